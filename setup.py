@@ -26,6 +26,7 @@ setup(
     license='Apache License, Version 2.0',
     ext_modules=[Extension('_pyframe3dd', ['src/py_main.c', 'src/py_io.c',
                  'src/frame3dd.c', 'src/HPGmatrix.c', 'src/coordtrans.c',
-                 'src/eig.c', 'src/HPGutil.c', 'src/NRutil.c'],
+                 'src/eig.c', 'src/HPGutil.c', 'src/NRutil.c', 'src/py_lapack.c',
+                 'src/py_sensitivity.c'],
                  extra_compile_args=extra_compile_args)]
 )
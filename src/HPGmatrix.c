@@ -41,6 +41,8 @@
 
 #define SWAP(a,b) {temp=(a);(a)=(b);(b)=temp;}
 
+#define MRHS_BLOCK 32	/* right hand sides per block in the _mrhs solvers */
+
 /* 
  * GAUSSJ
  * Linear equation solution by Gauss-Jordan elimination, [A][X]=[B] above. A[1..n][1..n]
@@ -515,6 +517,570 @@ void ldl_mprove_pm (
 }
 
 
+/*-----------------------------------------------------------------------------
+LDL_DCMP_SKY  -  Solves partitioned matrix equations
+
+             [A_qq]{x_q} + [A_qr]{x_r} = {b_q}
+             [A_rq]{x_q} + [A_rr]{x_r} = {b_r}
+             where {b_q} and {x_r} are known and {x_q} and {b_r} are unknown
+
+  via L D L' - decomposition of [A], with [A] held in profile (skyline) 
+  storage.  This is the same algorithm as ldl_dcmp_pm(), but only the 
+  entries below the sky-line of each column are stored and visited.
+  The upper triangle of [A] is stored column-by-column in A[1..sky[n]].  
+  Column j holds rows  j-(sky[j]-sky[j-1])+1 ... j  with the diagonal
+  last, so that  A(i,j) = A[ sky[j]-j+i ]  and  sky[0] = 0.  
+  [A] is preserved.  The rows of L, (the columns of L'), are returned in 
+  {L}, which has the same profile as {A}.  The diagonal of D is returned 
+  in the vector {d}.
+  {q} is a vector of the indexes of known values {b_q}
+  {r} is a vector of the indexes of known values {x_r}
+
+ usage: double *A, *L, *d, *b, *x;
+	int   *sky, n, *q, *r, reduce, solve, pd;
+	ldl_dcmp_sky ( A, L, sky, n, d, b, x, q, r, reduce, solve, &pd );
+
+ Bathe, Finite Element Procecures in Engineering Analysis, Prentice Hall, 1982
+-----------------------------------------------------------------------------*/
+void ldl_dcmp_sky (
+	double *A,	/**< the system matrix, in profile storage	*/
+	double *L,	/**< L of the L D L' decomp., in profile storage */
+	int *sky,	/**< location of the diagonal of each column	*/
+	int n,		/**< the dimension of the matrix		*/
+	double *d,	/**< diagonal of D in the  L D L' - decomp'n    */
+	double *b,	/**< the right hand side vector			*/
+	double *x,	/**< the solution vector			*/
+	int *q,		/**< q[j]=1 if  b[j] is known; q[j]=0 otherwise	*/
+	int *r,		/**< r[j]=1 if  x[j] is known; r[j]=0 otherwise	*/
+	int reduce,	/**< 1: do a forward reduction of A; 0: don't   */
+	int solve,	/**< 1: do a back substitution for {x}; 0: don't */
+	int *pd		/**< 1: definite matrix and successful L D L' decomp'n*/
+){
+	int	i, j, k, m,
+		ti, tj,		/* top row of column i and of column j	*/
+		oi, oj;		/* offset of column i and of column j	*/
+	*pd = 0;	/* number of negative elements on the diagonal of D */
+
+	if ( reduce ) {		/* forward column-wise reduction of [A]	*/
+
+	    for (j=1; j<=n; j++) {
+
+	      d[j] = 0.0;
+	      tj = j - sky[j] + sky[j-1] + 1;
+	      oj = sky[j] - j;
+
+	      for (i=tj; i <= j; i++)	L[oj+i] = 0.0;
+
+	      if ( q[j] ) { /* reduce column j, except where q[i]==0	*/	
+
+		for (i=tj; i < j; i++) {
+		    if ( q[i] ) {
+			ti = i - sky[i] + sky[i-1] + 1;
+			oi = sky[i] - i;
+			m  = ( ti > tj ) ? ti : tj;
+			L[oj+i] = A[oj+i];
+			for (k=m; k < i; k++)
+				if ( q[k] )
+					L[oj+i] -= L[oj+k]*L[oi+k];
+		    }
+		}
+
+		d[j] = A[oj+j];
+	    	for (i=tj; i < j; i++) if ( q[i] ) d[j] -= L[oj+i]*L[oj+i]/d[i];
+	    	for (i=tj; i < j; i++) if ( q[i] ) L[oj+i] /= d[i];
+		L[oj+j] = 1.0;
+
+		if ( d[j] == 0.0 ) {
+		 fprintf(stderr," ldl_dcmp_sky(): zero found on diagonal ...\n");
+		 fprintf(stderr," d[%d] = %11.4e\n", j, d[j] );
+		 return;
+		}
+		if ( d[j] < 0.0 ) (*pd)--;
+	      }
+	    }
+
+	}		/* the forward reduction of [A] is now complete	*/
+
+	if ( solve ) {		/* back substitution to solve for {x}   */
+
+	    for (i=1; i <= n; i++)	if ( q[i] )	x[i] = b[i];
+
+	    /* {x_q} = {b_q} - [A_qr]{x_r}, visiting each stored A(i,j) once */
+	    for (j=1; j <= n; j++) {
+		tj = j - sky[j] + sky[j-1] + 1;
+		oj = sky[j] - j;
+		for (i=tj; i < j; i++) {
+			if ( q[i] && r[j] )	x[i] -= A[oj+i]*x[j];
+			if ( r[i] && q[j] )	x[j] -= A[oj+i]*x[i];
+		}
+	    }
+
+		/* {x} is run through the same forward reduction as was [A] */
+	    for (i=1; i <= n; i++) {
+		if ( q[i] ) {
+			ti = i - sky[i] + sky[i-1] + 1;
+			oi = sky[i] - i;
+			for (j=ti; j < i; j++) if ( q[j] ) x[i] -= L[oi+j]*x[j];
+		}
+	    }
+
+	    for (i=1; i <= n; i++)	if ( q[i] )	x[i] /= d[i];
+
+	    /* now back substitution is conducted on {x};  [A] is preserved */
+
+	    for (i=n; i > 1; i--) {
+		if ( q[i] ) {
+			ti = i - sky[i] + sky[i-1] + 1;
+			oi = sky[i] - i;
+			for (j=ti; j < i; j++) if ( q[j] ) x[j] -= L[oi+j]*x[i];
+		}
+	    }
+
+	    /* finally, evaluate b_r	*/
+
+	    for (i=1; i<=n; i++)	if ( r[i] )	b[i] = 0.0;
+
+	    for (j=1; j <= n; j++) {
+		tj = j - sky[j] + sky[j-1] + 1;
+		oj = sky[j] - j;
+		for (i=tj; i < j; i++) {
+			if ( r[i] )	b[i] += A[oj+i]*x[j];
+			if ( r[j] )	b[j] += A[oj+i]*x[i];
+		}
+		if ( r[j] )	b[j] += A[oj+j]*x[j];
+	    }
+
+	}
+	return;
+}
+
+
+/*----------------------------------------------------------------------------
+LDL_MPROVE_SKY
+ Improves a solution vector x[1..n] of the partitioned set of linear equations
+             [A_qq]{x_q} + [A_qr]{x_r} = {b_q}
+             [A_rq]{x_q} + [A_rr]{x_r} = {b_r}
+             where {b_q} and {x_r} are known and {x_q} and {b_r} are unknown
+ The matrix [A] and its L D L' decomposition {L}, {d} are in profile storage,
+ as returned by ldl_dcmp_sky().
+ On output, only {x} is modified to an improved set of values.
+
+ usage: double *A, *L, *d, *b, *x, rms_resid;
+	int   *sky, n, ok, *q, *r;
+	ldl_mprove_sky ( A, L, sky, n, d, b, x, q, r, &rms_resid, &ok );
+-----------------------------------------------------------------------------*/
+void ldl_mprove_sky (
+	double *A, double *L, int *sky, int n, double *d, double *b, double *x,
+	int *q, int *r,
+	double *rms_resid, int *ok
+){
+	double   *resid,	/* the residual error		  	*/
+		rms_resid_new=0.0; /* the RMS error of the mprvd solution */
+	int	i, pd;
+
+	resid = dvector(1,n);
+
+	// calculate the r.h.s. of ...
+	//  [A_qq]{r_q} = {b_q} - [A_qr]*{x_r} - [A_qq]{x_q+r_q}      
+	prodAx_sky ( A, sky, n, x, resid );
+	for (i=1;i<=n;i++) {
+		if ( q[i] )	resid[i] = b[i] - resid[i];
+		else		resid[i] = 0.0;
+	}
+
+	/* solve for the residual error term	*/
+	ldl_dcmp_sky ( A, L, sky, n, d, resid, resid, q,r, 0, 1, &pd );
+
+	for (i=1;i<=n;i++) if ( q[i] )	rms_resid_new += resid[i]*resid[i];
+
+	rms_resid_new = sqrt ( rms_resid_new / (double) n );
+
+	*ok = 0;
+	if ( rms_resid_new / *rms_resid < 0.90 ) {	/* good improvement */
+				/* subtract the error from the old solution */
+		for (i=1;i<=n;i++) if ( q[i] )	x[i] += resid[i];
+		*rms_resid = rms_resid_new;
+		*ok = 1;	/* the solution has improved		*/
+	}
+
+	free_dvector(resid,1,n);
+	return;
+}
+
+
+/*----------------------------------------------------------------------------
+PRODAX_SKY  -  {y} = [A]{x} for a symmetric matrix [A] in profile storage,
+ as described in ldl_dcmp_sky().
+-----------------------------------------------------------------------------*/
+void prodAx_sky ( double *A, int *sky, int n, double *x, double *y )
+{
+	int	i, j, tj, oj;
+
+	for (i=1; i<=n; i++)	y[i] = 0.0;
+
+	for (j=1; j<=n; j++) {
+		tj = j - sky[j] + sky[j-1] + 1;
+		oj = sky[j] - j;
+		for (i=tj; i < j; i++) {
+			y[i] += A[oj+i]*x[j];
+			y[j] += A[oj+i]*x[i];
+		}
+		y[j] += A[oj+j]*x[j];
+	}
+}
+
+
+/*-----------------------------------------------------------------------------
+LDL_SOLVE_PM_MRHS  -  back substitution of ldl_dcmp_pm() for many r.h.s.
+
+  Solves the partitioned matrix equations of ldl_dcmp_pm() for nb right hand
+  sides at once, with [A] already reduced by ldl_dcmp_pm( ..., 1, 0, &pd ).
+  The r.h.s. and solution vectors are the columns of B[1..n][1..nb] and
+  X[1..n][1..nb], so that the nb values of each row are contiguous.  
+  The right hand sides are taken MRHS_BLOCK at a time and each term of L is
+  read once for a block of right hand sides, not once for each of them.
+  X may be the same matrix as B.
+-----------------------------------------------------------------------------*/
+void ldl_solve_pm_mrhs (
+	double **A,	/**< L D L' decomp. of the system matrix	*/
+	int n,		/**< the dimension of the matrix		*/
+	double *d,	/**< diagonal of D in the  L D L' - decomp'n    */
+	double **B,	/**< the right hand side vectors, B[1..n][1..nb] */
+	double **X,	/**< the solution vectors, X[1..n][1..nb]	*/
+	int nb,		/**< the number of right hand side vectors	*/
+	int *q,		/**< q[j]=1 if  b[j] is known; q[j]=0 otherwise	*/
+	int *r		/**< r[j]=1 if  x[j] is known; r[j]=0 otherwise	*/
+){
+	double	a, *xi, *xj;
+	int	i, j, k, k0, k1;
+
+	for (k0=1; k0 <= nb; k0 += MRHS_BLOCK) {
+
+	    k1 = ( k0+MRHS_BLOCK-1 < nb ) ? k0+MRHS_BLOCK-1 : nb;
+
+	    for (i=1; i <= n; i++) {
+		if ( q[i] ) {
+			xi = X[i];
+			for (k=k0; k<=k1; k++)	xi[k] = B[i][k];
+			for (j=1; j<= n; j++) {
+				if ( r[j] && (a = A[i][j]) != 0.0 ) {
+					xj = X[j];
+					for (k=k0; k<=k1; k++)	xi[k] -= a*xj[k];
+				}
+			}
+		}
+	    }
+
+		/* {x} is run through the same forward reduction as was [A] */
+	    for (i=1; i <= n; i++) {
+		if ( q[i] ) {
+			xi = X[i];
+			for (j=1; j<i; j++) {
+				if ( q[j] && (a = A[i][j]) != 0.0 ) {
+					xj = X[j];
+					for (k=k0; k<=k1; k++)	xi[k] -= a*xj[k];
+				}
+			}
+		}
+	    }
+
+	    for (i=1; i <= n; i++)
+		if ( q[i] )	for (k=k0; k<=k1; k++)	X[i][k] /= d[i];
+
+	    /* now back substitution is conducted on {x};  [A] is preserved */
+
+	    for (i=n; i > 1; i--) {
+		if ( q[i] ) {
+			xi = X[i];
+			for (j=1; j < i; j++) {
+				if ( q[j] && (a = A[i][j]) != 0.0 ) {
+					xj = X[j];
+					for (k=k0; k<=k1; k++)	xj[k] -= a*xi[k];
+				}
+			}
+		}
+	    }
+
+	    /* finally, evaluate b_r	*/
+
+	    for (i=1; i<=n; i++) {
+		if ( r[i] ) {
+			for (k=k0; k<=k1; k++)	B[i][k] = 0.0;
+			for (j=1; j<=n; j++) {
+				if ( (a = A[i][j]) != 0.0 ) {
+					xj = X[j];
+					for (k=k0; k<=k1; k++)	B[i][k] += a*xj[k];
+				}
+			}
+		}
+	    }
+	}
+	return;
+}
+
+
+/*----------------------------------------------------------------------------
+LDL_MPROVE_PM_MRHS
+ Improves the solution vectors X[1..n][1..nb] of ldl_solve_pm_mrhs(), as 
+ ldl_mprove_pm() does for one vector.  Only the columns k with ok[k] != 0 
+ are improved, and their residuals are computed and solved as one block.
+ On output ok[k] = 1 if column k was improved, and rms_resid[k] is its 
+ RMS residual.  Call repeatedly until no ok[k] is 1.
+
+ usage: double **A, *d, **B, **X, *rms_resid;
+	int   n, nb, *ok, *q, *r;
+	ldl_mprove_pm_mrhs ( A, n, d, B, X, nb, q, r, rms_resid, ok );
+-----------------------------------------------------------------------------*/
+void ldl_mprove_pm_mrhs (
+	double **A, int n, double *d, double **B, double **X, int nb,
+	int *q, int *r,
+	double *rms_resid, int *ok
+){
+	double	a, **resid,	/* the residual error of each active column */
+		rms_resid_new;	/* the RMS error of the mprvd solution	*/
+	int	i, j, k, na, *col;
+
+	col = ivector(1,nb);
+	for (na=0, k=1; k<=nb; k++)	if ( ok[k] )	col[++na] = k;
+	if ( na == 0 ) {
+		free_ivector(col,1,nb);
+		return;
+	}
+
+	resid = dmatrix(1,n,1,na);
+
+	// calculate the r.h.s. of ...
+	//  [A_qq]{r_q} = {b_q} - [A_qr]*{x_r} - [A_qq]{x_q+r_q}      
+	for (i=1;i<=n;i++) {
+	    for (k=1;k<=na;k++)	resid[i][k] = q[i] ? B[i][col[k]] : 0.0;
+	    if ( q[i] ) {
+		for (j=1;j<=n;j++) {	/* A in upper triangle only     */
+			if ( r[j] )		a = A[i][j];
+			else if ( i <= j )	a = A[i][j];
+			else			a = A[j][i];
+			if ( a != 0.0 )
+				for (k=1;k<=na;k++) resid[i][k] -= a*X[j][col[k]];
+		}
+	    }
+	}
+
+	/* solve for the residual error terms	*/
+	ldl_solve_pm_mrhs ( A, n, d, resid, resid, na, q, r );
+
+	for (k=1;k<=na;k++) {
+		rms_resid_new = 0.0;
+		for (i=1;i<=n;i++) if ( q[i] )
+			rms_resid_new += resid[i][k]*resid[i][k];
+		rms_resid_new = sqrt ( rms_resid_new / (double) n );
+
+		ok[col[k]] = 0;
+		if ( rms_resid_new / rms_resid[col[k]] < 0.90 ) { /* improved */
+			for (i=1;i<=n;i++) if ( q[i] )	X[i][col[k]] += resid[i][k];
+			rms_resid[col[k]] = rms_resid_new;
+			ok[col[k]] = 1;
+		}
+	}
+
+	free_dmatrix(resid,1,n,1,na);
+	free_ivector(col,1,nb);
+	return;
+}
+
+
+/*-----------------------------------------------------------------------------
+LDL_SOLVE_SKY_MRHS  -  ldl_solve_pm_mrhs() for [A] and L in profile storage,
+  as returned by ldl_dcmp_sky( ..., 1, 0, &pd ).
+-----------------------------------------------------------------------------*/
+void ldl_solve_sky_mrhs (
+	double *A,	/**< the system matrix, in profile storage	*/
+	double *L,	/**< L of the L D L' decomp., in profile storage */
+	int *sky,	/**< location of the diagonal of each column	*/
+	int n,		/**< the dimension of the matrix		*/
+	double *d,	/**< diagonal of D in the  L D L' - decomp'n    */
+	double **B,	/**< the right hand side vectors, B[1..n][1..nb] */
+	double **X,	/**< the solution vectors, X[1..n][1..nb]	*/
+	int nb,		/**< the number of right hand side vectors	*/
+	int *q,		/**< q[j]=1 if  b[j] is known; q[j]=0 otherwise	*/
+	int *r		/**< r[j]=1 if  x[j] is known; r[j]=0 otherwise	*/
+){
+	double	a, *xi, *xj;
+	int	i, j, k, k0, k1,
+		ti, tj,		/* top row of column i and of column j	*/
+		oi, oj;		/* offset of column i and of column j	*/
+
+	for (k0=1; k0 <= nb; k0 += MRHS_BLOCK) {
+
+	    k1 = ( k0+MRHS_BLOCK-1 < nb ) ? k0+MRHS_BLOCK-1 : nb;
+
+	    for (i=1; i <= n; i++)
+		if ( q[i] )	for (k=k0; k<=k1; k++)	X[i][k] = B[i][k];
+
+	    /* {x_q} = {b_q} - [A_qr]{x_r}, visiting each stored A(i,j) once */
+	    for (j=1; j <= n; j++) {
+		tj = j - sky[j] + sky[j-1] + 1;
+		oj = sky[j] - j;
+		xj = X[j];
+		for (i=tj; i < j; i++) {
+			a  = A[oj+i];
+			xi = X[i];
+			if ( q[i] && r[j] )	for (k=k0; k<=k1; k++) xi[k] -= a*xj[k];
+			if ( r[i] && q[j] )	for (k=k0; k<=k1; k++) xj[k] -= a*xi[k];
+		}
+	    }
+
+		/* {x} is run through the same forward reduction as was [A] */
+	    for (i=1; i <= n; i++) {
+		if ( q[i] ) {
+			ti = i - sky[i] + sky[i-1] + 1;
+			oi = sky[i] - i;
+			xi = X[i];
+			for (j=ti; j < i; j++) {
+				if ( q[j] && (a = L[oi+j]) != 0.0 ) {
+					xj = X[j];
+					for (k=k0; k<=k1; k++)	xi[k] -= a*xj[k];
+				}
+			}
+		}
+	    }
+
+	    for (i=1; i <= n; i++)
+		if ( q[i] )	for (k=k0; k<=k1; k++)	X[i][k] /= d[i];
+
+	    /* now back substitution is conducted on {x};  [A] is preserved */
+
+	    for (i=n; i > 1; i--) {
+		if ( q[i] ) {
+			ti = i - sky[i] + sky[i-1] + 1;
+			oi = sky[i] - i;
+			xi = X[i];
+			for (j=ti; j < i; j++) {
+				if ( q[j] && (a = L[oi+j]) != 0.0 ) {
+					xj = X[j];
+					for (k=k0; k<=k1; k++)	xj[k] -= a*xi[k];
+				}
+			}
+		}
+	    }
+
+	    /* finally, evaluate b_r	*/
+
+	    for (i=1; i<=n; i++)
+		if ( r[i] )	for (k=k0; k<=k1; k++)	B[i][k] = 0.0;
+
+	    for (j=1; j <= n; j++) {
+		tj = j - sky[j] + sky[j-1] + 1;
+		oj = sky[j] - j;
+		xj = X[j];
+		for (i=tj; i < j; i++) {
+			a  = A[oj+i];
+			xi = X[i];
+			if ( r[i] )	for (k=k0; k<=k1; k++)	B[i][k] += a*xj[k];
+			if ( r[j] )	for (k=k0; k<=k1; k++)	B[j][k] += a*xi[k];
+		}
+		if ( r[j] )	for (k=k0; k<=k1; k++)	B[j][k] += A[oj+j]*xj[k];
+	    }
+	}
+	return;
+}
+
+
+/*----------------------------------------------------------------------------
+LDL_MPROVE_SKY_MRHS
+ ldl_mprove_pm_mrhs() for [A] and its L D L' decomposition in profile
+ storage, as returned by ldl_dcmp_sky().
+
+ usage: double *A, *L, *d, **B, **X, *rms_resid;
+	int   *sky, n, nb, *ok, *q, *r;
+	ldl_mprove_sky_mrhs ( A, L, sky, n, d, B, X, nb, q, r, rms_resid, ok );
+-----------------------------------------------------------------------------*/
+void ldl_mprove_sky_mrhs (
+	double *A, double *L, int *sky, int n, double *d,
+	double **B, double **X, int nb,
+	int *q, int *r,
+	double *rms_resid, int *ok
+){
+	double	**Xa,		/* the active columns of X		*/
+		**resid,	/* the residual error of each active column */
+		rms_resid_new;	/* the RMS error of the mprvd solution	*/
+	int	i, k, na, *col;
+
+	col = ivector(1,nb);
+	for (na=0, k=1; k<=nb; k++)	if ( ok[k] )	col[++na] = k;
+	if ( na == 0 ) {
+		free_ivector(col,1,nb);
+		return;
+	}
+
+	Xa    = dmatrix(1,n,1,na);
+	resid = dmatrix(1,n,1,na);
+
+	for (i=1;i<=n;i++)	for (k=1;k<=na;k++)	Xa[i][k] = X[i][col[k]];
+
+	// calculate the r.h.s. of ...
+	//  [A_qq]{r_q} = {b_q} - [A_qr]*{x_r} - [A_qq]{x_q+r_q}      
+	prodAX_sky ( A, sky, n, Xa, resid, na );
+	for (i=1;i<=n;i++) {
+		for (k=1;k<=na;k++) {
+			if ( q[i] )	resid[i][k] = B[i][col[k]] - resid[i][k];
+			else		resid[i][k] = 0.0;
+		}
+	}
+
+	/* solve for the residual error terms	*/
+	ldl_solve_sky_mrhs ( A, L, sky, n, d, resid, resid, na, q, r );
+
+	for (k=1;k<=na;k++) {
+		rms_resid_new = 0.0;
+		for (i=1;i<=n;i++) if ( q[i] )
+			rms_resid_new += resid[i][k]*resid[i][k];
+		rms_resid_new = sqrt ( rms_resid_new / (double) n );
+
+		ok[col[k]] = 0;
+		if ( rms_resid_new / rms_resid[col[k]] < 0.90 ) { /* improved */
+			for (i=1;i<=n;i++) if ( q[i] )	X[i][col[k]] += resid[i][k];
+			rms_resid[col[k]] = rms_resid_new;
+			ok[col[k]] = 1;
+		}
+	}
+
+	free_dmatrix(Xa,1,n,1,na);
+	free_dmatrix(resid,1,n,1,na);
+	free_ivector(col,1,nb);
+	return;
+}
+
+
+/*----------------------------------------------------------------------------
+PRODAX_SKY  -  [Y] = [A][X] for a symmetric matrix [A] in profile storage
+ and the nb columns of X[1..n][1..nb], as described in ldl_dcmp_sky().
+-----------------------------------------------------------------------------*/
+void prodAX_sky ( double *A, int *sky, int n, double **X, double **Y, int nb )
+{
+	double	a, *xi, *xj, *yi, *yj;
+	int	i, j, k, tj, oj;
+
+	for (i=1; i<=n; i++)	for (k=1; k<=nb; k++)	Y[i][k] = 0.0;
+
+	for (j=1; j<=n; j++) {
+		tj = j - sky[j] + sky[j-1] + 1;
+		oj = sky[j] - j;
+		xj = X[j];
+		yj = Y[j];
+		for (i=tj; i < j; i++) {
+			if ( (a = A[oj+i]) == 0.0 )	continue;
+			xi = X[i];
+			yi = Y[i];
+			for (k=1; k<=nb; k++) {
+				yi[k] += a*xj[k];
+				yj[k] += a*xi[k];
+			}
+		}
+		a = A[oj+j];
+		for (k=1; k<=nb; k++)	yj[k] += a*xj[k];
+	}
+}
+
+
 /*----------------------------------------------------------------------------
 PSB_UPDATE
  Update secant stiffness matrix via the Powell-Symmetric-Broyden update eqn.
@@ -167,6 +167,129 @@ void ldl_mprove_pm (
 );
 
 
+/* ----------------------------------------------------------------------------
+ LDL_DCMP_SKY  -  Solves partitioned matrix equations
+ [A_qq]{x_q} + [A_qr]{x_r} = {b_q}
+ [A_rq]{x_q} + [A_rr]{x_r} = {b_r}
+ where {b_q} and {x_r} are known and {x_q} and {b_r} are unknown
+ via L D L' - decomposition of [A] held in profile (skyline) storage.
+ The upper triangle of [A] is stored column-by-column in A[1..sky[n]], 
+ column j holds rows j-(sky[j]-sky[j-1])+1 ... j with the diagonal last,
+ so that  A(i,j) = A[ sky[j]-j+i ]  and  sky[0] = 0.
+ [A] is preserved.  The rows of L are returned in {L}, in the profile of [A].
+ The diagonal of D is returned in the vector {d}
+ 
+ usage: double *A, *L, *d, *b, *x;
+ int   *sky, n, *q, *r, reduce, solve, pd;
+ ldl_dcmp_sky ( A, L, sky, n, d, b, x, q, r, reduce, solve, &pd );
+-----------------------------------------------------------------------------*/
+void ldl_dcmp_sky (
+        double *A,      /**< the system matrix, in profile storage      */
+        double *L,      /**< L of the L D L' decomp., in profile storage */
+        int *sky,       /**< location of the diagonal of each column    */
+        int n,          /**< the dimension of the matrix                */
+        double *d,      /**< diagonal of D in the  L D L' - decomp'n    */
+        double *b,      /**< the right hand side vector                 */
+        double *x,      /**< the solution vector                        */
+        int *q,         /**< q[j]=1 if  b[j] is known; q[j]=0 otherwise */
+        int *r,         /**< r[j]=1 if  x[j] is known; r[j]=0 otherwise */
+        int reduce,     /**< 1: do a forward reduction of A; 0: don't   */
+        int solve,      /**< 1: do a back substitution for {x}; 0: don't */
+        int *pd );      /**< 1: definite matrix and successful L D L' decomp'n*/
+
+
+/* ----------------------------------------------------------------------------
+ LDL_MPROVE_SKY 
+ Improves a solution vector x[1..n] of the partitioned set of linear equations
+ as in ldl_mprove_pm(), for [A] and its L D L' decomposition in profile 
+ storage, as returned by ldl_dcmp_sky().
+ -----------------------------------------------------------------------------*/
+void ldl_mprove_sky (
+        double *A, double *L, int *sky, int n, double *d, double *b, double *x,
+        int *q, int *r,
+	double *rms_resid,	/**< the RMS error of the solution residual */
+	int *ok
+);
+
+
+/* ---------------------------------------------------------------------------
+ * PRODAX_SKY  -  {y} = [A]{x} for a symmetric [A] in profile storage
+ * --------------------------------------------------------------------------*/
+void prodAx_sky ( double *A, int *sky, int n, double *x, double *y );
+
+
+/* ----------------------------------------------------------------------------
+ LDL_SOLVE_PM_MRHS  -  back substitution of ldl_dcmp_pm() for the nb columns
+ of B[1..n][1..nb] at once, with [A] already reduced by ldl_dcmp_pm().
+ The right hand sides are processed in cache-sized blocks.  X may equal B.
+ 
+ usage: double **A, *d, **B, **X;
+ int   n, nb, *q, *r;
+ ldl_solve_pm_mrhs ( A, n, d, B, X, nb, q, r );
+-----------------------------------------------------------------------------*/
+void ldl_solve_pm_mrhs (
+	double **A,	/**< L D L' decomp. of the system matrix	*/
+	int n,		/**< the dimension of the matrix		*/
+	double *d,	/**< diagonal of D in the  L D L' - decomp'n    */
+	double **B,	/**< the right hand side vectors, B[1..n][1..nb] */
+	double **X,	/**< the solution vectors, X[1..n][1..nb]	*/
+	int nb,		/**< the number of right hand side vectors	*/
+	int *q,		/**< q[j]=1 if  b[j] is known; q[j]=0 otherwise	*/
+	int *r		/**< r[j]=1 if  x[j] is known; r[j]=0 otherwise	*/
+);
+
+
+/* ----------------------------------------------------------------------------
+ LDL_MPROVE_PM_MRHS
+ Improves the columns k of X[1..n][1..nb] with ok[k] != 0 as a block,
+ as ldl_mprove_pm() does for one vector.
+ -----------------------------------------------------------------------------*/
+void ldl_mprove_pm_mrhs (
+	double **A, int n, double *d, double **B, double **X, int nb,
+	int *q, int *r,
+	double *rms_resid,	/**< the RMS error of each solution residual */
+	int *ok		/**< in: 1 to improve column k, out: 1 if improved */
+);
+
+
+/* ----------------------------------------------------------------------------
+ LDL_SOLVE_SKY_MRHS  -  ldl_solve_pm_mrhs() for [A] in profile storage
+ as returned by ldl_dcmp_sky().
+-----------------------------------------------------------------------------*/
+void ldl_solve_sky_mrhs (
+	double *A,	/**< the system matrix, in profile storage	*/
+	double *L,	/**< L of the L D L' decomp., in profile storage */
+	int *sky,	/**< location of the diagonal of each column	*/
+	int n,		/**< the dimension of the matrix		*/
+	double *d,	/**< diagonal of D in the  L D L' - decomp'n    */
+	double **B,	/**< the right hand side vectors, B[1..n][1..nb] */
+	double **X,	/**< the solution vectors, X[1..n][1..nb]	*/
+	int nb,		/**< the number of right hand side vectors	*/
+	int *q,		/**< q[j]=1 if  b[j] is known; q[j]=0 otherwise	*/
+	int *r		/**< r[j]=1 if  x[j] is known; r[j]=0 otherwise	*/
+);
+
+
+/* ----------------------------------------------------------------------------
+ LDL_MPROVE_SKY_MRHS
+ ldl_mprove_pm_mrhs() for [A] in profile storage.
+ -----------------------------------------------------------------------------*/
+void ldl_mprove_sky_mrhs (
+	double *A, double *L, int *sky, int n, double *d,
+	double **B, double **X, int nb,
+	int *q, int *r,
+	double *rms_resid,	/**< the RMS error of each solution residual */
+	int *ok		/**< in: 1 to improve column k, out: 1 if improved */
+);
+
+
+/* ---------------------------------------------------------------------------
+ * PRODAX_SKY  -  [Y] = [A][X] for a symmetric [A] in profile storage
+ * and the nb columns of X[1..n][1..nb]
+ * --------------------------------------------------------------------------*/
+void prodAX_sky ( double *A, int *sky, int n, double **X, double **Y, int nb );
+
+
 /* ----------------------------------------------------------------------------
  PSB_UPDATE
  Update secant stiffness matrix via the Powell-Symmetric-Broyden update eqn.
@@ -395,7 +395,9 @@ void free_D3matrix(float ***m, int nrl, int nrh, int ncl, int nch, int nzl, int
 		for(j=nch;j>=ncl;j--) {
 			free((char*) (m[i][j]+nzl));
 		}
+		free((char*) (m[i]+ncl));
 	}
+	free((char*) (m+nrl));
 }
 
 void free_D3dmatrix(double ***m, int nrl, int nrh, int ncl, int nch, int nzl, int nzh)
@@ -406,7 +408,77 @@ void free_D3dmatrix(double ***m, int nrl, int nrh, int ncl, int nch, int nzl, in
 		for(j=nch;j>=ncl;j--) {
 			free((char*) (m[i][j]+nzl));
 		}
+		free((char*) (m[i]+ncl));
+	}
+	free((char*) (m+nrl));
+}
+
+float ***R3matrix(int nrl, int nrh, int *n, int nzl, int nzh)
+/* storage for a ragged 3-D matrix m[nrl..nrh][1..n[i]][nzl..nzh],
+   with all the rows in one block and all the values in another */
+{
+	int     i,j,rows=0,nz=nzh-nzl+1;
+	float   ***m,**r,*v;
+
+	for (i=nrl;i<=nrh;i++) rows += n[i];
+	m=(float ***) malloc((size_t) (nrh-nrl+1)*sizeof(float**));
+	if (!m) nrerror("alloc failure 1 in R3matrix()");
+	m -= nrl;
+	r=(float **) malloc((size_t) (rows+1)*sizeof(float*));
+	if (!r) nrerror("alloc failure 2 in R3matrix()");
+	v=(float *) malloc((size_t) (rows*nz+1)*sizeof(float));
+	if (!v) nrerror("alloc failure 3 in R3matrix()");
+	r[0]=v;		/* the block of values, for free_R3matrix() */
+	for (i=nrl;i<=nrh;i++) {
+		m[i]=r;
+		for (j=1;j<=n[i];j++) {
+			m[i][j]=v-nzl;
+			v += nz;
+		}
+		r += n[i];
+	}
+	return m;
+}
+
+double ***R3dmatrix(int nrl, int nrh, int *n, int nzl, int nzh)
+/* storage for a ragged 3-D matrix m[nrl..nrh][1..n[i]][nzl..nzh],
+   with all the rows in one block and all the values in another */
+{
+	int     i,j,rows=0,nz=nzh-nzl+1;
+	double  ***m,**r,*v;
+
+	for (i=nrl;i<=nrh;i++) rows += n[i];
+	m=(double ***) malloc((size_t) (nrh-nrl+1)*sizeof(double**));
+	if (!m) nrerror("alloc failure 1 in R3dmatrix()");
+	m -= nrl;
+	r=(double **) malloc((size_t) (rows+1)*sizeof(double*));
+	if (!r) nrerror("alloc failure 2 in R3dmatrix()");
+	v=(double *) malloc((size_t) (rows*nz+1)*sizeof(double));
+	if (!v) nrerror("alloc failure 3 in R3dmatrix()");
+	r[0]=v;		/* the block of values, for free_R3dmatrix() */
+	for (i=nrl;i<=nrh;i++) {
+		m[i]=r;
+		for (j=1;j<=n[i];j++) {
+			m[i][j]=v-nzl;
+			v += nz;
+		}
+		r += n[i];
 	}
+	return m;
+}
+
+void free_R3matrix(float ***m, int nrl)
+{
+	free((char*) m[nrl][0]);
+	free((char*) m[nrl]);
+	free((char*) (m+nrl));
+}
+
+void free_R3dmatrix(double ***m, int nrl)
+{
+	free((char*) m[nrl][0]);
+	free((char*) m[nrl]);
+	free((char*) (m+nrl));
 }
 
 
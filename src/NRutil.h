@@ -90,6 +90,10 @@ float  ***D3matrix(int nrl,int nrh, int ncl, int nch, int nzl, int nzh);
 double ***D3dmatrix(int nrl,int nrh, int ncl, int nch, int nzl, int nzh);
 void   free_D3matrix(float ***m, int nrl, int nrh, int ncl, int nch, int nzl, int nzh);
 void free_D3dmatrix(double ***m, int nrl, int nrh, int ncl, int nch, int nzl, int nzh);
+float  ***R3matrix(int nrl, int nrh, int *n, int nzl, int nzh);
+double ***R3dmatrix(int nrl, int nrh, int *n, int nzl, int nzh);
+void   free_R3matrix(float ***m, int nrl);
+void free_R3dmatrix(double ***m, int nrl);
 
 void show_vector(float *A, int n);
 void show_dvector(double *A, int n );
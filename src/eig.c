@@ -29,6 +29,7 @@
  Durham, NC  27708--0287
 */
 
+#include <float.h>
 #include <math.h>
 #include <stdio.h>
 #include <stdlib.h>
@@ -38,6 +39,7 @@
 #include "HPGmatrix.h"
 #include "HPGutil.h"
 #include "NRutil.h"
+#include "py_lapack.h"
 
 /* #define EIG_DEBUG */
 
@@ -46,6 +48,10 @@
 static void jacobi( double **K, double **M, double *E, double **V, int n );
 
 static void rotate ( double **A, int n,double alpha, double beta, int i,int j);
+static void tridiag_ql ( double *d, double *e, int n, double **Z );
+static double m_orthogonalize ( double *M, int *sky, int n, double *u,
+			double *Mu, double **X, int nx, double **Q, int nq );
+static int sturm_sky ( double *A, double *M, int *sky, int n, double ws );
 
 void eigsort ( double *e, double **v, int n, int m);
 
@@ -63,7 +69,7 @@ where
  H.P. Gavin, Civil Engineering, Duke University, hpgavin@duke.edu  1 March 2007
  Bathe, Finite Element Procecures in Engineering Analysis, Prentice Hall, 1982
 -----------------------------------------------------------------------------*/
-void subspace(
+int subspace(
 	double **K, double **M,
 	int n, int m,	/**< DoF and number of required modes	*/
 	double *w, double **V,
@@ -78,13 +84,14 @@ void subspace(
 	int	i=0, j=0, k=0,
 		modes,
 		disp = 0,	/* display convergence info.	*/
-		*idx;
+		*idx,
+		status = 0;	/* 0: ok, 32: the iteration failed	*/
 	char	errMsg[MAXL];
 
 	if ( m > n ) {
 		sprintf(errMsg,"subspace: Number of eigen-values must be less than the problem dimension.\n Desired number of eigen-values=%d \n Dimension of the problem= %d \n", m, n);
 		errorMsg(errMsg);
-		exit(32);
+		return 32;
 	}
 
 	d  = dvector(1,n);
@@ -116,7 +123,8 @@ void subspace(
 		if ( M[i][i] <= 0.0 )  {
 		 sprintf(errMsg," subspace: M[%d][%d] = %e \n", i,i, M[i][i] );
 		 errorMsg(errMsg);
-		 exit(32);
+		 status = 32;
+		 goto done;
 		}
 		d[i] = K[i][i] / M[i][i];
 	}
@@ -192,7 +200,8 @@ void subspace(
 		if (w[modes] == 0.0) {
 		 sprintf(errMsg," subspace: Zero frequency found! \n w[%d] = %e \n", modes, w[modes] );
 		 errorMsg(errMsg);
-		 exit(32);
+		 status = 32;
+		 goto done;
 		}
 		error = fabs( w[modes] - w_old ) / w[modes];
 
@@ -204,7 +213,8 @@ void subspace(
 		if ( *iter > 1000 ) {
 		    sprintf(errMsg,"  subspace: Iteration limit exceeded\n rel. error = %e > %e\n", error, tol );
 		    errorMsg(errMsg);
-		    exit(32);
+		    status = 32;
+		    goto done;
 		}
 
 	} while	( error > tol );		/* End   sub-space iterations */
@@ -224,14 +234,19 @@ void subspace(
 
 	*ok = sturm ( K, M, n, m, shift, w[modes]+tol, verbose );
 
+done:
 	for (i=1;i<=n;i++) for (j=i;j<=n;j++) K[i][j] -= shift*M[i][j];
 
+	free_dvector(d,1,n);
+	free_dvector(u,1,n);
+	free_dvector(v,1,n);
 	free_dmatrix(Kb,1,m,1,m);
 	free_dmatrix(Mb,1,m,1,m);
 	free_dmatrix(Xb,1,n,1,m);
 	free_dmatrix(Qb,1,m,1,m);
+	free_ivector(idx,1,m);
 
-	return;
+	return status;
 }
 
 
@@ -360,7 +375,7 @@ with shifting. 								15oct98
 
  H.P. Gavin, Civil Engineering, Duke University, hpgavin@duke.edu  12 Jul 2001
 ------------------------------------------------------------------------------*/
-void stodola (
+int stodola (
 	double **K, double **M, /* stiffness and mass matrices */
 	int n, int m, /* DoF and number of required modes	*/
 	double *w, double **V, double tol, double shift, int *iter, int *ok,
@@ -380,6 +395,7 @@ void stodola (
 	int	i_ex = 9999, /* location of minimum value of D[i][i]	*/
 		modes,		/* number of desired modes		*/
 		disp = 0,	/* 1: display convergence error; 0: dont*/
+		status = 0,	/* 0: ok, 32: the iteration failed	*/
 		i,j,k;
 
 	char	errMsg[MAXL];
@@ -399,7 +415,8 @@ void stodola (
 	if (*ok<0) {
 		sprintf(errMsg," Make sure that all six rigid body translation are restrained.\n");
 		errorMsg(errMsg);
-		exit(32);
+		status = 32;
+		goto done;
 	}
 						/* calculate  D = K^(-1) M */
 	for (j=1; j<=n; j++) {
@@ -481,7 +498,8 @@ void stodola (
 		if ( *iter > 1000 ) {
 		    sprintf(errMsg,"  stodola: Iteration limit exceeded\n  rel. error = %e > %e\n", (fabs(RQ - RQold)/RQ) , tol );
 		    errorMsg(errMsg);
-		    exit(32);
+		    status = 32;
+		    goto done;
 		}
 
 	    } while ( (fabs(RQ - RQold)/RQ) > tol );
@@ -507,13 +525,403 @@ void stodola (
 	save_dmatrix ( "V", V, 1,n, 1,m, 0, "w" ); /* save mode shape matrix */
 #endif
 
+done:
 	free_dmatrix(D,1,n,1,n);
 	free_dvector(d,1,n);
 	free_dvector(u,1,n);
 	free_dvector(v,1,n);
 	free_dvector(c,1,m);
 
-	return;
+	return status;
+}
+
+
+/*------------------------------------------------------------------------------
+LAPACK_EIG  -  lowest m eigen-values, w, and eigen-vectors, V, of the general
+eigen-problem K V = w M V, with the LAPACK routine dsygvx.  
+Only the upper triangles of K and M are used, and K and M are preserved.
+The eigen-values are shifted by shift, as in subspace().
+*ok is 0 on success, or -1 if dsygvx failed, e.g. for a singular mass matrix.
+------------------------------------------------------------------------------*/
+void lapack_eig(
+	double **K, double **M,
+	int n, int m,	/**< DoF and number of required modes	*/
+	double *w, double **V,
+	double shift,
+	int *ok,
+	int verbose
+){
+	double	*A, *B, *Z;	/* K+shift*M, M, and V, column-major	*/
+	int	i, j, k, info;
+
+	A = (double *) malloc( sizeof(double)*n*n );
+	B = (double *) malloc( sizeof(double)*n*n );
+	Z = (double *) malloc( sizeof(double)*n*m );
+
+	for (j=1; j<=n; j++) {
+		for (i=1; i<=j; i++) {
+			A[(i-1)+(j-1)*n] = K[i][j] + shift*M[i][j];
+			B[(i-1)+(j-1)*n] = M[i][j];
+		}
+	}
+
+	lapack_dsygvx ( n, m, A, B, w+1, Z, &info );
+
+	*ok = 0;
+	if ( info != 0 ) {
+		*ok = -1;
+		fprintf(stderr," lapack_eig: dsygvx failed, info = %d\n", info );
+	} else {
+		for (k=1; k<=m; k++) {
+			for (i=1; i<=n; i++)	V[i][k] = Z[(i-1)+(k-1)*n];
+			if ( w[k] > shift )	w[k] = w[k] - shift;
+			else			w[k] = shift - w[k];
+		}
+		if ( verbose )
+			for ( k=1; k<=m; k++ )
+				fprintf(stdout,"  mode: %2d\t %9.4lf Hz\n",
+						k, sqrt(w[k])/(2.0*PI) );
+	}
+
+	free(A);
+	free(B);
+	free(Z);
+}
+
+
+/*------------------------------------------------------------------------------
+LANCZOS - Find the lowest m eigen-values, w, and eigen-vectors, V, of the
+general eigen-problem  K V = w M V, with K and M in profile storage, as
+described in ldl_dcmp_sky(), using shift-invert Lanczos iteration.
+[K + shift M] is factored once.  The Lanczos vectors are fully
+re-orthogonalized in the M inner product, and the Krylov space is extended 
+until the residuals of the lowest m Ritz pairs are less than tol.
+Converged modes are locked, and a Sturm sequence check restarts the 
+iteration, orthogonal to the locked modes, to find any missing (repeated)
+eigen-values.  V is M-normalized.
+*ok is 0 if all m modes were found, and negative otherwise.
+
+ Ericsson and Ruhe, The spectral transformation Lanczos method for the
+ numerical solution of large sparse generalized symmetric eigenvalue 
+ problems, Mathematics of Computation, 35(152):1251-1268, 1980
+------------------------------------------------------------------------------*/
+void lanczos(
+	double *K, double *M, int *sky,
+	int n, int m,	/**< DoF and number of required modes	*/
+	double *w, double **V,
+	double tol, double shift,
+	int *iter,	/**< number of Lanczos vectors		*/
+	int *ok,
+	int verbose
+){
+	double	*A, *L, *d,	/* K + shift M and its L D L' decomposition */
+		**Q,		/* M-orthonormal Lanczos vectors, Q[j][1..n] */
+		**X, **Y, **Z,	/* locked, new, and merged modes, X[k][1..n] */
+		*tX, *tY, *tZ,	/* eigen-values of [K + shift M]^-1 M	*/
+		**T, *t,
+		*u, *Mu, *Mq,	/* new Lanczos vector, M u, and M q_j	*/
+		*alpha, *beta,	/* the Lanczos tri-diagonal matrix	*/
+		*theta, *e, **S, /* its eigen-values and eigen-vectors	*/
+		c, ws;
+	int	i, j, k, l, nl=0, nr, mm, nv=0, maxv, run, last,
+		converged=0, below, *idx, *q, *r, pd;
+	unsigned long	seed = 1;
+
+	maxv = 10*m + 50;
+	if ( maxv > n )	maxv = n;
+
+	A  = dvector(1,sky[n]);
+	L  = dvector(1,sky[n]);
+	d  = dvector(1,n);
+	u  = dvector(1,n);
+	Mu = dvector(1,n);
+	Mq = dvector(1,n);
+	q  = ivector(1,n);
+	r  = ivector(1,n);
+	Q  = dmatrix(1,maxv,1,n);
+	X  = dmatrix(1,m,1,n);
+	Y  = dmatrix(1,m,1,n);
+	Z  = dmatrix(1,m,1,n);
+	tX = dvector(1,m);
+	tY = dvector(1,m);
+	tZ = dvector(1,m);
+	alpha = dvector(1,maxv);
+	beta  = dvector(1,maxv);
+	theta = dvector(1,maxv);
+	e     = dvector(1,maxv);
+	S     = dmatrix(1,maxv,1,maxv);
+	idx   = ivector(1,maxv);
+
+	for (i=1; i<=n; i++) {
+		q[i] = 1;
+		r[i] = 0;
+	}
+					/* shift eigen-values by this much */
+	for (i=1; i<=sky[n]; i++)	A[i] = K[i] + shift*M[i];
+	ldl_dcmp_sky ( A, L, sky, n, d, NULL, NULL, q, r, 1, 0, &pd );
+
+	*ok = -m;
+	for (run=1; run<=m; run++) {	/* restart after locking modes */
+
+		nr = n - nl;		/* number of Lanczos vectors */
+		if ( nr > maxv )	nr = maxv;
+		if ( nr < 1 )	break;
+		mm = ( m < nr ) ? m : nr;
+
+		for (i=1; i<=n; i++) {	/* starting vector */
+			seed = seed*1103515245 + 12345;
+			u[i] = 0.5 + (double)((seed/65536) % 32768) / 32768.0;
+		}
+		m_orthogonalize ( M, sky, n, u, Mu, X, nl, Q, 0 );
+		for (c=0.0, i=1; i<=n; i++)	c += u[i]*Mu[i];
+		c = sqrt(c);
+		for (i=1; i<=n; i++) {
+			Q[1][i] = u[i] / c;
+			Mq[i]   = Mu[i] / c;
+		}
+
+		for (j=1; j<=nr; j++) {	/* Begin Lanczos iterations */
+
+			++nv;
+						/* {u} = [K + shift M]^-1 M {q_j} */
+			ldl_dcmp_sky ( A, L, sky, n, d, Mq, u, q, r, 0, 1, &pd );
+
+			alpha[j] = m_orthogonalize ( M, sky, n, u, Mu, X, nl, Q, j );
+			for (c=0.0, i=1; i<=n; i++)	c += u[i]*Mu[i];
+			beta[j] = sqrt(fabs(c));
+
+			last = ( beta[j] <= 1e-12*fabs(alpha[j]) || j == nr );
+
+			if ( ( j >= mm && j%5 == 0 ) || last ) {
+				if ( j < mm )	mm = j;
+				for (k=1; k<=j; k++) {
+					theta[k] = alpha[k];
+					e[k] = (k > 1) ? beta[k-1] : 0.0;
+				}
+				tridiag_ql ( theta, e, j, S );
+				for (k=1; k<=mm; k++) {	/* largest Ritz values */
+					idx[k] = 0;
+					for (l=1; l<=j; l++) {
+						for (i=1; i<k; i++) if ( idx[i] == l ) break;
+						if ( i < k )	continue;
+						if ( idx[k] == 0 || theta[l] > theta[idx[k]] )
+							idx[k] = l;
+					}
+				}
+				for (converged=0, k=1; k<=mm; k++)
+					if ( fabs(beta[j]*S[j][idx[k]]) <= tol*fabs(theta[idx[k]]) )
+						converged++;
+				if ( converged == mm || last )	break;
+			}
+
+			for (i=1; i<=n; i++) {
+				Q[j+1][i] = u[i] / beta[j];
+				Mq[i]     = Mu[i] / beta[j];
+			}
+		}			/* End Lanczos iterations */
+
+		for (k=1; k<=mm; k++) {		/* Ritz values and vectors */
+			l = idx[k];
+			tY[k] = theta[l];
+			for (i=1; i<=n; i++)	Y[k][i] = 0.0;
+			for (l=1; l<=j; l++)
+				for (i=1; i<=n; i++)	Y[k][i] += Q[l][i]*S[l][idx[k]];
+		}
+						/* lock the largest of tX and tY */
+		for (k=1, i=1, l=1; k<=m && ( i<=nl || l<=mm ); k++) {
+			if ( l > mm || ( i <= nl && tX[i] >= tY[l] ) ) {
+				tZ[k] = tX[i];
+				for (j=1; j<=n; j++)	Z[k][j] = X[i][j];
+				i++;
+			} else {
+				tZ[k] = tY[l];
+				for (j=1; j<=n; j++)	Z[k][j] = Y[l][j];
+				l++;
+			}
+		}
+		nl = k-1;
+		T  = X;  X  = Z;  Z  = T;
+		t  = tX; tX = tZ; tZ = t;
+
+		if ( converged < mm ) {
+			*ok = converged - mm;
+			break;
+		}
+		if ( nl < m ) {
+			*ok = nl - m;
+			continue;
+		}
+
+						/* Sturm sequence check */
+		ws = (1.0 - sqrt(tol)) / tX[nl];
+		for (below=0, k=1; k<=nl; k++)	if ( 1.0/tX[k] < ws )	below++;
+		*ok = sturm_sky ( A, M, sky, n, ws ) + below;
+		if ( *ok == 0 )	break;
+	}
+
+	for (k=1; k<=m; k++) {		/* eigen-values and eigen-vectors */
+		for (i=1; i<=n; i++)	V[i][k] = ( k <= nl ) ? X[k][i] : 0.0;
+		w[k] = 0.0;
+		if ( k > nl )	continue;
+		w[k] = 1.0 / tX[k];
+		if ( w[k] > shift )	w[k] = w[k] - shift;
+		else			w[k] = shift - w[k];
+	}
+
+	*iter = nv;
+
+	if ( verbose ) {
+		fprintf(stdout," %4d Lanczos vectors in %d run(s)\n", nv, run );
+		for ( k=1; k<=m; k++ )
+			fprintf(stdout,"  mode: %2d\t %9.4lf Hz\n",
+						k, sqrt(w[k])/(2.0*PI) );
+	}
+	if ( *ok < 0 )
+		fprintf(stderr," lanczos: %d of the lowest %d modes were not found to tol = %e\n",
+							-*ok, m, tol );
+
+	free_dvector(A,1,sky[n]);
+	free_dvector(L,1,sky[n]);
+	free_dvector(d,1,n);
+	free_dvector(u,1,n);
+	free_dvector(Mu,1,n);
+	free_dvector(Mq,1,n);
+	free_ivector(q,1,n);
+	free_ivector(r,1,n);
+	free_dmatrix(Q,1,maxv,1,n);
+	free_dmatrix(X,1,m,1,n);
+	free_dmatrix(Y,1,m,1,n);
+	free_dmatrix(Z,1,m,1,n);
+	free_dvector(tX,1,m);
+	free_dvector(tY,1,m);
+	free_dvector(tZ,1,m);
+	free_dvector(alpha,1,maxv);
+	free_dvector(beta,1,maxv);
+	free_dvector(theta,1,maxv);
+	free_dvector(e,1,maxv);
+	free_dmatrix(S,1,maxv,1,maxv);
+	free_ivector(idx,1,maxv);
+}
+
+
+/*------------------------------------------------------------------------------
+M_ORTHOGONALIZE - remove the components of u along the M-orthonormal vectors
+X[1..nx] and Q[1..nq], twice, and return Mu = M u.  Return the component of
+u along Q[nq].
+------------------------------------------------------------------------------*/
+static double m_orthogonalize (
+	double *M, int *sky, int n, double *u, double *Mu,
+	double **X, int nx, double **Q, int nq
+){
+	double	c, cq = 0.0;
+	int	i, k, pass;
+
+	for (pass=1; pass<=2; pass++) {
+		prodAx_sky ( M, sky, n, u, Mu );
+		for (k=1; k<=nx; k++) {
+			for (c=0.0, i=1; i<=n; i++)	c += X[k][i]*Mu[i];
+			for (i=1; i<=n; i++)	u[i] -= c*X[k][i];
+		}
+		for (k=1; k<=nq; k++) {
+			for (c=0.0, i=1; i<=n; i++)	c += Q[k][i]*Mu[i];
+			for (i=1; i<=n; i++)	u[i] -= c*Q[k][i];
+			if ( k == nq )	cq += c;
+		}
+	}
+	prodAx_sky ( M, sky, n, u, Mu );
+	return cq;
+}
+
+
+/*------------------------------------------------------------------------------
+STURM_SKY - return minus the number of eigen-values of A x = w M x, with A and
+M in profile storage, that are less than ws, from the signs of the pivots of
+the L D L' decomposition of [A - ws M]
+------------------------------------------------------------------------------*/
+static int sturm_sky ( double *A, double *M, int *sky, int n, double ws )
+{
+	double	*B, *L, *d;
+	int	i, *q, *r, pd;
+
+	B = dvector(1,sky[n]);
+	L = dvector(1,sky[n]);
+	d = dvector(1,n);
+	q = ivector(1,n);
+	r = ivector(1,n);
+
+	for (i=1; i<=n; i++) {
+		q[i] = 1;
+		r[i] = 0;
+	}
+	for (i=1; i<=sky[n]; i++)	B[i] = A[i] - ws*M[i];
+	ldl_dcmp_sky ( B, L, sky, n, d, NULL, NULL, q, r, 1, 0, &pd );
+
+	free_dvector(B,1,sky[n]);
+	free_dvector(L,1,sky[n]);
+	free_dvector(d,1,n);
+	free_ivector(q,1,n);
+	free_ivector(r,1,n);
+	return pd;
+}
+
+
+/*------------------------------------------------------------------------------
+TRIDIAG_QL - eigen-values d[1..n] and eigen-vectors Z[1..n][1..n] of the
+symmetric tri-diagonal matrix with diagonal d[1..n] and sub-diagonal e[2..n],
+by the QL method with implicit shifts.  d and e are destroyed.
+ Numerical Recipes in C, 2nd ed., section 11.3
+------------------------------------------------------------------------------*/
+static void tridiag_ql ( double *d, double *e, int n, double **Z )
+{
+	double	s, r, p, g, f, dd, c, b;
+	int	m, l, iter, i, k;
+
+	for (i=1; i<=n; i++) for (k=1; k<=n; k++) Z[i][k] = (i == k) ? 1.0 : 0.0;
+	for (i=2; i<=n; i++)	e[i-1] = e[i];
+	e[n] = 0.0;
+
+	for (l=1; l<=n; l++) {
+		iter = 0;
+		do {
+			for (m=l; m<=n-1; m++) {
+				dd = fabs(d[m]) + fabs(d[m+1]);
+				if ( fabs(e[m]) <= DBL_EPSILON*dd )	break;
+			}
+			if ( m != l ) {
+				if ( iter++ == 60 )	break;
+				g = (d[l+1]-d[l]) / (2.0*e[l]);
+				r = hypot(g,1.0);
+				g = d[m]-d[l] + e[l]/(g + (g >= 0.0 ? r : -r));
+				s = c = 1.0;
+				p = 0.0;
+				for (i=m-1; i>=l; i--) {
+					f = s*e[i];
+					b = c*e[i];
+					e[i+1] = (r = hypot(f,g));
+					if ( r == 0.0 ) {
+						d[i+1] -= p;
+						e[m] = 0.0;
+						break;
+					}
+					s = f/r;
+					c = g/r;
+					g = d[i+1]-p;
+					r = (d[i]-g)*s + 2.0*c*b;
+					d[i+1] = g + (p = s*r);
+					g = c*r - b;
+					for (k=1; k<=n; k++) {	/* eigen-vectors */
+						f = Z[k][i+1];
+						Z[k][i+1] = s*Z[k][i] + c*f;
+						Z[k][i]   = c*Z[k][i] - s*f;
+					}
+				}
+				if ( r == 0.0 && i >= l )	continue;
+				d[l] -= p;
+				e[l] = g;
+				e[m] = 0.0;
+			}
+		} while ( m != l );
+	}
 }
 
 
@@ -36,8 +36,9 @@
 	@param M is an n by n  symmetric positive definate real (mass) matrix
 	@param w is a diagonal matrix of eigen-values
 	@param V is a  rectangular matrix of eigen-vectors
+	@return 0, or 32 if the iteration fails
 */
-void subspace(
+int subspace(
 	double **K, double **M,	/**< stiffness and mass matrices	*/
 	int n, int m,		/**< DoF and number of required modes	*/
 	double *w, double **V,	/**< modal frequencies and mode shapes	*/
@@ -62,8 +63,9 @@ void xtAx( double **A, double **X, double **C, int N, int J );
 
 	@param n number of degrees of freedom
 	@param m number of required modes
+	@return 0, or 32 if the iteration fails
 */
-void stodola(
+int stodola(
 	double **K, double **M,	/**< stiffness and mass matrices	*/
 	int n, int m,		/**< DoF and number of required modes	*/
 	double *w, double **V,	/**< modal frequencies and mode shapes	*/
@@ -74,5 +76,38 @@ void stodola(
 	int verbose		/**< 1: copious screen output, 0: none	*/
 );
 
+/**
+	Find the lowest m eigenvalues, w, and eigenvectors, V, of the
+	general eigenproblem, K V = w M V, with the LAPACK routine dsygvx.
+	K and M are preserved.  ok is -1 if dsygvx fails.
+*/
+void lapack_eig(
+	double **K, double **M,	/**< stiffness and mass matrices	*/
+	int n, int m,		/**< DoF and number of required modes	*/
+	double *w, double **V,	/**< modal frequencies and mode shapes	*/
+	double shift,		/**< frequency shift for unrestrained frames */
+	int *ok,		/**< 0: success, -1: dsygvx failed	*/
+	int verbose		/**< 1: copious screen output, 0: none	*/
+);
+
+/**
+	Find the lowest m eigenvalues, w, and eigenvectors, V, of the
+	general eigenproblem, K V = w M V, with K and M in profile storage,
+	using shift-invert Lanczos iteration with full re-orthogonalization.
+
+	@param sky location of the diagonal of each column of K and M
+*/
+void lanczos(
+	double *K, double *M,	/**< stiffness and mass matrices, profile	*/
+	int *sky,		/**< location of the diagonal of each column */
+	int n, int m,		/**< DoF and number of required modes	*/
+	double *w, double **V,	/**< modal frequencies and mode shapes	*/
+	double tol,		/**< covergence tolerence		*/
+	double shift,		/**< frequency shift for unrestrained frames */
+	int *iter,		/**< number of Lanczos vectors		*/
+	int *ok,		/**< 0: all modes found, < 0: modes missing */
+	int verbose		/**< 1: copious screen output, 0: none	*/
+);
+
 #endif /* FRAME_EIG_H */
 
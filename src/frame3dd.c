@@ -32,6 +32,7 @@
 #include "eig.h"
 #include "HPGmatrix.h"
 #include "NRutil.h"
+#include "py_lapack.h"
 
 
 /* #define MATRIX_DEBUG */
@@ -156,6 +157,336 @@ void assemble_K(
 }
 
 
+/*------------------------------------------------------------------------------
+REORDER_NODES_RCM  -  renumber the nodes by the reverse Cuthill-McKee method
+to reduce the profile of the global stiffness matrix.  
+Node j of the frame becomes node nmap[j] of the equations.
+Each connected part of the frame is numbered in turn, starting from a 
+pseudo-peripheral node of lowest degree.
+------------------------------------------------------------------------------*/
+void reorder_nodes_rcm( int nN, int nE, int *N1, int *N2, int *nmap )
+{
+	int	*deg,		/* number of elements at each node	*/
+		*xadj, *adj,	/* adjacency lists of the nodes		*/
+		*order,		/* Cuthill-McKee ordering of the nodes	*/
+		*level,		/* breadth-first level of each node	*/
+		i, j, k, n, t, head, tail, start, done=0,
+		ecc, new_ecc;	/* eccentricity of the starting node	*/
+
+	deg   = ivector(1,nN);
+	xadj  = ivector(1,nN+1);
+	adj   = ivector(1,2*nE+1);
+	order = ivector(1,nN);
+	level = ivector(1,nN);
+
+	for (j=1; j<=nN; j++)	deg[j] = 0;
+	for (i=1; i<=nE; i++) {
+		if ( N1[i] == N2[i] )	continue;
+		deg[N1[i]]++;
+		deg[N2[i]]++;
+	}
+	xadj[1] = 1;
+	for (j=1; j<=nN; j++)	xadj[j+1] = xadj[j] + deg[j];
+	for (j=1; j<=nN; j++)	level[j] = xadj[j];	/* next free slot */
+	for (i=1; i<=nE; i++) {
+		if ( N1[i] == N2[i] )	continue;
+		adj[level[N1[i]]++] = N2[i];
+		adj[level[N2[i]]++] = N1[i];
+	}
+
+	for (j=1; j<=nN; j++)	nmap[j] = 0;	/* 0: not yet numbered */
+	for (j=1; j<=nN; j++)	level[j] = -1;	/* -1: not yet visited */
+
+	while ( done < nN ) {
+
+		/* lowest-degree node not yet numbered */
+		start = 0;
+		for (j=1; j<=nN; j++)
+			if ( !nmap[j] && ( !start || deg[j] < deg[start] ) )
+				start = j;
+
+		/* move the start to a pseudo-peripheral node of this part */
+		ecc = -1;
+		for (k=1; k<=nN; k++) {
+			level[start] = 0;
+			order[done+1] = start;
+			head = tail = done+1;
+			while ( head <= tail ) {
+				n = order[head++];
+				for (i=xadj[n]; i<xadj[n+1]; i++)
+					if ( level[adj[i]] < 0 ) {
+						level[adj[i]] = level[n] + 1;
+						order[++tail] = adj[i];
+					}
+			}
+			new_ecc = level[order[tail]];
+			t = order[tail];	/* lowest degree in the last level */
+			for (i=tail; i>done && level[order[i]] == new_ecc; i--)
+				if ( deg[order[i]] < deg[t] )	t = order[i];
+			for (i=done+1; i<=tail; i++)	level[order[i]] = -1;
+			if ( new_ecc <= ecc || t == start )	break;
+			ecc = new_ecc;
+			start = t;
+		}
+
+		/* Cuthill-McKee: breadth-first, neighbors by increasing degree */
+		order[done+1] = start;
+		nmap[start] = -1;
+		head = tail = done+1;
+		while ( head <= tail ) {
+			n = order[head++];
+			k = tail;
+			for (i=xadj[n]; i<xadj[n+1]; i++)
+				if ( !nmap[adj[i]] ) {
+					nmap[adj[i]] = -1;
+					order[++tail] = adj[i];
+				}
+			for (i=k+2; i<=tail; i++) {	/* insertion sort */
+				t = order[i];
+				for (j=i-1; j>k && deg[order[j]] > deg[t]; j--)
+					order[j+1] = order[j];
+				order[j+1] = t;
+			}
+		}
+		done = tail;
+	}
+
+	for (i=1; i<=nN; i++)	nmap[order[i]] = nN - i + 1;	/* reverse */
+
+	free_ivector(deg,1,nN);
+	free_ivector(xadj,1,nN+1);
+	free_ivector(adj,1,2*nE+1);
+	free_ivector(order,1,nN);
+	free_ivector(level,1,nN);
+	return;
+}
+
+
+/*------------------------------------------------------------------------------
+SKYLINE_PROFILE  -  locate the diagonal of each column of the global stiffness
+matrix in profile (skyline) storage.  Coordinate i is stored as equation dof[i].
+The height of column j reaches up to the lowest-numbered equation of any 
+element connected to equation j.
+sky[0] = 0, and sky[DoF] is the number of stored terms in the profile.
+------------------------------------------------------------------------------*/
+void skyline_profile( int *sky, int *dof, int DoF, int nE, int *N1, int *N2 )
+{
+	int	i, j, l, top,
+		ind[13];	/* equation numbers of an element	*/
+
+	for (j=1; j<=DoF; j++)	sky[j] = j;	/* top row of each column */
+
+	for ( i = 1; i <= nE; i++ ) {
+		for ( l=1; l <= 6; l++ ) {
+			ind[l]   = dof[6*N1[i]-6+l];
+			ind[l+6] = dof[6*N2[i]-6+l];
+		}
+		top = ind[1];
+		for ( l=2; l <= 12; l++ )	if ( ind[l] < top )	top = ind[l];
+		for ( l=1; l <= 12; l++ )
+			if ( top < sky[ind[l]] )	sky[ind[l]] = top;
+	}
+
+	sky[0] = 0;		/* column heights to diagonal locations	*/
+	for (j=1; j<=DoF; j++)	sky[j] = sky[j-1] + j - sky[j] + 1;
+
+	return;
+}
+
+
+/*------------------------------------------------------------------------------
+ASSEMBLE_K_SKY  -  assemble the upper triangle of the global stiffness matrix
+into profile (skyline) storage, K(i,j) = K[sky[j]-j+i], see ldl_dcmp_sky().
+Coordinate i is stored as equation dof[i].
+------------------------------------------------------------------------------*/
+void assemble_K_sky(
+	double *K, int *sky, int *dof,
+	int DoF, int nE, int nN,
+	vec3 *xyz, float *r, double *L, double *Le,
+	int *N1, int *N2,
+	float *Ax, float *Asy, float *Asz,
+	float *Jx, float *Iy, float *Iz,
+	float *E, float *G, float *p,
+	int shear, int geom, double **Q, int debug,
+	float *EKx, float *EKy, float *EKz,
+	float *EKtx, float *EKty, float *EKtz
+){
+	double	**k;		/* element stiffness matrix in global coord */
+	int	ind[13],	/* member-structure DoF index table	*/
+		i, j, ii, jj, l, ll;
+	char	stiffness_fn[FILENMAX];
+
+	for (i=1; i<=sky[DoF]; i++)	K[i] = 0.0;
+
+	k   =  dmatrix(1,12,1,12);
+
+	for ( i = 1; i <= nE; i++ ) {
+
+		for ( l=1; l <= 6; l++ ) {
+			ind[l]   = dof[6*N1[i]-6+l];
+			ind[l+6] = dof[6*N2[i]-6+l];
+		}
+
+		elastic_K ( k, xyz, r, L[i], Le[i], N1[i], N2[i],
+		Ax[i],Asy[i],Asz[i], Jx[i],Iy[i],Iz[i], E[i],G[i], p[i], shear);
+
+		if (geom)
+		 geometric_K( k, xyz, r, L[i], Le[i], N1[i], N2[i],
+		           Ax[i], Asy[i],Asz[i],
+                           Jx[i], Iy[i], Iz[i],
+                           E[i],G[i], p[i], -Q[i][1], shear);
+
+		if (debug) {
+			sprintf(stiffness_fn,"k_%03d",i);
+			save_dmatrix(stiffness_fn,k,1,12,1,12,0, "w");
+		}
+
+		for ( l=1; l <= 12; l++ ) {
+			ii = ind[l];
+			for ( ll=1; ll <= 12; ll++ ) {
+				jj = ind[ll];
+				if ( ii <= jj )	K[sky[jj]-jj+ii] += k[l][ll];
+			}
+		}
+	}
+
+	for ( j = 1; j <= nN; j++ ) {		// add extra stiffness
+		i = 6*(j-1);
+		K[sky[dof[i+1]]] += EKx[j];
+		K[sky[dof[i+2]]] += EKy[j];
+		K[sky[dof[i+3]]] += EKz[j];
+		K[sky[dof[i+4]]] += EKtx[j];
+		K[sky[dof[i+5]]] += EKty[j];
+		K[sky[dof[i+6]]] += EKtz[j];
+	}
+
+	free_dmatrix ( k,1,12,1,12);
+	return;
+}
+
+
+/*------------------------------------------------------------------------------
+ASSEMBLE_KG  -  add the geometric stiffness of every element, for the axial
+forces Q, to a stored elastic stiffness matrix Ke:  K = Ke + Kg(Q).
+Ke is assembled once, by assemble_K() with geom=0, and is not changed, 
+so only the geometric stiffness is re-computed in each nonlinear iteration.
+------------------------------------------------------------------------------*/
+void assemble_Kg(
+	double **K, double **Ke,
+	int DoF, int nE,
+	vec3 *xyz, float *r, double *L, double *Le,
+	int *N1, int *N2,
+	float *Ax, float *Asy, float *Asz,
+	float *Jx, float *Iy, float *Iz,
+	float *E, float *G, float *p,
+	int shear, double **Q
+){
+	double	**k;		/* element geometric stiffness, global coord */
+	int	ind[13],	/* member-structure DoF index table	*/
+		i, j, l, ll;
+
+	for (i=1; i<=DoF; i++)	for (j=1; j<=DoF; j++)	K[i][j] = Ke[i][j];
+
+	k   =  dmatrix(1,12,1,12);
+
+	for ( i = 1; i <= nE; i++ ) {
+
+		if ( Q[i][1] == 0.0 )	continue;	/* no axial force */
+
+		for ( l=1; l <= 6; l++ ) {
+			ind[l]   = 6*N1[i]-6+l;
+			ind[l+6] = 6*N2[i]-6+l;
+		}
+
+		for (l=1; l<=12; l++)	for (ll=1; ll<=12; ll++)  k[l][ll] = 0.0;
+
+		geometric_K( k, xyz, r, L[i], Le[i], N1[i], N2[i],
+		           Ax[i], Asy[i],Asz[i],
+                           Jx[i], Iy[i], Iz[i],
+                           E[i],G[i], p[i], -Q[i][1], shear);
+
+		for ( l=1; l <= 12; l++ )
+			for ( ll=1; ll <= 12; ll++ )
+				K[ind[l]][ind[ll]] += k[l][ll];
+	}
+
+	free_dmatrix ( k,1,12,1,12);
+	return;
+}
+
+
+/*------------------------------------------------------------------------------
+ASSEMBLE_KG_SKY  -  add the geometric stiffness of every element to a stored
+elastic stiffness matrix Ke, both in profile (skyline) storage, see assemble_Kg()
+------------------------------------------------------------------------------*/
+void assemble_Kg_sky(
+	double *K, double *Ke, int *sky, int *dof,
+	int DoF, int nE,
+	vec3 *xyz, float *r, double *L, double *Le,
+	int *N1, int *N2,
+	float *Ax, float *Asy, float *Asz,
+	float *Jx, float *Iy, float *Iz,
+	float *E, float *G, float *p,
+	int shear, double **Q
+){
+	double	**k;		/* element geometric stiffness, global coord */
+	int	ind[13],	/* member-structure DoF index table	*/
+		i, ii, jj, l, ll;
+
+	for (i=1; i<=sky[DoF]; i++)	K[i] = Ke[i];
+
+	k   =  dmatrix(1,12,1,12);
+
+	for ( i = 1; i <= nE; i++ ) {
+
+		if ( Q[i][1] == 0.0 )	continue;	/* no axial force */
+
+		for ( l=1; l <= 6; l++ ) {
+			ind[l]   = dof[6*N1[i]-6+l];
+			ind[l+6] = dof[6*N2[i]-6+l];
+		}
+
+		for (l=1; l<=12; l++)	for (ll=1; ll<=12; ll++)  k[l][ll] = 0.0;
+
+		geometric_K( k, xyz, r, L[i], Le[i], N1[i], N2[i],
+		           Ax[i], Asy[i],Asz[i],
+                           Jx[i], Iy[i], Iz[i],
+                           E[i],G[i], p[i], -Q[i][1], shear);
+
+		for ( l=1; l <= 12; l++ ) {
+			ii = ind[l];
+			for ( ll=1; ll <= 12; ll++ ) {
+				jj = ind[ll];
+				if ( ii <= jj )	K[sky[jj]-jj+ii] += k[l][ll];
+			}
+		}
+	}
+
+	free_dmatrix ( k,1,12,1,12);
+	return;
+}
+
+
+/*------------------------------------------------------------------------------
+EXPAND_K_SKY  -  copy a stiffness matrix in profile storage to [K], dense,
+in which coordinate i is stored as equation dof[i]
+------------------------------------------------------------------------------*/
+void expand_K_sky( double *Ks, int *sky, int *dof, int DoF, double **K )
+{
+	int	i, j, ii, jj;
+
+	for (i=1; i<=DoF; i++) {
+		for (j=i; j<=DoF; j++) {
+			ii = dof[i] < dof[j] ? dof[i] : dof[j];	/* row	  */
+			jj = dof[i] < dof[j] ? dof[j] : dof[i];	/* column */
+			if ( ii > jj - sky[jj] + sky[jj-1] )	/* in profile */
+				K[i][j] = K[j][i] = Ks[sky[jj]-jj+ii];
+			else	K[i][j] = K[j][i] = 0.0;
+		}
+	}
+}
+
+
 /*------------------------------------------------------------------------------
 ELASTIC_K - space frame elastic stiffness matrix in global coordnates	22oct02
 ------------------------------------------------------------------------------*/
@@ -376,6 +707,28 @@ void compute_reaction_forces( double *F, double **K, double *D, int DoF, int *r)
 }
 
 
+/*------------------------------------------------------------------------------
+COMPUTE_REACTION_FORCES_SKY - compute_reaction_forces() for [K] in profile 
+storage, see ldl_dcmp_sky().  Coordinate i is stored as equation dof[i].
+------------------------------------------------------------------------------*/
+void compute_reaction_forces_sky(
+	double *F, double *K, int *sky, int *dof, double *D, int DoF, int *r
+){
+	double	*Dp, *KD;	/* {D} and [K]{D} in equation order	*/
+	int	i;
+
+	Dp = dvector(1,DoF);
+	KD = dvector(1,DoF);
+
+	for (i=1; i<=DoF; i++)	Dp[dof[i]] = D[i];
+	prodAx_sky ( K, sky, DoF, Dp, KD );
+	for (i=1; i<=DoF; i++)	if (r[i])	F[i] = KD[dof[i]];
+
+	free_dvector(Dp,1,DoF);
+	free_dvector(KD,1,DoF);
+}
+
+
 /*----------------------------------------------------------------------------
 SOLVE_SYSTEM  -  solve {F} =   [K]{D} via L D L' decomposition        27dec01
 Prescribed displacements are "mechanical loads" not "temperature loads"
@@ -385,34 +738,477 @@ void solve_system(
 	int *ok, int verbose, double *rms_resid
 ){
 	double	*diag;		/* diagonal vector of the L D L' decomp. */
-	// int	i;
-
-	verbose = 0;		/* suppress verbose output		*/
 
 	diag = dvector ( 1, DoF );
 
-	/*  L D L' decomp */
-	ldl_dcmp_pm ( K, DoF, diag, F, D, q,r, 1, 0, ok );
+	factor_system ( K, diag, DoF, q, r, ok );
+	if ( *ok >= 0 )				/* back substitute for D */
+		back_solve_system ( K, diag, D, F, DoF, q, r, ok, verbose, rms_resid );
+
+	free_dvector( diag, 1, DoF );
+}
+
+
+/*----------------------------------------------------------------------------
+FACTOR_SYSTEM  -  L D L' decomposition of [K], so that {F} = [K]{D} may be 
+solved for any number of load vectors with back_solve_system().
+The lower triangle of [K_qq] is replaced by L.  The diagonal of D is returned
+in {diag}.  *ok is the negative of the number of negative terms in {diag}.
+----------------------------------------------------------------------------*/
+void factor_system(
+	double **K, double *diag, int DoF, int *q, int *r, int *ok
+){
+	ldl_dcmp_pm ( K, DoF, diag, NULL, NULL, q,r, 1, 0, ok );
 	if ( *ok < 0 ) {
 	 	fprintf(stderr," Make sure that all six");
 		fprintf(stderr," rigid body translations are restrained!\n");
 		/* exit(31); */
-	} else {				/* back substitute for D */
-		/* LDL'  back-sub */
-		ldl_dcmp_pm ( K, DoF, diag, F, D, q,r, 0, 1, ok );
-		if ( verbose ) fprintf(stdout,"    LDL' RMS residual:");
-		*rms_resid = *ok = 1;
-		do {					/* improve solution */
-			ldl_mprove_pm ( K, DoF, diag, F,D, q,r, rms_resid, ok );
-			if ( verbose ) fprintf(stdout,"%9.2e", *rms_resid );
-		} while ( *ok );
-	        if ( verbose ) fprintf(stdout,"\n");
 	}
+}
+
+
+/*----------------------------------------------------------------------------
+BACK_SOLVE_SYSTEM  -  solve {F} = [K]{D} for [K] factored by factor_system()
+----------------------------------------------------------------------------*/
+void back_solve_system(
+	double **K, double *diag, double *D, double *F, int DoF, int *q, int *r,
+	int *ok, int verbose, double *rms_resid
+){
+	verbose = 0;		/* suppress verbose output		*/
+
+	/* LDL'  back-sub */
+	ldl_dcmp_pm ( K, DoF, diag, F, D, q,r, 0, 1, ok );
+	if ( verbose ) fprintf(stdout,"    LDL' RMS residual:");
+	*rms_resid = *ok = 1;
+	do {					/* improve solution */
+		ldl_mprove_pm ( K, DoF, diag, F,D, q,r, rms_resid, ok );
+		if ( verbose ) fprintf(stdout,"%9.2e", *rms_resid );
+	} while ( *ok );
+        if ( verbose ) fprintf(stdout,"\n");
+}
+
+
+/*----------------------------------------------------------------------------
+SOLVE_SYSTEM_SKY - solve {F} = [K]{D} via L D L' decomposition of [K] 
+in profile storage.  [K] is preserved and the L of the L D L' decomposition
+is returned in {Kf}, which has the profile of [K].
+Coordinate i is stored as equation dof[i].
+----------------------------------------------------------------------------*/
+void solve_system_sky(
+	double *K, double *Kf, int *sky, int *dof, double *D, double *F, int DoF,
+	int *q, int *r, int *ok, int verbose, double *rms_resid
+){
+	double	*diag;		/* diagonal vector of the L D L' decomp. */
+
+	diag = dvector ( 1, DoF );
+
+	factor_system_sky ( K, Kf, sky, dof, diag, DoF, q, r, ok );
+	if ( *ok >= 0 )				/* back substitute for D */
+		back_solve_system_sky ( K, Kf, sky, dof, diag, D, F, DoF, q, r,
+							ok, verbose, rms_resid );
 
 	free_dvector( diag, 1, DoF );
 }
 
 
+/*----------------------------------------------------------------------------
+FACTOR_SYSTEM_SKY  -  factor_system() for [K] in profile storage.
+[K] is preserved and L is returned in {Kf}, which has the profile of [K].
+{diag} is returned in equation order.
+----------------------------------------------------------------------------*/
+void factor_system_sky(
+	double *K, double *Kf, int *sky, int *dof, double *diag, int DoF,
+	int *q, int *r, int *ok
+){
+	int	i, *qp, *rp;	/* {q} and {r} in equation order	*/
+
+	qp = ivector(1,DoF);
+	rp = ivector(1,DoF);
+	for (i=1; i<=DoF; i++) {
+		qp[dof[i]] = q[i];
+		rp[dof[i]] = r[i];
+	}
+
+	ldl_dcmp_sky ( K, Kf, sky, DoF, diag, NULL, NULL, qp,rp, 1, 0, ok );
+	if ( *ok < 0 ) {
+	 	fprintf(stderr," Make sure that all six");
+		fprintf(stderr," rigid body translations are restrained!\n");
+	}
+
+	free_ivector(qp,1,DoF);
+	free_ivector(rp,1,DoF);
+}
+
+
+/*----------------------------------------------------------------------------
+BACK_SOLVE_SYSTEM_SKY  -  back_solve_system() for [K] in profile storage
+----------------------------------------------------------------------------*/
+void back_solve_system_sky(
+	double *K, double *Kf, int *sky, int *dof, double *diag,
+	double *D, double *F,
+	int DoF, int *q, int *r, int *ok, int verbose, double *rms_resid
+){
+	double	*Dp, *Fp;	/* {D} and {F} in equation order	*/
+	int	i, *qp, *rp;	/* {q} and {r} in equation order	*/
+
+	verbose = 0;		/* suppress verbose output		*/
+
+	Dp = dvector(1,DoF);
+	Fp = dvector(1,DoF);
+	qp = ivector(1,DoF);
+	rp = ivector(1,DoF);
+	for (i=1; i<=DoF; i++) {
+		Dp[dof[i]] = D[i];
+		Fp[dof[i]] = F[i];
+		qp[dof[i]] = q[i];
+		rp[dof[i]] = r[i];
+	}
+
+	ldl_dcmp_sky ( K, Kf, sky, DoF, diag, Fp, Dp, qp,rp, 0, 1, ok );
+	if ( verbose ) fprintf(stdout,"    LDL' RMS residual:");
+	*rms_resid = *ok = 1;
+	do {					/* improve solution */
+		ldl_mprove_sky ( K, Kf, sky, DoF, diag, Fp,Dp, qp,rp, rms_resid, ok );
+		if ( verbose ) fprintf(stdout,"%9.2e", *rms_resid );
+	} while ( *ok );
+        if ( verbose ) fprintf(stdout,"\n");
+
+	for (i=1; i<=DoF; i++) {
+		D[i] = Dp[dof[i]];
+		F[i] = Fp[dof[i]];
+	}
+
+	free_dvector(Dp,1,DoF);
+	free_dvector(Fp,1,DoF);
+	free_ivector(qp,1,DoF);
+	free_ivector(rp,1,DoF);
+}
+
+/*----------------------------------------------------------------------------
+BACK_SOLVE_SYSTEM_MRHS  -  solve {F_k} = [K]{D_k} for the nb load vectors
+F[1..nb][1..DoF] with [K] factored by factor_system(), as one blocked
+forward and back substitution followed by a blocked iterative improvement.
+rms_resid[1..nb] returns the RMS residual of each solution.
+----------------------------------------------------------------------------*/
+void back_solve_system_mrhs(
+	double **K, double *diag, double **D, double **F, int nb, int DoF,
+	int *q, int *r, double *rms_resid
+){
+	double	**X, **B;	/* {D_k} and {F_k} as the columns of [X], [B] */
+	int	i, k, more, *ok;
+
+	if ( nb < 1 )	return;
+
+	X  = dmatrix(1,DoF,1,nb);
+	B  = dmatrix(1,DoF,1,nb);
+	ok = ivector(1,nb);
+	for (i=1; i<=DoF; i++) for (k=1; k<=nb; k++) {
+		X[i][k] = D[k][i];
+		B[i][k] = F[k][i];
+	}
+
+	ldl_solve_pm_mrhs ( K, DoF, diag, B, X, nb, q, r );
+	for (k=1; k<=nb; k++)	rms_resid[k] = ok[k] = 1;
+	do {					/* improve solutions */
+		ldl_mprove_pm_mrhs ( K, DoF, diag, B, X, nb, q, r, rms_resid, ok );
+		for (more=0, k=1; k<=nb; k++)	more += ok[k];
+	} while ( more );
+
+	for (i=1; i<=DoF; i++) for (k=1; k<=nb; k++) {
+		D[k][i] = X[i][k];
+		F[k][i] = B[i][k];
+	}
+
+	free_dmatrix(X,1,DoF,1,nb);
+	free_dmatrix(B,1,DoF,1,nb);
+	free_ivector(ok,1,nb);
+}
+
+
+/*----------------------------------------------------------------------------
+BACK_SOLVE_SYSTEM_SKY_MRHS  -  back_solve_system_mrhs() for [K] in profile 
+storage, factored by factor_system_sky()
+----------------------------------------------------------------------------*/
+void back_solve_system_sky_mrhs(
+	double *K, double *Kf, int *sky, int *dof, double *diag,
+	double **D, double **F, int nb, int DoF,
+	int *q, int *r, double *rms_resid
+){
+	double	**X, **B;	/* {D_k}, {F_k} in equation order, as columns */
+	int	i, k, more, *ok,
+		*qp, *rp;	/* {q} and {r} in equation order	*/
+
+	if ( nb < 1 )	return;
+
+	X  = dmatrix(1,DoF,1,nb);
+	B  = dmatrix(1,DoF,1,nb);
+	ok = ivector(1,nb);
+	qp = ivector(1,DoF);
+	rp = ivector(1,DoF);
+	for (i=1; i<=DoF; i++) {
+		qp[dof[i]] = q[i];
+		rp[dof[i]] = r[i];
+		for (k=1; k<=nb; k++) {
+			X[dof[i]][k] = D[k][i];
+			B[dof[i]][k] = F[k][i];
+		}
+	}
+
+	ldl_solve_sky_mrhs ( K, Kf, sky, DoF, diag, B, X, nb, qp, rp );
+	for (k=1; k<=nb; k++)	rms_resid[k] = ok[k] = 1;
+	do {					/* improve solutions */
+		ldl_mprove_sky_mrhs ( K, Kf, sky, DoF, diag, B, X, nb, qp, rp,
+								rms_resid, ok );
+		for (more=0, k=1; k<=nb; k++)	more += ok[k];
+	} while ( more );
+
+	for (i=1; i<=DoF; i++) for (k=1; k<=nb; k++) {
+		D[k][i] = X[dof[i]][k];
+		F[k][i] = B[dof[i]][k];
+	}
+
+	free_dmatrix(X,1,DoF,1,nb);
+	free_dmatrix(B,1,DoF,1,nb);
+	free_ivector(ok,1,nb);
+	free_ivector(qp,1,DoF);
+	free_ivector(rp,1,DoF);
+}
+
+
+/*----------------------------------------------------------------------------
+STIFFNESS_PRODUCT  -  {y} = [K]{x} for [K] in profile storage (Ks != NULL),
+where coordinate i is stored as equation dof[i], or for dense [K] using only
+its upper triangle.
+----------------------------------------------------------------------------*/
+static void stiffness_product(
+	double **K, double *Ks, int *sky, int *dof, double *x, double *y, int DoF
+){
+	double	*xp, *yp;	/* {x} and {y} in equation order	*/
+	int	i, j;
+
+	if ( Ks != NULL ) {
+		xp = dvector(1,DoF);
+		yp = dvector(1,DoF);
+		for (i=1; i<=DoF; i++)	xp[dof[i]] = x[i];
+		prodAx_sky ( Ks, sky, DoF, xp, yp );
+		for (i=1; i<=DoF; i++)	y[i] = yp[dof[i]];
+		free_dvector(xp,1,DoF);
+		free_dvector(yp,1,DoF);
+	} else {
+		for (i=1; i<=DoF; i++) {
+			y[i] = 0.0;
+			for (j=1; j<i; j++)	y[i] += K[j][i]*x[j];
+			for (j=i; j<=DoF; j++)	y[i] += K[i][j]*x[j];
+		}
+	}
+}
+
+
+/*----------------------------------------------------------------------------
+BAND_SYSTEM  -  number the unrestrained coordinates (q[i]==1) as the equations
+of [K_qq] for the banded LAPACK solver.  The equations follow the equation
+order dof[] of [K] in profile storage, or the coordinate order of a dense [K]
+(sky == NULL).  eqn[i] is the equation of coordinate i, 0 if q[i]==0.
+Returns the number of equations; *kd returns the half-bandwidth of [K_qq].
+----------------------------------------------------------------------------*/
+int band_system(
+	double **K, int *sky, int *dof, int DoF, int *q, int *eqn, int *kd
+){
+	int	i, j, tj, neq = 0,
+		*coord;		/* coordinate of each equation of [K]	*/
+
+	coord = ivector(1,DoF);
+	for (i=1; i<=DoF; i++)	coord[ sky ? dof[i] : i ] = i;
+	for (j=1; j<=DoF; j++)	eqn[coord[j]] = q[coord[j]] ? ++neq : 0;
+
+	*kd = 0;
+	for (j=1; j<=DoF; j++) {	/* top non-zero of each column of K_qq */
+		if ( !eqn[coord[j]] )	continue;
+		if ( sky )
+			tj = j - sky[j] + sky[j-1] + 1;
+		else
+			for (tj=1; tj < j && K[tj][j] == 0.0; tj++) ;
+		for (i=tj; i < j && !eqn[coord[i]]; i++) ;
+		if ( eqn[coord[j]] - eqn[coord[i]] > *kd )
+			*kd = eqn[coord[j]] - eqn[coord[i]];
+	}
+
+	free_ivector(coord,1,DoF);
+	return neq;
+}
+
+
+/*----------------------------------------------------------------------------
+FACTOR_SYSTEM_BAND  -  banded Cholesky factorization (LAPACK dpbtrf) of [K_qq]
+with equations numbered by band_system().  [K] is preserved; the factor is 
+returned in AB[0..(kd+1)*neq-1].  *ok is -1 if [K_qq] is not positive definite.
+----------------------------------------------------------------------------*/
+void factor_system_band(
+	double **K, double *Ks, int *sky, int *dof, double *AB, int kd,
+	int *eqn, int neq, int DoF, int *ok
+){
+	int	i, j, ei, ej, tj, info,
+		*coord;		/* coordinate of each equation of [K]	*/
+
+	for (i=0; i < (kd+1)*neq; i++)	AB[i] = 0.0;
+
+	if ( Ks != NULL ) {
+		coord = ivector(1,DoF);
+		for (i=1; i<=DoF; i++)	coord[dof[i]] = i;
+		for (j=1; j<=DoF; j++) {
+			if ( !(ej = eqn[coord[j]]) )	continue;
+			tj = j - sky[j] + sky[j-1] + 1;
+			for (i=tj; i<=j; i++)
+				if ( (ei = eqn[coord[i]]) )
+					AB[kd+ei-ej + (ej-1)*(kd+1)] = Ks[sky[j]-j+i];
+		}
+		free_ivector(coord,1,DoF);
+	} else {
+		for (j=1; j<=DoF; j++) {
+			if ( !(ej = eqn[j]) )	continue;
+			for (i=1; i<=j; i++)
+				if ( (ei = eqn[i]) && ej-ei <= kd )
+					AB[kd+ei-ej + (ej-1)*(kd+1)] = K[i][j];
+		}
+	}
+
+	lapack_dpbtrf ( neq, kd, AB, &info );
+
+	*ok = 0;
+	if ( info != 0 ) {
+		*ok = -1;
+		fprintf(stderr," The stiffness matrix is not positive definite.\n");
+	 	fprintf(stderr," Make sure that all six");
+		fprintf(stderr," rigid body translations are restrained!\n");
+	}
+}
+
+
+/*----------------------------------------------------------------------------
+BACK_SOLVE_SYSTEM_BAND_MRHS  -  solve {F_k} = [K]{D_k} for the nb load
+vectors F[1..nb][1..DoF] with [K_qq] factored by factor_system_band(), 
+followed by iterative improvement of all of the solutions together.
+rms_resid[1..nb] returns the RMS residual of each solution.
+----------------------------------------------------------------------------*/
+void back_solve_system_band_mrhs(
+	double **K, double *Ks, int *sky, int *dof, double *AB, int kd,
+	int *eqn, int neq, double **D, double **F, int nb, int DoF,
+	int *q, int *r, double *rms_resid
+){
+	double	*X,		/* right hand sides of [K_qq], column-major */
+		*KD,		/* [K]{D}				*/
+		rms_resid_new;
+	int	i, k, na, info,
+		*ok;		/* 1: the solution is still improving	*/
+
+	if ( nb < 1 )	return;
+
+	X  = dvector(0,neq*nb-1);
+	KD = dvector(1,DoF);
+	ok = ivector(1,nb);
+
+	/* {F_q} - [K_qr]{D_r} */
+	for (k=1; k<=nb; k++) {
+		for (i=1; i<=DoF; i++)	if ( q[i] )	D[k][i] = 0.0;
+		stiffness_product ( K, Ks, sky, dof, D[k], KD, DoF );
+		for (i=1; i<=DoF; i++)
+			if ( eqn[i] )	X[eqn[i]-1 + (k-1)*neq] = F[k][i] - KD[i];
+	}
+
+	lapack_dpbtrs ( neq, kd, AB, X, nb, &info );
+
+	for (k=1; k<=nb; k++) {
+		for (i=1; i<=DoF; i++)
+			if ( eqn[i] )	D[k][i] = X[eqn[i]-1 + (k-1)*neq];
+		rms_resid[k] = ok[k] = 1;
+	}
+
+	do {				/* improve the active solutions */
+		for (na=0, k=1; k<=nb; k++) {
+			if ( !ok[k] )	continue;
+			stiffness_product ( K, Ks, sky, dof, D[k], KD, DoF );
+			for (i=1; i<=DoF; i++)
+				if ( eqn[i] )	X[eqn[i]-1 + na*neq] = F[k][i] - KD[i];
+			++na;
+		}
+		if ( na == 0 )	break;
+
+		lapack_dpbtrs ( neq, kd, AB, X, na, &info );
+
+		for (na=0, k=1; k<=nb; k++) {
+			if ( !ok[k] )	continue;
+			rms_resid_new = 0.0;
+			for (i=0; i<neq; i++)
+				rms_resid_new += X[i+na*neq]*X[i+na*neq];
+			rms_resid_new = sqrt ( rms_resid_new / (double) DoF );
+			ok[k] = 0;
+			if ( rms_resid_new / rms_resid[k] < 0.90 ) {
+				for (i=1; i<=DoF; i++)
+					if ( eqn[i] )	D[k][i] += X[eqn[i]-1 + na*neq];
+				rms_resid[k] = rms_resid_new;
+				ok[k] = 1;
+			}
+			++na;
+		}
+	} while ( na > 0 );
+
+	/* finally, evaluate {F_r} = [K_rq]{D_q} + [K_rr]{D_r}  */
+	for (k=1; k<=nb; k++) {
+		stiffness_product ( K, Ks, sky, dof, D[k], KD, DoF );
+		for (i=1; i<=DoF; i++)	if ( r[i] )	F[k][i] = KD[i];
+	}
+
+	free_dvector(X,0,neq*nb-1);
+	free_dvector(KD,1,DoF);
+	free_ivector(ok,1,nb);
+}
+
+
+/*----------------------------------------------------------------------------
+BACK_SOLVE_SYSTEM_BAND  -  back_solve_system() with the factor of
+factor_system_band()
+----------------------------------------------------------------------------*/
+void back_solve_system_band(
+	double **K, double *Ks, int *sky, int *dof, double *AB, int kd,
+	int *eqn, int neq, double *D, double *F, int DoF,
+	int *q, int *r, int *ok, int verbose, double *rms_resid
+){
+	double	*Dv[2], *Fv[2], rms[2];
+
+	Dv[1] = D;
+	Fv[1] = F;
+	back_solve_system_band_mrhs ( K, Ks, sky, dof, AB, kd, eqn, neq,
+						Dv, Fv, 1, DoF, q, r, rms );
+	*rms_resid = rms[1];
+	*ok = 0;
+}
+
+
+/*----------------------------------------------------------------------------
+SOLVE_SYSTEM_BAND  -  solve {F} = [K]{D} with the banded LAPACK solver, 
+for [K] in profile storage (Ks != NULL) or dense [K].  [K] is preserved.
+----------------------------------------------------------------------------*/
+void solve_system_band(
+	double **K, double *Ks, int *sky, int *dof, double *D, double *F,
+	int DoF, int *q, int *r, int *ok, int verbose, double *rms_resid
+){
+	double	*AB;		/* banded Cholesky factor of [K_qq]	*/
+	int	*eqn, neq, kd;
+
+	eqn = ivector(1,DoF);
+	neq = band_system ( K, sky, dof, DoF, q, eqn, &kd );
+	AB  = dvector(0,(kd+1)*neq-1);
+
+	factor_system_band ( K, Ks, sky, dof, AB, kd, eqn, neq, DoF, ok );
+	if ( *ok >= 0 )				/* back substitute for D */
+		back_solve_system_band ( K, Ks, sky, dof, AB, kd, eqn, neq,
+					D, F, DoF, q, r, ok, verbose, rms_resid );
+
+	free_dvector(AB,0,(kd+1)*neq-1);
+	free_ivector(eqn,1,DoF);
+}
+
+
 /*----------------------------------------------------------------------------
 EQUILIBRIUM_ERROR -  compute {dF} =   {F} - [K]{D}  and return ||dF||/||F||
 ----------------------------------------------------------------------------*/
@@ -437,6 +1233,70 @@ double equilibrium_error( double *dF, double *F, double **K, double *D, int DoF,
 }
 
 
+/*----------------------------------------------------------------------------
+EQUILIBRIUM_ERROR_SKY - equilibrium_error() for [K] in profile storage,
+in which coordinate i is stored as equation dof[i]
+----------------------------------------------------------------------------*/
+double equilibrium_error_sky(
+	double *dF, double *F, double *K, int *sky, int *dof,
+	double *D, int DoF, int *q
+){
+	double	ss_dF = 0.0,	//  sum of squares of dF
+		ss_F  = 0.0,	//  sum of squares of F
+		*Dp, *KD;	//  {D} and [K]{D} in equation order
+	int	i;
+
+	Dp = dvector(1,DoF);
+	KD = dvector(1,DoF);
+
+	for (i=1; i<=DoF; i++)	Dp[dof[i]] = D[i];
+	prodAx_sky ( K, sky, DoF, Dp, KD );	// compute equilibrium error
+	for (i=1; i<=DoF; i++) {
+		if ( q[i] )	dF[i] = F[i] - KD[dof[i]];
+		else		dF[i] = F[i];
+	}
+
+	free_dvector(Dp,1,DoF);
+	free_dvector(KD,1,DoF);
+
+	for (i=1; i<=DoF; i++) if (q[i]) ss_dF += ( dF[i] * dF[i] );
+	for (i=1; i<=DoF; i++) if (q[i]) ss_F  += ( F[i]  * F[i] );
+
+	return ( sqrt(ss_dF) / sqrt(ss_F) );	// convergence criterion
+}
+
+
+/*----------------------------------------------------------------------------
+BROYDEN_UPDATE  -  apply the Broyden (good) inverse update of the stiffness to
+the step {dD} = [K_0]^-1 {dF}, in which [K_0] is the stiffness matrix factored 
+before the previous ns steps, S[1..ns].  The updated step is returned in {dD} 
+and saved as S[ns+1], with ss[ns+1] = S[ns+1]' S[ns+1].
+ C.T. Kelley, Iterative Methods for Linear and Nonlinear Equations, 
+ SIAM, 1995, section 7.3
+----------------------------------------------------------------------------*/
+void broyden_update( double *dD, double **S, double *ss, int ns, int DoF )
+{
+	double	c;
+	int	i, j;
+
+	for (j=1; j<ns; j++) {
+		for (c=0.0, i=1; i<=DoF; i++)	c += S[j][i]*dD[i];
+		c /= ss[j];
+		for (i=1; i<=DoF; i++)	dD[i] += c*S[j+1][i];
+	}
+	if ( ns > 0 ) {
+		for (c=0.0, i=1; i<=DoF; i++)	c += S[ns][i]*dD[i];
+		c = 1.0 - c/ss[ns];
+		for (i=1; i<=DoF; i++)	dD[i] /= c;
+	}
+	for (c=0.0, i=1; i<=DoF; i++) {
+		S[ns+1][i] = dD[i];
+		c += dD[i]*dD[i];
+	}
+	ss[ns+1] = c;
+}
+
+
 /*------------------------------------------------------------------------------
 END_FORCES  -  evaluate the member end forces for every member		23feb94
 ------------------------------------------------------------------------------*/
@@ -660,6 +1520,62 @@ void add_feF(
 }
 
 
+/*-----------------------------------------------------------------------------
+ADD_FEF_ROWS -  add the fixed end forces of each load to reactions and internal
+element forces, with the element of load k in feF[k][0] and its fixed end
+forces in feF[k][1..12], as from read_and_assemble_loads() in py_io.c.
+With F NULL the reactions are not needed and only {Q} is changed.
+------------------------------------------------------------------------------*/
+void add_feF_rows(
+	vec3 *xyz,
+	double *L, int *N1, int *N2, float *p,
+	double **Q, double **feF, int nfe,
+	double *F, int *r
+){
+	double  t1, t2, t3, t4, t5, t6, t7, t8, t9,	/* 3D coord Xformn */
+		*f;
+	int	k, m, n1, n2, i, i1, i2;
+
+	for (k=1; k <= nfe; k++) {	/* loop over all loads */
+
+		f = feF[k];
+		m = (int) f[0];
+		n1 = N1[m];	n2 = N2[m];
+
+		/* add fixed-end forces to reaction forces */
+		for (i=1; i<=6 && F; i++) {
+			i1 = 6*(n1-1) + i;
+			if (r[i1])
+				F[i1] -= f[i];
+		}
+		for (i=1; i<=6 && F; i++) {
+			i2 = 6*(n2-1) + i;
+			if (r[i2])
+				F[i2] -= f[i+6];
+		}
+
+		coord_trans ( xyz, L[m], n1, n2,
+			&t1, &t2, &t3, &t4, &t5, &t6, &t7, &t8, &t9, p[m] );
+
+		// add fixed end forces (-equivalent loads) to internal loads
+		// {Q} = [T]{F}
+		Q[m][1]  -= ( f[1] *t1 + f[2] *t2 + f[3] *t3 );
+		Q[m][2]  -= ( f[1] *t4 + f[2] *t5 + f[3] *t6 );
+		Q[m][3]  -= ( f[1] *t7 + f[2] *t8 + f[3] *t9 );
+		Q[m][4]  -= ( f[4] *t1 + f[5] *t2 + f[6] *t3 );
+		Q[m][5]  -= ( f[4] *t4 + f[5] *t5 + f[6] *t6 );
+		Q[m][6]  -= ( f[4] *t7 + f[5] *t8 + f[6] *t9 );
+
+		Q[m][7]  -= ( f[7] *t1 + f[8] *t2 + f[9] *t3 );
+		Q[m][8]  -= ( f[7] *t4 + f[8] *t5 + f[9] *t6 );
+		Q[m][9]  -= ( f[7] *t7 + f[8] *t8 + f[9] *t9 );
+		Q[m][10] -= ( f[10]*t1 + f[11]*t2 + f[12]*t3 );
+		Q[m][11] -= ( f[10]*t4 + f[11]*t5 + f[12]*t6 );
+		Q[m][12] -= ( f[10]*t7 + f[11]*t8 + f[12]*t9 );
+	}
+}
+
+
 /*------------------------------------------------------------------------------
 ASSEMBLE_M  -  assemble global mass matrix from element mass & inertia  24nov98
 ------------------------------------------------------------------------------*/
@@ -798,6 +1714,108 @@ void assemble_M(
 }
 
 
+/*------------------------------------------------------------------------------
+ASSEMBLE_M_SKY  -  assemble the upper triangle of the global mass matrix into
+profile (skyline) storage, M(i,j) = M[sky[j]-j+i], with the profile of [K],
+see assemble_M().  Coordinate i is stored as equation dof[i].
+------------------------------------------------------------------------------*/
+void assemble_M_sky(
+	double *M, int *sky, int *dof,
+	int DoF, int nN, int nE,
+	vec3 *xyz, float *r, double *L,
+	int *N1, int *N2,
+	float *Ax, float *Jx, float *Iy, float *Iz, float *p,
+	float *d, float *EMs,
+	float *NMs, float *NMx, float *NMy, float *NMz,
+	float *NMxy, float *NMxz, float *NMyz,
+	float *rhox, float *rhoy, float *rhoz,
+	int lump, int debug
+){
+	double	**m;		/* element mass matrix in global coord */
+	int	ind[13],	/* member-structure DoF index table	*/
+		i, j, ii, jj, l, ll;
+	char	mass_fn[FILENMAX];
+	double mass, Ixx, Iyy, Izz, Ixy, Ixz, Iyz;
+	double rx, ry, rz;
+
+	for (i=1; i<=sky[DoF]; i++)	M[i] = 0.0;
+
+	m = dmatrix(1,12,1,12);
+
+	for ( i = 1; i <= nE; i++ ) {
+
+		for ( l=1; l <= 6; l++ ) {
+			ind[l]   = dof[6*N1[i]-6+l];
+			ind[l+6] = dof[6*N2[i]-6+l];
+		}
+
+		if ( lump )	lumped_M ( m, xyz, L[i], N1[i], N2[i],
+				Ax[i], Jx[i], Iy[i], Iz[i], p[i], d[i], EMs[i]);
+		else		consistent_M ( m, xyz,r,L[i], N1[i], N2[i],
+				Ax[i], Jx[i], Iy[i], Iz[i], p[i], d[i], EMs[i]);
+
+		if (debug) {
+			sprintf(mass_fn,"m_%03d",i);
+			save_dmatrix(mass_fn, m, 1,12, 1,12, 0, "w");
+		}
+
+		for ( l=1; l <= 12; l++ ) {
+			ii = ind[l];
+			for ( ll=1; ll <= 12; ll++ ) {
+				jj = ind[ll];
+				if ( ii <= jj )	M[sky[jj]-jj+ii] += m[l][ll];
+			}
+		}
+	}
+
+	for ( j = 1; j <= nN; j++ ) {		// add extra node mass
+		i = 6*(j-1);
+		mass = NMs[j];
+		Ixx = NMx[j];
+		Iyy = NMy[j];
+		Izz = NMz[j];
+		Ixy = NMxy[j];
+		Ixz = NMxz[j];
+		Iyz = NMyz[j];
+		rx = rhox[j];
+		ry = rhoy[j];
+		rz = rhoz[j];
+
+		for (l=1; l<=6; l++) for (ll=1; ll<=6; ll++) m[l][ll] = 0.0;
+		m[1][1] = m[2][2] = m[3][3] = mass;
+		m[1][5] = m[5][1] =  mass*rz;
+		m[1][6] = m[6][1] = -mass*ry;
+		m[2][4] = m[4][2] = -mass*rz;
+		m[2][6] = m[6][2] =  mass*rx;
+		m[3][4] = m[4][3] =  mass*ry;
+		m[3][5] = m[5][3] = -mass*rx;
+		m[4][4] = Ixx + mass*(ry*ry + rz*rz);
+		m[5][5] = Iyy + mass*(rx*rx + rz*rz);
+		m[6][6] = Izz + mass*(rx*rx + ry*ry);
+		m[4][5] = m[5][4] = Ixy - mass*(rx*ry);
+		m[4][6] = m[6][4] = Ixz - mass*(rx*rz);
+		m[5][6] = m[6][5] = Iyz - mass*(ry*rz);
+
+		for ( l=1; l <= 6; l++ ) {
+			ii = dof[i+l];
+			for ( ll=1; ll <= 6; ll++ ) {
+				jj = dof[i+ll];
+				if ( ii <= jj && ii > jj - sky[jj] + sky[jj-1] )
+					M[sky[jj]-jj+ii] += m[l][ll];
+			}
+		}
+	}
+
+	for (i=1; i<= DoF; i++) {
+		if ( M[sky[dof[i]]] <= 0.0 ) {
+			fprintf(stderr,"  error: Non pos-def mass matrix\n");
+			fprintf(stderr,"  M[%d][%d] = %lf\n", i,i, M[sky[dof[i]]] );
+		}
+	}
+	free_dmatrix ( m, 1,12,1,12);
+}
+
+
 /*------------------------------------------------------------------------------
 LUMPED_M  -  space frame element lumped mass matrix in global coordnates 7apr94
 ------------------------------------------------------------------------------*/
@@ -1173,26 +2191,28 @@ void deallocate(
 	free_vector(p,1,nE);
 
 // printf("..D\n"); /* debug */
-	free_D3matrix(U,1,nL,1,nE,1,4);
-	free_D3matrix(W,1,nL,1,10*nE,1,13);
-	free_D3matrix(P,1,nL,1,10*nE,1,5);
-	free_D3matrix(T,1,nL,1,nE,1,8);
-	free_matrix(Dp,1,nL,1,DoF);
+	if ( nL > 0 ) {		/* no loads in a modal analysis only */
+		free_D3matrix(U,1,nL,1,nE,1,4);
+		free_D3matrix(W,1,nL,1,10*nE,1,13);
+		free_D3matrix(P,1,nL,1,10*nE,1,5);
+		free_D3matrix(T,1,nL,1,nE,1,8);
+		free_matrix(Dp,1,nL,1,DoF);
 
 // printf("..E\n"); /* debug */
-	free_dmatrix(F_mech,1,nL,1,DoF);
-	free_dmatrix(F_temp,1,nL,1,DoF);
+		free_dmatrix(F_mech,1,nL,1,DoF);
+		free_dmatrix(F_temp,1,nL,1,DoF);
 
 // printf("..F\n"); /* debug */
-	free_D3dmatrix(feF_mech,1,nL,1,nE,1,12);
-	free_D3dmatrix(feF_temp,1,nL,1,nE,1,12);
+		free_D3dmatrix(feF_mech,1,nL,1,nE,1,12);
+		free_D3dmatrix(feF_temp,1,nL,1,nE,1,12);
 
 // printf("..G\n"); /* debug */
-	free_dmatrix(F,1,nL,1,DoF);
+		free_dmatrix(F,1,nL,1,DoF);
+	}
 	free_dvector(dF,1,DoF);
 
 // printf("..H\n"); /* debug */
-	free_dmatrix(K,1,DoF,1,DoF);
+	if ( K != NULL )	free_dmatrix(K,1,DoF,1,DoF);
 	free_dmatrix(Q,1,nE,1,12);
 
 // printf("..I\n"); /* debug */
@@ -1219,9 +2239,9 @@ void deallocate(
 
 // printf("..L\n"); /* debug */
 	if ( nM > 0 ) {
-		free_dmatrix(M,1,DoF,1,DoF);
-		free_dvector(f,1,nM);
-		free_dmatrix(V,1,DoF,1,DoF);
+		if ( M != NULL )	free_dmatrix(M,1,DoF,1,DoF);
+		if ( f != NULL )	free_dvector(f,1,nM);
+		if ( V != NULL )	free_dmatrix(V,1,DoF,1,DoF);
 	}
 
 	free_vector(EKx,1,nN);
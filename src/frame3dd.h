@@ -57,6 +57,100 @@ void assemble_K(
 );
 
 
+/** renumber the nodes by reverse Cuthill-McKee to reduce the profile of [K] */
+void reorder_nodes_rcm(
+	int nN,			/**< number of nodes			*/
+	int nE,			/**< number of frame elements		*/
+	int *N1, int *N2,	/**< node connectivity			*/
+	int *nmap		/**< new number of each node		*/
+);
+
+
+/** locate the diagonal of each column of [K] in profile (skyline) storage */
+void skyline_profile(
+	int *sky,		/**< location of the diagonal of each column */
+	int *dof,		/**< equation number of each coordinate	*/
+	int DoF,		/**< number of degrees of freedom	*/
+	int nE,			/**< number of frame elements		*/
+	int *N1, int *N2	/**< node connectivity			*/
+);
+
+
+/** form the global stiffness matrix in profile (skyline) storage */
+void assemble_K_sky(
+	double *K,		/**< stiffness matrix, profile storage	*/
+	int *sky,		/**< location of the diagonal of each column */
+	int *dof,		/**< equation number of each coordinate	*/
+	int DoF,		/**< number of degrees of freedom	*/
+	int nE,			/**< number of frame elements		*/
+	int nN,			/**< number of nodes		*/
+	vec3 *xyz,		/**< XYZ locations of every node	*/
+	float *r,		/**< rigid radius of every node	*/
+	double *L, double *Le,	/**< length of each frame element, effective */
+	int *N1, int *N2,	/**< node connectivity			*/
+	float *Ax, float *Asy, float *Asz,	/**< section areas	*/
+	float *Jx, float *Iy, float *Iz,	/**< section inertias	*/
+	float *E, float *G,	/**< elastic and shear moduli		*/
+	float *p,		/**< roll angle, radians		*/
+	int shear,		/**< 1: include shear deformation, 0: don't */
+	int geom,		/**< 1: include goemetric stiffness, 0: don't */
+	double **Q,		/**< frame element end forces		*/
+	int debug,		/**< 1: write element stiffness matrices*/
+	float *EKx, float *EKy, float *EKz,  // extra nodal stiffness
+	float *EKtx, float *EKty, float *EKtz
+);
+
+
+/** add the geometric stiffness to a stored elastic stiffness matrix */
+void assemble_Kg(
+	double **K,		/**< stiffness matrix			*/
+	double **Ke,		/**< elastic stiffness matrix		*/
+	int DoF,		/**< number of degrees of freedom	*/
+	int nE,			/**< number of frame elements		*/
+	vec3 *xyz,		/**< XYZ locations of every node	*/
+	float *r,		/**< rigid radius of every node	*/
+	double *L, double *Le,	/**< length of each frame element, effective */
+	int *N1, int *N2,	/**< node connectivity			*/
+	float *Ax, float *Asy, float *Asz,	/**< section areas	*/
+	float *Jx, float *Iy, float *Iz,	/**< section inertias	*/
+	float *E, float *G,	/**< elastic and shear moduli		*/
+	float *p,		/**< roll angle, radians		*/
+	int shear,		/**< 1: include shear deformation, 0: don't */
+	double **Q		/**< frame element end forces		*/
+);
+
+
+/** add the geometric stiffness to a stored elastic [K], profile storage */
+void assemble_Kg_sky(
+	double *K,		/**< stiffness matrix, profile storage	*/
+	double *Ke,		/**< elastic stiffness, profile storage	*/
+	int *sky,		/**< location of the diagonal of each column */
+	int *dof,		/**< equation number of each coordinate	*/
+	int DoF,		/**< number of degrees of freedom	*/
+	int nE,			/**< number of frame elements		*/
+	vec3 *xyz,		/**< XYZ locations of every node	*/
+	float *r,		/**< rigid radius of every node	*/
+	double *L, double *Le,	/**< length of each frame element, effective */
+	int *N1, int *N2,	/**< node connectivity			*/
+	float *Ax, float *Asy, float *Asz,	/**< section areas	*/
+	float *Jx, float *Iy, float *Iz,	/**< section inertias	*/
+	float *E, float *G,	/**< elastic and shear moduli		*/
+	float *p,		/**< roll angle, radians		*/
+	int shear,		/**< 1: include shear deformation, 0: don't */
+	double **Q		/**< frame element end forces		*/
+);
+
+
+/** copy [K] in profile storage to a dense matrix */
+void expand_K_sky(
+	double *Ks,	/**< stiffness matrix, profile storage		*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	int DoF,	/**< number of degrees of freedom		*/
+	double **K	/**< stiffness matrix, dense			*/
+);
+
+
 /* compute_reaction_forces --- comput [K(r,q)] * {D(q)} + [K(r,r)] * {D(r)} */
 
 void compute_reaction_forces(
@@ -68,6 +162,18 @@ void compute_reaction_forces(
 );
 
 
+/** compute_reaction_forces() for [K] in profile storage */
+void compute_reaction_forces_sky(
+	double *F,	/**< vector of external loads and reaction forces  */
+	double *K,	/**< stiffness matrix, profile storage		*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *D,	/**< displacement vector to be solved		*/
+	int DoF,	/**< number of structural coordinates		*/
+	int *r		/**< 0: not a reaction; 1: a reaction coordinate */
+);
+
+
 /** solve {F} =   [K]{D} via L D L' decomposition */
 void solve_system(
 	double **K,	/**< stiffness matrix for the restrained frame	*/
@@ -82,6 +188,198 @@ void solve_system(
 );
 
 
+/** solve {F} = [K]{D} via L D L' decomposition, [K] in profile storage */
+void solve_system_sky(
+	double *K,	/**< stiffness matrix, profile storage		*/
+	double *Kf,	/**< L of the L D L' decomp., profile storage	*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *D,	/**< displacement vector to be solved		*/
+	double *F,	/**< load vector				*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	int *ok,	/**< indicates positive definite stiffness matrix */
+	int verbose,	/**< 1: copious screen output; 0: none		*/
+	double *rms_resid /**< the RMS error of the solution residual */
+);
+
+
+/** L D L' decomposition of [K] for repeated solutions of {F} = [K]{D} */
+void factor_system(
+	double **K,	/**< stiffness matrix, returned with L in lower triangle */
+	double *diag,	/**< diagonal of D in the L D L' decomposition	*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	int *ok		/**< indicates positive definite stiffness matrix */
+);
+
+
+/** solve {F} = [K]{D} for [K] factored by factor_system() */
+void back_solve_system(
+	double **K,	/**< L D L' decomposition from factor_system()	*/
+	double *diag,	/**< diagonal of D in the L D L' decomposition	*/
+	double *D,	/**< displacement vector to be solved		*/
+	double *F,	/**< load vector				*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	int *ok,	/**< indicates positive definite stiffness matrix */
+	int verbose,	/**< 1: copious screen output; 0: none		*/
+	double *rms_resid /**< the RMS error of the solution residual */
+);
+
+
+/** factor_system() for [K] in profile storage */
+void factor_system_sky(
+	double *K,	/**< stiffness matrix, profile storage		*/
+	double *Kf,	/**< L of the L D L' decomp., profile storage	*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *diag,	/**< diagonal of D in the L D L' decomposition	*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	int *ok		/**< indicates positive definite stiffness matrix */
+);
+
+
+/** back_solve_system() for [K] in profile storage */
+void back_solve_system_sky(
+	double *K,	/**< stiffness matrix, profile storage		*/
+	double *Kf,	/**< L of the L D L' decomp., profile storage	*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *diag,	/**< diagonal of D in the L D L' decomposition	*/
+	double *D,	/**< displacement vector to be solved		*/
+	double *F,	/**< load vector				*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	int *ok,	/**< indicates positive definite stiffness matrix */
+	int verbose,	/**< 1: copious screen output; 0: none		*/
+	double *rms_resid /**< the RMS error of the solution residual */
+);
+
+
+/** solve {F_k} = [K]{D_k} for nb load vectors at once, [K] factored by factor_system() */
+void back_solve_system_mrhs(
+	double **K,	/**< L D L' decomposition from factor_system()	*/
+	double *diag,	/**< diagonal of D in the L D L' decomposition	*/
+	double **D,	/**< displacement vectors D[1..nb][1..DoF]	*/
+	double **F,	/**< load vectors F[1..nb][1..DoF]		*/
+	int nb,		/**< number of load vectors			*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	double *rms_resid /**< the RMS error of each solution residual	*/
+);
+
+
+/** back_solve_system_mrhs() for [K] in profile storage */
+void back_solve_system_sky_mrhs(
+	double *K,	/**< stiffness matrix, profile storage		*/
+	double *Kf,	/**< L of the L D L' decomp., profile storage	*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *diag,	/**< diagonal of D in the L D L' decomposition	*/
+	double **D,	/**< displacement vectors D[1..nb][1..DoF]	*/
+	double **F,	/**< load vectors F[1..nb][1..DoF]		*/
+	int nb,		/**< number of load vectors			*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	double *rms_resid /**< the RMS error of each solution residual	*/
+);
+
+
+/** number the equations of [K_qq] for the banded LAPACK solver and
+ return their number; *kd returns the half-bandwidth */
+int band_system(
+	double **K,	/**< dense stiffness matrix, if sky == NULL	*/
+	int *sky,	/**< location of the diagonal of each column, or NULL */
+	int *dof,	/**< equation number of each coordinate in profile storage */
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *eqn,	/**< equation of each coordinate in [K_qq], 0 if q[i]==0 */
+	int *kd		/**< half-bandwidth of [K_qq]			*/
+);
+
+
+/** banded Cholesky factorization of [K_qq] with LAPACK dpbtrf */
+void factor_system_band(
+	double **K,	/**< dense stiffness matrix, if Ks == NULL	*/
+	double *Ks,	/**< stiffness matrix, profile storage, or NULL	*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *AB,	/**< banded Cholesky factor of [K_qq]		*/
+	int kd,		/**< half-bandwidth of [K_qq]			*/
+	int *eqn,	/**< equation of each coordinate in [K_qq]	*/
+	int neq,	/**< number of equations in [K_qq]		*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *ok		/**< -1 if [K_qq] is not positive definite	*/
+);
+
+
+/** solve {F} = [K]{D} for [K] factored by factor_system_band() */
+void back_solve_system_band(
+	double **K,	/**< dense stiffness matrix, if Ks == NULL	*/
+	double *Ks,	/**< stiffness matrix, profile storage, or NULL	*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *AB,	/**< banded Cholesky factor of [K_qq]		*/
+	int kd,		/**< half-bandwidth of [K_qq]			*/
+	int *eqn,	/**< equation of each coordinate in [K_qq]	*/
+	int neq,	/**< number of equations in [K_qq]		*/
+	double *D,	/**< displacement vector to be solved		*/
+	double *F,	/**< load vector				*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	int *ok,	/**< indicates positive definite stiffness matrix */
+	int verbose,	/**< 1: copious screen output; 0: none		*/
+	double *rms_resid /**< the RMS error of the solution residual */
+);
+
+
+/** back_solve_system_band() for nb load vectors at once */
+void back_solve_system_band_mrhs(
+	double **K,	/**< dense stiffness matrix, if Ks == NULL	*/
+	double *Ks,	/**< stiffness matrix, profile storage, or NULL	*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *AB,	/**< banded Cholesky factor of [K_qq]		*/
+	int kd,		/**< half-bandwidth of [K_qq]			*/
+	int *eqn,	/**< equation of each coordinate in [K_qq]	*/
+	int neq,	/**< number of equations in [K_qq]		*/
+	double **D,	/**< displacement vectors D[1..nb][1..DoF]	*/
+	double **F,	/**< load vectors F[1..nb][1..DoF]		*/
+	int nb,		/**< number of load vectors			*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	double *rms_resid /**< the RMS error of each solution residual	*/
+);
+
+
+/** solve {F} = [K]{D} with the banded LAPACK solver, [K] is preserved */
+void solve_system_band(
+	double **K,	/**< dense stiffness matrix, if Ks == NULL	*/
+	double *Ks,	/**< stiffness matrix, profile storage, or NULL	*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *D,	/**< displacement vector to be solved		*/
+	double *F,	/**< load vector				*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q,		/**< 1: not a reaction; 0: a reaction coordinate */
+	int *r,		/**< 0: not a reaction; 1: a reaction coordinate */
+	int *ok,	/**< indicates positive definite stiffness matrix */
+	int verbose,	/**< 1: copious screen output; 0: none		*/
+	double *rms_resid /**< the RMS error of the solution residual */
+);
+
+
 /** compute {dF} = {F} - [K]{D} and return ||dF|| / ||F||*/
 double equilibrium_error(
         double *dF,	/**< equilibrium error  {dF} = {F} - [K]{D}	*/
@@ -93,6 +391,29 @@ double equilibrium_error(
 );
 
 
+/** equilibrium_error() for [K] in profile storage */
+double equilibrium_error_sky(
+	double *dF,	/**< equilibrium error  {dF} = {F} - [K]{D}	*/
+	double *F,	/**< load vector				*/
+	double *K,	/**< stiffness matrix, profile storage		*/
+	int *sky,	/**< location of the diagonal of each column	*/
+	int *dof,	/**< equation number of each coordinate		*/
+	double *D,	/**< displacement vector to be solved		*/
+	int DoF,	/**< number of degrees of freedom		*/
+	int *q		/**< 1: not a reaction; 0: a reaction coordinate */
+);
+
+
+/** Broyden inverse update of a step {dD} = [K_0]^-1 {dF} */
+void broyden_update(
+	double *dD,	/**< step, updated in place			*/
+	double **S,	/**< steps since [K_0] was factored, S[1..ns+1]	*/
+	double *ss,	/**< S[j]' S[j]					*/
+	int ns,		/**< number of steps since [K_0] was factored	*/
+	int DoF		/**< number of degrees of freedom		*/
+);
+
+
 /** evaluate the member end forces for every member */
 void element_end_forces(
 	double **Q,	/**< frame element end forces			*/
@@ -127,6 +448,20 @@ void add_feF(
 );
 
 
+/** add the fixed end forces of each load to internal element forces */
+void add_feF_rows(
+	vec3 *xyz,	/**< XYZ locations of each node		*/
+	double *L,	/**< length of each frame element, effective	*/
+	int *N1, int *N2, /**< node connectivity			*/
+	float *p,	/**< roll angle, radians			*/
+	double **Q,	/**< frame element end forces			*/
+	double **feF,	/**< element and fixed end forces of each load	*/
+	int nfe,	/**< number of loads				*/
+	double *F,	/**< vector of external loads and reaction forces, or NULL */
+	int *r		/**< 0: not a reaction; 1: a reaction coordinate */
+);
+
+
 /** assemble global mass matrix from element mass & inertia */
 void assemble_M(
 	double **M,	/**< mass matrix				*/
@@ -150,6 +485,31 @@ void assemble_M(
 );
 
 
+/** form the global mass matrix in profile (skyline) storage */
+void assemble_M_sky(
+	double *M,		/**< mass matrix, profile storage	*/
+	int *sky,		/**< location of the diagonal of each column */
+	int *dof,		/**< equation number of each coordinate	*/
+	int DoF,		/**< number of degrees of freedom	*/
+	int nN, int nE,		/**< number of nodes, number of elements */
+	vec3 *xyz,		/**< XYZ locations of each node		*/
+	float *r,		/**< rigid radius of every node		*/
+	double *L,		/**< length of each frame element	*/
+	int *N1, int *N2,	/**< node connectivity			*/
+	float *Ax,		/**< cross section area of each element	*/
+	float *Jx, float *Iy, float *Iz,	/**< section inertias	*/
+	float *p,		/**< roll angle, radians		*/
+	float *d,		/**< frame element density		*/
+	float *EMs,		/**< extra frame element mass		*/
+	float *NMs,		/**< node mass				*/
+	float *NMx, float *NMy, float *NMz,	/**< node inertias	*/
+	float *NMxy, float *NMxz, float *NMyz,	/**< node products of inertia */
+	float *rhox, float *rhoy, float *rhoz,	/**< node mass offsets	*/
+	int lump,		/**< 1: lumped mass matrix, 0: consistent mass */
+	int debug		/**< 1: write element mass matrices	*/
+);
+
+
 /** static condensation of stiffness matrix from NxN to nxn */
 void condense(
 	double **A,	/**< a square matrix				*/
@@ -9,8 +9,12 @@ Copyright (c) NREL. All rights reserved.
 
 import numpy as np
 import math
-from ctypes import POINTER, c_int, c_double, Structure, pointer
-from collections import namedtuple
+from ctypes import POINTER, c_int, c_double, c_char_p, c_void_p, py_object, pythonapi, Structure, pointer
+from collections import namedtuple, OrderedDict
+from functools import partial
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from multiprocessing.sharedctypes import RawArray
 import os
 
 
@@ -26,6 +30,24 @@ def dp(x):
     return x.ctypes.data_as(c_double_p)
 
 
+def lapackRoutines(*names):
+    """addresses of LAPACK routines, from the LAPACK shipped with SciPy"""
+
+    from scipy.linalg import cython_lapack
+
+    pythonapi.PyCapsule_GetName.restype = c_char_p
+    pythonapi.PyCapsule_GetName.argtypes = [py_object]
+    pythonapi.PyCapsule_GetPointer.restype = c_void_p
+    pythonapi.PyCapsule_GetPointer.argtypes = [py_object, c_char_p]
+
+    addresses = []
+    for name in names:
+        capsule = cython_lapack.__pyx_capi__[name]
+        addresses.append(pythonapi.PyCapsule_GetPointer(capsule, pythonapi.PyCapsule_GetName(capsule)))
+
+    return addresses
+
+
 
 # --------------
 # General Inputs
@@ -218,7 +240,87 @@ class C_Condensation(Structure):
                 ('cxx', c_double_p),
                 ('cyy', c_double_p),
                 ('czz', c_double_p),
-                ('m', c_int_p)]
+                ('m', c_int_p),
+                ('Kc', c_double_p),
+                ('Mc', c_double_p)]
+
+
+
+# --------------
+# Solver Inputs
+# --------------
+
+
+class C_SolverData(Structure):
+    _fields_ = [('storage', c_int),
+                ('reorder', c_int),
+                ('block', c_int),
+                ('backend', c_int),
+                ('nlmethod', c_int),
+                ('nltol', c_double),
+                ('nlmaxit', c_int),
+                ('nlrefactor', c_int),
+                ('profile', c_int_p),
+                ('symbolic', c_int_p),
+                ('blockbytes', c_double)]
+
+
+class C_SensitivityData(Structure):
+    _fields_ = [('method', c_int),
+                ('wrt', c_int_p),
+                ('nrows', c_int),
+                ('rows', c_int_p),
+                ('J', c_double_p),
+                ('modal', c_int),
+                ('shapes', c_int),
+                ('mwrt', c_int_p),
+                ('dfreq', c_double_p),
+                ('dV', c_double_p)]
+
+
+class C_OutputData(Structure):
+    _fields_ = [('nD', c_int),
+                ('Dnode', c_int_p),
+                ('nQ', c_int),
+                ('Qelement', c_int_p),
+                ('nR', c_int),
+                ('Rnode', c_int_p)]
+
+
+
+# --------------
+# Batch Inputs and Outputs
+# --------------
+
+
+class C_BatchData(Structure):
+    _fields_ = [('nB', c_int),
+                ('Ax', c_double_p),
+                ('Asy', c_double_p),
+                ('Asz', c_double_p),
+                ('Jx', c_double_p),
+                ('Iy', c_double_p),
+                ('Iz', c_double_p),
+                ('E', c_double_p),
+                ('G', c_double_p),
+                ('roll', c_double_p),
+                ('density', c_double_p),
+                ('varyLoads', c_int),
+                ('ifoff', c_int_p),
+                ('dnode', c_int_p),
+                ('disp', c_double_p),
+                ('felement', c_int_p),
+                ('fnode', c_int_p),
+                ('forces', c_double_p),
+                ('rnode', c_int_p),
+                ('reactions', c_double_p),
+                ('iforces', c_double_p),
+                ('mass', c_double_p),
+                ('mnode', c_int_p),
+                ('nmass', c_double_p),
+                ('freq', c_double_p),
+                ('modenode', c_int_p),
+                ('modes', c_double_p)]
 
 
 
@@ -268,17 +370,9 @@ class C_ReactionForces(Structure):
 
 
 class C_InternalForces(Structure):
-    _fields_ = [('x', c_double_p),
-                ('Nx', c_double_p),
-                ('Vy', c_double_p),
-                ('Vz', c_double_p),
-                ('Tx', c_double_p),
-                ('My', c_double_p),
-                ('Mz', c_double_p),
-                ('Dx', c_double_p),
-                ('Dy', c_double_p),
-                ('Dz', c_double_p),
-                ('Rx', c_double_p),
+    _fields_ = [('offset', c_int_p),
+                ('values', c_double_p),
+                ('extrema', c_double_p),
                 ]
 
 
@@ -339,6 +433,368 @@ InternalForces = namedtuple('InternalForces', ['x', 'Nx', 'Vy', 'Vz', 'Tx', 'My'
 NodeMasses = namedtuple('NodeMasses', ['total_mass', 'struct_mass', 'node', 'xmass', 'ymass', 'zmass', 'xinrta', 'yinrta', 'zinrta'])
 Modes = namedtuple('Modes', ['freq', 'xmpf', 'ympf', 'zmpf', 'node', 'xdsp', 'ydsp', 'zdsp',
     'xrot', 'yrot', 'zrot'])
+StiffnessProfile = namedtuple('StiffnessProfile', ['original', 'reordered'])
+Sensitivity = namedtuple('Sensitivity', ['displacements', 'reactions', 'forces'])
+ModalSensitivity = namedtuple('ModalSensitivity', ['freq', 'modes'])
+Extrema = namedtuple('Extrema', ['max', 'xmax', 'min', 'xmin'])
+InternalForceExtrema = namedtuple('InternalForceExtrema', InternalForces._fields[1:])
+Envelope = namedtuple('Envelope', ['max', 'imax', 'min', 'imin'])
+ElementDisplacements = namedtuple('ElementDisplacements', ['element', 'x', 'dx', 'dy', 'dz',
+    'dxrot', 'dyrot', 'dzrot'])
+
+
+class InternalForceArrays(namedtuple('InternalForceArrays', InternalForces._fields + ('offset',))):
+    """internal forces of all elements, one contiguous array per quantity
+
+    Each quantity has shape (nCases, nIF), where nIF is the number of
+    internal force points of all elements (runBatch adds a leading design
+    axis).  The points of element i (counting from 0) are the columns
+    offset[i]:offset[i+1].
+
+    """
+
+    __slots__ = ()
+
+    def element(self, i):
+        """the InternalForces of element i (counting from 0), as views of the arrays"""
+
+        start, stop = self.offset[i], self.offset[i+1]
+        return InternalForces(*[values[..., start:stop] for values in self[:-1]])
+
+
+class StaticSolution(object):
+    """the solved state of the load cases of run(lazy=True), from which the
+    internal forces of an element are computed only when they are asked for
+
+    Holds the node displacements D, shape (nCases, 6 nN), and the element end
+    forces Q, shape (nCases, nE, 12), of each load case, in the order of the
+    rows of the node and element data, and the load data the C module read
+    for them, so later runs and changes of the load cases do not affect it;
+    the nodes and elements of the frame should not be changed while the
+    solution is in use.  The internal forces of the most recently evaluated
+    elements are kept in a least recently used cache of cacheSize entries.
+    The displacements at any points along the elements are found by
+    elementDisplacements.
+
+    """
+
+    def __init__(self, evaluate, displace, D, Q, cacheSize=128, loads=None):
+
+        self.D = D
+        self.Q = Q
+        self.cacheSize = cacheSize
+        self.__loads = loads  # the arrays the C structs of the load cases point into
+        self.__evaluate = evaluate
+        self.__displace = displace
+        self.__cache = OrderedDict()
+
+
+    def internalForces(self, element, case, stations=None):
+        """the internal forces of one element in one load case
+
+        Parameters
+        ----------
+        element : int
+            element number
+        case : int
+            load case (counting from 0)
+        stations : array_like
+            points x along the element, 0 <= x <= L, at which the internal
+            forces are found exactly from the piecewise polynomials of the
+            loads (as run(extrema=True)), or None (default) for the points
+            at spacing dx of run(), with the same values
+
+        Returns
+        -------
+        InternalForces
+            each quantity an array with one value for each point
+
+        """
+
+        if not 0 <= case < len(self.D):
+            raise ValueError('load case %d is out of range' % case)
+        if stations is not None:
+            return self.__evaluate(case, self.D[case], self.Q[case], element, stations)
+
+        key = (element, case)
+        if key in self.__cache:
+            intF = self.__cache.pop(key)  # most recently used: last
+        else:
+            intF = self.__evaluate(case, self.D[case], self.Q[case], element, None)
+            while len(self.__cache) >= self.cacheSize > 0:
+                self.__cache.popitem(last=False)
+        if self.cacheSize > 0:
+            self.__cache[key] = intF
+
+        return intF
+
+
+    def elementDisplacements(self, element, x, local=False):
+        """the displacements and rotations at points along the elements, in
+        all load cases
+
+        Parameters
+        ----------
+        element : array_like
+            element number of each point
+        x : array_like
+            location of each point along its element, 0 <= x <= L, broadcast
+            against element
+        local : bool
+            if True the displacements are in the local coordinates of each
+            element (as Dx, Dy, Dz, Rx of the internal forces), else in global
+            coordinates (as the node displacements)
+
+        Returns
+        -------
+        ElementDisplacements
+            element and x of each point, and each displacement an array of
+            shape (nCases, number of points)
+
+        """
+
+        element, x = np.broadcast_arrays(np.asarray(element, dtype=np.int32),
+            np.asarray(x, dtype=np.float64))
+        element, x = element.ravel(), x.ravel()
+
+        # the points of each element together, in the order of the elements
+        order = np.argsort(element, kind='mergesort')
+        displ = np.empty((6, len(self.D), len(x)))
+        displ[:, :, order] = self.__displace(self.D, self.Q, element[order], x[order], local)
+
+        return ElementDisplacements(element, x, *displ)
+
+
+
+class InfluenceLines(object):
+    """the results of a unit load at each position of a path, from
+    Frame.influenceLines, and the results of loads moving along the path
+
+    s holds the distance along the path of each position, and displacements,
+    forces and reactions the results of run for the unit load at each
+    position, with one row for each position (None if not selected).
+    Between the positions the influence functions are interpolated linearly
+    in s.
+
+    """
+
+    def __init__(self, s, displacements, forces, reactions):
+
+        self.s = s
+        self.displacements = displacements
+        self.forces = forces
+        self.reactions = reactions
+
+
+    def coefficients(self, loads, offsets, positions):
+        """the factor of the unit load at each position of the path in the
+        load of a load train at each of its positions
+
+        Parameters
+        ----------
+        loads : array_like
+            the load of each axle of the train, in units of the unit load
+        offsets : array_like
+            the distance along the path of each axle from the front of the train
+        positions : array_like
+            the distances s along the path of the front of the train
+
+        Returns
+        -------
+        array of shape (len(positions), len(s)), the coefficients of
+        Frame.combine.  An axle beyond the ends of the path carries no load.
+
+        """
+
+        loads = np.atleast_1d(np.asarray(loads, dtype=np.float64))
+        offsets = np.atleast_1d(np.asarray(offsets, dtype=np.float64))
+        positions = np.atleast_1d(np.asarray(positions, dtype=np.float64))
+        if loads.shape != offsets.shape:
+            raise ValueError('each axle must have a load and an offset')
+        s, n = self.s, len(self.s)
+
+        C = np.zeros((len(positions), n))
+        for load, offset in zip(loads, offsets):
+            p = positions - offset
+            on = np.nonzero((p >= s[0]) & (p <= s[-1]))[0]
+            # the positions j, k of the path on either side of the axle
+            j = np.clip(np.searchsorted(s, p[on], side='right') - 1, 0, max(n-2, 0))
+            k = np.minimum(j+1, n-1)
+            ds = s[k] - s[j]
+            t = (p[on] - s[j])/np.where(ds > 0, ds, 1.0)
+            np.add.at(C, (on, j), load*(1 - t))
+            np.add.at(C, (on, k), load*t)
+
+        return C
+
+
+    def movingLoad(self, loads, offsets, positions, envelope=False, chunkSize=1024):
+        """the results of a load train moving along the path
+
+        Parameters
+        ----------
+        loads, offsets, positions : array_like
+            see coefficients
+        envelope : bool
+            return the Envelope of the results over the positions of the
+            train (see Frame.envelope) rather than the results at each position
+        chunkSize : int
+            see Frame.envelope
+
+        Returns
+        -------
+        displacements : NodeDisplacements
+        forces : ElementEndForces
+        reactions : NodeReactions
+            as Frame.combine, with one row for each position of the train, or
+            as Frame.envelope
+
+        """
+
+        C = self.coefficients(loads, offsets, positions)
+        results = (self.displacements, self.forces, self.reactions, None)
+        if envelope:
+            return Frame.envelope(C, results, chunkSize)[:3]
+
+        return Frame.combine(C, results)[:3]
+
+
+
+# design variables of the sensitivity analysis, in the order of the C flags
+SENSITIVITY_VARIABLES = ['Ax', 'Asy', 'Asz', 'Jx', 'Iy', 'Iz', 'E', 'G', 'density', 'x', 'y', 'z']
+# extra node inertia (changeExtraNodeMass), for the modal sensitivities only
+NODE_MASS_VARIABLES = ['mass', 'Ixx', 'Iyy', 'Izz', 'Ixy', 'Ixz', 'Iyz', 'rhox', 'rhoy', 'rhoz']
+# element properties that may differ between the designs of a batch run
+BATCH_PROPERTIES = ['Ax', 'Asy', 'Asz', 'Jx', 'Iy', 'Iz', 'E', 'G', 'roll', 'density']
+# results of run that may be selected, in the order of its outputs
+OUTPUTS = ['displacements', 'forces', 'reactions', 'internalForces', 'mass']
+
+
+_pyframe3dd = None  # the C module, loaded once for all frames
+
+
+def loadLibrary():
+    """the C module, with the argument types of its entry points"""
+
+    global _pyframe3dd
+
+    if _pyframe3dd is not None:
+        return _pyframe3dd
+
+    dir = os.path.dirname(os.path.realpath(__file__))  # get path to this file
+    lib = np.ctypeslib.load_library('_pyframe3dd', dir)
+
+    inputs = [POINTER(C_Nodes), POINTER(C_Reactions), POINTER(C_Elements),
+        POINTER(C_OtherElementData), c_int, POINTER(C_LoadCase),
+        POINTER(C_DynamicData), POINTER(C_ExtraInertia), POINTER(C_ExtraMass),
+        POINTER(C_Condensation), POINTER(C_SolverData)]
+
+    lib.run.argtypes = inputs + [POINTER(C_SensitivityData), POINTER(C_OutputData),
+        POINTER(C_Displacements), POINTER(C_Forces), POINTER(C_ReactionForces),
+        POINTER(C_InternalForces), POINTER(C_MassResults), POINTER(C_ModalResults)]
+    lib.run.restype = c_int
+
+    lib.run_batch.argtypes = inputs + [POINTER(C_BatchData)]
+    lib.run_batch.restype = c_int
+
+    lib.element_internal_forces.argtypes = [POINTER(C_Nodes), POINTER(C_Elements),
+        POINTER(C_OtherElementData), POINTER(C_LoadCase), c_int, c_double_p, c_double_p,
+        c_int, POINTER(C_InternalForces)]
+    lib.element_internal_forces.restype = c_int
+
+    lib.element_displacements.argtypes = [POINTER(C_Nodes), POINTER(C_Elements),
+        POINTER(C_OtherElementData), c_int, POINTER(C_LoadCase), c_double_p, c_double_p,
+        c_int, c_int_p, c_double_p, c_int, c_double_p]
+    lib.element_displacements.restype = c_int
+
+    lib.set_lapack.argtypes = [c_void_p, c_void_p, c_void_p]
+    lib.set_lapack.restype = None
+
+    _pyframe3dd = lib
+    return lib
+
+
+
+def _sharedArrays(shared, layout):
+    """arrays in a shared memory block, from (name, offset, shape, dtype)"""
+
+    buf = np.ctypeslib.as_array(shared).view(np.uint8)
+    return dict((name, np.ndarray(shape, dtype=np.dtype(dtype), buffer=buf, offset=offset))
+        for name, offset, shape, dtype in layout)
+
+
+def _combined(C, fields, nLabels):
+    """the fields of a result of the load cases for the combinations C: the
+    first nLabels (node or element numbers, or x) are the same for every
+    combination, the others are the matrix products with the load cases"""
+
+    nCombos, nCases = C.shape
+    combined = []
+    for i, values in enumerate(fields):
+        values = np.asarray(values)
+        if values.shape[0] != nCases:
+            raise ValueError('coefficients must have one column for each of the %d load cases'
+                % values.shape[0])
+        if i < nLabels:
+            combined.append(np.repeat(values[:1], nCombos, axis=0))
+        else:
+            combined.append(np.dot(C, values.reshape(nCases, -1)).reshape((nCombos,) + values.shape[1:]))
+
+    return combined
+
+
+def _envelope(C, values, chunkSize):
+    """the Envelope over the combinations C of the values of the load cases,
+    shape (nCases, n), from chunkSize combinations at a time"""
+
+    nCombos, nCases = C.shape
+    values = np.asarray(values, dtype=np.float64)
+    if values.shape[0] != nCases:
+        raise ValueError('coefficients must have one column for each of the %d load cases'
+            % values.shape[0])
+    n = values.shape[1]
+    rows = np.arange(n)
+    values = np.ascontiguousarray(values.T)  # the combinations of a value in a row
+
+    vmax, imax = np.full(n, -np.inf), np.zeros(n, dtype=np.int64)
+    vmin, imin = np.full(n, np.inf), np.zeros(n, dtype=np.int64)
+    for start in range(0, nCombos, chunkSize):
+        combos = np.dot(values, C[start:start+chunkSize].T)
+        i = np.argmax(combos, axis=1)
+        v = combos[rows, i]
+        governs = v > vmax  # the first of equal combinations governs
+        vmax[governs], imax[governs] = v[governs], i[governs] + start
+        i = np.argmin(combos, axis=1)
+        v = combos[rows, i]
+        governs = v < vmin
+        vmin[governs], imin[governs] = v[governs], i[governs] + start
+
+    return Envelope(vmax, imax, vmin, imin)
+
+
+_sweep = None  # frame and shared arrays of a runSweep worker process
+
+
+def _sweepInit(frame, shared, layout, properties, block):
+    """attach a runSweep worker process to the shared memory block"""
+
+    global _sweep
+
+    _sweep = (frame, shared, _sharedArrays(shared, layout), properties, block)
+
+
+def _sweepTask(task):
+    """run designs start to stop, in place in the shared memory block"""
+
+    frame, shared, arrays, properties, block = _sweep
+    start, stop, loadCases = task
+
+    designs = dict((name, arrays[name][start:stop]) for name in properties)
+    out = dict((name, values[start:stop]) for name, values in arrays.items()
+        if name not in properties)
+    frame.runBatch(designs, loadCases, block, out)
+
+    return frame.profile
 
 
 
@@ -388,22 +844,7 @@ class Frame(object):
 
 
         # create c objects
-        self.c_nodes = C_Nodes(len(self.nnode), ip(self.nnode), dp(self.nx),
-            dp(self.ny), dp(self.nz), dp(self.nr))
-
-        self.c_reactions = C_Reactions(len(self.rnode), ip(self.rnode),
-            dp(self.rKx), dp(self.rKy), dp(self.rKz),
-            dp(self.rKtx), dp(self.rKty), dp(self.rKtz), reactions.rigid)
-
-        self.c_elements = C_Elements(len(self.eelement), ip(self.eelement),
-            ip(self.eN1), ip(self.eN2), dp(self.eAx), dp(self.eAsy),
-            dp(self.eAsz), dp(self.eJx), dp(self.eIy), dp(self.eIz),
-            dp(self.eE), dp(self.eG), dp(self.eroll), dp(self.edensity))
-
-
-        # options
-        exagg_static = 1.0  # not used
-        self.c_other = C_OtherElementData(options.shear, options.geom, exagg_static, options.dx)
+        self.__createStructs()
 
         # leave off dynamics by default
         self.nM = 0              # number of desired dynamic modes of vibration (below only necessary if nM > 0)
@@ -412,6 +853,28 @@ class Frame(object):
         self.tol = 1e-9          # mode shape tolerance
         self.shift = 0.0         # shift value ... for unrestrained structures
 
+        # stiffness matrix storage
+        self.storage = 1         # 0: dense     1: profile (skyline)
+        self.reorder = 0         # 1: renumber nodes to reduce the profile
+        self.profile = None      # StiffnessProfile of the last run (skyline only)
+        self.backend = 0         # 0: native solvers     1: LAPACK
+        self.blockBytes = 0      # memory for the loads of a block of load cases (0: 64 MB)
+
+        # geometric nonlinearity
+        self.nlmethod = 0        # 0: Newton     1: modified Newton     2: Broyden
+        self.nltol = None        # equilibrium tolerance (None: use self.tol)
+        self.nlmaxit = 500       # maximum number of iterations
+        self.nlrefactor = 10     # iterations between factorizations (methods 1, 2)
+
+        # sensitivity analysis
+        self.sensmethod = 0      # 0: none     1: direct     2: adjoint
+        self.senswrt = []        # design variables
+        self.sensof = {}         # responses: kind -> node or element numbers
+        self.sensitivity = None  # Sensitivity of the last run
+        self.modalwrt = []       # design variables of the modal sensitivities
+        self.modalshapes = 0     # 1: mode shape derivatives too
+        self.modalSensitivity = None  # ModalSensitivity of the last run
+
         # create list for load cases
         self.loadCases = []
 
@@ -424,18 +887,52 @@ class Frame(object):
 
 
         # load c module
-        dir = os.path.dirname(os.path.realpath(__file__))  # get path to this file
-        self._frame3dd = np.ctypeslib.load_library('_pyframe3dd', dir)
+        self._frame3dd = loadLibrary()
+
+
+
+    def __createStructs(self):
+        """the C structs of the nodes, reactions, elements and options"""
+
+        self.c_nodes = C_Nodes(len(self.nnode), ip(self.nnode), dp(self.nx),
+            dp(self.ny), dp(self.nz), dp(self.nr))
+
+        self.c_reactions = C_Reactions(len(self.rnode), ip(self.rnode),
+            dp(self.rKx), dp(self.rKy), dp(self.rKz),
+            dp(self.rKtx), dp(self.rKty), dp(self.rKtz), self.reactions.rigid)
+
+        self.c_elements = C_Elements(len(self.eelement), ip(self.eelement),
+            ip(self.eN1), ip(self.eN2), dp(self.eAx), dp(self.eAsy),
+            dp(self.eAsz), dp(self.eJx), dp(self.eIy), dp(self.eIz),
+            dp(self.eE), dp(self.eG), dp(self.eroll), dp(self.edensity))
+
+        # options
+        exagg_static = 1.0  # not used
+        self.c_other = C_OtherElementData(self.options.shear, self.options.geom, exagg_static, self.options.dx)
+
+
+    def __getstate__(self):
+        """the data of the frame, without the C structs, for pickling"""
+
+        return dict((key, value) for key, value in self.__dict__.items()
+            if key != '_frame3dd' and not isinstance(value, Structure))
 
-        self._frame3dd.run.argtypes = [POINTER(C_Nodes), POINTER(C_Reactions), POINTER(C_Elements),
-            POINTER(C_OtherElementData), c_int, POINTER(C_LoadCase),
-            POINTER(C_DynamicData), POINTER(C_ExtraInertia), POINTER(C_ExtraMass),
-            POINTER(C_Condensation),
-            POINTER(C_Displacements), POINTER(C_Forces), POINTER(C_ReactionForces),
-            POINTER(POINTER(C_InternalForces)), POINTER(C_MassResults), POINTER(C_ModalResults)]
 
-        self._frame3dd.run.restype = c_int
+    def __setstate__(self, state):
+        """restore a pickled frame and rebuild its C structs"""
 
+        self.__dict__.update(state)
+        self.__createStructs()
+        self.changeExtraNodeMass(self.ENMnode, self.ENMmass, self.ENMIxx, self.ENMIyy, self.ENMIzz,
+            self.ENMIxy, self.ENMIxz, self.ENMIyz, self.ENMrhox, self.ENMrhoy, self.ENMrhoz,
+            self.addGravityLoadForExtraNodeMass)
+        self.changeExtraElementMass(self.EEMelement, self.EEMmass, self.addGravityLoadForExtraElementMass)
+        self.changeCondensationData(self.Cmethod, self.NC, self.cx, self.cy, self.cz,
+            self.cxx, self.cyy, self.czz, self.mC)
+
+        self._frame3dd = loadLibrary()
+        if self.backend == 1:
+            self.setSolver('lapack')
 
 
     def addLoadCase(self, loadCase):
@@ -478,6 +975,7 @@ class Frame(object):
     def changeCondensationData(self, Cmethod, N, cx, cy, cz, cxx, cyy, czz, m):
         # I don't think this is actually used in Frame3DD anyway
 
+        self.Cmethod = Cmethod
         self.NC = N.astype(np.int32)
         self.cx = np.copy(cx)
         self.cy = np.copy(cy)
@@ -487,11 +985,35 @@ class Frame(object):
         self.czz = np.copy(czz)
         self.mC = m.astype(np.int32)
 
+        # condensed stiffness and mass matrices, filled in by each run
+        Cdof = np.count_nonzero([cx, cy, cz, cxx, cyy, czz]) if Cmethod > 0 else 0
+        self.Kc = np.zeros((Cdof, Cdof))
+        self.Mc = np.zeros((Cdof, Cdof))
+
         self.c_condensation = C_Condensation(Cmethod, len(N), ip(self.NC), dp(self.cx), dp(self.cy), dp(self.cz),
-            dp(self.cxx), dp(self.cyy), dp(self.czz), ip(self.mC))
+            dp(self.cxx), dp(self.cyy), dp(self.czz), ip(self.mC), dp(self.Kc), dp(self.Mc))
 
 
     def enableDynamics(self, nM, Mmethod, lump, tol, shift):
+        """modal analysis options
+
+        Parameters
+        ----------
+        nM : int
+            number of modes to find
+        Mmethod : int
+            1: subspace-Jacobi iteration, 2: Stodola iteration,
+            3: shift-invert Lanczos iteration on the sparse (profile)
+            stiffness and mass matrices, which avoids dense DoF x DoF
+            matrices and is much faster for large frames
+        lump : int
+            1: lumped mass matrix, 0: consistent mass matrix
+        tol : float
+            convergence tolerance for the mode shapes
+        shift : float
+            frequency shift for unrestrained frames
+
+        """
 
         self.nM = nM
         self.Mmethod = Mmethod
@@ -500,34 +1022,333 @@ class Frame(object):
         self.shift = shift
 
 
-    def __addGravityToExtraMass(self):
+    def setStorage(self, storage, reorder=False):
+        """storage scheme for the global stiffness matrix
+
+        Parameters
+        ----------
+        storage : str
+            'skyline' (default) stores only the profile of the stiffness matrix,
+            so memory scales with the profile rather than with DoF^2.
+            'dense' stores the full DoF x DoF matrix.
+        reorder : bool
+            renumber the nodes internally by reverse Cuthill-McKee before
+            assembly to reduce the profile (skyline storage only).  Results
+            are still reported in the user node numbering.  The number of
+            terms in the profile before and after reordering is available
+            in ``self.profile`` after each run.
+
+        """
+
+        storages = {'dense': 0, 'skyline': 1}
+        if storage not in storages:
+            raise ValueError("storage must be 'dense' or 'skyline'")
+
+        self.storage = storages[storage]
+        self.reorder = int(reorder)
+
+
+    def setSolver(self, solver):
+        """solver backend for the static equations and the modal eigenproblem
+
+        Parameters
+        ----------
+        solver : str
+            'native' (default) uses the L D L' and subspace/Stodola routines of
+            Frame3DD.  'lapack' factors the stiffness matrix with the banded
+            Cholesky routines of LAPACK (dpbtrf/dpbtrs) and solves the modal
+            eigenproblem with dsygvx, using the LAPACK shipped with SciPy
+            (SciPy must be installed).  Node reordering with
+            ``setStorage('skyline', reorder=True)`` narrows the band.  If the
+            mass matrix is not positive definite the modal analysis falls
+            back to the native eigensolver.
+
+        """
+
+        solvers = {'native': 0, 'lapack': 1}
+        if solver not in solvers:
+            raise ValueError("solver must be 'native' or 'lapack'")
+
+        if solver == 'lapack':
+            self._frame3dd.set_lapack(*lapackRoutines('dpbtrf', 'dpbtrs', 'dsygvx'))
+
+        self.backend = solvers[solver]
+
+
+    def setLoadBlock(self, size=0):
+        """memory for the load data of a block of load cases
+
+        Parameters
+        ----------
+        size : int
+            bytes for the load data (element loads, load vectors, fixed end
+            forces) of the load cases that are read and solved together,
+            with one factorization of the stiffness matrix for all blocks;
+            a block has at least one load case.  0 (default) uses the 64 MB
+            of the C module.
+
+        """
+
+        if size < 0:
+            raise ValueError('size must not be negative')
+
+        self.blockBytes = size
+
+
+    def setNonlinear(self, method='newton', tol=None, maxit=500, refactor=10):
+        """iteration for geometric nonlinearity (Options geom=1)
+
+        Parameters
+        ----------
+        method : str
+            'newton' (default) re-assembles and re-factors the stiffness
+            matrix at every iteration.  'modified' (modified Newton) re-uses
+            the factored stiffness matrix, re-factoring only every
+            ``refactor`` iterations or when the equilibrium error drops by
+            less than half in an iteration.  'broyden' also re-uses the
+            factored stiffness matrix and corrects each step with Broyden
+            secant updates, re-factoring after ``refactor`` updates or on
+            slow convergence.  Modified Newton and Broyden keep a second
+            copy of the stiffness matrix.
+        tol : float
+            convergence tolerance of the RMS relative equilibrium error.
+            None (default) uses the modal tolerance set in enableDynamics,
+            as in Frame3DD.
+        maxit : int
+            maximum number of iterations for each load case
+        refactor : int
+            maximum number of iterations (modified Newton) or secant updates
+            (Broyden) between factorizations of the stiffness matrix
+
+        """
+
+        methods = {'newton': 0, 'modified': 1, 'broyden': 2}
+        if method not in methods:
+            raise ValueError("method must be 'newton', 'modified', or 'broyden'")
+
+        self.nlmethod = methods[method]
+        self.nltol = tol
+        self.nlmaxit = maxit
+        self.nlrefactor = refactor
+
+
+    def setSensitivity(self, wrt, of=('displacements', 'reactions', 'forces'), method='auto'):
+        """derivatives of the static response with respect to the design variables
+
+        After each run, ``self.sensitivity`` is a Sensitivity tuple whose
+        fields (displacements, reactions, forces) are dicts that map each
+        design variable to a NodeDisplacements, NodeReactions or
+        ElementEndForces tuple of derivatives (None for a response that was
+        not selected).  Each derivative array has the shape of the
+        corresponding output with a last axis for the design variables:
+        (nCases, nNodes or 2*nElements, nE) for an element property and
+        (nCases, nNodes or 2*nElements, nN) for a node coordinate.
+
+        The derivatives are found with the factored stiffness matrix of the
+        linear analysis, so they are available only without geometric
+        nonlinearity (Options geom=0).
+
+        Parameters
+        ----------
+        wrt : list(str)
+            design variables, any of 'Ax', 'Asy', 'Asz', 'Jx', 'Iy', 'Iz',
+            'E', 'G', 'density' (one variable per element) and 'x', 'y', 'z'
+            (one variable per node).  None turns the sensitivity analysis off.
+        of : tuple(str) or dict
+            responses: any of 'displacements', 'reactions' and 'forces', or
+            a dict mapping each of them to the node numbers (reaction node
+            numbers, element numbers) of interest, or to None for all.
+        method : str
+            'direct' solves once for each design variable, 'adjoint' once
+            for each response.  'auto' (default) picks the one with fewer
+            solutions.
+
+        """
+
+        self.sensmethod = 0
+        self.senswrt = []
+        self.sensof = {}
+        self.sensitivity = None
+        if not wrt:
+            return
 
-        if self.addGravityLoadForExtraNodeMass:
+        for var in wrt:
+            if var not in SENSITIVITY_VARIABLES:
+                raise ValueError("unknown design variable '%s'" % var)
+
+        if not isinstance(of, dict):
+            of = dict((kind, None) for kind in of)
+        for kind in of:
+            if kind not in Sensitivity._fields:
+                raise ValueError("responses must be 'displacements', 'reactions', or 'forces'")
+
+        methods = {'auto': -1, 'direct': 1, 'adjoint': 2}
+        if method not in methods:
+            raise ValueError("method must be 'auto', 'direct', or 'adjoint'")
+
+        self.sensmethod = methods[method]
+        self.senswrt = [var for var in SENSITIVITY_VARIABLES if var in wrt]
+        self.sensof = of
+
+
+    def setModalSensitivity(self, wrt, shapes=False):
+        """derivatives of the natural frequencies and mode shapes
+
+        After each run with modes (see enableDynamics), ``self.modalSensitivity``
+        is a ModalSensitivity tuple.  ``freq`` maps each design variable to
+        an array (nM, nVar) of the derivatives of the frequencies (Hz), and
+        ``modes`` (None unless ``shapes``) maps each design variable to a
+        NodeDisplacements tuple of the derivatives of the mode shapes, each of
+        shape (nM, nN, nVar).  nVar is nE for an element property, nN for a
+        node coordinate and the number of extra node masses for an extra
+        node inertia.
+
+        The frequency derivatives reuse the mode shapes of the modal analysis
+        and cost a small fraction of a modal analysis.  The mode shape
+        derivatives (Nelson's method) factor [K] - w [M] once per mode and
+        are valid for distinct frequencies.  With geometric stiffness, the
+        axial forces are held fixed.
+
+        Parameters
+        ----------
+        wrt : list(str)
+            design variables, any of 'Ax', 'Asy', 'Asz', 'Jx', 'Iy', 'Iz', 'E',
+            'G', 'density' (per element), 'x', 'y', 'z' (per node) and 'mass',
+            'Ixx', 'Iyy', 'Izz', 'Ixy', 'Ixz', 'Iyz', 'rhox', 'rhoy', 'rhoz'
+            (per extra node mass, see changeExtraNodeMass).  None turns the
+            modal sensitivity analysis off.
+        shapes : bool
+            also compute the derivatives of the mode shapes
+
+        """
+
+        self.modalwrt = []
+        self.modalshapes = 0
+        self.modalSensitivity = None
+        if not wrt:
+            return
 
-            # need to save all in memory
-            nLC = len(self.loadCases)
-            self.PLN = [0]*nLC
-            self.PLFx = [0]*nLC
-            self.PLFy = [0]*nLC
-            self.PLFz = [0]*nLC
-            self.PLMx = [0]*nLC
-            self.PLMy = [0]*nLC
-            self.PLMz = [0]*nLC
+        variables = SENSITIVITY_VARIABLES + NODE_MASS_VARIABLES
+        for var in wrt:
+            if var not in variables:
+                raise ValueError("unknown design variable '%s'" % var)
+
+        self.modalwrt = [var for var in variables if var in wrt]
+        self.modalshapes = int(shapes)
+
+
+    def __sensitivityColumns(self, wrt):
+        """the columns of each design variable"""
+
+        nN = len(self.nodes.node)
+        nE = len(self.elements.element)
+        nI = len(self.ENMnode)
+
+        cols = {}
+        c = 0
+        for var in wrt:
+            if var in NODE_MASS_VARIABLES:
+                n = nI
+            elif SENSITIVITY_VARIABLES.index(var) < SENSITIVITY_VARIABLES.index('x'):
+                n = nE
+            else:
+                n = nN
+            cols[var] = slice(c, c+n)
+            c += n
+
+        return cols, c
+
+
+    def __sensitivityRows(self):
+        """selected nodes, reaction nodes and elements, and the rows of the Jacobian"""
+
+        nN = len(self.nodes.node)
+        nE = len(self.elements.element)
+        nR = len(self.reactions.node)
+
+        sel = {}
+        rows = []
+        for kind, first, size, n in (('displacements', 0, 6, nN),
+                ('reactions', 6*nN, 6, nR), ('forces', 6*nN + 6*nR, 12, nE)):
+            if kind not in self.sensof:
+                continue
+            ids = self.sensof[kind]
+            if kind == 'reactions':
+                if ids is None:
+                    ids = self.reactions.node
+                idx = [list(self.reactions.node).index(i) for i in ids]
+            else:
+                if ids is None:
+                    ids = np.arange(1, n+1)
+                idx = [i-1 for i in ids]
+            sel[kind] = np.asarray(ids, dtype=np.int32)
+            for i in idx:
+                rows.extend(range(first + size*i, first + size*(i+1)))
+
+        return sel, np.array(rows, dtype=np.int32)
+
+
+    def __sensitivityResults(self, J, sel):
+        """split the Jacobian by response and design variable"""
+
+        nCases = J.shape[0]
+        cols = self.__sensitivityColumns(self.senswrt)[0]
+
+        out = dict.fromkeys(Sensitivity._fields)
+        r = 0
+        for kind in Sensitivity._fields:
+            if kind not in sel:
+                continue
+            ids = sel[kind]
+            out[kind] = {}
+            if kind == 'forces':
+                Jk = J[:, r:r+12*len(ids), :].reshape(nCases, 2*len(ids), 6, -1)
+                r += 12*len(ids)
+                ends = np.column_stack([self.elements.N1[ids-1], self.elements.N2[ids-1]]).ravel()
+                for var in self.senswrt:
+                    Jv = Jk[:, :, :, cols[var]]
+                    out[kind][var] = ElementEndForces(np.repeat(ids, 2), ends, *[Jv[:, :, i, :] for i in range(6)])
+            else:
+                Jk = J[:, r:r+6*len(ids), :].reshape(nCases, len(ids), 6, -1)
+                r += 6*len(ids)
+                result = NodeDisplacements if kind == 'displacements' else NodeReactions
+                for var in self.senswrt:
+                    Jv = Jk[:, :, :, cols[var]]
+                    out[kind][var] = result(ids, *[Jv[:, :, i, :] for i in range(6)])
+
+        return Sensitivity(**out)
+
+
+    def __loadCaseStructs(self, cases):
+        """the C structs of the load cases, with the weight of the extra node
+        and element masses added to their point and element loads, and the
+        arrays of the added loads, which must be kept alive while the structs
+        are in use.  The load cases themselves are not changed, so frames
+        that share a load case can run at the same time."""
+
+        c_cases = []
+        arrays = []
 
-            for icase, lc in enumerate(self.loadCases):
+        if self.addGravityLoadForExtraElementMass:
+            L = self.__elementLengths()
 
-                gx = lc.gx
-                gy = lc.gy
-                gz = lc.gz
+        for lc in cases:
+
+            gx = lc.gx
+            gy = lc.gy
+            gz = lc.gz
+
+            pL = lc.pL
+            if self.addGravityLoadForExtraNodeMass:
 
                 # copy data over for this case
-                self.PLN[icase] = np.copy(lc.NF)
-                self.PLFx[icase] = np.copy(lc.Fx)
-                self.PLFy[icase] = np.copy(lc.Fy)
-                self.PLFz[icase] = np.copy(lc.Fz)
-                self.PLMx[icase] = np.copy(lc.Mxx)
-                self.PLMy[icase] = np.copy(lc.Myy)
-                self.PLMz[icase] = np.copy(lc.Mzz)
+                N = np.copy(lc.NF)
+                Fx = np.copy(lc.Fx)
+                Fy = np.copy(lc.Fy)
+                Fz = np.copy(lc.Fz)
+                Mx = np.copy(lc.Mxx)
+                My = np.copy(lc.Myy)
+                Mz = np.copy(lc.Mzz)
 
                 for iextra in range(len(self.ENMnode)):
                     Nm = self.ENMnode[iextra]
@@ -537,165 +1358,891 @@ class Frame(object):
                     z = self.ENMrhoz[iextra]
 
                     # check if a point load already exists for this node
-                    if Nm in self.PLN[icase]:
-                        idx = np.where(self.PLN[icase]==Nm)[0]
+                    if Nm in N:
+                        idx = np.where(N==Nm)[0]
 
                         # if so just add it
-                        self.PLFx[icase][idx] += mass*gx
-                        self.PLFy[icase][idx] += mass*gy
-                        self.PLFz[icase][idx] += mass*gz
-                        self.PLMx[icase][idx] += mass*(y*gz - z*gy)
-                        self.PLMy[icase][idx] += mass*(z*gx - x*gz)
-                        self.PLMz[icase][idx] += mass*(x*gy - y*gx)
+                        Fx[idx] += mass*gx
+                        Fy[idx] += mass*gy
+                        Fz[idx] += mass*gz
+                        Mx[idx] += mass*(y*gz - z*gy)
+                        My[idx] += mass*(z*gx - x*gz)
+                        Mz[idx] += mass*(x*gy - y*gx)
 
                     else:
                         # otherwise append to end
-                        self.PLN[icase] = np.concatenate([self.PLN[icase], [Nm]])
-                        self.PLFx[icase] = np.concatenate([self.PLFx[icase], [mass*gx]])
-                        self.PLFy[icase] = np.concatenate([self.PLFy[icase], [mass*gy]])
-                        self.PLFz[icase] = np.concatenate([self.PLFz[icase], [mass*gz]])
-                        self.PLMx[icase] = np.concatenate([self.PLMx[icase], [mass*(y*gz - z*gy)]])
-                        self.PLMy[icase] = np.concatenate([self.PLMy[icase], [mass*(z*gx - x*gz)]])
-                        self.PLMz[icase] = np.concatenate([self.PLMz[icase], [mass*(x*gy - y*gx)]])
-
-                lc.pL = C_PointLoads(len(self.PLN[icase]), ip(self.PLN[icase]), dp(self.PLFx[icase]),
-                    dp(self.PLFy[icase]), dp(self.PLFz[icase]), dp(self.PLMx[icase]),
-                    dp(self.PLMy[icase]), dp(self.PLMz[icase]))
-
+                        N = np.concatenate([N, [Nm]]).astype(np.int32)
+                        Fx = np.concatenate([Fx, [mass*gx]])
+                        Fy = np.concatenate([Fy, [mass*gy]])
+                        Fz = np.concatenate([Fz, [mass*gz]])
+                        Mx = np.concatenate([Mx, [mass*(y*gz - z*gy)]])
+                        My = np.concatenate([My, [mass*(z*gx - x*gz)]])
+                        Mz = np.concatenate([Mz, [mass*(x*gy - y*gx)]])
+
+                arrays += [N, Fx, Fy, Fz, Mx, My, Mz]
+                pL = C_PointLoads(len(N), ip(N), dp(Fx), dp(Fy), dp(Fz), dp(Mx), dp(My), dp(Mz))
+
+            eL = lc.eL
+            if self.addGravityLoadForExtraElementMass:
+
+                # add to interior point loads, at the middle of each element
+                E = np.copy(lc.ELE)
+                Px = np.copy(lc.Px)
+                Py = np.copy(lc.Py)
+                Pz = np.copy(lc.Pz)
+                xE = np.copy(lc.xE)
 
-        if self.addGravityLoadForExtraElementMass:
-
-            element = self.EEMelement
-            mass = self.EEMmass
-
-            # compute length of element
-            nE = len(self.elements.element)  # number of elements
-            x = self.nodes.x
-            y = self.nodes.y
-            z = self.nodes.z
-            N1 = self.elements.N1
-            N2 = self.elements.N2
+                for iextra in range(len(self.EEMelement)):
 
-            L = np.zeros(nE)
-            for i in range(nE):
+                    element = self.EEMelement[iextra]
+                    mass = self.EEMmass[iextra]
 
-                L[i] = math.sqrt(
-                    (x[N2[i]-1] - x[N1[i]-1])**2 +
-                    (y[N2[i]-1] - y[N1[i]-1])**2 +
-                    (z[N2[i]-1] - z[N1[i]-1])**2
-                )
+                    # check whether an element load already exists for this element
+                    if element in E:
+                        idx = np.where(E==element)[0]
 
-            # LE = L[element]
+                        # if so we just add the weight loads
+                        Px[idx] += mass*gx
+                        Py[idx] += mass*gy
+                        Pz[idx] += mass*gz
+                        # TODO: assumes xE does not change
 
-            # add to interior point load
+                    else:
+                        # otherwise append to the end
+                        E = np.concatenate([E, [element]]).astype(np.int32)
+                        Px = np.concatenate([Px, [mass*gx]])
+                        Py = np.concatenate([Py, [mass*gy]])
+                        Pz = np.concatenate([Pz, [mass*gz]])
+                        xE = np.concatenate([xE, [0.5*L[element-1]]])
+
+                arrays += [E, Px, Py, Pz, xE]
+                eL = C_ElementLoads(len(E), ip(E), dp(Px), dp(Py), dp(Pz), dp(xE))
+
+            c_cases.append(C_LoadCase(gx, gy, gz, pL, lc.uL, lc.tL, eL, lc.tempL, lc.pD))
+
+        return c_cases, arrays
+
+
+
+    def run(self, block=False, contiguous=False, outputs=None, extrema=False, lazy=False):
+        """run the analysis
+
+        Parameters
+        ----------
+        block : bool
+            for a linear analysis, solve the load vectors of all load cases
+            together as one block of right hand sides (with a blocked
+            iterative refinement), rather than one load case at a time.
+            The results are the same; with many load cases the solution is
+            faster because the factored stiffness matrix is read once per
+            block of load vectors.
+        contiguous : bool
+            return the internal forces as one InternalForceArrays, with one
+            (nCases, nIF) array for each quantity holding the points of all
+            elements, rather than as a list of InternalForces, one for each
+            element.  The C module writes the internal forces into these
+            arrays in either case; the list holds views of them.
+        outputs : tuple(str) or dict
+            results to compute: any of 'displacements', 'forces',
+            'reactions', 'internalForces' and 'mass', or a dict mapping each
+            of them to the node numbers (element numbers, reaction node
+            numbers) of interest, or to None for all.  A result that is not
+            selected is returned as None (an element without internal forces
+            as None in the list, or with no points in InternalForceArrays),
+            and the other results hold only the selected nodes or elements,
+            in the order given.  The C module skips the work of the results
+            that are not selected: the reactions are not computed without
+            'reactions', the element end forces not without 'forces' or
+            'internalForces' (in a linear analysis), and the internal forces
+            only for the selected elements.  None (default) computes all.
+        extrema : bool
+            return, in place of the internal forces, an InternalForceExtrema
+            with the Extrema (max, xmax, min, xmin) of each quantity, Nx ...
+            Rx, along each element: arrays of shape (nCases, nE), NaN for the
+            elements not selected.  Between the ends of the trapezoidal loads
+            and the interior point loads each quantity is a polynomial of x,
+            so the C module finds the exact extrema and their locations from
+            the roots of its derivative, without the points at spacing dx.
+        lazy : bool
+            return, in place of the internal forces, a StaticSolution that
+            holds the node displacements and end forces of each load case, and
+            computes the internal forces of an element and load case only
+            when solution.internalForces(element, case) asks for them.  The
+            C module computes no internal forces during the analysis.
+
+        """
 
-            # save all data in memory
-            nLC = len(self.loadCases)
-            self.IPLE = [0]*nLC
-            self.IPLPx = [0]*nLC
-            self.IPLPy = [0]*nLC
-            self.IPLPz = [0]*nLC
-            self.IPLxE = [0]*nLC
+        nCases = len(self.loadCases)  # number of load cases
 
+        if nCases == 0:
+            print('error: must have at least 1 load case')
+            return
 
-            for icase, lc in enumerate(self.loadCases):
 
-                gx = lc.gx
-                gy = lc.gy
-                gz = lc.gz
+        return self.__run(nCases, block, contiguous, outputs, extrema, lazy)
 
-                # iterate through additional mass
-                for iextra in range(len(self.EEMelement)):
 
-                    element = self.EEMelement[iextra]
-                    mass = self.EEMmass[iextra]
-                    LE = L[element]
 
-                    # check whether an element load already exists for this element
-                    if element in self.IPLE[icase]:
-                        idx = np.where(self.IPLE[icase]==element)[0]
+    def runModal(self):
+        """run the modal analysis only
 
-                        # if so we just add the weight loads
-                        self.IPLPx[icase][idx] += mass*gx
-                        self.IPLPy[icase][idx] += mass*gy
-                        self.IPLPz[icase][idx] += mass*gz
-                        # TODO: assumes xE does not change
+        The stiffness and mass matrices are assembled, the reactions are
+        applied, and the modes are found, without any load case, static
+        solution, or internal force calculation.  The stiffness matrix is
+        the elastic stiffness (no geometric stiffness from static loads).
+        Load cases, if any, are ignored.
 
-                    else:
-                        # otherwise append to the end
-                        self.IPLE[icase] = np.concatenate([self.IPLE[icase], [element]])
-                        self.IPLPx[icase] = np.concatenate([self.IPLPx[icase], [mass*gx]])
-                        self.IPLPy[icase] = np.concatenate([self.IPLPx[icase], [mass*gy]])
-                        self.IPLPz[icase] = np.concatenate([self.IPLPx[icase], [mass*gz]])
-                        self.IPLxE[icase] = np.concatenate([self.IPLxE[icase], 0.5*LE])
+        Returns
+        -------
+        mass : NodeMasses
+        modal : Modes
 
-                # self.IPLE = np.concatenate([lc.ELE, element])
-                # self.IPLPx = np.concatenate([lc.Px, mass*gx])
-                # self.IPLPy = np.concatenate([lc.Py, mass*gy])
-                # self.IPLPz = np.concatenate([lc.Pz, mass*gz])
-                # self.IPLxE = np.concatenate([lc.xE, 0.5*LE])
+        """
 
-                lc.eL = C_ElementLoads(len(self.IPLE[icase]), ip(self.IPLE[icase]),
-                    dp(self.IPLPx[icase]), dp(self.IPLPy[icase]), dp(self.IPLPz[icase]),
-                    dp(self.IPLxE[icase]))
+        if self.nM == 0:
+            print('error: must enable dynamics with at least 1 mode')
+            return
 
+        dout, fout, rout, ifout, mout, modalout = self.__run(0, False)
+
+        return mout, modalout
+
+
+
+    def runBatch(self, properties=None, loadCases=None, block=False, out=None, contiguous=False):
+        """run a batch of designs of the same topology in one call
+
+        The designs share the nodes, reactions, element connectivity, options,
+        extra masses and dynamics settings of this frame, and differ in the
+        element properties and, optionally, the load cases.  All designs are
+        analyzed in one call to the C module, which reads the nodes, reactions
+        and element connectivity and finds the profile of the stiffness matrix
+        once: each design only checks its element properties and assembles,
+        factors and solves as run does.  Sensitivities are not computed.
+
+        Parameters
+        ----------
+        properties : dict
+            element properties of each design, any of 'Ax', 'Asy', 'Asz', 'Jx',
+            'Iy', 'Iz', 'E', 'G', 'roll', 'density', each an array of shape
+            (nDesigns, nE).  Properties that are not given are those of the
+            frame.
+        loadCases : list(list(StaticLoadCase))
+            the load cases of each design, the same number for all designs.
+            None uses the load cases of the frame for every design.
+        block : bool
+            see run
+        out : dict
+            arrays that receive the outputs, as laid out by runSweep (each
+            C-contiguous with a leading design axis).  None (default)
+            allocates new arrays.
+        contiguous : bool
+            see run
+
+        Returns
+        -------
+        The outputs of run, with a leading design axis on every array: for
+        example ``displacements.dx`` has shape (nDesigns, nCases, nN),
+        ``internalForces[i].Mz`` (nDesigns, nCases, nIF), ``mass.total_mass``
+        (nDesigns,) and ``modal.freq`` (nDesigns, nM).
+
+        """
+
+        stacked, nB = self.__batchDesigns(properties, loadCases)
+
+        # the load cases of every design, with the weight of the extra masses
+        caseLists = [self.loadCases] if loadCases is None else loadCases
+        nCases = len(caseLists[0])
+        if nCases == 0 and self.nM == 0:
+            print('error: must have at least 1 load case')
+            return
 
+        c_cases, alive = self.__loadCaseStructs([lc for cases in caseLists for lc in cases])
+        c_loadcases = (C_LoadCase * len(c_cases))(*c_cases)
+
+        return self.__runBatch(nB, stacked, int(loadCases is not None), nCases, c_loadcases, block, out, contiguous)
+
+
+
+    def runSweep(self, properties=None, loadCases=None, processes=None, chunksize=None, block=False,
+            contiguous=False):
+        """run a batch of designs of the same topology on a pool of processes
+
+        The designs are those of runBatch.  They are split into chunks of
+        designs that run on a multiprocessing pool, each chunk with one call
+        to the C module.  The element properties and the outputs of all
+        designs live in one shared memory block, a
+        multiprocessing.sharedctypes.RawArray: the frame is sent once to
+        each process, a task is only the range of its designs, and the C
+        module reads its properties from and writes its outputs into the
+        shared block, so no arrays are pickled.  The load cases of each
+        design, when given, are pickled with the tasks.
+
+        Parameters
+        ----------
+        properties : dict
+            see runBatch
+        loadCases : list(list(StaticLoadCase))
+            see runBatch
+        processes : int
+            number of processes, by default the number of CPUs
+        chunksize : int
+            number of designs in each task, by default so that each process
+            gets about four tasks
+        block : bool
+            see run
+        contiguous : bool
+            see run
+
+        Returns
+        -------
+        The outputs of runBatch.
+
+        """
+
+        stacked, nB = self.__batchDesigns(properties, loadCases)
+        if nB == 0:  # nothing to share out
+            return self.runBatch(properties, loadCases, block, contiguous=contiguous)
+
+        nCases = len(self.loadCases if loadCases is None else loadCases[0])
+        if nCases == 0 and self.nM == 0:
+            print('error: must have at least 1 load case')
+            return
 
-    def run(self):
+        # one block for the properties and the outputs, aligned to cache lines
+        buffers = self.__batchBuffers(nB, nCases)
+        layout = []
+        size = 0
+        for name, shape, dtype in [(name, values.shape, values.dtype) for name, values in stacked.items()] + buffers:
+            layout.append((name, size, shape, np.dtype(dtype).str))
+            size += (int(np.prod(shape))*np.dtype(dtype).itemsize + 63)//64*64
+
+        if chunksize is None:
+            chunksize = -(-nB // (4*(processes or multiprocessing.cpu_count())))
+        tasks = [(start, min(start + chunksize, nB), None if loadCases is None else loadCases[start:start + chunksize])
+            for start in range(0, nB, chunksize)]
+
+        shared = RawArray(c_double, max(size//8, 1))  # sizes are multiples of 64
+        arrays = _sharedArrays(shared, layout)
+        for name, values in stacked.items():
+            arrays[name][...] = values
+
+        pool = multiprocessing.Pool(processes, _sweepInit, (self, shared, layout, list(stacked), block))
+        try:
+            profiles = pool.map(_sweepTask, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+        out = dict((name, np.array(arrays[name])) for name, shape, dtype in buffers)
+
+        if self.storage == 1:
+            self.profile = profiles[0]
+
+        return self.__batchResults(out, contiguous)
+
+
+
+    @staticmethod
+    def runMany(frames, maxWorkers=None, block=False, contiguous=False, outputs=None,
+            extrema=False, lazy=False):
+        """run the analysis of many frames on a pool of threads
+
+        The C module keeps all of its working data on the stack and in
+        allocations owned by each call, and ctypes releases the GIL while a
+        call runs, so independent frames are analyzed in parallel.
+
+        Parameters
+        ----------
+        frames : list(Frame)
+            the frames to analyze.  A frame holds the buffers of its own
+            results, so each frame may appear only once.
+        maxWorkers : int
+            number of threads, by default the number of CPUs
+        block : bool
+            see run
+        contiguous : bool
+            see run
+        outputs : tuple(str) or dict
+            see run
+        extrema : bool
+            see run
+        lazy : bool
+            see run
+
+        Returns
+        -------
+        the outputs of run for each frame, in the order of frames
+
+        """
+
+        if len(set(id(frame) for frame in frames)) != len(frames):
+            raise ValueError('a frame may appear only once in runMany')
+
+        pool = ThreadPool(maxWorkers)
+        try:
+            return pool.map(lambda frame: frame.run(block, contiguous, outputs, extrema, lazy), frames)
+        finally:
+            pool.close()
+            pool.join()
+
+
+
+    def runCombinations(self, coefficients, block=False, contiguous=False, outputs=None):
+        """run the basic load cases once and return their linear combinations
+
+        Parameters
+        ----------
+        coefficients : array_like
+            shape (nCombos, nCases): the factor of each load case in each
+            combination
+        block : bool
+            see run
+        contiguous : bool
+            see run
+        outputs : tuple(str) or dict
+            see run
+
+        Returns
+        -------
+        the outputs of run, with the displacements, forces, reactions and
+        internal forces of the combinations in place of the load cases
+
+        """
+
+        if self.c_other.geom:
+            raise ValueError('load combinations are available only for a linear analysis (geom=0)')
+
+        return Frame.combine(coefficients, self.run(block, contiguous, outputs))
+
+
+    @staticmethod
+    def combine(coefficients, results):
+        """linear combinations of the results of the load cases of a linear analysis
+
+        Each result of a combination is the sum of the results of the load
+        cases times their factors, so the combinations of all nodes, elements
+        or internal force points cost one matrix product for each quantity,
+        without solving the equilibrium equations again.
+
+        Parameters
+        ----------
+        coefficients : array_like
+            shape (nCombos, nCases): the factor of each load case in each
+            combination
+        results : tuple
+            the outputs of run (with geom=0), whose displacements, forces,
+            reactions and internal forces (a list of InternalForces or an
+            InternalForceArrays) are combined; any of them may be None
+
+        Returns
+        -------
+        the outputs of run, with the displacements, forces, reactions and
+        internal forces of the combinations in place of the load cases, and
+        the other outputs unchanged
+
+        """
+
+        C = np.atleast_2d(np.asarray(coefficients, dtype=np.float64))
+        if C.ndim != 2:
+            raise ValueError('coefficients must have shape (nCombos, nCases)')
+
+        dout, fout, rout, ifout = results[:4]
+
+        if isinstance(ifout, (InternalForceExtrema, StaticSolution)):
+            raise ValueError('only the internal forces of run(extrema=False, lazy=False) can be combined')
+        if isinstance(ifout, InternalForceArrays):
+            ifout = InternalForceArrays(*(_combined(C, ifout[:-1], 1) + [ifout.offset]))
+        elif ifout is not None:
+            ifout = [None if intF is None else InternalForces(*_combined(C, intF, 1))
+                for intF in ifout]
+        if dout is not None:
+            dout = NodeDisplacements(*_combined(C, dout, 1))
+        if fout is not None:
+            fout = ElementEndForces(*_combined(C, fout, 2))
+        if rout is not None:
+            rout = NodeReactions(*_combined(C, rout, 1))
+
+        return (dout, fout, rout, ifout) + tuple(results[4:])
+
+
+
+    @staticmethod
+    def envelope(coefficients, results, chunkSize=1024):
+        """the envelopes of the results over many linear combinations of the
+        load cases of a linear analysis
+
+        The combinations are formed chunkSize at a time (see combine) and
+        reduced to the running largest and smallest value of each quantity at
+        each node, element end or internal force point, with the combination
+        that governs it, so the memory does not depend on the number of
+        combinations.
+
+        Parameters
+        ----------
+        coefficients : array_like
+            shape (nCombos, nCases): the factor of each load case in each
+            combination
+        results : tuple
+            the outputs of run (with geom=0), whose displacements, forces,
+            reactions and internal forces (a list of InternalForces or an
+            InternalForceArrays) are enveloped; any of them may be None
+        chunkSize : int
+            number of combinations formed at a time
+
+        Returns
+        -------
+        displacements : NodeDisplacements
+        forces : ElementEndForces
+        reactions : NodeReactions
+        internalForces : list(InternalForces) or InternalForceArrays
+            as the results, with each quantity an Envelope (max, imax, min,
+            imin) of arrays with one value for each node, element end or
+            point, imax and imin the governing combinations (counting from
+            0), and the node and element numbers and x of one load case
+
+        """
+
+        C = np.atleast_2d(np.asarray(coefficients, dtype=np.float64))
+        if C.ndim != 2:
+            raise ValueError('coefficients must have shape (nCombos, nCases)')
+        if chunkSize < 1:
+            raise ValueError('chunkSize must be at least 1')
+
+        dout, fout, rout, ifout = results[:4]
+
+        def reduced(fields, nLabels):
+            return [np.asarray(values)[0] if i < nLabels else _envelope(C, values, chunkSize)
+                for i, values in enumerate(fields)]
+
+        if isinstance(ifout, (InternalForceExtrema, StaticSolution)):
+            raise ValueError('only the internal forces of run(extrema=False, lazy=False) can be enveloped')
+        if isinstance(ifout, InternalForceArrays):
+            ifout = InternalForceArrays(*(reduced(ifout[:-1], 1) + [ifout.offset]))
+        elif ifout is not None:
+            # the points of all elements side by side, one product per chunk
+            elements = [i for i, intF in enumerate(ifout) if intF is not None]
+            offset = np.cumsum([0] + [len(ifout[i].x[0]) for i in elements])
+            if elements:
+                stacked = reduced([np.concatenate([ifout[i][k] for i in elements], axis=1)
+                    for k in range(len(InternalForces._fields))], 1)
+            envelopes = [None]*len(ifout)
+            for j, i in enumerate(elements):
+                start, stop = offset[j], offset[j+1]
+                envelopes[i] = InternalForces(stacked[0][start:stop],
+                    *[Envelope(*[values[start:stop] for values in env]) for env in stacked[1:]])
+            ifout = envelopes
+        if dout is not None:
+            dout = NodeDisplacements(*reduced(dout, 1))
+        if fout is not None:
+            fout = ElementEndForces(*reduced(fout, 2))
+        if rout is not None:
+            rout = NodeReactions(*reduced(rout, 1))
+
+        return dout, fout, rout, ifout
+
+
+
+    def influenceLines(self, load, nodes=None, elements=None, x=None, outputs=None, block=True):
+        """the results of a unit load at each position of a path through the
+        frame, for the influence lines of a moving load
+
+        One load case is made for the load at each position and all of them
+        are solved in one analysis, so the stiffness matrix is factored once
+        and the load vectors are solved as blocks of right hand sides.  The
+        load cases of the frame are not changed, and no modal analysis or
+        sensitivities are computed.
+
+        Parameters
+        ----------
+        load : array_like
+            the components (Px, Py, Pz) of the unit load: in global
+            coordinates at nodes, and in the local coordinates of the element
+            (as changeElementLoads) at points along elements
+        nodes : array_like
+            the node at each position of the path, or
+        elements, x : array_like
+            the element and the distance along it of each position of the path
+        outputs : tuple(str) or dict
+            any of 'displacements', 'forces' and 'reactions', see run.
+            None (default) selects all three.
+        block : bool
+            see run
+
+        Returns
+        -------
+        InfluenceLines
+
+        """
+
+        if self.c_other.geom:
+            raise ValueError('influence lines are available only for a linear analysis (geom=0)')
+        if (nodes is None) == (elements is None) or (elements is None) != (x is None):
+            raise ValueError('the positions must be given as nodes or as elements and x')
+
+        outputs = ('displacements', 'forces', 'reactions') if outputs is None else outputs
+        if any(kind not in ('displacements', 'forces', 'reactions') for kind in outputs):
+            raise ValueError("influence lines have 'displacements', 'forces' or 'reactions' outputs")
+        Px, Py, Pz = np.asarray(load, dtype=np.float64)
+
+        # the global coordinates of each position, as the C module finds them
+        if nodes is not None:
+            nodes = np.atleast_1d(np.asarray(nodes, dtype=np.int32))
+            if not np.all(np.isin(nodes, self.nnode)):
+                raise ValueError('unknown node numbers in the positions')
+            points = self.__nodeCoordinates()[nodes]
+        else:
+            elements, x = np.broadcast_arrays(np.asarray(elements, dtype=np.int32),
+                np.asarray(x, dtype=np.float64))
+            elements, x = np.atleast_1d(elements.ravel()), np.atleast_1d(x.ravel())
+            if not np.all(np.isin(elements, self.eelement)):
+                raise ValueError('unknown element numbers in the positions')
+            X1, X2 = self.__elementNodes(elements)
+            L = np.sqrt(np.sum((X2 - X1)**2, axis=1))
+            if np.any(x < 0) or np.any(x > L):
+                raise ValueError('points must be between 0 and the element length')
+            points = X1 + (x/L)[:, np.newaxis]*(X2 - X1)
+        s = np.r_[0.0, np.cumsum(np.sqrt(np.sum(np.diff(points, axis=0)**2, axis=1)))]
+
+        # one load case for the unit load at each position
+        cases = []
+        one = np.ones(1)
+        for i in range(len(points)):
+            lc = StaticLoadCase(0.0, 0.0, 0.0)
+            if nodes is not None:
+                lc.changePointLoads(nodes[i:i+1], Px*one, Py*one, Pz*one, 0*one, 0*one, 0*one)
+            else:
+                lc.changeElementLoads(elements[i:i+1], Px*one, Py*one, Pz*one, x[i:i+1])
+            cases.append(lc)
+
+        loads = self.loadCases
+        self.loadCases = cases
+        try:
+            dout, fout, rout = self.__run(len(cases), block, outputs=outputs, static=True)[:3]
+        finally:
+            self.loadCases = loads
+
+        return InfluenceLines(s, dout, fout, rout)
+
+
+
+    def __batchDesigns(self, properties, loadCases):
+        """check the properties and load cases of a batch of designs"""
+
+        properties = {} if properties is None else properties
+        nE = len(self.elements.element)
+
+        for name in properties:
+            if name not in BATCH_PROPERTIES:
+                raise ValueError("unknown element property '%s'" % name)
+
+        stacked = dict((name, np.ascontiguousarray(values, dtype=np.float64))
+            for name, values in properties.items())
+        nBs = set(values.shape[0] for values in stacked.values())
+        if loadCases is not None:
+            nBs.add(len(loadCases))
+            if len(set(len(cases) for cases in loadCases)) != 1:
+                raise ValueError('every design must have the same number of load cases')
+        if len(nBs) != 1:
+            raise ValueError('the properties and load cases must be given for the same number of designs')
+        nB = nBs.pop()
+        for name, values in stacked.items():
+            if values.shape != (nB, nE):
+                raise ValueError("'%s' must have shape (nDesigns, nE)" % name)
+
+        return stacked, nB
+
+
+    def __batchBuffers(self, nB, nCases):
+        """name, shape and type of each output array of a batch"""
 
-        nCases = len(self.loadCases)  # number of load cases
         nN = len(self.nodes.node)  # number of nodes
         nE = len(self.elements.element)  # number of elements
         nR = len(self.reactions.node)  # number of reactions
         nM = self.nM  # number of modes
+        nIF = sum(self.__internalForcePoints())
+
+        return [('dnode', (nB, nCases, nN), np.int32),
+            ('disp', (nB, nCases, 6, nN), np.float64),
+            ('felement', (nB, nCases, 2*nE), np.int32),
+            ('fnode', (nB, nCases, 2*nE), np.int32),
+            ('forces', (nB, nCases, 6, 2*nE), np.float64),
+            ('rnode', (nB, nCases, nR), np.int32),
+            ('reactions', (nB, nCases, 6, nR), np.float64),
+            ('iforces', (nB, 11, nCases, nIF), np.float64),
+            ('mass', (nB, 2), np.float64),
+            ('mnode', (nB, nN), np.int32),
+            ('nmass', (nB, 6, nN), np.float64),
+            ('freq', (nB, 4, nM), np.float64),
+            ('modenode', (nB, nM, nN), np.int32),
+            ('modes', (nB, nM, 6, nN), np.float64)]
+
+
+    def __batchResults(self, out, contiguous):
+        """the output tuples of a batch, as views of its output arrays"""
+
+        disp, forces, reactions, iforces = out['disp'], out['forces'], out['reactions'], out['iforces']
+        mass, nmass, freq, modes = out['mass'], out['nmass'], out['freq'], out['modes']
+
+        dout = NodeDisplacements(out['dnode'], *[disp[:, :, i] for i in range(6)])
+        fout = ElementEndForces(out['felement'], out['fnode'], *[forces[:, :, i] for i in range(6)])
+        rout = NodeReactions(out['rnode'], *[reactions[:, :, i] for i in range(6)])
+        ifout = self.__internalForceResults([iforces[:, k] for k in range(11)],
+            self.__internalForceOffsets(), contiguous)
+        mout = NodeMasses(mass[:, 0], mass[:, 1], out['mnode'], *[nmass[:, i] for i in range(6)])
+        modalout = Modes(*([freq[:, i] for i in range(4)] + [out['modenode']] +
+            [modes[:, :, i] for i in range(6)]))
 
-        if nCases == 0:
-            print('error: must have at least 1 load case')
-            return
+        return dout, fout, rout, ifout, mout, modalout
+
+
+
+    def __internalForcesOf(self, c_loadcases, case, D, Q, element, stations):
+        """the InternalForces of one element and load case, from its solution"""
+
+        if not 1 <= element <= len(self.elements.element):
+            raise ValueError('element %d is out of range' % element)
+        if stations is None:
+            nIF = self.__internalForcePoints([element])[0]
+            values = np.zeros((11, 1, nIF))
+        else:
+            stations = np.asarray(stations, dtype=np.float64).ravel()
+            L = self.__elementLengths([element])[0]
+            if np.any(stations < 0) or np.any(stations > L):
+                raise ValueError('points must be between 0 and the element length')
+            values = np.zeros((11, 1, len(stations)))
+            values[0, 0] = stations
+        ifoff = np.array([0, values.shape[2]], dtype=np.int32)
+        c_internalForces = C_InternalForces(ip(ifoff), dp(values), None)
+        D = np.ascontiguousarray(D, dtype=np.float64)
+        Q = np.ascontiguousarray(Q, dtype=np.float64)
+
+        status = self._frame3dd.element_internal_forces(self.c_nodes, self.c_elements,
+            self.c_other, c_loadcases[case], element, dp(D), dp(Q),
+            stations is not None, c_internalForces)
+
+        if status != 0:
+            raise RuntimeError('Frame3DD error %d (see the message above)' % status)
+
+        return InternalForces(*values[:, 0])
+
+
+
+    def __elementDisplacementsOf(self, c_loadcases, D, Q, element, x, local):
+        """the displacements at the points x along the elements element, sorted
+        by element, of all load cases, from their solution"""
+
+        nE = len(self.elements.element)
+        if len(element) > 0 and not (1 <= element[0] and element[-1] <= nE):
+            raise ValueError('element numbers must be between 1 and %d' % nE)
+        L = self.__elementLengths(element)
+        if np.any(x < 0) or np.any(x > L):
+            raise ValueError('points must be between 0 and the element length')
+        element = np.ascontiguousarray(element, dtype=np.int32)
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        displ = np.zeros((6, len(D), len(x)))
+        D = np.ascontiguousarray(D, dtype=np.float64)
+        Q = np.ascontiguousarray(Q, dtype=np.float64)
+
+        status = self._frame3dd.element_displacements(self.c_nodes, self.c_elements,
+            self.c_other, len(D), c_loadcases, dp(D), dp(Q), len(x), ip(element),
+            dp(x), bool(local), dp(displ))
+
+        if status != 0:
+            raise RuntimeError('Frame3DD error %d (see the message above)' % status)
+
+        return displ
+
+
+
+    def __internalForceResults(self, values, offset, contiguous):
+        """the internal force output, from the array of each quantity"""
+
+        ifout = InternalForceArrays(*(values + [offset]))
+        if not contiguous:
+            ifout = [ifout.element(i) for i in range(len(self.elements.element))]
+
+        return ifout
+
+
+
+    def __internalForceOffsets(self, elements=None):
+        """first internal force point of each element, and the number of points
+
+        Only the given elements (element numbers, None for all) have points.
 
+        """
 
-        self.__addGravityToExtraMass()
+        nIF = self.__internalForcePoints()
+        if elements is not None:
+            nIF[np.setdiff1d(np.arange(len(nIF)), np.asarray(elements) - 1)] = 0
+
+        return np.concatenate([[0], np.cumsum(nIF)]).astype(np.int32)
+
+
+
+    def __outputSelection(self, outputs):
+        """the selected nodes, elements or reaction nodes of each result of run"""
+
+        if outputs is None:
+            outputs = OUTPUTS
+        if not isinstance(outputs, dict):
+            outputs = dict((kind, None) for kind in outputs)
+
+        every = {'displacements': self.nodes.node, 'forces': self.elements.element,
+            'reactions': self.reactions.node, 'internalForces': self.elements.element,
+            'mass': []}
+
+        sel = {}
+        for kind, ids in outputs.items():
+            if kind not in OUTPUTS:
+                raise ValueError("outputs must be 'displacements', 'forces', 'reactions', 'internalForces', or 'mass'")
+            ids = np.asarray(every[kind] if ids is None else ids, dtype=np.int32).ravel()
+            if not np.all(np.isin(ids, every[kind])):
+                raise ValueError("unknown node or element numbers in the %s output" % kind)
+            sel[kind] = ids
+
+        return sel
+
+
+
+    def __nodeCoordinates(self):
+        """the coordinates of each node, in the row of its number (row 0 unused), from
+        the arrays that are passed to the C module"""
+
+        xyz = np.zeros((len(self.nnode) + 1, 3))
+        xyz[self.nnode] = np.c_[self.nx, self.ny, self.nz]
+
+        return xyz
+
+
+
+    def __elementNodes(self, elements=None):
+        """the coordinates of the two nodes of each element (in the order of
+        the element numbers), or of the given element numbers, from the
+        arrays that are passed to the C module"""
+
+        xyz = self.__nodeCoordinates()
+        row = np.zeros(len(self.eelement) + 1, dtype=np.int64)
+        row[self.eelement] = np.arange(len(self.eelement))
+        if elements is None:
+            elements = np.arange(1, len(self.eelement) + 1)
+        row = row[np.asarray(elements, dtype=np.int64)]
+
+        return xyz[self.eN1[row]], xyz[self.eN2[row]]
+
+
+    def __elementLengths(self, elements=None):
+        """length of each element (in the order of the element numbers), or
+        of the given element numbers, as the C module finds it"""
+
+        X1, X2 = self.__elementNodes(elements)
+
+        return np.sqrt(np.sum((X2 - X1)**2, axis=1))
+
+
+    def __internalForcePoints(self, elements=None):
+        """number of internal force points of each element (in the order of
+        the element numbers), or of the given element numbers"""
+
+        L = self.__elementLengths(elements)
+        dx = np.float32(self.c_other.dx)  # the C module keeps dx as a float
+        nIF = np.maximum(np.floor(L/dx), 1).astype(np.int64) + 1
+
+        return nIF
+
+
+
+    def __runBatch(self, nB, stacked, varyLoads, nCases, c_loadcases, block, out, contiguous):
+
+        ifoff = self.__internalForceOffsets()
+
+        # stacked outputs
+        buffers = self.__batchBuffers(nB, nCases)
+        if out is None:
+            out = dict((name, np.zeros(shape, dtype=dtype)) for name, shape, dtype in buffers)
+        for name, shape, dtype in buffers:
+            values = out[name]
+            if values.shape != shape or values.dtype != dtype or not values.flags.c_contiguous:
+                raise ValueError("out['%s'] must be a contiguous %s array of shape %s" % (name, np.dtype(dtype).name, shape))
+
+        def stackedPointer(name):
+            return dp(stacked[name]) if name in stacked else None
+
+        c_batch = C_BatchData(nB, *[stackedPointer(name) for name in BATCH_PROPERTIES])
+        c_batch.varyLoads = varyLoads
+        c_batch.ifoff = ip(ifoff)
+        for name, shape, dtype in buffers:
+            setattr(c_batch, name, ip(out[name]) if dtype == np.int32 else dp(out[name]))
+
+        exagg_modal = 1.0  # not used
+        c_dynamicData = C_DynamicData(self.nM, self.Mmethod, self.lump, self.tol, self.shift, exagg_modal)
+
+        profile = np.zeros(2, dtype=np.int32)
+        nltol = self.tol if self.nltol is None else self.nltol
+        c_solverData = C_SolverData(self.storage, self.reorder, int(block), self.backend,
+            self.nlmethod, nltol, self.nlmaxit, self.nlrefactor, ip(profile), None, self.blockBytes)
+
+        status = self._frame3dd.run_batch(self.c_nodes, self.c_reactions, self.c_elements, self.c_other,
+            nCases, c_loadcases, c_dynamicData, self.c_extraInertia,
+            self.c_extraMass, self.c_condensation, c_solverData, c_batch)
+
+        if status != 0:
+            raise RuntimeError('Frame3DD error %d (see the message above)' % status)
+
+        if self.storage == 1:
+            self.profile = StiffnessProfile(int(profile[0]), int(profile[1]))
+
+        return self.__batchResults(out, contiguous)
+
+
+
+    def __run(self, nCases, block, contiguous=False, outputs=None, extrema=False, lazy=False,
+            static=False):
+
+        nN = len(self.nodes.node)  # number of nodes
+        nM = 0 if static else self.nM  # number of modes
+
+        # selected nodes, elements and reaction nodes
+        outsel = self.__outputSelection(outputs)
+        empty = np.zeros(0, dtype=np.int32)
+        nE = len(self.elements.element)
+        if extrema and lazy:
+            raise ValueError('the internal forces may be extrema or lazy, not both')
+        csel = outsel  # the results the C module computes
+        if lazy:  # the displacements and end forces of all nodes and elements, by row
+            csel = dict(outsel, displacements=self.nnode, forces=self.eelement)
+            csel.pop('internalForces', None)
+        dnode = csel.get('displacements', empty)
+        felement = csel.get('forces', empty)
+        rnode = csel.get('reactions', empty)
+        nD = len(dnode)  # number of nodes of the displacements
+        nQ = len(felement)  # number of elements of the end forces
+        nR = len(rnode)  # number of reactions
 
 
         # initialize output arrays
 
-        dout = NodeDisplacements(np.zeros((nCases, nN), dtype=np.int32),
-            np.zeros((nCases, nN)), np.zeros((nCases, nN)), np.zeros((nCases, nN)),
-            np.zeros((nCases, nN)), np.zeros((nCases, nN)), np.zeros((nCases, nN))
+        dout = NodeDisplacements(np.zeros((nCases, nD), dtype=np.int32),
+            np.zeros((nCases, nD)), np.zeros((nCases, nD)), np.zeros((nCases, nD)),
+            np.zeros((nCases, nD)), np.zeros((nCases, nD)), np.zeros((nCases, nD))
         )
-        fout = ElementEndForces(np.zeros((nCases, 2*nE), dtype=np.int32),
-            np.zeros((nCases, 2*nE), dtype=np.int32),
-            np.zeros((nCases, 2*nE)), np.zeros((nCases, 2*nE)), np.zeros((nCases, 2*nE)),
-            np.zeros((nCases, 2*nE)), np.zeros((nCases, 2*nE)), np.zeros((nCases, 2*nE))
+        fout = ElementEndForces(np.zeros((nCases, 2*nQ), dtype=np.int32),
+            np.zeros((nCases, 2*nQ), dtype=np.int32),
+            np.zeros((nCases, 2*nQ)), np.zeros((nCases, 2*nQ)), np.zeros((nCases, 2*nQ)),
+            np.zeros((nCases, 2*nQ)), np.zeros((nCases, 2*nQ)), np.zeros((nCases, 2*nQ))
         )
         rout = NodeReactions(np.zeros((nCases, nR), dtype=np.int32),
             np.zeros((nCases, nR)), np.zeros((nCases, nR)), np.zeros((nCases, nR)),
             np.zeros((nCases, nR)), np.zeros((nCases, nR)), np.zeros((nCases, nR))
         )
 
-        x = self.nodes.x
-        y = self.nodes.y
-        z = self.nodes.z
-        N1 = self.elements.N1
-        N2 = self.elements.N2
-        dx = self.options.dx
-
-        ifout = [0]*nE
-        for i in range(nE):
-
-            L = math.sqrt(
-                (x[N2[i]-1] - x[N1[i]-1])**2 +
-                (y[N2[i]-1] - y[N1[i]-1])**2 +
-                (z[N2[i]-1] - z[N1[i]-1])**2
-            )
-
-            nIF = int(max(math.floor(L/dx), 1)) + 1
-
-            ifout[i] = InternalForces(np.zeros((nCases, nIF)), np.zeros((nCases, nIF)),
-                np.zeros((nCases, nIF)), np.zeros((nCases, nIF)), np.zeros((nCases, nIF)),
-                np.zeros((nCases, nIF)), np.zeros((nCases, nIF)), np.zeros((nCases, nIF)),
-                np.zeros((nCases, nIF)), np.zeros((nCases, nIF)), np.zeros((nCases, nIF))
-            )
+        ifoff = self.__internalForceOffsets(csel.get('internalForces', empty))
+        if extrema:
+            iforces = np.zeros((11, nCases, 0))
+            ifext = np.full((10, 4, nCases, nE), np.nan)  # max, xmax, min, xmin
+        else:
+            iforces = np.zeros((11, nCases, ifoff[-1]))  # the points of all elements
 
 
         mout = NodeMasses(0.0, 0.0, np.zeros(nN, dtype=np.int32),
@@ -716,13 +2263,13 @@ class Frame(object):
         c_disp = (C_Displacements * nCases)()
         c_forces = (C_Forces * nCases)()
         c_reactions = (C_ReactionForces * nCases)()
-        c_internalForces = (POINTER(C_InternalForces) * nCases)()
+        c_internalForces = C_InternalForces(ip(ifoff), dp(iforces),
+            dp(ifext) if extrema else None)
 
 
+        c_cases, alive = self.__loadCaseStructs(self.loadCases[:nCases])
         for i in range(nCases):
-            lci = self.loadCases[i]
-            c_loadcases[i] = C_LoadCase(lci.gx, lci.gy, lci.gz, lci.pL,
-                lci.uL, lci.tL, lci.eL, lci.tempL, lci.pD)
+            c_loadcases[i] = c_cases[i]
             c_disp[i] = C_Displacements(ip(dout.node[i, :]),
                 dp(dout.dx[i, :]), dp(dout.dy[i, :]), dp(dout.dz[i, :]),
                 dp(dout.dxrot[i, :]), dp(dout.dyrot[i, :]), dp(dout.dzrot[i, :]))
@@ -733,13 +2280,6 @@ class Frame(object):
                 dp(rout.Fx[i, :]), dp(rout.Fy[i, :]), dp(rout.Fz[i, :]),
                 dp(rout.Mxx[i, :]), dp(rout.Myy[i, :]), dp(rout.Mzz[i, :]))
 
-            c_internalForces[i] = (C_InternalForces * nE)()
-            for j in range(nE):
-                (c_internalForces[i])[j] = C_InternalForces(dp(ifout[j].x[i, :]), dp(ifout[j].Nx[i, :]),
-                    dp(ifout[j].Vy[i, :]), dp(ifout[j].Vz[i, :]), dp(ifout[j].Tx[i, :]),
-                    dp(ifout[j].My[i, :]), dp(ifout[j].Mz[i, :]), dp(ifout[j].Dx[i, :]),
-                    dp(ifout[j].Dy[i, :]), dp(ifout[j].Dz[i, :]), dp(ifout[j].Rx[i, :]))
-
         total_mass = c_double()
         struct_mass = c_double()
 
@@ -770,12 +2310,43 @@ class Frame(object):
 
         # set dynamics data
         exagg_modal = 1.0  # not used
-        c_dynamicData = C_DynamicData(self.nM, self.Mmethod, self.lump, self.tol, self.shift, exagg_modal)
-
-        self._frame3dd.run(self.c_nodes, self.c_reactions, self.c_elements, self.c_other,
+        c_dynamicData = C_DynamicData(nM, self.Mmethod, self.lump, self.tol, self.shift, exagg_modal)
+
+        # set solver data
+        profile = np.zeros(2, dtype=np.int32)
+        nltol = self.tol if self.nltol is None else self.nltol
+        c_solverData = C_SolverData(self.storage, self.reorder, int(block), self.backend,
+            self.nlmethod, nltol, self.nlmaxit, self.nlrefactor, ip(profile), None, self.blockBytes)
+
+        # set sensitivity data
+        sensmethod = self.sensmethod if nCases > 0 and not static else 0
+        variables = SENSITIVITY_VARIABLES + NODE_MASS_VARIABLES
+        wrt = np.array([var in self.senswrt for var in variables], dtype=np.int32)
+        nV = self.__sensitivityColumns(self.senswrt)[1]
+        sel, rows = self.__sensitivityRows() if sensmethod != 0 else ({}, np.zeros(0, dtype=np.int32))
+        J = np.zeros((nCases, len(rows), nV))
+        if sensmethod != 0 and self.c_other.geom:
+            raise ValueError('sensitivities are available only for a linear analysis (geom=0)')
+        if sensmethod == -1:
+            sensmethod = 1 if nV <= len(rows) else 2
+        modal = int(nM > 0 and len(self.modalwrt) > 0)
+        mwrt = np.array([var in self.modalwrt for var in variables], dtype=np.int32)
+        mcols, nMV = self.__sensitivityColumns(self.modalwrt)
+        dfreq = np.zeros((nM, nMV))
+        dV = np.zeros((nM, 6*nN, nMV) if self.modalshapes else 1)
+        c_sensitivityData = C_SensitivityData(sensmethod, ip(wrt), len(rows), ip(rows), dp(J),
+            modal, self.modalshapes, ip(mwrt), dp(dfreq), dp(dV))
+
+        # set output selection
+        c_outputData = C_OutputData(nD, ip(dnode), nQ, ip(felement), nR, ip(rnode))
+
+        status = self._frame3dd.run(self.c_nodes, self.c_reactions, self.c_elements, self.c_other,
             nCases, c_loadcases, c_dynamicData, self.c_extraInertia,
-            self.c_extraMass, self.c_condensation,
-            c_disp, c_forces, c_reactions, c_internalForces, c_massResults, c_modalResults)
+            self.c_extraMass, self.c_condensation, c_solverData, c_sensitivityData,
+            c_outputData, c_disp, c_forces, c_reactions, c_internalForces, c_massResults, c_modalResults)
+
+        if status != 0:
+            raise RuntimeError('Frame3DD error %d (see the message above)' % status)
 
         # put mass values back in since tuple is read only
         mout = NodeMasses(total_mass.value, struct_mass.value, mout.node,
@@ -789,6 +2360,50 @@ class Frame(object):
             modalout.ympf[i] = ympf[i].value
             modalout.zmpf[i] = zmpf[i].value
 
+        if self.storage == 1:
+            self.profile = StiffnessProfile(int(profile[0]), int(profile[1]))
+
+        if sensmethod != 0:
+            self.sensitivity = self.__sensitivityResults(J, sel)
+
+        if modal:
+            freq = dict((var, dfreq[:, mcols[var]]) for var in self.modalwrt)
+            modes = None
+            if self.modalshapes:
+                dV = dV.reshape(nM, nN, 6, nMV)
+                modes = dict((var, NodeDisplacements(np.arange(1, nN+1),
+                    *[dV[:, :, i, mcols[var]] for i in range(6)])) for var in self.modalwrt)
+            self.modalSensitivity = ModalSensitivity(freq, modes)
+
+        # the selected results
+        if lazy:
+            D = np.stack(dout[1:], axis=-1).reshape(nCases, 6*nN)
+            Q = np.stack(fout[2:], axis=-1).reshape(nCases, nE, 12)
+            evaluate = partial(self.__internalForcesOf, c_loadcases)
+            displace = partial(self.__elementDisplacementsOf, c_loadcases)
+            # a later change of the loads replaces the arrays of c_loadcases
+            loads = [alive] + [dict(vars(lc)) for lc in self.loadCases]
+            if 'displacements' in outsel:
+                cols = np.argsort(self.nnode)[outsel['displacements'] - 1]
+                dout = NodeDisplacements(*[f[:, cols] for f in dout])
+            if 'forces' in outsel:
+                rows = np.argsort(self.eelement)[outsel['forces'] - 1]
+                cols = (2*rows[:, np.newaxis] + [0, 1]).ravel()
+                fout = ElementEndForces(*[f[:, cols] for f in fout])
+        dout = dout if 'displacements' in outsel else None
+        fout = fout if 'forces' in outsel else None
+        rout = rout if 'reactions' in outsel else None
+        ifout = None
+        if 'internalForces' in outsel and lazy:
+            ifout = StaticSolution(evaluate, displace, D, Q, loads=loads)
+        elif 'internalForces' in outsel and extrema:
+            ifout = InternalForceExtrema(*[Extrema(*q) for q in ifext])
+        elif 'internalForces' in outsel:
+            ifout = self.__internalForceResults(list(iforces), ifoff, contiguous)
+            if not contiguous:
+                ifout = [f if n > 0 else None for f, n in zip(ifout, np.diff(ifoff))]
+        mout = mout if 'mass' in outsel else None
+
         return dout, fout, rout, ifout, mout, modalout
 
 
@@ -822,6 +2437,27 @@ class StaticLoadCase(object):
 
 
 
+    def __getstate__(self):
+        """the loads, without the C structs, for pickling"""
+
+        return dict((key, value) for key, value in self.__dict__.items()
+            if not isinstance(value, Structure))
+
+
+    def __setstate__(self, state):
+        """restore pickled loads and rebuild their C structs"""
+
+        self.__dict__.update(state)
+        self.changePointLoads(self.NF, self.Fx, self.Fy, self.Fz, self.Mxx, self.Myy, self.Mzz)
+        self.changeUniformLoads(self.ELU, self.Ux, self.Uy, self.Uz)
+        self.changeTrapezoidalLoads(self.ELT, self.xx1, self.xx2, self.wx1, self.wx2, self.xy1, self.xy2,
+            self.wy1, self.wy2, self.xz1, self.xz2, self.wz1, self.wz2)
+        self.changeElementLoads(self.ELE, self.Px, self.Py, self.Pz, self.xE)
+        self.changeTemperatureLoads(self.ELTemp, self.a, self.hy, self.hz, self.Typ, self.Tym, self.Tzp, self.Tzm)
+        self.changePrescribedDisplacements(self.ND, self.Dx, self.Dy, self.Dz, self.Dxx, self.Dyy, self.Dzz)
+
+
+
 
     def changePointLoads(self, N, Fx, Fy, Fz, Mxx, Myy, Mzz):
 
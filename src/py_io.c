@@ -17,6 +17,7 @@ Mimics frame3d_io.c but allows direct initialization rather than input files
 #include "HPGutil.h"
 #include "NRutil.h"
 #include "py_io.h"
+#include "py_lapack.h"
 
 
 
@@ -26,7 +27,7 @@ Mimics frame3d_io.c but allows direct initialization rather than input files
 READ_NODE_DATA  -  read node location data
 Oct 31 2013
 ------------------------------------------------------------------------------*/
-void read_node_data(Nodes *nodes, int nN, vec3 *xyz, float *r ){
+int read_node_data(Nodes *nodes, int nN, vec3 *xyz, float *r ){
 
     int i, j;
     char errMsg[MAXL];
@@ -36,28 +37,25 @@ void read_node_data(Nodes *nodes, int nN, vec3 *xyz, float *r ){
         if ( j <= 0 || j > nN ) {
             sprintf(errMsg,"\nERROR: in node coordinate data, node number out of range\n(node number %d is <= 0 or > %d)\n", j, nN);
             errorMsg(errMsg);
-            exit(41);
+            return 41;
         }
         xyz[j].x = nodes->x[i-1];
         xyz[j].y = nodes->y[i-1];
         xyz[j].z = nodes->z[i-1];
         r[j] = fabs(nodes->r[i-1]);
     }
-    return;
+    return 0;
 }
 
 
 
 /*------------------------------------------------------------------------------
-READ_FRAME_ELEMENT_DATA  -  read frame element property data
+READ_FRAME_ELEMENT_CONNECTIVITY  -  read frame element node numbers and lengths
 Oct 31, 2013
 ------------------------------------------------------------------------------*/
-void read_frame_element_data (Elements *elements,
+int read_frame_element_connectivity (Elements *elements,
     int nN, int nE, vec3 *xyz, float *r,
-    double *L, double *Le,
-    int *N1, int *N2,
-    float *Ax, float *Asy, float *Asz,
-    float *Jx, float *Iy, float *Iz, float *E, float *G, float *p, float *d){
+    double *L, double *Le, int *N1, int *N2){
 
     int n1, n2, i, n, b;
     int *epn, epn0=0;   /* vector of elements per node */
@@ -67,24 +65,86 @@ void read_frame_element_data (Elements *elements,
 
     for (n=1;n<=nN;n++) epn[n] = 0;
 
-    for (i=1;i<=nE;i++) {       /* read frame element properties */
+    for (i=1;i<=nE;i++) {       /* read frame element node numbers */
         b = elements->EL[i-1];
         if ( b <= 0 || b > nE ) {
             sprintf(errMsg,"\n  error in frame element property data: Element number out of range  \n Frame element number: %d  \n", b);
             errorMsg(errMsg);
-            exit(51);
+            free_ivector(epn,1,nN);
+            return 51;
         }
         N1[b] = elements->N1[i-1];
         N2[b] = elements->N2[i-1];
 
-        epn[N1[b]] += 1;        epn[N2[b]] += 1;
-
         if ( N1[b] <= 0 || N1[b] > nN || N2[b] <= 0 || N2[b] > nN ) {
             sprintf(errMsg,"\n  error in frame element property data: node number out of range  \n Frame element number: %d \n", b);
             errorMsg(errMsg);
-            exit(52);
+            free_ivector(epn,1,nN);
+            return 52;
         }
 
+        epn[N1[b]] += 1;        epn[N2[b]] += 1;
+    }
+
+    for (b=1;b<=nE;b++) {       /* calculate frame element lengths */
+        n1 = N1[b];
+        n2 = N2[b];
+
+#define SQ(X) ((X)*(X))
+        L[b] =  SQ( xyz[n2].x - xyz[n1].x ) +
+            SQ( xyz[n2].y - xyz[n1].y ) +
+            SQ( xyz[n2].z - xyz[n1].z );
+#undef SQ
+
+        L[b] = sqrt( L[b] );
+        Le[b] = L[b] - r[n1] - r[n2];
+        if ( n1 == n2 || L[b] == 0.0 ) {
+           sprintf(errMsg,
+            " Frame elements must start and stop at different nodes\n  frame element %d  N1= %d N2= %d L= %e\n   Perhaps frame element number %d has not been specified.\n  or perhaps the Input Data file is missing expected data.\n",
+           b, n1,n2, L[b], i );
+           errorMsg(errMsg);
+           free_ivector(epn,1,nN);
+           return 60;
+        }
+        if ( Le[b] <= 0.0 ) {
+           sprintf(errMsg, " Node  radii are too large.\n  frame element %d  N1= %d N2= %d L= %e \n  r1= %e r2= %e Le= %e \n",
+           b, n1,n2, L[b], r[n1], r[n2], Le[b] );
+           errorMsg(errMsg);
+           free_ivector(epn,1,nN);
+           return 61;
+        }
+    }
+
+    for ( n=1; n<=nN; n++ ) {
+     if ( epn[n] == 0 ) {
+      sprintf(errMsg,"node or frame element property data:\n     node number %3d is unconnected. \n", n);
+      sferr(errMsg);
+      epn0 += 1;
+     }
+    }
+
+    free_ivector(epn,1,nN);
+
+    if ( epn0 > 0 ) return 42;
+
+    return 0;
+}
+
+
+/*------------------------------------------------------------------------------
+READ_FRAME_ELEMENT_PROPERTIES  -  read frame element property data
+Oct 31, 2013
+------------------------------------------------------------------------------*/
+int read_frame_element_properties (Elements *elements, int nE,
+    float *Ax, float *Asy, float *Asz,
+    float *Jx, float *Iy, float *Iz, float *E, float *G, float *p, float *d){
+
+    int i, b;
+    char errMsg[MAXL];
+
+    for (i=1;i<=nE;i++) {       /* read frame element properties */
+        b = elements->EL[i-1];
+
         Ax[b] = elements->Ax[i-1];
         Asy[b] = elements->Asy[i-1];
         Asz[b] = elements->Asz[i-1];
@@ -102,80 +162,41 @@ void read_frame_element_data (Elements *elements,
              Jx[b] < 0 ||  Iy[b] < 0 ||  Iz[b] < 0  ) {
          sprintf(errMsg,"\n  error in frame element property data: section property < 0 \n  Frame element number: %d  \n", b);
          errorMsg(errMsg);
-         exit(53);
+         return 53;
         }
         if ( Ax[b] == 0 ) {
          sprintf(errMsg,"\n  error in frame element property data: cross section area is zero   \n  Frame element number: %d  \n", b);
          errorMsg(errMsg);
-         exit(54);
+         return 54;
         }
         if ( (Asy[b] == 0 || Asz[b] == 0) && G[b] == 0 ) {
          sprintf(errMsg,"\n  error in frame element property data: a shear area and shear modulus are zero   \n  Frame element number: %d  \n", b);
          errorMsg(errMsg);
-         exit(55);
+         return 55;
         }
         if ( Jx[b] == 0 ) {
          sprintf(errMsg,"\n  error in frame element property data: torsional moment of inertia is zero   \n  Frame element number: %d  \n", b);
          errorMsg(errMsg);
-         exit(56);
+         return 56;
         }
         if ( Iy[b] == 0 || Iz[b] == 0 ) {
          sprintf(errMsg,"\n  error: cross section bending moment of inertia is zero   \n  Frame element number : %d  \n", b);
          errorMsg(errMsg);
-         exit(57);
+         return 57;
         }
         if ( E[b] <= 0 || G[b] <= 0 ) {
          sprintf(errMsg,"\n  error : material elastic modulus E or G is not positive   \n  Frame element number: %d  \n", b);
          errorMsg(errMsg);
-         exit(58);
+         return 58;
         }
         if ( d[b] <= 0 ) {
          sprintf(errMsg,"\n  error : mass density d is not positive   \n  Frame element number: %d  \n", b);
          errorMsg(errMsg);
-         exit(59);
-        }
-    }
-
-    for (b=1;b<=nE;b++) {       /* calculate frame element lengths */
-        n1 = N1[b];
-        n2 = N2[b];
-
-#define SQ(X) ((X)*(X))
-        L[b] =  SQ( xyz[n2].x - xyz[n1].x ) +
-            SQ( xyz[n2].y - xyz[n1].y ) +
-            SQ( xyz[n2].z - xyz[n1].z );
-#undef SQ
-
-        L[b] = sqrt( L[b] );
-        Le[b] = L[b] - r[n1] - r[n2];
-        if ( n1 == n2 || L[b] == 0.0 ) {
-           sprintf(errMsg,
-            " Frame elements must start and stop at different nodes\n  frame element %d  N1= %d N2= %d L= %e\n   Perhaps frame element number %d has not been specified.\n  or perhaps the Input Data file is missing expected data.\n",
-           b, n1,n2, L[b], i );
-           errorMsg(errMsg);
-           exit(60);
-        }
-        if ( Le[b] <= 0.0 ) {
-           sprintf(errMsg, " Node  radii are too large.\n  frame element %d  N1= %d N2= %d L= %e \n  r1= %e r2= %e Le= %e \n",
-           b, n1,n2, L[b], r[n1], r[n2], Le[b] );
-           errorMsg(errMsg);
-           exit(61);
+         return 59;
         }
     }
 
-    for ( n=1; n<=nN; n++ ) {
-     if ( epn[n] == 0 ) {
-      sprintf(errMsg,"node or frame element property data:\n     node number %3d is unconnected. \n", n);
-      sferr(errMsg);
-      epn0 += 1;
-     }
-    }
-
-    free_ivector(epn,1,nN);
-
-    if ( epn0 > 0 ) exit(42);
-
-    return;
+    return 0;
 }
 
 
@@ -184,7 +205,7 @@ READ_RUN_DATA  -  read information for analysis
 Oct 31, 2013
 ------------------------------------------------------------------------------*/
 
-void read_run_data (OtherElementData *other, int *shear, int *geom, double *exagg_static, float *dx){
+int read_run_data (OtherElementData *other, int *shear, int *geom, double *exagg_static, float *dx){
 
     *shear = other->shear;
     *geom = other->geom;
@@ -193,25 +214,25 @@ void read_run_data (OtherElementData *other, int *shear, int *geom, double *exag
 
     if (*shear != 0 && *shear != 1) {
         errorMsg(" Rember to specify shear deformations with a 0 or a 1 \n after the frame element property info.\n");
-        exit(71);
+        return 71;
     }
 
     if (*geom != 0 && *geom != 1) {
         errorMsg(" Rember to specify geometric stiffness with a 0 or a 1 \n after the frame element property info.\n");
-        exit(72);
+        return 72;
     }
 
     if ( *exagg_static < 0.0 ) {
         errorMsg(" Remember to specify an exageration factor greater than zero.\n");
-        exit(73);
+        return 73;
     }
 
     if ( *dx <= 0.0 && *dx != -1 ) {
         errorMsg(" Remember to specify a frame element increment greater than zero.\n");
-        exit(74);
+        return 74;
     }
 
-    return;
+    return 0;
 }
 
 
@@ -220,7 +241,7 @@ void read_run_data (OtherElementData *other, int *shear, int *geom, double *exag
 READ_REACTION_DATA - Read fixed node displacement boundary conditions
 Oct 31, 2013
 ------------------------------------------------------------------------------*/
-void read_reaction_data (Reactions *reactions, int DoF, int nN,
+int read_reaction_data (Reactions *reactions, int DoF, int nN,
     int *nR, int *q, int *r, int *sumR, int verbose, int geom,
     float *EKx, float *EKy, float *EKz,
     float *EKtx, float *EKty, float *EKtz){
@@ -250,17 +271,17 @@ void read_reaction_data (Reactions *reactions, int DoF, int nN,
         fprintf(stderr," nR = %3d ", *nR );
         sprintf(errMsg,"\n  error: valid ranges for nR is 0 ... %d \n", DoF/6 );
         errorMsg(errMsg);
-        exit(80);
+        return 80;
     }
 
 
     for (i=1; i <= *nR; i++) {
         j = reactions->N[i-1];
 
-        if ( j > nN ) {
+        if ( j < 1 || j > nN ) {
             sprintf(errMsg,"\n  error in reaction data: node number %d is greater than the number of nodes, %d \n", j, nN );
             errorMsg(errMsg);
-            exit(81);
+            return 81;
         }
 
         // save rigid locations (and extra stiffness if needed)
@@ -301,33 +322,53 @@ void read_reaction_data (Reactions *reactions, int DoF, int nN,
     if ( *sumR < 4 && geom) {
         sprintf(errMsg,"\n  error:  geometric stiffness can not be used for unrestrained structure.  set geom=0 or added more reactions.\n");
         errorMsg(errMsg);
-        exit(84);
+        return 84;
     }
     // if ( *sumR < 4 ) {
     //     sprintf(errMsg,"\n  Warning:  un-restrained structure   %d imposed reactions.\n  At least 4 reactions are required to support static loads.\n", *sumR );
     //     errorMsg(errMsg);
-    //     /*  exit(84); */
+    //     /*  return 84; */
     // }
     if ( *sumR >= DoF ) {
         sprintf(errMsg,"\n  error in reaction data:  Fully restrained structure\n   %d imposed reactions >= %d degrees of freedom\n", *sumR, DoF );
         errorMsg(errMsg);
-        exit(85);
+        return 85;
     }
 
     for (i=1; i<=DoF; i++)  if (r[i]) q[i] = 0; else q[i] = 1;
 
-    return;
+    return 0;
+}
+
+
+/*------------------------------------------------------------------------------
+COUNT_LOADS  -  the number of rows of each load table of a load case:  the
+uniformly distributed, trapezoidal, element point and temperature loads, and
+the fixed end forces, one row for each of these loads and, with gravity, one
+for each frame element.  Negative counts are left to read_and_assemble_loads()
+------------------------------------------------------------------------------*/
+void count_loads ( LoadCase *lcase, int nE,
+        int *nU, int *nW, int *nP, int *nT, int *nFE ){
+
+    *nU = lcase->uniformLoads.nU > 0 ? lcase->uniformLoads.nU : 0;
+    *nW = lcase->trapezoidalLoads.nW > 0 ? lcase->trapezoidalLoads.nW : 0;
+    *nP = lcase->elementLoads.nP > 0 ? lcase->elementLoads.nP : 0;
+    *nT = lcase->temperatureLoads.nT > 0 ? lcase->temperatureLoads.nT : 0;
+
+    *nFE = *nU + *nW + *nP + *nT;
+    if ( lcase->gx != 0 || lcase->gy != 0 || lcase->gz != 0 )   *nFE += nE;
 }
 
 
 /*------------------------------------------------------------------------------
 READ_AND_ASSEMBLE_LOADS  -
 read load information data, assemble un-restrained load vectors
+of load cases lc1 to lc2 (of nL); the load arrays are indexed by load case
 09 Sep 2008
 ------------------------------------------------------------------------------*/
-void read_and_assemble_loads (
+int read_and_assemble_loads (
         LoadCase* loadcases,
-        int nN, int nE, int nL, int DoF,
+        int nN, int nE, int nL, int lc1, int lc2, int DoF,
         vec3 *xyz,
         double *L, double *Le,
         int *J1, int *J2,
@@ -341,7 +382,7 @@ void read_and_assemble_loads (
         double **Q,
         double **F_temp, double **F_mech, double **Fo,
         float ***U, float ***W, float ***P, float ***T, float **Dp,
-        double ***feF_mech, double ***feF_temp,
+        double ***feF,
         int verbose){
 
     float   hy, hz;         /* section dimensions in local coords */
@@ -354,7 +395,8 @@ void read_and_assemble_loads (
         Ksy, Ksz,       /* shear deformatn coefficients */
         a, b,           /* point load locations */
         t1, t2, t3, t4, t5, t6, t7, t8, t9; /* 3D coord Xfrm coeffs */
-    int i,j,l, lc, n, n1, n2;
+    double  *fe;            /* fixed end forces of a load */
+    int i,j,l, lc, n, n1, n2, k;
     char errMsg[MAXL];
     LoadCase lcase;
     PointLoads pL;
@@ -365,19 +407,15 @@ void read_and_assemble_loads (
     PrescribedDisplacements pD;
 
     for (j=1; j<=DoF; j++)
-        for (lc=1; lc <= nL; lc++)
+        for (lc=lc1; lc <= lc2; lc++)
             Fo[lc][j] = F_temp[lc][j] = F_mech[lc][j] = 0.0;
-    for (i=1; i<=12; i++)
-        for (n=1; n<=nE; n++)
-            for (lc=1; lc <= nL; lc++)
-                feF_mech[lc][n][i] = feF_temp[lc][n][i] = 0.0;
 
-    for (i=1; i<=DoF; i++)  for (lc=1; lc<=nL; lc++) Dp[lc][i] = 0.0;
+    for (i=1; i<=DoF; i++)  for (lc=lc1; lc<=lc2; lc++) Dp[lc][i] = 0.0;
 
     for (i=1;i<=nE;i++) for(j=1;j<=12;j++)  Q[i][j] = 0.0;
 
 
-    for (lc = 1; lc <= nL; lc++) {      /* begin load-case loop */
+    for (lc = lc1; lc <= lc2; lc++) {      /* begin load-case loop */
 
         lcase = loadcases[lc-1];
         pL = lcase.pointLoads;
@@ -401,33 +439,37 @@ void read_and_assemble_loads (
         gY[lc] = lcase.gy;
         gZ[lc] = lcase.gz;
 
-        for (n=1; n<=nE; n++) {
+        k = 0;          /* rows of feF[lc], one for each load */
+        if ( gX[lc] != 0 || gY[lc] != 0 || gZ[lc] != 0 ) for (n=1; n<=nE; n++) {
 
             n1 = J1[n]; n2 = J2[n];
 
             coord_trans ( xyz, L[n], n1, n2,
                 &t1, &t2, &t3, &t4, &t5, &t6, &t7, &t8, &t9, p[n] );
 
-            feF_mech[lc][n][1]  = d[n]*Ax[n]*L[n]*gX[lc] / 2.0;
-            feF_mech[lc][n][2]  = d[n]*Ax[n]*L[n]*gY[lc] / 2.0;
-            feF_mech[lc][n][3]  = d[n]*Ax[n]*L[n]*gZ[lc] / 2.0;
+            fe = feF[lc][++k];
+            fe[0] = n;
+
+            fe[1]  = d[n]*Ax[n]*L[n]*gX[lc] / 2.0;
+            fe[2]  = d[n]*Ax[n]*L[n]*gY[lc] / 2.0;
+            fe[3]  = d[n]*Ax[n]*L[n]*gZ[lc] / 2.0;
 
-            feF_mech[lc][n][4]  = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
+            fe[4]  = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
                 ( (-t4*t8+t5*t7)*gY[lc] + (-t4*t9+t6*t7)*gZ[lc] );
-            feF_mech[lc][n][5]  = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
+            fe[5]  = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
                 ( (-t5*t7+t4*t8)*gX[lc] + (-t5*t9+t6*t8)*gZ[lc] );
-            feF_mech[lc][n][6]  = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
+            fe[6]  = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
                 ( (-t6*t7+t4*t9)*gX[lc] + (-t6*t8+t5*t9)*gY[lc] );
 
-            feF_mech[lc][n][7]  = d[n]*Ax[n]*L[n]*gX[lc] / 2.0;
-            feF_mech[lc][n][8]  = d[n]*Ax[n]*L[n]*gY[lc] / 2.0;
-            feF_mech[lc][n][9]  = d[n]*Ax[n]*L[n]*gZ[lc] / 2.0;
+            fe[7]  = d[n]*Ax[n]*L[n]*gX[lc] / 2.0;
+            fe[8]  = d[n]*Ax[n]*L[n]*gY[lc] / 2.0;
+            fe[9]  = d[n]*Ax[n]*L[n]*gZ[lc] / 2.0;
 
-            feF_mech[lc][n][10] = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
+            fe[10] = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
                 ( ( t4*t8-t5*t7)*gY[lc] + ( t4*t9-t6*t7)*gZ[lc] );
-            feF_mech[lc][n][11] = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
+            fe[11] = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
                 ( ( t5*t7-t4*t8)*gX[lc] + ( t5*t9-t6*t8)*gZ[lc] );
-            feF_mech[lc][n][12] = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
+            fe[12] = d[n]*Ax[n]*L[n]*L[n] / 12.0 *
                 ( ( t6*t7-t4*t9)*gX[lc] + ( t6*t8-t5*t9)*gY[lc] );
 
         }                 /* end gravity loads */
@@ -443,7 +485,7 @@ void read_and_assemble_loads (
             if ( j < 1 || j > nN ) {
                 sprintf(errMsg,"\n  error in node load data: node number out of range ... Node : %d\n   Perhaps you did not specify %d node loads \n  or perhaps the Input Data file is missing expected data.\n", j, nF[lc] );
                 errorMsg(errMsg);
-                exit(121);
+                return 121;
             }
 
             F_mech[lc][6*j-5] = pL.Fx[i-1];
@@ -469,14 +511,14 @@ void read_and_assemble_loads (
             fprintf(stderr," nU = %3d\n", nU[lc]);
             sprintf(errMsg,"\n  error: valid ranges for nU is 0 ... %d \n", nE );
             errorMsg(errMsg);
-            exit(131);
+            return 131;
         }
         for (i=1; i <= nU[lc]; i++) { /* ! local element coordinates ! */
             n = uL.EL[i-1];
             if ( n < 1 || n > nE ) {
                 sprintf(errMsg,"\n  error in uniform distributed loads: element number %d is out of range\n",n);
                 errorMsg(errMsg);
-                exit(132);
+                return 132;
             }
             U[lc][i][1] = (double) n;
             U[lc][i][2] = uL.Ux[i-1];
@@ -500,19 +542,21 @@ void read_and_assemble_loads (
 
 
             /* {F} = [T]'{Q} */
-            feF_mech[lc][n][1]  += ( Nx1*t1 + Vy1*t4 + Vz1*t7 );
-            feF_mech[lc][n][2]  += ( Nx1*t2 + Vy1*t5 + Vz1*t8 );
-            feF_mech[lc][n][3]  += ( Nx1*t3 + Vy1*t6 + Vz1*t9 );
-            feF_mech[lc][n][4]  += ( Mx1*t1 + My1*t4 + Mz1*t7 );
-            feF_mech[lc][n][5]  += ( Mx1*t2 + My1*t5 + Mz1*t8 );
-            feF_mech[lc][n][6]  += ( Mx1*t3 + My1*t6 + Mz1*t9 );
-
-            feF_mech[lc][n][7]  += ( Nx2*t1 + Vy2*t4 + Vz2*t7 );
-            feF_mech[lc][n][8]  += ( Nx2*t2 + Vy2*t5 + Vz2*t8 );
-            feF_mech[lc][n][9]  += ( Nx2*t3 + Vy2*t6 + Vz2*t9 );
-            feF_mech[lc][n][10] += ( Mx2*t1 + My2*t4 + Mz2*t7 );
-            feF_mech[lc][n][11] += ( Mx2*t2 + My2*t5 + Mz2*t8 );
-            feF_mech[lc][n][12] += ( Mx2*t3 + My2*t6 + Mz2*t9 );
+            fe = feF[lc][++k];
+            fe[0] = n;
+            fe[1]  = ( Nx1*t1 + Vy1*t4 + Vz1*t7 );
+            fe[2]  = ( Nx1*t2 + Vy1*t5 + Vz1*t8 );
+            fe[3]  = ( Nx1*t3 + Vy1*t6 + Vz1*t9 );
+            fe[4]  = ( Mx1*t1 + My1*t4 + Mz1*t7 );
+            fe[5]  = ( Mx1*t2 + My1*t5 + Mz1*t8 );
+            fe[6]  = ( Mx1*t3 + My1*t6 + Mz1*t9 );
+
+            fe[7]  = ( Nx2*t1 + Vy2*t4 + Vz2*t7 );
+            fe[8]  = ( Nx2*t2 + Vy2*t5 + Vz2*t8 );
+            fe[9]  = ( Nx2*t3 + Vy2*t6 + Vz2*t9 );
+            fe[10] = ( Mx2*t1 + My2*t4 + Mz2*t7 );
+            fe[11] = ( Mx2*t2 + My2*t5 + Mz2*t8 );
+            fe[12] = ( Mx2*t3 + My2*t6 + Mz2*t9 );
 
         }             /* end uniformly distributed loads */
 
@@ -525,14 +569,14 @@ void read_and_assemble_loads (
         if ( nW[lc] < 0 || nW[lc] > 10*nE ) {
             sprintf(errMsg,"\n  error: valid ranges for nW is 0 ... %d \n", 10*nE );
             errorMsg(errMsg);
-            exit(140);
+            return 140;
         }
         for (i=1; i <= nW[lc]; i++) { /* ! local element coordinates ! */
             n = tL.EL[i-1];
             if ( n < 1 || n > nE ) {
                 sprintf(errMsg,"\n  error in trapezoidally-distributed loads: element number %d is out of range\n",n);
                 errorMsg(errMsg);
-                exit(141);
+                return 141;
             }
             W[lc][i][1] = (double) n;
             W[lc][i][2] = tL.xx1[i-1];
@@ -563,54 +607,54 @@ void read_and_assemble_loads (
               sprintf(errMsg,"\n   error in x-axis trapezoidal loads, load case: %d , element %d , load %d\n  starting location = %f < 0\n",
               lc, n, i , W[lc][i][2]);
               errorMsg(errMsg);
-              exit(142);
+              return 142;
             }
             if ( W[lc][i][ 2] > W[lc][i][3] ) {
               sprintf(errMsg,"\n   error in x-axis trapezoidal loads, load case: %d , element %d , load %d\n  starting location = %f > ending location = %f \n",
               lc, n, i , W[lc][i][2], W[lc][i][3] );
               errorMsg(errMsg);
-              exit(143);
+              return 143;
             }
             if ( W[lc][i][ 3] > Ln ) {
               sprintf(errMsg,"\n   error in x-axis trapezoidal loads, load case: %d , element %d , load %d\n ending location = %f > L (%f) \n",
               lc, n, i, W[lc][i][3], Ln );
               errorMsg(errMsg);
-              exit(144);
+              return 144;
             }
             if ( W[lc][i][ 6] < 0 ) {
               sprintf(errMsg,"\n   error in y-axis trapezoidal loads, load case: %d , element %d , load %d\n starting location = %f < 0\n",
               lc, n, i, W[lc][i][6]);
               errorMsg(errMsg);
-              exit(142);
+              return 142;
             }
             if ( W[lc][i][ 6] > W[lc][i][7] ) {
               sprintf(errMsg,"\n   error in y-axis trapezoidal loads, load case: %d , element %d , load %d\n starting location = %f > ending location = %f \n",
               lc, n, i, W[lc][i][6], W[lc][i][7] );
               errorMsg(errMsg);
-              exit(143);
+              return 143;
             }
             if ( W[lc][i][ 7] > Ln ) {
               sprintf(errMsg,"\n   error in y-axis trapezoidal loads, load case: %d , element %d , load %d\n ending location = %f > L (%f) \n",
               lc, n, i, W[lc][i][7],Ln );
               errorMsg(errMsg);
-              exit(144);
+              return 144;
             }
             if ( W[lc][i][10] < 0 ) {
               sprintf(errMsg,"\n   error in z-axis trapezoidal loads, load case: %d , element %d , load %d\n starting location = %f < 0\n",
               lc, n, i, W[lc][i][10]);
               errorMsg(errMsg);
-              exit(142);
+              return 142;
             }
             if ( W[lc][i][10] > W[lc][i][11] ) {
               sprintf(errMsg,"\n   error in z-axis trapezoidal loads, load case: %d , element %d , load %d\n starting location = %f > ending location = %f \n",
               lc, n, i, W[lc][i][10], W[lc][i][11] );
               errorMsg(errMsg);
-              exit(143);
+              return 143;
             }
             if ( W[lc][i][11] > Ln ) {
               sprintf(errMsg,"\n   error in z-axis trapezoidal loads, load case: %d , element %d , load %d\n ending location = %f > L (%f) \n",lc, n, i, W[lc][i][11], Ln );
               errorMsg(errMsg);
-              exit(144);
+              return 144;
             }
 
             if ( shear ) {
@@ -686,19 +730,21 @@ void read_and_assemble_loads (
 
 
             /* {F} = [T]'{Q} */
-            feF_mech[lc][n][1]  += ( Nx1*t1 + Vy1*t4 + Vz1*t7 );
-            feF_mech[lc][n][2]  += ( Nx1*t2 + Vy1*t5 + Vz1*t8 );
-            feF_mech[lc][n][3]  += ( Nx1*t3 + Vy1*t6 + Vz1*t9 );
-            feF_mech[lc][n][4]  += ( Mx1*t1 + My1*t4 + Mz1*t7 );
-            feF_mech[lc][n][5]  += ( Mx1*t2 + My1*t5 + Mz1*t8 );
-            feF_mech[lc][n][6]  += ( Mx1*t3 + My1*t6 + Mz1*t9 );
-
-            feF_mech[lc][n][7]  += ( Nx2*t1 + Vy2*t4 + Vz2*t7 );
-            feF_mech[lc][n][8]  += ( Nx2*t2 + Vy2*t5 + Vz2*t8 );
-            feF_mech[lc][n][9]  += ( Nx2*t3 + Vy2*t6 + Vz2*t9 );
-            feF_mech[lc][n][10] += ( Mx2*t1 + My2*t4 + Mz2*t7 );
-            feF_mech[lc][n][11] += ( Mx2*t2 + My2*t5 + Mz2*t8 );
-            feF_mech[lc][n][12] += ( Mx2*t3 + My2*t6 + Mz2*t9 );
+            fe = feF[lc][++k];
+            fe[0] = n;
+            fe[1]  = ( Nx1*t1 + Vy1*t4 + Vz1*t7 );
+            fe[2]  = ( Nx1*t2 + Vy1*t5 + Vz1*t8 );
+            fe[3]  = ( Nx1*t3 + Vy1*t6 + Vz1*t9 );
+            fe[4]  = ( Mx1*t1 + My1*t4 + Mz1*t7 );
+            fe[5]  = ( Mx1*t2 + My1*t5 + Mz1*t8 );
+            fe[6]  = ( Mx1*t3 + My1*t6 + Mz1*t9 );
+
+            fe[7]  = ( Nx2*t1 + Vy2*t4 + Vz2*t7 );
+            fe[8]  = ( Nx2*t2 + Vy2*t5 + Vz2*t8 );
+            fe[9]  = ( Nx2*t3 + Vy2*t6 + Vz2*t9 );
+            fe[10] = ( Mx2*t1 + My2*t4 + Mz2*t7 );
+            fe[11] = ( Mx2*t2 + My2*t5 + Mz2*t8 );
+            fe[12] = ( Mx2*t3 + My2*t6 + Mz2*t9 );
 
         }         /* end trapezoidally distributed loads */
 
@@ -714,14 +760,14 @@ void read_and_assemble_loads (
             fprintf(stderr," nP = %3d\n", nP[lc]);
             sprintf(errMsg,"\n  error: valid ranges for nP is 0 ... %d \n", 10*nE );
             errorMsg(errMsg);
-            exit(150);
+            return 150;
         }
         for (i=1; i <= nP[lc]; i++) { /* ! local element coordinates ! */
             n = eL.EL[i-1];
             if ( n < 1 || n > nE ) {
                 sprintf(errMsg,"\n   error in internal point loads: frame element number %d is out of range\n",n);
                 errorMsg(errMsg);
-                exit(151);
+                return 151;
             }
             P[lc][i][1] = (double) n;
             P[lc][i][2] = eL.Px[i-1];
@@ -735,7 +781,7 @@ void read_and_assemble_loads (
                 sprintf(errMsg,"\n  error in point load data: Point load coord. out of range\n   Frame element number: %d  L: %lf  load coord.: %lf\n",
                 n, L[n], P[lc][i][5] );
                 errorMsg(errMsg);
-                exit(152);
+                return 152;
             }
 
             if ( shear ) {
@@ -776,19 +822,21 @@ void read_and_assemble_loads (
                 &t1, &t2, &t3, &t4, &t5, &t6, &t7, &t8, &t9, p[n] );
 
             /* {F} = [T]'{Q} */
-            feF_mech[lc][n][1]  += ( Nx1*t1 + Vy1*t4 + Vz1*t7 );
-            feF_mech[lc][n][2]  += ( Nx1*t2 + Vy1*t5 + Vz1*t8 );
-            feF_mech[lc][n][3]  += ( Nx1*t3 + Vy1*t6 + Vz1*t9 );
-            feF_mech[lc][n][4]  += ( Mx1*t1 + My1*t4 + Mz1*t7 );
-            feF_mech[lc][n][5]  += ( Mx1*t2 + My1*t5 + Mz1*t8 );
-            feF_mech[lc][n][6]  += ( Mx1*t3 + My1*t6 + Mz1*t9 );
-
-            feF_mech[lc][n][7]  += ( Nx2*t1 + Vy2*t4 + Vz2*t7 );
-            feF_mech[lc][n][8]  += ( Nx2*t2 + Vy2*t5 + Vz2*t8 );
-            feF_mech[lc][n][9]  += ( Nx2*t3 + Vy2*t6 + Vz2*t9 );
-            feF_mech[lc][n][10] += ( Mx2*t1 + My2*t4 + Mz2*t7 );
-            feF_mech[lc][n][11] += ( Mx2*t2 + My2*t5 + Mz2*t8 );
-            feF_mech[lc][n][12] += ( Mx2*t3 + My2*t6 + Mz2*t9 );
+            fe = feF[lc][++k];
+            fe[0] = n;
+            fe[1]  = ( Nx1*t1 + Vy1*t4 + Vz1*t7 );
+            fe[2]  = ( Nx1*t2 + Vy1*t5 + Vz1*t8 );
+            fe[3]  = ( Nx1*t3 + Vy1*t6 + Vz1*t9 );
+            fe[4]  = ( Mx1*t1 + My1*t4 + Mz1*t7 );
+            fe[5]  = ( Mx1*t2 + My1*t5 + Mz1*t8 );
+            fe[6]  = ( Mx1*t3 + My1*t6 + Mz1*t9 );
+
+            fe[7]  = ( Nx2*t1 + Vy2*t4 + Vz2*t7 );
+            fe[8]  = ( Nx2*t2 + Vy2*t5 + Vz2*t8 );
+            fe[9]  = ( Nx2*t3 + Vy2*t6 + Vz2*t9 );
+            fe[10] = ( Mx2*t1 + My2*t4 + Mz2*t7 );
+            fe[11] = ( Mx2*t2 + My2*t5 + Mz2*t8 );
+            fe[12] = ( Mx2*t3 + My2*t6 + Mz2*t9 );
         }                 /* end element point loads */
 
         /* thermal loads    */
@@ -803,14 +851,14 @@ void read_and_assemble_loads (
             fprintf(stderr," nT = %3d\n", nT[lc] );
             sprintf(errMsg,"\n  error: valid ranges for nT is 0 ... %d \n", nE );
             errorMsg(errMsg);
-            exit(160);
+            return 160;
         }
         for (i=1; i <= nT[lc]; i++) { /* ! local element coordinates ! */
             n = tempL.EL[i-1];
             if ( n < 1 || n > nE ) {
                 sprintf(errMsg,"\n  error in temperature loads: frame element number %d is out of range\n",n);
                 errorMsg(errMsg);
-                exit(161);
+                return 161;
             }
             T[lc][i][1] = (double) n;
             T[lc][i][2] = tempL.a[i-1];
@@ -828,7 +876,7 @@ void read_and_assemble_loads (
             if ( hy < 0 || hz < 0 ) {
                 sprintf(errMsg,"\n  error in thermal load data: section dimension < 0\n   Frame element number: %d  hy: %f  hz: %f\n", n,hy,hz);
                 errorMsg(errMsg);
-                exit(162);
+                return 162;
             }
 
             Nx2 = (a/4.0)*( T[lc][i][5]+T[lc][i][6]+T[lc][i][7]+T[lc][i][8])*E[n]*Ax[n];
@@ -846,28 +894,34 @@ void read_and_assemble_loads (
                 &t1, &t2, &t3, &t4, &t5, &t6, &t7, &t8, &t9, p[n] );
 
             /* {F} = [T]'{Q} */
-            feF_temp[lc][n][1]  += ( Nx1*t1 + Vy1*t4 + Vz1*t7 );
-            feF_temp[lc][n][2]  += ( Nx1*t2 + Vy1*t5 + Vz1*t8 );
-            feF_temp[lc][n][3]  += ( Nx1*t3 + Vy1*t6 + Vz1*t9 );
-            feF_temp[lc][n][4]  += ( Mx1*t1 + My1*t4 + Mz1*t7 );
-            feF_temp[lc][n][5]  += ( Mx1*t2 + My1*t5 + Mz1*t8 );
-            feF_temp[lc][n][6]  += ( Mx1*t3 + My1*t6 + Mz1*t9 );
-
-            feF_temp[lc][n][7]  += ( Nx2*t1 + Vy2*t4 + Vz2*t7 );
-            feF_temp[lc][n][8]  += ( Nx2*t2 + Vy2*t5 + Vz2*t8 );
-            feF_temp[lc][n][9]  += ( Nx2*t3 + Vy2*t6 + Vz2*t9 );
-            feF_temp[lc][n][10] += ( Mx2*t1 + My2*t4 + Mz2*t7 );
-            feF_temp[lc][n][11] += ( Mx2*t2 + My2*t5 + Mz2*t8 );
-            feF_temp[lc][n][12] += ( Mx2*t3 + My2*t6 + Mz2*t9 );
+            fe = feF[lc][++k];
+            fe[0] = n;
+            fe[1]  = ( Nx1*t1 + Vy1*t4 + Vz1*t7 );
+            fe[2]  = ( Nx1*t2 + Vy1*t5 + Vz1*t8 );
+            fe[3]  = ( Nx1*t3 + Vy1*t6 + Vz1*t9 );
+            fe[4]  = ( Mx1*t1 + My1*t4 + Mz1*t7 );
+            fe[5]  = ( Mx1*t2 + My1*t5 + Mz1*t8 );
+            fe[6]  = ( Mx1*t3 + My1*t6 + Mz1*t9 );
+
+            fe[7]  = ( Nx2*t1 + Vy2*t4 + Vz2*t7 );
+            fe[8]  = ( Nx2*t2 + Vy2*t5 + Vz2*t8 );
+            fe[9]  = ( Nx2*t3 + Vy2*t6 + Vz2*t9 );
+            fe[10] = ( Mx2*t1 + My2*t4 + Mz2*t7 );
+            fe[11] = ( Mx2*t2 + My2*t5 + Mz2*t8 );
+            fe[12] = ( Mx2*t3 + My2*t6 + Mz2*t9 );
         }             /* end thermal loads    */
 
 
-        for (n=1; n<=nE; n++) {
-            n1 = J1[n];    n2 = J2[n];
-            for (i=1; i<= 6; i++) F_mech[lc][6*n1- 6+i] += feF_mech[lc][n][i];
-            for (i=7; i<=12; i++) F_mech[lc][6*n2-12+i] += feF_mech[lc][n][i];
-            for (i=1; i<= 6; i++) F_temp[lc][6*n1- 6+i] += feF_temp[lc][n][i];
-            for (i=7; i<=12; i++) F_temp[lc][6*n2-12+i] += feF_temp[lc][n][i];
+        for (j=1; j<=k; j++) { /* the temperature loads are the last nT rows */
+            fe = feF[lc][j];
+            n1 = J1[(int) fe[0]];    n2 = J2[(int) fe[0]];
+            if ( j <= k - nT[lc] ) {
+                for (i=1; i<= 6; i++) F_mech[lc][6*n1- 6+i] += fe[i];
+                for (i=7; i<=12; i++) F_mech[lc][6*n2-12+i] += fe[i];
+            } else {
+                for (i=1; i<= 6; i++) F_temp[lc][6*n1- 6+i] += fe[i];
+                for (i=7; i<=12; i++) F_temp[lc][6*n2-12+i] += fe[i];
+            }
         }
 
         nD[lc] = pD.nD;
@@ -890,14 +944,14 @@ void read_and_assemble_loads (
                     sprintf(errMsg," Initial displacements can be prescribed only at restrained coordinates\n  node: %d  dof: %d  r: %d\n",
                     j, 6-l, r[6*j-l] );
                     errorMsg(errMsg);
-                    exit(171);
+                    return 171;
                 }
             }
         }
 
     }                   /* end load-case loop */
 
-    return;
+    return 0;
 }
 
 
@@ -905,7 +959,7 @@ void read_and_assemble_loads (
 READ_MASS_DATA  -  read element densities and extra inertial mass data
 Oct 31, 2013
 ------------------------------------------------------------------------------*/
-void read_mass_data (
+int read_mass_data (
         DynamicData *dynamic, ExtraInertia *extraInertia, ExtraMass *extraMass,
         int nN, int nE, int *nI, int *nX,
         float *d, float *EMs,
@@ -946,7 +1000,7 @@ void read_mass_data (
             *struct_mass += d[b]*Ax[b]*L[b];
         }
 
-        return;
+        return 0;
     }
 
     *Mmethod = dynamic->Mmethod;
@@ -956,6 +1010,7 @@ void read_mass_data (
         dots(stdout,30);    fprintf(stdout," %3d ",*Mmethod);
         if ( *Mmethod == 1 ) fprintf(stdout," (Subspace-Jacobi)\n");
         if ( *Mmethod == 2 ) fprintf(stdout," (Stodola)\n");
+        if ( *Mmethod == 3 ) fprintf(stdout," (Lanczos)\n");
     }
 
     *lump = dynamic->lump;
@@ -988,7 +1043,7 @@ void read_mass_data (
                 sprintf(errMsg,"\n  error in node mass data: node number out of range    Node : %d  \n   Perhaps you did not specify %d extra masses \n   or perhaps the Input Data file is missing expected data.\n",
             jnt, *nI );
             errorMsg(errMsg);
-            exit(86);
+            return 86;
         }
         NMs[jnt] = extraInertia->EMs[j-1];
         NMx[jnt] = extraInertia->EMx[j-1];
@@ -1024,7 +1079,7 @@ void read_mass_data (
             sprintf(errMsg,"\n  error in element mass data: element number out of range   Element: %d  \n   Perhaps you did not specify %d extra masses \n   or perhaps the Input Data file is missing expected data.\n",
             b, *nX );
             errorMsg(errMsg);
-            exit(87);
+            return 87;
         }
         EMs[b] = extraMass->EMs[m-1];
     }
@@ -1041,7 +1096,7 @@ void read_mass_data (
         if ( d[m] < 0.0 || EMs[m] < 0.0 || d[m]+EMs[m] <= 0.0 ) {
         sprintf(errMsg,"\n  error: Non-positive mass or density\n  d[%d]= %f  EMs[%d]= %f\n",m,d[m],m,EMs[m]);
         errorMsg(errMsg);
-        exit(88);
+        return 88;
         }
     }
 
@@ -1092,7 +1147,7 @@ void read_mass_data (
     // strcat(mode_file,"-m");
     // output_path(mode_file,modepath,FRAME3DD_PATHMAX,NULL);
 
-    return;
+    return 0;
 }
 
 
@@ -1100,7 +1155,7 @@ void read_mass_data (
 READ_CONDENSE   -  read matrix condensation information
 Oct 31, 2013
 ------------------------------------------------------------------------------*/
-void read_condensation_data (
+int read_condensation_data (
         Condensation *condensation,
         int nN, int nM,
         int *nC, int *Cdof,
@@ -1115,7 +1170,7 @@ void read_condensation_data (
 
     if ( *Cmethod <= 0 )  {
         *Cmethod = *nC = *Cdof = 0;
-        return;
+        return 0;
     }
 
     if ( *Cmethod > 3 ) *Cmethod = 1;   /* default */
@@ -1138,7 +1193,7 @@ void read_condensation_data (
         sprintf(errMsg,"\n  error in matrix condensation data: \n error: nC > nN ... nC=%d; nN=%d;\n The number of nodes with condensed DoF's may not exceed the total number of nodes.\n",
         *nC, nN );
         errorMsg(errMsg);
-        exit(90);
+        return 90;
     }
 
     cm = imatrix( 1, *nC, 1,7 );
@@ -1154,7 +1209,8 @@ void read_condensation_data (
         if ( cm[i][1] < 1 || cm[i][1] > nN ) {     /* error check */
             sprintf(errMsg,"\n  error in matrix condensation data: \n  condensed node number out of range\n  cj[%d] = %d  ... nN = %d  \n", i, cm[i][1], nN );
             errorMsg(errMsg);
-            exit(91);
+            free_imatrix(cm,1, *nC, 1,7);
+            return 91;
         }
     }
 
@@ -1176,12 +1232,79 @@ void read_condensation_data (
             sprintf(errMsg,"\n  error in matrix condensation data: \n  m[%d] = %d \n The condensed mode number must be between   1 and %d (modes).\n",
             i, m[i], nM );
             errorMsg(errMsg);
-            exit(92);
+            free_imatrix(cm,1, *nC, 1,7);
+            return 92;
         }
     }
 
     free_imatrix(cm,1, *nC, 1,7);
-    return;
+    return 0;
+}
+
+
+/*------------------------------------------------------------------------------
+READ_SOLVER_DATA  -  read options controlling the solution of the equations
+------------------------------------------------------------------------------*/
+int read_solver_data (SolverData *solver, int *storage, int *reorder, int *block,
+        int *backend, int *nlmethod, double *nltol, int *nlmaxit, int *nlrefactor,
+        size_t *blockbytes){
+
+    *storage = solver->storage;
+    *reorder = solver->reorder;
+    *block = solver->block;
+    *backend = solver->backend;
+    *nlmethod = solver->nlmethod;
+    *nltol = solver->nltol;
+    *nlmaxit = solver->nlmaxit;
+    *nlrefactor = solver->nlrefactor;
+    if ( solver->blockbytes > 0 )   *blockbytes = (size_t) solver->blockbytes;
+
+    if (*storage != 0 && *storage != 1) {
+        errorMsg(" Remember to specify the stiffness matrix storage with a 0 (dense) or a 1 (skyline).\n");
+        return 75;
+    }
+
+    if (*reorder != 0 && *reorder != 1) {
+        errorMsg(" Remember to specify node reordering with a 0 or a 1.\n");
+        return 76;
+    }
+
+    if (*block != 0 && *block != 1) {
+        errorMsg(" Remember to specify the blocked load case solution with a 0 or a 1.\n");
+        return 77;
+    }
+
+    if (*backend != 0 && *backend != 1) {
+        errorMsg(" Remember to specify the solver backend with a 0 (native) or a 1 (LAPACK).\n");
+        return 78;
+    }
+
+    if (*backend == 1 && !lapack_available()) {
+        errorMsg(" The LAPACK solver backend was selected but the LAPACK routines were not provided.\n");
+        return 79;
+    }
+
+    if (*nlmethod < 0 || *nlmethod > 2) {
+        errorMsg(" Remember to specify the nonlinear solution method with a 0 (Newton), 1 (modified Newton), or 2 (Broyden).\n");
+        return 95;
+    }
+
+    if (*nltol <= 0.0) {
+        errorMsg(" The nonlinear equilibrium tolerance must be positive.\n");
+        return 96;
+    }
+
+    if (*nlmaxit < 1) {
+        errorMsg(" The maximum number of nonlinear iterations must be at least 1.\n");
+        return 97;
+    }
+
+    if (*nlrefactor < 1) {
+        errorMsg(" The number of nonlinear iterations between factorizations must be at least 1.\n");
+        return 98;
+    }
+
+    return 0;
 }
 
 
@@ -1191,6 +1314,7 @@ Oct 31, 2013
 ------------------------------------------------------------------------------*/
 void write_static_results (
         Displacements* displacements, Forces* forces, ReactionForces* reactionForces,
+        OutputData *output,
         Reactions* reactions, int nR,
         int nN, int nE, int nL, int lc, int DoF,
         int *J1, int *J2,
@@ -1198,7 +1322,10 @@ void write_static_results (
         double err, int ok){
 
     // double  disp;
-    int i,j,n,k;
+    int i,j,n,k,
+        nD = output ? output->nD : nN, // selected nodes and elements
+        nQ = output ? output->nQ : nE,
+        nRo = output ? output->nR : nR;
     char errMsg[MAXL];
     double vals[6];
 
@@ -1211,42 +1338,44 @@ void write_static_results (
         errorMsg(errMsg);
     }
 
-    for (j=1; j<= nN; j++) {
-        displacements[lc-1].node[j-1] = j;
-        displacements[lc-1].x[j-1] = D[6*j-5];
-        displacements[lc-1].y[j-1] = D[6*j-4];
-        displacements[lc-1].z[j-1] = D[6*j-3];
-        displacements[lc-1].xrot[j-1] = D[6*j-2];
-        displacements[lc-1].yrot[j-1] = D[6*j-1];
-        displacements[lc-1].zrot[j-1] = D[6*j];
+    for (k=1; k<= nD; k++) {
+        j = output ? output->Dnode[k-1] : k;  // node number
+        displacements[lc-1].node[k-1] = j;
+        displacements[lc-1].x[k-1] = D[6*j-5];
+        displacements[lc-1].y[k-1] = D[6*j-4];
+        displacements[lc-1].z[k-1] = D[6*j-3];
+        displacements[lc-1].xrot[k-1] = D[6*j-2];
+        displacements[lc-1].yrot[k-1] = D[6*j-1];
+        displacements[lc-1].zrot[k-1] = D[6*j];
     }
 
 
-    for (n=1; n<= nE; n++) {
-        forces[lc-1].element[2*n-2] = n;
-        forces[lc-1].node[2*n-2] = J1[n];
-        forces[lc-1].Nx[2*n-2] = Q[n][1];
-        forces[lc-1].Vy[2*n-2] = Q[n][2];
-        forces[lc-1].Vz[2*n-2] = Q[n][3];
-        forces[lc-1].Txx[2*n-2] = Q[n][4];
-        forces[lc-1].Myy[2*n-2] = Q[n][5];
-        forces[lc-1].Mzz[2*n-2] = Q[n][6];
-
-        forces[lc-1].element[2*n-1] = n;
-        forces[lc-1].node[2*n-1] = J2[n];
-        forces[lc-1].Nx[2*n-1] = Q[n][7];
-        forces[lc-1].Vy[2*n-1] = Q[n][8];
-        forces[lc-1].Vz[2*n-1] = Q[n][9];
-        forces[lc-1].Txx[2*n-1] = Q[n][10];
-        forces[lc-1].Myy[2*n-1] = Q[n][11];
-        forces[lc-1].Mzz[2*n-1] = Q[n][12];
+    for (k=1; k<= nQ; k++) {
+        n = output ? output->Qelement[k-1] : k;  // element number
+        forces[lc-1].element[2*k-2] = n;
+        forces[lc-1].node[2*k-2] = J1[n];
+        forces[lc-1].Nx[2*k-2] = Q[n][1];
+        forces[lc-1].Vy[2*k-2] = Q[n][2];
+        forces[lc-1].Vz[2*k-2] = Q[n][3];
+        forces[lc-1].Txx[2*k-2] = Q[n][4];
+        forces[lc-1].Myy[2*k-2] = Q[n][5];
+        forces[lc-1].Mzz[2*k-2] = Q[n][6];
+
+        forces[lc-1].element[2*k-1] = n;
+        forces[lc-1].node[2*k-1] = J2[n];
+        forces[lc-1].Nx[2*k-1] = Q[n][7];
+        forces[lc-1].Vy[2*k-1] = Q[n][8];
+        forces[lc-1].Vz[2*k-1] = Q[n][9];
+        forces[lc-1].Txx[2*k-1] = Q[n][10];
+        forces[lc-1].Myy[2*k-1] = Q[n][11];
+        forces[lc-1].Mzz[2*k-1] = Q[n][12];
 
     }
 
 
 
-    for (k=1; k<=nR; k++) {  // iteration through reactions
-        j = reactions->N[k-1];  // node number
+    for (k=1; k<=nRo; k++) {  // iteration through reactions
+        j = output ? output->Rnode[k-1] : reactions->N[k-1];  // node number
         reactionForces[lc-1].node[k-1] = j;
 
         for (i=5; i>=0; i--) {
@@ -1291,6 +1420,27 @@ void write_static_results (
 
 
 
+/*------------------------------------------------------------------------------
+LOAD_INDEX - list the loads of a load case element by element:  the loads of
+element n are list[start[n] .. start[n+1]-1], with X[i][1] the element of load i
+------------------------------------------------------------------------------*/
+void load_index ( int nE, int nl, float **X, int *start, int *list ){
+
+    int i, n;
+
+    for (n=1; n<=nE+1; n++) start[n] = 0;
+    for (i=1; i<=nl; i++)   ++start[(int) X[i][1] + 1];
+    start[1] = 1;
+    for (n=2; n<=nE+1; n++) start[n] += start[n-1];
+    for (i=1; i<=nl; i++) {
+        n = (int) X[i][1];
+        list[start[n]++] = i;
+    }
+    for (n=nE; n>=2; n--)   start[n] = start[n-1];
+    start[1] = 1;
+}
+
+
 /*------------------------------------------------------------------------------
 WRITE_INTERNAL_FORCES -
 calculate frame element internal forces, Nx, Vy, Vz, Tx, My, Mz
@@ -1299,7 +1449,7 @@ write internal forces and local displacements to an output data file
 Oct 31, 2013
 ------------------------------------------------------------------------------*/
 void write_internal_forces (
-        InternalForces **internalForces,
+        InternalForces *internalForces,
         int lc, int nL, float dx,
         vec3 *xyz,
         double **Q, int nN, int nE, double *L, int *J1, int *J2,
@@ -1330,11 +1480,15 @@ void write_internal_forces (
         *My, *Mz,   /* bending moments within frame el. */
         *Sy, *Sz,   /* transverse slopes of frame el.   */
         *Dx, *Dy, *Dz,  /* frame el. displ. in local x,y,z, dir's */
-        *Rx;        /* twist rotation about the local x-axis */
+        *Rx,        /* twist rotation about the local x-axis */
+        *o;     /* output row of frame element "m"  */
 
     int n, m,       /* frame element number         */
-        cU=0, cW=0, cP=0, /* counters for U, W, and P loads */
-        i, nx,      /* number of sections alont x axis  */
+        *sU, *iU, *sW, *iW, *sP, *iP, /* the U, W, and P loads of each element */
+        nIF = internalForces->offset[nE], /* points of all elements */
+        nLIF = nL*nIF,  /* values of one quantity           */
+        np,     /* points written for an element    */
+        i, j, nx, nxmax=1, /* number of sections alont x axis  */
         n1,n2,i1,i2;    /* starting and stopping node no's  */
 
     // char    errMsg[MAXL];
@@ -1344,29 +1498,41 @@ void write_internal_forces (
 
     (void) time(&now);
 
+    // index the loads by frame element, so each element finds its own loads
+    sU = ivector(1,nE+1);   iU = ivector(1,nU);
+    sW = ivector(1,nE+1);   iW = ivector(1,nW);
+    sP = ivector(1,nE+1);   iP = ivector(1,nP);
+    load_index ( nE, nU, U, sU, iU );
+    load_index ( nE, nW, W, sW, iW );
+    load_index ( nE, nP, P, sP, iP );
+
+    // allocate memory for interior force data, for the longest frame element
+    for ( m=1; m <= nE; m++ )
+        if ( floor(L[m]/dx) > nxmax )   nxmax = floor(L[m]/dx);
+    x  = dvector(0,nxmax);
+    Nx = dvector(0,nxmax);
+    Vy = dvector(0,nxmax);
+    Vz = dvector(0,nxmax);
+    Tx = dvector(0,nxmax);
+    My = dvector(0,nxmax);
+    Mz = dvector(0,nxmax);
+    Sy = dvector(0,nxmax);
+    Sz = dvector(0,nxmax);
+    Rx = dvector(0,nxmax);
+    Dx = dvector(0,nxmax);
+    Dy = dvector(0,nxmax);
+    Dz = dvector(0,nxmax);
 
     for ( m=1; m <= nE; m++ ) { // loop over all frame elements
 
+        if ( internalForces->offset[m] == internalForces->offset[m-1] )
+            continue;   // element not selected for output
+
         n1 = J1[m]; n2 = J2[m]; // node 1 and node 2 of elmnt m
 
         nx = floor(L[m]/dx);    // number of x-axis increments
         if (nx < 1) nx = 1; // at least one x-axis increment
 
-    // allocate memory for interior force data for frame element "m"
-        x  = dvector(0,nx);
-        Nx = dvector(0,nx);
-        Vy = dvector(0,nx);
-        Vz = dvector(0,nx);
-        Tx = dvector(0,nx);
-        My = dvector(0,nx);
-        Mz = dvector(0,nx);
-        Sy = dvector(0,nx);
-        Sz = dvector(0,nx);
-        Rx = dvector(0,nx);
-        Dx = dvector(0,nx);
-        Dy = dvector(0,nx);
-        Dz = dvector(0,nx);
-
     // the local x-axis for frame element "m" starts at 0 and ends at L[m]
         for (i=0; i<nx; i++)    x[i] = i*dx;
         x[nx] = L[m];
@@ -1383,13 +1549,11 @@ void write_internal_forces (
         wzg = d[m]*Ax[m]*(t7*gX + t8*gY + t9*gZ);
 
         // add uniformly-distributed loads to gravity load
-        for (n=1; n<=nE && cU<nU; n++) {
-            if ( (int) U[n][1] == m ) { // load n on element m
-                wxg += U[n][2];
-                wyg += U[n][3];
-                wzg += U[n][4];
-                ++cU;
-            }
+        for (j=sU[m]; j<sU[m+1]; j++) {
+            n = iU[j];  // load n on element m
+            wxg += U[n][2];
+            wyg += U[n][3];
+            wzg += U[n][4];
         }
 
         // interior forces for frame element "m" at (x=0)
@@ -1416,9 +1580,8 @@ void write_internal_forces (
             }
 
             // add trapezoidally-distributed loads
-            for (n=1; n<=10*nE && cW<nW; n++) {
-                if ( (int) W[n][1] == m ) { // load n on element m
-                if (i==nx) ++cW;
+            for (j=sW[m]; j<sW[m+1]; j++) {
+                n = iW[j];  // load n on element m
                 xx1 = W[n][2];  xx2 = W[n][3];
                 wx1 = W[n][4];  wx2 = W[n][5];
                 xy1 = W[n][6];  xy2 = W[n][7];
@@ -1432,7 +1595,6 @@ void write_internal_forces (
                     wy += wy1+(wy2-wy1)*(x[i]-xy1)/(xy2-xy1);
                 if ( x[i]>xz1 && x[i]<=xz2 )
                     wz += wz1+(wz2-wz1)*(x[i]-xz1)/(xz2-xz1);
-                }
             }
 
             // trapezoidal integration of distributed loads
@@ -1450,9 +1612,8 @@ void write_internal_forces (
             tx_ = tx;
 
             // add interior point loads
-            for (n=1; n<=10*nE && cP<nP; n++) {
-                if ( (int) P[n][1] == m ) { // load n on element m
-                if (i==nx) ++cP;
+            for (j=sP[m]; j<sP[m+1]; j++) {
+                n = iP[j];  // load n on element m
                 xp = P[n][5];
                 if ( x[i] <= xp && xp < x[i]+dx ) {
                     Nx[i] -= P[n][2] * 0.5 * (1.0 - (xp-x[i])/dx);
@@ -1465,7 +1626,6 @@ void write_internal_forces (
                     Vy[i] -= P[n][3] * 0.5 * (1.0 - (x[i]-dx-xp)/dx);
                     Vz[i] -= P[n][4] * 0.5 * (1.0 - (x[i]-dx-xp)/dx);
                 }
-                }
             }
 
         }
@@ -1575,70 +1735,595 @@ void write_internal_forces (
         }
 
 
-    // write results to the internal frame element force output data file
-        for (i=0; i<=nx; i++) {
-            internalForces[lc-1][m-1].x[i] = x[i];
-            internalForces[lc-1][m-1].Nx[i] = Nx[i];
-            internalForces[lc-1][m-1].Vy[i] = Vy[i];
-            internalForces[lc-1][m-1].Vz[i] = Vz[i];
-            internalForces[lc-1][m-1].Tx[i] = Tx[i];
-            internalForces[lc-1][m-1].My[i] = My[i];
-            internalForces[lc-1][m-1].Mz[i] = Mz[i];
-            internalForces[lc-1][m-1].Dx[i] = Dx[i];
-            internalForces[lc-1][m-1].Dy[i] = Dy[i];
-            internalForces[lc-1][m-1].Dz[i] = Dz[i];
-            internalForces[lc-1][m-1].Rx[i] = Rx[i];
+    // write results to the points of element "m" in the output rows
+        o = internalForces->values + (lc-1)*nIF + internalForces->offset[m-1];
+        np = internalForces->offset[m] - internalForces->offset[m-1];
+        if (np > nx+1)  np = nx+1;
+        for (i=0; i<np; i++) {
+            o[i] = x[i];
+            o[nLIF+i] = Nx[i];
+            o[2*nLIF+i] = Vy[i];
+            o[3*nLIF+i] = Vz[i];
+            o[4*nLIF+i] = Tx[i];
+            o[5*nLIF+i] = My[i];
+            o[6*nLIF+i] = Mz[i];
+            o[7*nLIF+i] = Dx[i];
+            o[8*nLIF+i] = Dy[i];
+            o[9*nLIF+i] = Dz[i];
+            o[10*nLIF+i] = Rx[i];
         }
 
+    }               // end of loop over all frame elements
+
     // free memory
-        free_dvector(x,0,nx);
-        free_dvector(Nx,0,nx);
-        free_dvector(Vy,0,nx);
-        free_dvector(Vz,0,nx);
-        free_dvector(Tx,0,nx);
-        free_dvector(My,0,nx);
-        free_dvector(Mz,0,nx);
-        free_dvector(Rx,0,nx);
-        free_dvector(Sy,0,nx);
-        free_dvector(Sz,0,nx);
-        free_dvector(Dx,0,nx);
-        free_dvector(Dy,0,nx);
-        free_dvector(Dz,0,nx);
+    free_dvector(x,0,nxmax);
+    free_dvector(Nx,0,nxmax);
+    free_dvector(Vy,0,nxmax);
+    free_dvector(Vz,0,nxmax);
+    free_dvector(Tx,0,nxmax);
+    free_dvector(My,0,nxmax);
+    free_dvector(Mz,0,nxmax);
+    free_dvector(Rx,0,nxmax);
+    free_dvector(Sy,0,nxmax);
+    free_dvector(Sz,0,nxmax);
+    free_dvector(Dx,0,nxmax);
+    free_dvector(Dy,0,nxmax);
+    free_dvector(Dz,0,nxmax);
+    free_ivector(sU,1,nE+1);    free_ivector(iU,1,nU);
+    free_ivector(sW,1,nE+1);    free_ivector(iW,1,nW);
+    free_ivector(sP,1,nE+1);    free_ivector(iP,1,nP);
+
+}
+
+
+/*------------------------------------------------------------------------------
+POLY_VALUE - the value of the polynomial c[0] + c[1] s + ... + c[n] s^n
+------------------------------------------------------------------------------*/
+static double poly_value ( double *c, int n, double s )
+{
+    double  v = c[n];
+
+    while ( --n >= 0 )  v = v*s + c[n];
+
+    return v;
+}
+
+
+/*------------------------------------------------------------------------------
+POLY_ROOTS - the roots of c[0] + c[1] s + ... + c[n] s^n, n <= 5, in (a,b),
+in ascending order.  The roots of the derivative split (a,b) into pieces on
+which the polynomial is monotonic, with at most one root each, found by
+bisection.
+------------------------------------------------------------------------------*/
+static int poly_roots ( double *c, int n, double a, double b, double *roots )
+{
+    double  dc[5], e[6],    /* derivative and its roots, with a and b */
+        lo, hi, mid, flo, fhi, fmid;
+    int i, k, ne, nr = 0;
+
+    while ( n > 0 && c[n] == 0.0 )  --n;    /* the degree */
+    if ( n == 0 )   return 0;
+
+    for (i=1; i<=n; i++)    dc[i-1] = i*c[i];
+    e[0] = a;
+    ne = 1 + poly_roots ( dc, n-1, a, b, e+1 );
+    e[ne++] = b;
+
+    for (k=0; k < ne-1; k++) {  /* each monotonic piece */
+        lo = e[k];  hi = e[k+1];
+        flo = poly_value ( c, n, lo );
+        fhi = poly_value ( c, n, hi );
+        if ( fhi == 0.0 && k < ne-2 ) {
+            roots[nr++] = hi;
+            continue;
+        }
+        if ( flo == 0.0 || fhi == 0.0 || (flo < 0.0) == (fhi < 0.0) )
+            continue;
+        for (i=0; i<200; i++) {
+            mid = 0.5*(lo+hi);
+            if ( mid <= lo || mid >= hi )   break;
+            fmid = poly_value ( c, n, mid );
+            if ( (fmid < 0.0) == (flo < 0.0) ) { lo = mid; flo = fmid; }
+            else    hi = mid;
+        }
+        roots[nr++] = 0.5*(lo+hi);
+    }
+
+    return nr;
+}
+
+
+/*------------------------------------------------------------------------------
+POLY_INTEGRAL - g(x) = start + scale * (integral of f from 0 to x), for f and g
+polynomials of degree 5 on each of the np pieces between the breakpoints a,
+less jump[k] at the start of piece k, if jump is not NULL
+------------------------------------------------------------------------------*/
+static void poly_integral (
+        double **f, double **g, double scale, double start,
+        double *jump, double *a, int np
+){
+    int j, k;
+
+    for (k=0; k<np; k++) {
+        if ( jump ) start -= jump[k];
+        g[k][0] = start;
+        for (j=0; j<5; j++) g[k][j+1] = scale*f[k][j]/(j+1);
+        start = poly_value ( g[k], 5, a[k+1]-a[k] );
+    }
+}
+
+
+/*------------------------------------------------------------------------------
+POLY_CORRECT - subtract the linear function that is zero at x=0 and makes the
+value of the piecewise polynomial g at the end, x = a[np], equal to target
+------------------------------------------------------------------------------*/
+static void poly_correct ( double **g, double target, double *a, int np )
+{
+    double  delta;
+    int k;
+
+    delta = poly_value ( g[np-1], 5, a[np]-a[np-1] ) - target;
+    for (k=0; k<np; k++) {
+        g[k][0] -= delta * a[k]/a[np];
+        g[k][1] -= delta / a[np];
+    }
+}
+
+
+/* the quantities of the polynomials of an element: Nx, Vy, Vz, Tx, My, Mz,
+   Dx, Dy, Dz, Rx, in the order of the output, the rotations Ry, Rz of the
+   cross section, the slopes Sy, Sz and the distributed loads wx, wy, wz */
+enum { NX, VY, VZ, TX, MY, MZ, DX, DY, DZ, RX, RY, RZ, SY, SZ, WX, WY, WZ, NQ };
+
+
+/*------------------------------------------------------------------------------
+INTERNAL_FORCE_PIECES - the largest number of pieces of the polynomials of an
+element, one more than the number of ends of its trapezoidal loads and of its
+interior point loads
+------------------------------------------------------------------------------*/
+static int internal_force_pieces ( int nE, int *sW, int *sP )
+{
+    int m, np, npmax = 2;
+
+    for ( m=1; m <= nE; m++ ) {
+        np = 1 + 6*(sW[m+1]-sW[m]) + (sP[m+1]-sP[m]);
+        if ( np > npmax )   npmax = np;
+    }
+
+    return npmax;
+}
+
+
+/*------------------------------------------------------------------------------
+INTERNAL_FORCE_POLYNOMIALS -
+the internal forces, Nx, Vy, Vz, Tx, My, Mz, and local displacements, Dx, Dy,
+Dz, Rx, of frame element m as polynomials of x.  Between the ends of the
+trapezoidal loads and the interior point loads the distributed loads are
+linear, so each quantity is a polynomial of degree 5 or less on each piece,
+found by integrating the loads exactly as write_internal_forces integrates
+them with the trapezoidal rule, with the same linear corrections to the end
+forces and displacements.  The rotations Ry, Rz of the cross section are the
+integrals of the curvatures from the end rotations, and with shear
+deformation the slopes of Dy and Dz add the shear strains to them.  For the
+end forces and displacements of a linear analysis the corrections vanish, and
+Dy, Dz are the cubic Hermite interpolation of the end displacements plus the
+particular solution of the loads.  Returns the number of pieces, np; piece k starts at
+x = a[k] and the value of quantity q at x is c[q][k] evaluated at x - a[k].
+------------------------------------------------------------------------------*/
+static int internal_force_polynomials (
+        int m, vec3 *xyz, double **Q, double *L, int *J1, int *J2,
+        float *Ax,float *Asy,float *Asz,float *Jx,float *Iy,float *Iz,
+        float *E, float *G, float *p,
+        float *d, float gX, float gY, float gZ,
+        float **U, int *sU, int *iU, float **W, int *sW, int *iW,
+        float **P, int *sP, int *iP,
+        double *D, int shear,
+        double *a, double **jump, double ***c
+){
+    double  t1, t2, t3, t4, t5, t6, t7, t8, t9, /* coord transformation */
+        u1, u2, u3, u4, u5, u6, u7, u8, u9, u10, u11, u12; /* displ. */
+
+    double  wxg, wyg, wzg,  /* gravity and uniform loads, local coord's */
+        x1, x2, w1, w2, /* trapezoidal load data in one direction  */
+        xp, v;      /* point load location, a breakpoint       */
+
+    int n, i, j, k, q, np,
+        n1 = J1[m], n2 = J2[m], /* node 1 and node 2 of elmnt m */
+        i1, i2;     /* starting and stopping node no's  */
+
+    // the breakpoints: the ends, the ends of the trapezoidal loads, and the
+    // interior point loads, in ascending order
+    np = 0;
+    a[np++] = 0.0;
+    for (j=sW[m]; j<sW[m+1]; j++) {
+        n = iW[j];
+        for (i=2; i<=11; i += (i%4 == 3) ? 3 : 1) { /* W[n][2,3,6,7,10,11] */
+            if ( W[n][i] > 0.0 && W[n][i] < L[m] )  a[np++] = W[n][i];
+        }
+    }
+    for (j=sP[m]; j<sP[m+1]; j++) {
+        n = iP[j];
+        if ( P[n][5] > 0.0 && P[n][5] < L[m] )  a[np++] = P[n][5];
+    }
+    a[np++] = L[m];
+    for (i=1; i<np; i++) {  /* insertion sort */
+        v = a[i];
+        for (k=i; k > 0 && a[k-1] > v; k--) a[k] = a[k-1];
+        a[k] = v;
+    }
+    for (i=k=1; i<np; i++)  /* remove repeated breakpoints */
+        if ( a[i] > a[k-1] )    a[k++] = a[i];
+    np = k-1;   /* number of pieces */
+
+    coord_trans ( xyz, L[m], n1, n2,
+        &t1, &t2, &t3, &t4, &t5, &t6, &t7, &t8, &t9, p[m] );
+
+    // distributed gravity load in local x, y, z coordinates
+    wxg = d[m]*Ax[m]*(t1*gX + t2*gY + t3*gZ);
+    wyg = d[m]*Ax[m]*(t4*gX + t5*gY + t6*gZ);
+    wzg = d[m]*Ax[m]*(t7*gX + t8*gY + t9*gZ);
+
+    // add uniformly-distributed loads to gravity load
+    for (j=sU[m]; j<sU[m+1]; j++) {
+        n = iU[j];  // load n on element m
+        wxg += U[n][2];
+        wyg += U[n][3];
+        wzg += U[n][4];
+    }
+
+    // the distributed loads on each piece, and the point loads
+    for (k=0; k<np; k++) {
+        for (q=0; q<NQ; q++)    for (i=0; i<=5; i++)    c[q][k][i] = 0.0;
+        c[WX][k][0] = wxg;
+        c[WY][k][0] = wyg;
+        c[WZ][k][0] = wzg;
+        for (j=sW[m]; j<sW[m+1]; j++) {
+            n = iW[j];  // load n on element m
+            for (i=0; i<3; i++) {
+                x1 = W[n][4*i+2];   x2 = W[n][4*i+3];
+                w1 = W[n][4*i+4];   w2 = W[n][4*i+5];
+                if ( x1 < x2 && a[k] >= x1 && a[k+1] <= x2 ) {
+                    c[WX+i][k][0] += w1 + (w2-w1)*(a[k]-x1)/(x2-x1);
+                    c[WX+i][k][1] += (w2-w1)/(x2-x1);
+                }
+            }
+        }
+        for (i=0; i<3; i++) jump[i][k] = 0.0;
+        for (j=sP[m]; j<sP[m+1]; j++) {
+            n = iP[j];  // load n on element m
+            xp = P[n][5];
+            if ( xp == a[k] )
+                for (i=0; i<3; i++) jump[i][k] += P[n][i+2];
+        }
+    }
+
+    // axial force, shear forces and torque, with the end forces
+    // at x=0 and x=L[m] as in write_internal_forces
+    poly_integral ( c[WX], c[NX], -1.0, -Q[m][1], jump[0], a, np );
+    poly_integral ( c[WY], c[VY], -1.0, -Q[m][2], jump[1], a, np );
+    poly_integral ( c[WZ], c[VZ], -1.0, -Q[m][3], jump[2], a, np );
+    for (k=0; k<np; k++)    c[TX][k][0] = -Q[m][4];
+    poly_correct ( c[NX], Q[m][7],  a, np );
+    poly_correct ( c[VY], Q[m][8],  a, np );
+    poly_correct ( c[VZ], Q[m][9],  a, np );
+    poly_correct ( c[TX], Q[m][10], a, np );
+
+    // bending moments
+    poly_integral ( c[VZ], c[MY], -1.0,  Q[m][5], NULL, a, np );
+    poly_integral ( c[VY], c[MZ], -1.0, -Q[m][6], NULL, a, np );
+    poly_correct ( c[MY], -Q[m][11], a, np );
+    poly_correct ( c[MZ],  Q[m][12], a, np );
+
+    // end deflections in local coordinates
+    i1 = 6*(n1-1);  i2 = 6*(n2-1);
+
+    u1  = t1*D[i1+1] + t2*D[i1+2] + t3*D[i1+3];
+    u2  = t4*D[i1+1] + t5*D[i1+2] + t6*D[i1+3];
+    u3  = t7*D[i1+1] + t8*D[i1+2] + t9*D[i1+3];
+
+    u4  = t1*D[i1+4] + t2*D[i1+5] + t3*D[i1+6];
+    u5  = t4*D[i1+4] + t5*D[i1+5] + t6*D[i1+6];
+    u6  = t7*D[i1+4] + t8*D[i1+5] + t9*D[i1+6];
+
+    u7  = t1*D[i2+1] + t2*D[i2+2] + t3*D[i2+3];
+    u8  = t4*D[i2+1] + t5*D[i2+2] + t6*D[i2+3];
+    u9  = t7*D[i2+1] + t8*D[i2+2] + t9*D[i2+3];
+
+    u10 = t1*D[i2+4] + t2*D[i2+5] + t3*D[i2+6];
+    u11 = t4*D[i2+4] + t5*D[i2+5] + t6*D[i2+6];
+    u12 = t7*D[i2+4] + t8*D[i2+5] + t9*D[i2+6];
+
+    // axial displacement and twist
+    poly_integral ( c[NX], c[DX], 1.0/(E[m]*Ax[m]), u1, NULL, a, np );
+    poly_integral ( c[TX], c[RX], 1.0/(G[m]*Jx[m]), u4, NULL, a, np );
+    poly_correct ( c[DX], u7,  a, np );
+    poly_correct ( c[RX], u10, a, np );
+
+    // rotations of the cross section
+    poly_integral ( c[MZ], c[RZ],  1.0/(E[m]*Iz[m]), u6, NULL, a, np );
+    poly_integral ( c[MY], c[RY], -1.0/(E[m]*Iy[m]), u5, NULL, a, np );
+    poly_correct ( c[RZ], u12, a, np );
+    poly_correct ( c[RY], u11, a, np );
+
+    // transverse slopes, with shear deformation, and displacements
+    for (k=0; k<np; k++) {
+        for (i=0; i<=5; i++) {
+            c[SY][k][i] =  c[RZ][k][i];
+            c[SZ][k][i] = -c[RY][k][i];
+            if ( shear ) {
+                c[SY][k][i] += c[VY][k][i]/(G[m]*Asy[m]);
+                c[SZ][k][i] += c[VZ][k][i]/(G[m]*Asz[m]);
+            }
+        }
+    }
+    poly_integral ( c[SY], c[DY], 1.0, u2, NULL, a, np );
+    poly_integral ( c[SZ], c[DZ], 1.0, u3, NULL, a, np );
+    poly_correct ( c[DY], u8, a, np );
+    poly_correct ( c[DZ], u9, a, np );
+
+    return np;
+}
+
+
+/*------------------------------------------------------------------------------
+WRITE_INTERNAL_FORCE_EXTREMA -
+find the largest and smallest internal forces, Nx, Vy, Vz, Tx, My, Mz, and
+local displacements, Dx, Dy, Dz, Rx, of each frame element, and where along
+the element they occur, from the polynomials of internal_force_polynomials.
+The extrema are at the ends of the pieces or at the roots of the derivatives.
+------------------------------------------------------------------------------*/
+void write_internal_force_extrema (
+        InternalForces *internalForces,
+        int lc, int nL,
+        vec3 *xyz,
+        double **Q, int nN, int nE, double *L, int *J1, int *J2,
+        float *Ax,float *Asy,float *Asz,float *Jx,float *Iy,float *Iz,
+        float *E, float *G, float *p,
+        float *d, float gX, float gY, float gZ,
+        int nU, float **U, int nW, float **W, int nP, float **P,
+        double *D, int shear
+){
+    double  *a, h,      /* breakpoints, piece length        */
+        **jump,     /* point loads at the start of each piece  */
+        ***c,       /* polynomial of each quantity on each piece */
+        dc[5], s[7],    /* derivative and the points to evaluate */
+        v, *o;      /* value, and the output of element "m"    */
+
+    int m,          /* frame element number         */
+        *sU, *iU, *sW, *iW, *sP, *iP, /* the U, W, and P loads of each element */
+        nLE = nL*nE,    /* values of one extremum of one quantity  */
+        i, k, q, ns, np, npmax; /* number of pieces       */
+
+    // index the loads by frame element, so each element finds its own loads
+    sU = ivector(1,nE+1);   iU = ivector(1,nU);
+    sW = ivector(1,nE+1);   iW = ivector(1,nW);
+    sP = ivector(1,nE+1);   iP = ivector(1,nP);
+    load_index ( nE, nU, U, sU, iU );
+    load_index ( nE, nW, W, sW, iW );
+    load_index ( nE, nP, P, sP, iP );
+
+    // allocate memory for the pieces, for the most heavily loaded element
+    npmax = internal_force_pieces ( nE, sW, sP );
+    a = dvector(0,npmax);
+    jump = dmatrix(0,2,0,npmax);
+    c = D3dmatrix(0,NQ-1,0,npmax-1,0,5);
+
+    for ( m=1; m <= nE; m++ ) { // loop over all frame elements
+
+        if ( internalForces->offset[m] == internalForces->offset[m-1] )
+            continue;   // element not selected for output
+
+        np = internal_force_polynomials ( m, xyz, Q, L, J1, J2,
+                Ax, Asy, Asz, Jx, Iy, Iz, E, G, p, d, gX, gY, gZ,
+                U, sU, iU, W, sW, iW, P, sP, iP, D, shear, a, jump, c );
+
+    // the extrema of each quantity, at the ends of the pieces or
+    // at the roots of the derivative
+        for (q=NX; q<=RX; q++) {
+            o = internalForces->extrema + 4*q*nLE + (lc-1)*nE + (m-1);
+            for (k=0; k<np; k++) {
+                h = a[k+1]-a[k];
+                for (i=0; i<5; i++) dc[i] = (i+1)*c[q][k][i+1];
+                s[0] = 0.0;
+                s[1] = h;
+                ns = 2 + poly_roots ( dc, 4, 0.0, h, s+2 );
+                for (i=0; i<ns; i++) {
+                    v = poly_value ( c[q][k], 5, s[i] );
+                    if ( (k == 0 && i == 0) || v > o[0] ) {
+                        o[0] = v;
+                        o[nLE] = a[k] + s[i];
+                    }
+                    if ( (k == 0 && i == 0) || v < o[2*nLE] ) {
+                        o[2*nLE] = v;
+                        o[3*nLE] = a[k] + s[i];
+                    }
+                }
+            }
+        }
 
     }               // end of loop over all frame elements
 
+    // free memory
+    free_D3dmatrix(c,0,NQ-1,0,npmax-1,0,5);
+    free_dmatrix(jump,0,2,0,npmax);
+    free_dvector(a,0,npmax);
+    free_ivector(sU,1,nE+1);    free_ivector(iU,1,nU);
+    free_ivector(sW,1,nE+1);    free_ivector(iW,1,nW);
+    free_ivector(sP,1,nE+1);    free_ivector(iP,1,nP);
+
 }
 
 
 /*------------------------------------------------------------------------------
-WRITE_MODAL_RESULTS -  save modal frequencies and mode shapes
-Oct 31, 2013
+WRITE_INTERNAL_FORCE_STATIONS -
+the internal forces, Nx, Vy, Vz, Tx, My, Mz, and local displacements, Dx, Dy,
+Dz, Rx, of each frame element at the points x of its output rows, which hold
+the stations on input, from the polynomials of internal_force_polynomials.
+At an interior point load the values are those just beyond the load.
 ------------------------------------------------------------------------------*/
-void write_modal_results(
+void write_internal_force_stations (
+        InternalForces *internalForces,
+        int lc, int nL,
+        vec3 *xyz,
+        double **Q, int nN, int nE, double *L, int *J1, int *J2,
+        float *Ax,float *Asy,float *Asz,float *Jx,float *Iy,float *Iz,
+        float *E, float *G, float *p,
+        float *d, float gX, float gY, float gZ,
+        int nU, float **U, int nW, float **W, int nP, float **P,
+        double *D, int shear
+){
+    double  *a,     /* breakpoints              */
+        **jump,     /* point loads at the start of each piece  */
+        ***c,       /* polynomial of each quantity on each piece */
+        x, *o;      /* a station, and the output of element "m" */
+
+    int m,          /* frame element number         */
+        *sU, *iU, *sW, *iW, *sP, *iP, /* the U, W, and P loads of each element */
+        nIF = internalForces->offset[nE], /* points of all elements */
+        nLIF = nL*nIF,  /* values of one quantity, all load cases  */
+        i, k, q, np, npmax; /* number of pieces       */
+
+    // index the loads by frame element, so each element finds its own loads
+    sU = ivector(1,nE+1);   iU = ivector(1,nU);
+    sW = ivector(1,nE+1);   iW = ivector(1,nW);
+    sP = ivector(1,nE+1);   iP = ivector(1,nP);
+    load_index ( nE, nU, U, sU, iU );
+    load_index ( nE, nW, W, sW, iW );
+    load_index ( nE, nP, P, sP, iP );
+
+    // allocate memory for the pieces, for the most heavily loaded element
+    npmax = internal_force_pieces ( nE, sW, sP );
+    a = dvector(0,npmax);
+    jump = dmatrix(0,2,0,npmax);
+    c = D3dmatrix(0,NQ-1,0,npmax-1,0,5);
+
+    for ( m=1; m <= nE; m++ ) { // loop over all frame elements
+
+        if ( internalForces->offset[m] == internalForces->offset[m-1] )
+            continue;   // element not selected for output
+
+        np = internal_force_polynomials ( m, xyz, Q, L, J1, J2,
+                Ax, Asy, Asz, Jx, Iy, Iz, E, G, p, d, gX, gY, gZ,
+                U, sU, iU, W, sW, iW, P, sP, iP, D, shear, a, jump, c );
+
+    // the values at the stations, on the piece of each station
+        o = internalForces->values + (lc-1)*nIF;
+        for (i=internalForces->offset[m-1]; i<internalForces->offset[m]; i++) {
+            x = o[i];
+            for (k=0; k < np-1 && x >= a[k+1]; k++) ;
+            for (q=NX; q<=RX; q++)
+                o[(q+1)*nLIF+i] = poly_value ( c[q][k], 5, x-a[k] );
+        }
+
+    }               // end of loop over all frame elements
+
+    // free memory
+    free_D3dmatrix(c,0,NQ-1,0,npmax-1,0,5);
+    free_dmatrix(jump,0,2,0,npmax);
+    free_dvector(a,0,npmax);
+    free_ivector(sU,1,nE+1);    free_ivector(iU,1,nU);
+    free_ivector(sW,1,nE+1);    free_ivector(iW,1,nW);
+    free_ivector(sP,1,nE+1);    free_ivector(iP,1,nP);
+
+}
+
+
+/*------------------------------------------------------------------------------
+WRITE_ELEMENT_DISPLACEMENTS -
+the displacements, Dx, Dy, Dz, and rotations, Rx, Ry, Rz, of the frame elements
+at the points x[i] along the elements element[i], i = 0 ... nX-1, in the local
+coordinates of each element or, with local == 0, in global coordinates, from
+the polynomials of internal_force_polynomials.  The points are sorted by
+element, and the polynomials are found once for the points of each element.
+The results are written as displ[j*ld+i], j = 0 ... 5, with ld >= nX.
+------------------------------------------------------------------------------*/
+void write_element_displacements (
+        int nX, int *element, double *x, int local, double *displ, int ld,
+        vec3 *xyz,
+        double **Q, int nN, int nE, double *L, int *J1, int *J2,
+        float *Ax,float *Asy,float *Asz,float *Jx,float *Iy,float *Iz,
+        float *E, float *G, float *p,
+        float *d, float gX, float gY, float gZ,
+        int nU, float **U, int nW, float **W, int nP, float **P,
+        double *D, int shear
+){
+    double  *a,     /* breakpoints              */
+        **jump,     /* point loads at the start of each piece  */
+        ***c,       /* polynomial of each quantity on each piece */
+        t1, t2, t3, t4, t5, t6, t7, t8, t9, /* coord transformation */
+        u[6];       /* local displacements and rotations at a point */
+
+    int m,          /* frame element number         */
+        *sU, *iU, *sW, *iW, *sP, *iP, /* the U, W, and P loads of each element */
+        i, j, k, np=0, npmax; /* number of pieces       */
+
+    // index the loads by frame element, so each element finds its own loads
+    sU = ivector(1,nE+1);   iU = ivector(1,nU);
+    sW = ivector(1,nE+1);   iW = ivector(1,nW);
+    sP = ivector(1,nE+1);   iP = ivector(1,nP);
+    load_index ( nE, nU, U, sU, iU );
+    load_index ( nE, nW, W, sW, iW );
+    load_index ( nE, nP, P, sP, iP );
+
+    // allocate memory for the pieces, for the most heavily loaded element
+    npmax = internal_force_pieces ( nE, sW, sP );
+    a = dvector(0,npmax);
+    jump = dmatrix(0,2,0,npmax);
+    c = D3dmatrix(0,NQ-1,0,npmax-1,0,5);
+
+    for ( i=0, m=0; i < nX; i++ ) { // loop over all points
+
+        if ( element[i] != m ) {    // the polynomials of the next element
+            m = element[i];
+            np = internal_force_polynomials ( m, xyz, Q, L, J1, J2,
+                    Ax, Asy, Asz, Jx, Iy, Iz, E, G, p, d, gX, gY, gZ,
+                    U, sU, iU, W, sW, iW, P, sP, iP, D, shear, a, jump, c );
+            coord_trans ( xyz, L[m], J1[m], J2[m],
+                &t1, &t2, &t3, &t4, &t5, &t6, &t7, &t8, &t9, p[m] );
+        }
+
+        for (k=0; k < np-1 && x[i] >= a[k+1]; k++) ;
+        for (j=0; j<6; j++)
+            u[j] = poly_value ( c[DX+j][k], 5, x[i]-a[k] );
+
+        if ( !local ) { // rotate the local displacements to global coordinates
+            for (j=0; j<6; j+=3) {
+                displ[ j   *ld+i] = t1*u[j] + t4*u[j+1] + t7*u[j+2];
+                displ[(j+1)*ld+i] = t2*u[j] + t5*u[j+1] + t8*u[j+2];
+                displ[(j+2)*ld+i] = t3*u[j] + t6*u[j+1] + t9*u[j+2];
+            }
+        } else
+            for (j=0; j<6; j++) displ[j*ld+i] = u[j];
+    }               // end of loop over all points
+
+    // free memory
+    free_D3dmatrix(c,0,NQ-1,0,npmax-1,0,5);
+    free_dmatrix(jump,0,2,0,npmax);
+    free_dvector(a,0,npmax);
+    free_ivector(sU,1,nE+1);    free_ivector(iU,1,nU);
+    free_ivector(sW,1,nE+1);    free_ivector(iW,1,nW);
+    free_ivector(sP,1,nE+1);    free_ivector(iP,1,nP);
+
+}
+
+
+/*------------------------------------------------------------------------------
+SAVE_MODES -  save node masses, modal frequencies, mode participation factors
+and mode shapes, given the x, y, z mass sums, ms, and the diagonal, Md, of [M]
+------------------------------------------------------------------------------*/
+static void save_modes(
         MassResults* massR, ModalResults* modalR,
-        int nN, int nE, int nI, int DoF,
-        double **M, double *f, double **V,
+        int nN, int DoF,
+        double *msX, double *msY, double *msZ, double *Md,
+        double *f, double **V,
         double total_mass, double struct_mass,
-        int iter, int sumR, int nM,
-        double shift, int lump, double tol, int ok
+        int sumR, int nM
 ){
 
     int i, j, k, m, num_modes;
-    double  mpfX, mpfY, mpfZ,   /* mode participation factors   */
-        *msX, *msY, *msZ;
+    double  mpfX, mpfY, mpfZ;   /* mode participation factors   */
     // double  fs;
 
-    msX = dvector(1,DoF);
-    msY = dvector(1,DoF);
-    msZ = dvector(1,DoF);
-
-    for (i=1; i<=DoF; i++) {
-        msX[i] = msY[i] = msZ[i] = 0.0;
-        for (j=1; j<=DoF; j+=6) msX[i] += M[i][j];
-        for (j=2; j<=DoF; j+=6) msY[i] += M[i][j];
-        for (j=3; j<=DoF; j+=6) msZ[i] += M[i][j];
-    }
-
     if ( (DoF - sumR) > nM )    num_modes = nM;
     else    num_modes = DoF - sumR;
 
@@ -1648,12 +2333,12 @@ void write_modal_results(
     for (j=1; j <= nN; j++) {
         k = 6*(j-1);
         massR->N[j-1] = j;
-        massR->xmass[j-1] = M[k+1][k+1];
-        massR->ymass[j-1] = M[k+2][k+2];
-        massR->zmass[j-1] = M[k+3][k+3];
-        massR->xinrta[j-1] = M[k+4][k+4];
-        massR->yinrta[j-1] = M[k+5][k+5];
-        massR->zinrta[j-1] = M[k+6][k+6];
+        massR->xmass[j-1] = Md[k+1];
+        massR->ymass[j-1] = Md[k+2];
+        massR->zmass[j-1] = Md[k+3];
+        massR->xinrta[j-1] = Md[k+4];
+        massR->yinrta[j-1] = Md[k+5];
+        massR->zinrta[j-1] = Md[k+6];
     }
 
     //TODO use tol
@@ -1688,10 +2373,94 @@ void write_modal_results(
     //     fprintf(fp," order to get the missing modes below %f Hz.\n",fs);
     // } else  fprintf(fp," ... All %d modes were found.\n", nM );
 
+    return;
+}
+
+
+/*------------------------------------------------------------------------------
+WRITE_MODAL_RESULTS -  save modal frequencies and mode shapes
+Oct 31, 2013
+------------------------------------------------------------------------------*/
+void write_modal_results(
+        MassResults* massR, ModalResults* modalR,
+        int nN, int nE, int nI, int DoF,
+        double **M, double *f, double **V,
+        double total_mass, double struct_mass,
+        int iter, int sumR, int nM,
+        double shift, int lump, double tol, int ok
+){
+
+    int i, j;
+    double  *msX, *msY, *msZ, *Md;
+
+    msX = dvector(1,DoF);
+    msY = dvector(1,DoF);
+    msZ = dvector(1,DoF);
+    Md  = dvector(1,DoF);
+
+    for (i=1; i<=DoF; i++) {
+        msX[i] = msY[i] = msZ[i] = 0.0;
+        for (j=1; j<=DoF; j+=6) msX[i] += M[i][j];
+        for (j=2; j<=DoF; j+=6) msY[i] += M[i][j];
+        for (j=3; j<=DoF; j+=6) msZ[i] += M[i][j];
+        Md[i] = M[i][i];
+    }
+
+    save_modes ( massR, modalR, nN, DoF, msX, msY, msZ, Md, f, V,
+            total_mass, struct_mass, sumR, nM );
+
+    free_dvector(msX,1,DoF);
+    free_dvector(msY,1,DoF);
+    free_dvector(msZ,1,DoF);
+    free_dvector(Md,1,DoF);
+    return;
+}
+
+
+/*------------------------------------------------------------------------------
+WRITE_MODAL_RESULTS_SKY -  save modal frequencies and mode shapes, with [M]
+in profile (skyline) storage, in which coordinate i is stored as equation dof[i]
+------------------------------------------------------------------------------*/
+void write_modal_results_sky(
+        MassResults* massR, ModalResults* modalR,
+        int nN, int nE, int nI, int DoF,
+        double *M, int *sky, int *dof, double *f, double **V,
+        double total_mass, double struct_mass,
+        int iter, int sumR, int nM,
+        double shift, int lump, double tol, int ok
+){
+
+    int i, j;
+    double  *msX, *msY, *msZ, *Md,
+        *x, *y;     /* an indicator vector and [M]{x}, equation order */
+
+    msX = dvector(1,DoF);
+    msY = dvector(1,DoF);
+    msZ = dvector(1,DoF);
+    Md  = dvector(1,DoF);
+    x   = dvector(1,DoF);
+    y   = dvector(1,DoF);
+
+    for (j=1; j<=3; j++) {      /* sum the x, y, and z columns of [M] */
+        for (i=1; i<=DoF; i++)  x[dof[i]] = ( (i-1)%6 == j-1 ) ? 1.0 : 0.0;
+        prodAx_sky ( M, sky, DoF, x, y );
+        for (i=1; i<=DoF; i++) {
+            if ( j == 1 )   msX[i] = y[dof[i]];
+            if ( j == 2 )   msY[i] = y[dof[i]];
+            if ( j == 3 )   msZ[i] = y[dof[i]];
+        }
+    }
+    for (i=1; i<=DoF; i++)  Md[i] = M[sky[dof[i]]];
+
+    save_modes ( massR, modalR, nN, DoF, msX, msY, msZ, Md, f, V,
+            total_mass, struct_mass, sumR, nM );
 
     free_dvector(msX,1,DoF);
     free_dvector(msY,1,DoF);
     free_dvector(msZ,1,DoF);
+    free_dvector(Md,1,DoF);
+    free_dvector(x,1,DoF);
+    free_dvector(y,1,DoF);
     return;
 }
 
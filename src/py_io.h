@@ -11,13 +11,16 @@ Nov 1, 2013
 #include <stdio.h>
 
 
+/* The read_* functions check the input data and return 0, or the error code
+   of the first error found, so that a bad input never ends the process. */
+
 
 
 
 /**
     Read node coordinate data
 */
-void read_node_data (
+int read_node_data (
     Nodes *nodes,   /**node struct            */
     int nN,     /**< number of nodes                */
     vec3 *xyz,  /**< XYZ coordinates of each node       */
@@ -25,16 +28,24 @@ void read_node_data (
 );
 
 /**
-    Read frame element property data
+    Read frame element node numbers, and find the element lengths
 */
-void read_frame_element_data (
+int read_frame_element_connectivity (
     Elements *elements, // element data
     int nN,     /**< number of nodes                */
     int nE,     /**< number of frame elements           */
     vec3 *xyz,  /**< XYZ coordinates of each node       */
     float *rj,  /**< rigid radius of each node          */
     double *L, double *Le,  /**< length of each frame element, effective */
-    int *N1, int *N2,   /**< node connectivity          */
+    int *N1, int *N2    /**< node connectivity          */
+);
+
+/**
+    Read frame element property data, after the connectivity
+*/
+int read_frame_element_properties (
+    Elements *elements, // element data
+    int nE,     /**< number of frame elements           */
     float *Ax, float *Asy, float *Asz,  /**< section areas  */
     float *Jx, float *Iy, float *Iz,    /**< section inertias   */
     float *E, float *G, /**< elastic moduli and shear moduli    */
@@ -46,7 +57,7 @@ void read_frame_element_data (
 /**
     Read data controlling certain aspects of the analysis
 */
-void read_run_data (
+int read_run_data (
     OtherElementData *other, // struct
     int *shear, /**< 1: include shear deformations, 0: don't    */
     int *geom,  /**< 1: include geometric stiffness, 0: don't   */
@@ -58,7 +69,7 @@ void read_run_data (
 /**
     Read fixed node displacement boundary conditions
 */
-void read_reaction_data(
+int read_reaction_data(
     Reactions *reactions,  // struct
     int DoF,    /**< number of degrees of freedom       */
     int nN,     /**< number of nodes                */
@@ -74,13 +85,30 @@ void read_reaction_data(
 
 
 /**
-    read load information data, form un-restrained load vector
+    the number of rows of the load tables of load case lcase, to allocate
+    the load data of a block of load cases with R3matrix()
 */
-void read_and_assemble_loads(
+void count_loads(
+    LoadCase *lcase,    /**< the load case                      */
+    int nE,     /**< number of frame elements           */
+    int *nU,    /**< number of uniformly distributed loads */
+    int *nW,    /**< number of trapezoidaly distributed loads */
+    int *nP,    /**< number of concentrated point loads */
+    int *nT,    /**< number of temperature loads    */
+    int *nFE    /**< number of rows of fixed end forces */
+);
+
+
+/**
+    read load information data, form un-restrained load vector,
+    for load cases lc1 to lc2; the load arrays are indexed lc1..lc2
+*/
+int read_and_assemble_loads(
     LoadCase* loadcases, //struct
     int nN,     /**< number of nodes                */
     int nE,     /**< number of frame elements           */
     int nL,     /**< number of load cases           */
+    int lc1, int lc2,   /**< first and last load case to read */
     int DoF,    /**< number of degrees of freedom       */
     vec3 *xyz,  /**< XYZ coordinates of each node       */
     double *L, double *Le,  /**< length of each frame element, effective */
@@ -110,8 +138,8 @@ void read_and_assemble_loads(
     float ***P,     /**< concentrated point loads       */
     float ***T,     /**< temperature loads          */
     float **Dp,     /**< prescribed displacements at rctns  */
-    double ***feF_mech, /**< fixed end forces for mechanical loads */
-    double ***feF_temp, /**< fixed end forces for temperature loads */
+    double ***feF,  /**< fixed end forces of each load, feF[lc][k][0] is its
+                         element, the temperature loads are the last nT rows */
     int verbose     /**< 1: copious output to screen, 0: none */
 );
 
@@ -119,7 +147,7 @@ void read_and_assemble_loads(
 /**
     read member densities and extra inertial mass data
 */
-void read_mass_data(
+int read_mass_data(
     DynamicData *dynamic, ExtraInertia *extraInertia, ExtraMass *extraMass, // structs
     int nN, int nE, /**< number of nodes, number of frame elements */
     int *nI,    /**< number of nodes with extra inertia */
@@ -148,7 +176,7 @@ void read_mass_data(
 /**
     read matrix condensation information
 */
-void read_condensation_data(
+int read_condensation_data(
     Condensation *condensation, //struct
     int nN, int nM,     /**< number of nodes, number of modes   */
     int *nC,    /**< number of nodes with condensed DoF's   */
@@ -160,11 +188,30 @@ void read_condensation_data(
 );
 
 
+/**
+    read options controlling the storage and solution of the equations
+*/
+int read_solver_data(
+    SolverData *solver, // struct
+    int *storage,   /**< 0: dense [K], 1: profile (skyline) [K]  */
+    int *reorder,   /**< 1: renumber nodes to reduce the profile of [K] */
+    int *block,     /**< 1: solve all load cases together (linear only) */
+    int *backend,   /**< 0: native solvers, 1: LAPACK solvers */
+    int *nlmethod,  /**< 0: Newton, 1: modified Newton, 2: Broyden  */
+    double *nltol,  /**< convergence tolerance of the equilibrium error */
+    int *nlmaxit,   /**< maximum number of nonlinear iterations */
+    int *nlrefactor, /**< iterations between factorizations of [K] */
+    size_t *blockbytes /**< memory for the load data of a block of load cases */
+);
+
+
 /**
     save node displacements and member end forces in a text file    9sep08
+    only the nodes and elements selected in output, or all if output is NULL
 */
 void write_static_results(
     Displacements* displacements, Forces* forces, ReactionForces* reactionForces, //structs
+    OutputData *output,
     Reactions* reactions, int nR,
     int nN, int nE, int nL, int lc, int DoF,
     int *N1, int *N2,
@@ -173,6 +220,19 @@ void write_static_results(
 );
 
 
+/**
+    list the loads of a load case element by element:  the loads of element
+    n are list[start[n] .. start[n+1]-1], with X[i][1] the element of load i
+*/
+void load_index(
+    int nE,     /**< number of frame elements           */
+    int nl,     /**< number of loads                    */
+    float **X,  /**< load data                          */
+    int *start, /**< start[1..nE+1]: the first load of each element */
+    int *list   /**< list[1..nl]: the loads, element by element */
+);
+
+
 /**
     calculate frame element internal forces, Nx, Vy, Vz, Tx, My, Mz
     calculate frame element local displacements, Rx, Dx, Dy, Dz
@@ -180,7 +240,7 @@ void write_static_results(
     4jan10
 */
 void write_internal_forces(
-    InternalForces **internalForces, // array of arrays of structs
+    InternalForces *internalForces, // output rows of all load cases
     int lc,     /**< load case number               */
     int nL,     /**< number of static load cases        */
     float dx,   /**< increment distance along local x axis      */
@@ -210,6 +270,111 @@ void write_internal_forces(
 );
 
 
+/**
+    find the extrema of the frame element internal forces, Nx, Vy, Vz, Tx,
+    My, Mz, and local displacements, Dx, Dy, Dz, Rx, and where they occur,
+    from the exact piecewise polynomials of the distributed loads
+*/
+void write_internal_force_extrema(
+    InternalForces *internalForces, // output extrema of all load cases
+    int lc,     /**< load case number               */
+    int nL,     /**< number of static load cases        */
+    vec3 *xyz,  /**< XYZ locations of each node                */
+    double **Q, /**< frame element end forces                   */
+    int nN,     /**< number of nodes                           */
+    int nE,     /**< number of frame elements                   */
+    double *L,  /**< length of each frame element               */
+    int *N1, int *N2, /**< node connectivity                       */
+    float *Ax,  /**< cross sectional area                       */
+    float *Asy, float *Asz, /**< effective shear area               */
+    float *Jx,  /**< torsional moment of inertia             */
+    float *Iy, float *Iz,   /**< bending moment of inertia          */
+    float *E, float *G, /**< elastic and shear modulii          */
+    float *p,   /**< roll angle, radians                        */
+    float *d,   /**< mass density                               */
+    float gX, float gY, float gZ,   /**< gravitational acceleration */
+    int nU,     /**< number of uniformly-distributed loads  */
+    float **U,  /**< uniformly distributed load data            */
+    int nW,     /**< number of trapezoidally-distributed loads  */
+    float **W,  /**< trapezoidally distributed load data        */
+    int nP,     /**< number of internal point loads     */
+    float **P,  /**< internal point load data                   */
+    double *D,  /**< node displacements                        */
+    int shear   /**< shear deformation flag                     */
+);
+
+
+/**
+    calculate the frame element internal forces, Nx, Vy, Vz, Tx, My, Mz,
+    and local displacements, Dx, Dy, Dz, Rx, at the given points x, from the
+    exact piecewise polynomials of the distributed loads
+*/
+void write_internal_force_stations(
+    InternalForces *internalForces, // output rows, x given, of all load cases
+    int lc,     /**< load case number               */
+    int nL,     /**< number of static load cases        */
+    vec3 *xyz,  /**< XYZ locations of each node                */
+    double **Q, /**< frame element end forces                   */
+    int nN,     /**< number of nodes                           */
+    int nE,     /**< number of frame elements                   */
+    double *L,  /**< length of each frame element               */
+    int *N1, int *N2, /**< node connectivity                       */
+    float *Ax,  /**< cross sectional area                       */
+    float *Asy, float *Asz, /**< effective shear area               */
+    float *Jx,  /**< torsional moment of inertia             */
+    float *Iy, float *Iz,   /**< bending moment of inertia          */
+    float *E, float *G, /**< elastic and shear modulii          */
+    float *p,   /**< roll angle, radians                        */
+    float *d,   /**< mass density                               */
+    float gX, float gY, float gZ,   /**< gravitational acceleration */
+    int nU,     /**< number of uniformly-distributed loads  */
+    float **U,  /**< uniformly distributed load data            */
+    int nW,     /**< number of trapezoidally-distributed loads  */
+    float **W,  /**< trapezoidally distributed load data        */
+    int nP,     /**< number of internal point loads     */
+    float **P,  /**< internal point load data                   */
+    double *D,  /**< node displacements                        */
+    int shear   /**< shear deformation flag                     */
+);
+
+
+/**
+    calculate the displacements and rotations, in local or global coordinates,
+    at the points x along the frame elements, sorted by element, from the
+    exact piecewise polynomials of the distributed loads
+*/
+void write_element_displacements(
+    int nX,     /**< number of points                           */
+    int *element,   /**< frame element of each point            */
+    double *x,  /**< location of each point along its element   */
+    int local,  /**< 1: local coordinates, 0: global coordinates */
+    double *displ,  /**< output displacements and rotations, [6][ld] */
+    int ld,     /**< leading dimension of displ, at least nX    */
+    vec3 *xyz,  /**< XYZ locations of each node                */
+    double **Q, /**< frame element end forces                   */
+    int nN,     /**< number of nodes                           */
+    int nE,     /**< number of frame elements                   */
+    double *L,  /**< length of each frame element               */
+    int *N1, int *N2, /**< node connectivity                       */
+    float *Ax,  /**< cross sectional area                       */
+    float *Asy, float *Asz, /**< effective shear area               */
+    float *Jx,  /**< torsional moment of inertia             */
+    float *Iy, float *Iz,   /**< bending moment of inertia          */
+    float *E, float *G, /**< elastic and shear modulii          */
+    float *p,   /**< roll angle, radians                        */
+    float *d,   /**< mass density                               */
+    float gX, float gY, float gZ,   /**< gravitational acceleration */
+    int nU,     /**< number of uniformly-distributed loads  */
+    float **U,  /**< uniformly distributed load data            */
+    int nW,     /**< number of trapezoidally-distributed loads  */
+    float **W,  /**< trapezoidally distributed load data        */
+    int nP,     /**< number of internal point loads     */
+    float **P,  /**< internal point load data                   */
+    double *D,  /**< node displacements                        */
+    int shear   /**< shear deformation flag                     */
+);
+
+
 /**
     save modal frequencies and mode shapes          16aug01
 */
@@ -223,6 +388,22 @@ void write_modal_results(
 );
 
 
+/**
+    save modal frequencies and mode shapes, [M] in profile (skyline) storage
+*/
+void write_modal_results_sky(
+    MassResults* massR, ModalResults* modalR, //structs
+    int nN, int nE, int nI, int DoF,
+    double *M,  /**< mass matrix, profile storage       */
+    int *sky,   /**< location of the diagonal of each column */
+    int *dof,   /**< equation number of each coordinate */
+    double *f, double **V,
+    double total_mass, double struct_mass,
+    int iter, int sumR, int nM,
+    double shift, int lump, double tol, int ok
+);
+
+
 
 /** print a set of dots (periods) */
 void dots ( FILE *fp, int n );
@@ -0,0 +1,97 @@
+/*
+LAPACK routines used by the optional LAPACK solver backend.
+The addresses of the Fortran routines are supplied at run time by the Python
+wrapper, from the LAPACK shipped with SciPy, so no LAPACK is linked here.
+*/
+
+#include <stdio.h>
+#include <stdlib.h>
+
+#include "py_lapack.h"
+
+
+typedef void (*dpbtrf_t)( char *uplo, int *n, int *kd, double *ab, int *ldab,
+        int *info );
+
+typedef void (*dpbtrs_t)( char *uplo, int *n, int *kd, int *nrhs, double *ab,
+        int *ldab, double *b, int *ldb, int *info );
+
+typedef void (*dsygvx_t)( int *itype, char *jobz, char *range, char *uplo,
+        int *n, double *a, int *lda, double *b, int *ldb,
+        double *vl, double *vu, int *il, int *iu, double *abstol,
+        int *m, double *w, double *z, int *ldz,
+        double *work, int *lwork, int *iwork, int *ifail, int *info );
+
+static dpbtrf_t dpbtrf_ = NULL;
+static dpbtrs_t dpbtrs_ = NULL;
+static dsygvx_t dsygvx_ = NULL;
+
+
+/*------------------------------------------------------------------------------
+LAPACK_INIT - store the addresses of the LAPACK routines
+------------------------------------------------------------------------------*/
+void lapack_init( void *dpbtrf, void *dpbtrs, void *dsygvx ){
+
+    dpbtrf_ = (dpbtrf_t) dpbtrf;
+    dpbtrs_ = (dpbtrs_t) dpbtrs;
+    dsygvx_ = (dsygvx_t) dsygvx;
+}
+
+
+int lapack_available ( void ){
+
+    return dpbtrf_ != NULL && dpbtrs_ != NULL && dsygvx_ != NULL;
+}
+
+
+/*------------------------------------------------------------------------------
+LAPACK_DPBTRF - banded Cholesky factorization, upper triangle
+------------------------------------------------------------------------------*/
+void lapack_dpbtrf ( int n, int kd, double *AB, int *info ){
+
+    char uplo = 'U';
+    int ldab = kd+1;
+
+    dpbtrf_( &uplo, &n, &kd, AB, &ldab, info );
+}
+
+
+/*------------------------------------------------------------------------------
+LAPACK_DPBTRS - banded Cholesky back substitution for nrhs right hand sides
+------------------------------------------------------------------------------*/
+void lapack_dpbtrs ( int n, int kd, double *AB, double *B, int nrhs, int *info ){
+
+    char uplo = 'U';
+    int ldab = kd+1, ldb = n;
+
+    dpbtrs_( &uplo, &n, &kd, &nrhs, AB, &ldab, B, &ldb, info );
+}
+
+
+/*------------------------------------------------------------------------------
+LAPACK_DSYGVX - lowest m eigenpairs of the generalized problem K z = w M z
+------------------------------------------------------------------------------*/
+void lapack_dsygvx ( int n, int m, double *A, double *B, double *w, double *Z,
+        int *info ){
+
+    char jobz = 'V', range = 'I', uplo = 'U';
+    int itype = 1, il = 1, iu = m, found = 0, lwork = 8*n, i,
+        *iwork, *ifail;
+    double vl = 0.0, vu = 0.0, abstol = 0.0, *work, *wn;
+
+    work  = (double *) malloc( sizeof(double)*lwork );
+    wn    = (double *) malloc( sizeof(double)*n );     /* dsygvx may use n */
+    iwork = (int *) malloc( sizeof(int)*5*n );
+    ifail = (int *) malloc( sizeof(int)*n );
+
+    dsygvx_( &itype, &jobz, &range, &uplo, &n, A, &n, B, &n, &vl, &vu,
+            &il, &iu, &abstol, &found, wn, Z, &n,
+            work, &lwork, iwork, ifail, info );
+
+    for (i=0; i<m; i++)    w[i] = wn[i];
+
+    free(work);
+    free(wn);
+    free(iwork);
+    free(ifail);
+}
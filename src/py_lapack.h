@@ -0,0 +1,52 @@
+/*
+LAPACK routines used by the optional LAPACK solver backend.
+The library is not linked against LAPACK; the Python wrapper passes in the
+addresses of the routines that SciPy already ships (see set_lapack()).
+*/
+
+#ifndef PY_LAPACK_H
+#define PY_LAPACK_H
+
+
+/**
+    store the addresses of the LAPACK routines dpbtrf, dpbtrs and dsygvx
+*/
+void lapack_init(
+    void *dpbtrf,   /**< Cholesky factorization of a banded s.p.d. matrix */
+    void *dpbtrs,   /**< solution with the dpbtrf factor */
+    void *dsygvx    /**< selected eigenpairs of a generalized s.p.d. problem */
+);
+
+
+/**
+    1 if lapack_init() has been called with all of the routines, 0 otherwise
+*/
+int lapack_available ( void );
+
+
+/**
+    Cholesky factorization of the n by n s.p.d. matrix with half-bandwidth kd,
+    upper triangle stored column-major in AB[0..(kd+1)*n-1] with
+    A(i,j) = AB[kd+i-j + (j-1)*(kd+1)], i <= j.  info > 0 if not pos. def.
+*/
+void lapack_dpbtrf ( int n, int kd, double *AB, int *info );
+
+
+/**
+    solve [A]{x} = {b} for the nrhs columns of B[0..n*nrhs-1] (column-major)
+    with the factor from lapack_dpbtrf().  B is overwritten by the solutions.
+*/
+void lapack_dpbtrs ( int n, int kd, double *AB, double *B, int nrhs, int *info );
+
+
+/**
+    lowest m eigenvalues w[0..m-1] and M-normalized eigenvectors
+    Z[0..n*m-1] (column-major) of K z = w M z, with the upper triangles
+    of K and M stored column-major in A[0..n*n-1] and B[0..n*n-1].
+    A and B are destroyed.
+*/
+void lapack_dsygvx ( int n, int m, double *A, double *B, double *w, double *Z,
+        int *info );
+
+
+#endif /* PY_LAPACK_H */
@@ -18,6 +18,8 @@ Analog of main.c for direct calling (no input file needed)
 #include "HPGutil.h"
 #include "NRutil.h"
 #include "py_io.h"
+#include "py_lapack.h"
+#include "py_sensitivity.h"
 
 // for Windows to allow run() to be seen by DLL
 #ifdef _WIN64
@@ -32,13 +34,198 @@ Analog of main.c for direct calling (no input file needed)
 void init_pyframe3dd() { }
 
 
+/* memory for the load data of a block of load cases, unless the solver data
+   gives another; load cases are read, solved and reported one block at a
+   time, with one factorization of [K].  The load tables are ragged, sized to
+   the loads of each load case */
+#ifndef LOAD_BLOCK_BYTES
+#define LOAD_BLOCK_BYTES    (64*1024*1024)
+#endif
+
+
+/* free the load data of the load cases lc1 to lc2 */
+static void free_load_block ( int lc1, int lc2, int DoF,
+    float ***U, float ***W, float ***P, float ***T, float **Dp,
+    double **F_mech, double **F_temp, double **F, double ***feF,
+    double **Dt, double **Dm, double *rms_t, double *rms_m ){
+
+    free_R3matrix(U,lc1);
+    free_R3matrix(W,lc1);
+    free_R3matrix(P,lc1);
+    free_R3matrix(T,lc1);
+    free_matrix(Dp,lc1,lc2,1,DoF);
+
+    free_dmatrix(F_mech,lc1,lc2,1,DoF);
+    free_dmatrix(F_temp,lc1,lc2,1,DoF);
+    free_dmatrix(F,lc1,lc2,1,DoF);
+
+    free_R3dmatrix(feF,lc1);
+
+    if ( Dt != NULL ) { /* blocked solution */
+        free_dmatrix(Dt,lc1,lc2,1,DoF);
+        free_dmatrix(Dm,lc1,lc2,1,DoF);
+        free_dvector(rms_t,lc1,lc2);
+        free_dvector(rms_m,lc1,lc2);
+    }
+}
+
+
+// addresses of the LAPACK routines for the LAPACK solver backend
+ALLOW_DLL_CALL void set_lapack(void *dpbtrf, void *dpbtrs, void *dsygvx){
+
+    lapack_init(dpbtrf, dpbtrs, dsygvx);
+}
+
+
+
+/* the nodes, reactions and element connectivity of a frame, which are read
+   once and shared by the designs of a batch */
+typedef struct {
+
+    vec3    *xyz;       // X,Y,Z node coordinates (global)
+
+    float   *rj,        // node size radius, for finite sizes
+        *EKx, *EKy, *EKz,   // extra linear stiffness in global coord
+        *EKtx, *EKty, *EKtz;    // extra rotational stiffness in global coord
+
+    double  *L,         // node-to-node length of each element
+        *Le;            // effcve lngth, accounts for node size
+
+    int *N1, *N2,       // begin and end node numbers
+        *q, *r,         // free and restrained coordinates
+        nR,             // number of restrained nodes
+        sumR;           // total no. of reactions
+
+} Topology;
+
+
+/* allocate the topology t, and read the nodes, reactions and element
+   connectivity into it; t is freed with free_topology, also after an error */
+static int read_topology ( Nodes *nodes, Reactions *reactions,
+    Elements *elements, OtherElementData *other, Topology *t ){
+
+    int nN = nodes->nN,     // number of Nodes
+        nE = elements->nE,  // number of frame Elements
+        DoF = 6*nN,         // number of Degrees of Freedom
+        shear=0, geom=0,    // shear deformation and geometric nonlinearity
+        verbose=0,  // 1: copious screen output, 0: none
+        status=0;
+    double  exagg_static=10;
+    float   dx=1.0;
+
+    t->rj  =  vector(1,nN);     /* rigid radius around each node */
+    t->xyz = (vec3 *)malloc(sizeof(vec3)*(1+nN));  /* node coordinates */
+
+    t->q   = ivector(1,DoF);   /* allocate memory for reaction data ... */
+    t->r   = ivector(1,DoF);   /* allocate memory for reaction data ... */
+    t->EKx =  vector(1,nN);    /* extra linear stiffness in global coord */
+    t->EKy =  vector(1,nN);    /* extra linear stiffness in global coord */
+    t->EKz =  vector(1,nN);    /* extra linear stiffness in global coord */
+    t->EKtx =  vector(1,nN);    /* extra rotational stiffness in global coord */
+    t->EKty =  vector(1,nN);    /* extra rotational stiffness in global coord */
+    t->EKtz =  vector(1,nN);    /* extra rotational stiffness in global coord */
+
+    t->L   = dvector(1,nE);    /* length of each element       */
+    t->Le  = dvector(1,nE);    /* effective length of each element */
+    t->N1  = ivector(1,nE);    /* node #1 of each element      */
+    t->N2  = ivector(1,nE);    /* node #2 of each element      */
+
+    if ( verbose ) {    /* display nN */
+        fprintf(stdout," number of nodes ");
+        dots(stdout,36);    fprintf(stdout," nN =%4d ",nN);
+    }
+
+    status = read_node_data (nodes, nN, t->xyz, t->rj);
+    if ( status )   return(status);
+    if ( verbose )  printf(" ... complete\n");
+
+    status = read_run_data ( other, &shear, &geom, &exagg_static, &dx); // read this first because want geom for check in read_reaction_data
+    if ( status )   return(status);
+
+    status = read_reaction_data ( reactions, DoF, nN, &t->nR, t->q, t->r,
+        &t->sumR, verbose, geom,
+        t->EKx, t->EKy, t->EKz, t->EKtx, t->EKty, t->EKtz);
+    if ( status )   return(status);
+    if ( verbose )  fprintf(stdout," ... complete\n");
+
+    if ( verbose ) {    /* display nE */
+        fprintf(stdout," number of frame elements");
+        dots(stdout,28);    fprintf(stdout," nE =%4d ",nE);
+    }
+    if ( nN > nE + 1) { /* not enough elements */
+        fprintf(stderr,"\n  warning: %d nodes and %d members...", nN, nE );
+        fprintf(stderr," not enough elements to connect all nodes.\n");
+    }
+
+    return read_frame_element_connectivity( elements, nN, nE, t->xyz, t->rj,
+                    t->L, t->Le, t->N1, t->N2 );
+}
+
+
+/* free the topology t of a frame of nN nodes and nE elements */
+static void free_topology ( Topology *t, int nN, int nE ){
+
+    int DoF = 6*nN;
+
+    free(t->xyz);
+    free_vector(t->rj,1,nN);
+    free_ivector(t->q,1,DoF);
+    free_ivector(t->r,1,DoF);
+    free_vector(t->EKx,1,nN);
+    free_vector(t->EKy,1,nN);
+    free_vector(t->EKz,1,nN);
+    free_vector(t->EKtx,1,nN);
+    free_vector(t->EKty,1,nN);
+    free_vector(t->EKtz,1,nN);
+    free_dvector(t->L,1,nE);
+    free_dvector(t->Le,1,nE);
+    free_ivector(t->N1,1,nE);
+    free_ivector(t->N2,1,nE);
+}
+
+
+static int analyze(Topology *topo, Nodes* nodes, Reactions* reactions,
+    Elements* elements, OtherElementData* other, int nL, LoadCase* loadcases,
+    DynamicData *dynamic, ExtraInertia *extraInertia, ExtraMass *extraMass,
+    Condensation *condensation, SolverData *solver,
+    SensitivityData *sensitivity, OutputData *output,
+    Displacements* displacements, Forces* forces, ReactionForces* reactionForces,
+    InternalForces* internalForces, MassResults *massResults, ModalResults *modalResults);
+
 
 ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
     OtherElementData* other, int nL, LoadCase* loadcases,
     DynamicData *dynamic, ExtraInertia *extraInertia, ExtraMass *extraMass,
-    Condensation *condensation, // end of inputs, rest are outputs
+    Condensation *condensation, SolverData *solver,
+    SensitivityData *sensitivity,
+    OutputData *output, // end of inputs (NULL: all outputs), rest are outputs
     Displacements* displacements, Forces* forces, ReactionForces* reactionForces,
-    InternalForces** internalForces, MassResults *massResults, ModalResults *modalResults){
+    InternalForces* internalForces, MassResults *massResults, ModalResults *modalResults){
+
+    Topology topo;
+    int status;
+
+    status = read_topology ( nodes, reactions, elements, other, &topo );
+    if ( status == 0 )
+        status = analyze ( &topo, nodes, reactions, elements, other,
+                nL, loadcases, dynamic, extraInertia, extraMass,
+                condensation, solver, sensitivity, output,
+                displacements, forces, reactionForces, internalForces,
+                massResults, modalResults );
+    free_topology ( &topo, nodes->nN, elements->nE );
+
+    return(status);
+}
+
+
+/* the analysis of one design, with the topology already read */
+static int analyze(Topology *topo, Nodes* nodes, Reactions* reactions,
+    Elements* elements, OtherElementData* other, int nL, LoadCase* loadcases,
+    DynamicData *dynamic, ExtraInertia *extraInertia, ExtraMass *extraMass,
+    Condensation *condensation, SolverData *solver,
+    SensitivityData *sensitivity, OutputData *output,
+    Displacements* displacements, Forces* forces, ReactionForces* reactionForces,
+    InternalForces* internalForces, MassResults *massResults, ModalResults *modalResults){
 
 
     char errMsg[MAXL];       // the text of an error message
@@ -62,23 +249,41 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
         *rhox, *rhoy, *rhoz, // location of mass offset in global coord realtive to node
         *EKx, *EKy, *EKz, // extra linear stiffness in global coord
         *EKtx, *EKty, *EKtz, // extra rotational stiffness in global coord
-        gX[_NL_],   // gravitational acceleration in global X
-        gY[_NL_],   // gravitational acceleration in global Y
-        gZ[_NL_],   // gravitational acceleration in global Z
+        *gX=NULL,   // gravitational acceleration in global X
+        *gY=NULL,   // gravitational acceleration in global Y
+        *gZ=NULL,   // gravitational acceleration in global Z
         pan=1.0,    // >0: pan during animation; 0: don't
         dx=1.0;     // x-increment for internal force data
 
     double  **K=NULL,   // equilibrium stiffness matrix
+        *Ks=NULL,   // equilibrium stiffness matrix, profile storage
+        *Kf=NULL,   // L D L' decomposition of Ks, profile storage
         // **Ks=NULL,   // Broyden secant stiffness matrix
         traceK = 0.0,   // trace of the global stiffness matrix
         **M = NULL, // global mass matrix
+        *Ms = NULL, // global mass matrix, profile storage
+        **Ve = NULL,// mode-shapes in equation order, profile storage
+        *Kp = NULL, *Mp = NULL, // [K] and [M] in profile storage, eigen-sensitivities
         traceM = 0.0,   // trace of the global mass matrix
         **F_mech=NULL,  // mechanical load vectors,  load cases
         **F_temp=NULL,  // thermal load vectors, all load cases
         **F = NULL,     // general load vectors for each load case
-        ***feF_mech=NULL,// fixed end forces from mech loads
-        ***feF_temp=NULL,// fixed end forces from temp loads
+        ***feF=NULL,    // fixed end forces of each load
         *D=NULL, *dD=NULL,// displacement and displ increment
+        *diag=NULL, // diagonal of the L D L' decomp. of a linear K
+        *AB=NULL,   // banded Cholesky factor of a linear K, LAPACK backend
+        **Dt=NULL,  // temp. displacements of all load cases, blocked solve
+        **Dm=NULL,  // mech. displacements of all load cases, blocked solve
+        **Db=NULL, **Fb=NULL, // displ. and load vectors of a block
+        *rms_t=NULL, *rms_m=NULL, *rms_b=NULL, // RMS residuals, blocked solve
+        **Kn=NULL,  // [K] factored for modified Newton and Broyden iterations
+        *Ksn=NULL,  // Kn in profile storage
+        **Ke=NULL,  // elastic [K], kept for geometric nonlinearity
+        *Kse=NULL,  // Ke in profile storage
+        **Ds=NULL,  // Broyden steps since [K] was factored
+        *DsDs=NULL, // Ds' * Ds
+        nltol=1e-9, // convergence tolerance for geometric nonlinearity
+        error_old = 1.0,// rms equilibrium error at the previous iteration
         //dDdD = 0.0,   // dD' * dD
         *dF = NULL, // equilibrium error in nonlinear anlys
         *L  = NULL, // node-to-node length of each element
@@ -100,14 +305,17 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
     int nN=0,       // number of Nodes
         nE=0,       // number of frame Elements
         lc=0, // number of Load cases
+        lc1=1, lc2=0,   // first and last load case of a block
+        nLb=0,      // number of load cases in a block
         DoF=0, i, j,    // number of Degrees of Freedom
         nR=0,       // number of restrained nodes
-        nD[_NL_],   // number of prescribed nodal displ'nts
-        nF[_NL_],   // number of loaded nodes
-        nU[_NL_],   // number of members w/ unifm dist loads
-        nW[_NL_],   // number of members w/ trapz dist loads
-        nP[_NL_],   // number of members w/ conc point loads
-        nT[_NL_],   // number of members w/ temp. changes
+        *nD=NULL,   // number of prescribed nodal displ'nts
+        *nF=NULL,   // number of loaded nodes
+        *nU=NULL,   // number of members w/ unifm dist loads
+        *nW=NULL,   // number of members w/ trapz dist loads
+        *nP=NULL,   // number of members w/ conc point loads
+        *nT=NULL,   // number of members w/ temp. changes
+        *nFE=NULL,  // number of loads w/ fixed end forces
         nI=0,       // number of nodes w/ extra inertia
         nX=0,       // number of elemts w/ extra mass
         nC=0,       // number of condensed nodes
@@ -116,12 +324,29 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
         geom=0,     // indicates  geometric nonlinearity
         anlyz=1,    // 1: stiffness analysis, 0: data check
         *q=NULL,*r=NULL,sumR,   // reaction data, total no. of reactions
+        *sky=NULL,  // location of the diagonal of each column of Ks
+        *dof=NULL,  // equation number of each coordinate in Ks
+        *nmap=NULL, // node numbers after reordering
+        *skyM=NULL, *dofM=NULL, // profile of Kp and Mp
+        storage=0,  // 0: dense K, 1: profile (skyline) K
+        reorder=0,  // 1: renumber nodes to reduce the profile of Ks
+        block=0,    // 1: solve all load cases as one block of load vectors
+        nb=0,       // number of load vectors in a block
+        backend=0,  // 0: native solvers, 1: LAPACK solvers
+        *eqn=NULL,  // equation of each coordinate in the banded K_qq
+        *re=NULL,   // coordinate of each equation, profile storage
+        neq=0, kd=0, // number of equations and half-bandwidth of K_qq
+        nlmethod=0, // 0: Newton, 1: modified Newton, 2: Broyden iteration
+        nlmaxit=500,// maximum number of nonlinear iterations
+        nlrefactor=1,// iterations between factorizations of [K]
+        ns=0,       // iterations since [K] was factored
         nM=0,       // number of desired modes
-        Mmethod,    // 1: Subspace Jacobi, 2: Stodola
+        Mmethod,    // 1: Subspace Jacobi, 2: Stodola, 3: Lanczos
         nM_calc,    // number of modes to calculate
         lump=1,     // 1: lumped, 0: consistent mass matrix
         iter=0,     // number of iterations
         ok=1,       // number of (-ve) diag. terms of L D L'
+        pd=0,       // number of (-ve) diag. terms of L D L' of a linear K
         anim[20],   // the modes to be animated
         Cdof=0,     // number of condensed degrees o freedom
         Cmethod=0,  // matrix condensation method
@@ -130,8 +355,13 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
         write_matrix=0,  //   write stiffness and mass matrix
         // filetype=0, // 1 if .CSV, 2 if file is Matlab
         debug=0,    // 1: debugging screen output, 0: none
-        verbose=0;  // 1: copious screen output, 0: none
+        verbose=0,  // 1: copious screen output, 0: none
+        needQ=1,    // 1: end forces {Q} are output, or needed for an output
+        needR=1,    // 1: reaction forces are output
+        status=0;   // 0: ok, or the code of an input or analysis error
 
+    size_t  bytes=0,    // memory for the load data of a block
+        blockbytes=LOAD_BLOCK_BYTES; // the most memory for a block
 
     if ( verbose ) { /*  display program name, version and license type */
         textColor('w','b','b','x');
@@ -146,51 +376,31 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
 
 
     nN = nodes->nN;  /* number of nodes  */
-    if ( verbose ) {    /* display nN */
-        fprintf(stdout," number of nodes ");
-        dots(stdout,36);    fprintf(stdout," nN =%4d ",nN);
-    }
-
-                    /* allocate memory for node data ... */
-    rj  =  vector(1,nN);        /* rigid radius around each node */
-    xyz = (vec3 *)malloc(sizeof(vec3)*(1+nN));  /* node coordinates */
-
-    read_node_data (nodes, nN, xyz, rj);
-    if ( verbose )  printf(" ... complete\n");
-
+    nE = elements->nE;  /* number of frame elements */
     DoF = 6*nN;     /* total number of degrees of freedom   */
 
-    read_run_data ( other, &shear, &geom, &exagg_static, &dx); // read this first because want geom for check in read_reaction_data
-
-    q   = ivector(1,DoF);   /* allocate memory for reaction data ... */
-    r   = ivector(1,DoF);   /* allocate memory for reaction data ... */
-    EKx =  vector(1,nN);    /* extra linear stiffness in global coord */
-    EKy =  vector(1,nN);    /* extra linear stiffness in global coord */
-    EKz =  vector(1,nN);    /* extra linear stiffness in global coord */
-    EKtx =  vector(1,nN);    /* extra rotational stiffness in global coord */
-    EKty =  vector(1,nN);    /* extra rotational stiffness in global coord */
-    EKtz =  vector(1,nN);    /* extra rotational stiffness in global coord */
-    read_reaction_data ( reactions, DoF, nN, &nR, q, r, &sumR, verbose, geom,
-        EKx, EKy, EKz, EKtx, EKty, EKtz);
-    if ( verbose )  fprintf(stdout," ... complete\n");
-
-    nE = elements->nE;  /* number of frame elements */
-    if ( verbose ) {    /* display nE */
-        fprintf(stdout," number of frame elements");
-        dots(stdout,28);    fprintf(stdout," nE =%4d ",nE);
+    if ( output ) { /* skip the results that are not output */
+        needQ = output->nQ > 0 || internalForces->offset[nE] > 0;
+        needR = output->nR > 0;
     }
-    if ( nN > nE + 1) { /* not enough elements */
-        fprintf(stderr,"\n  warning: %d nodes and %d members...", nN, nE );
-        fprintf(stderr," not enough elements to connect all nodes.\n");
+
+    if ( nL < 1 && dynamic->nM < 1 ) { /* not enough load cases */
+        errorMsg("\n ERROR: the number of load cases must be at least 1\n");
+        return(101);
     }
 
-                /* allocate memory for frame elements ... */
-    L   = dvector(1,nE);    /* length of each element       */
-    Le  = dvector(1,nE);    /* effective length of each element */
+    /* allocate all of the input data before reading it, so that an error
+       in the input data can return after freeing everything */
 
-    N1  = ivector(1,nE);    /* node #1 of each element      */
-    N2  = ivector(1,nE);    /* node #2 of each element      */
+    xyz = topo->xyz;    rj  = topo->rj;     /* the topology, read once */
+    q   = topo->q;      r   = topo->r;
+    EKx = topo->EKx;    EKy = topo->EKy;    EKz = topo->EKz;
+    EKtx = topo->EKtx;  EKty = topo->EKty;  EKtz = topo->EKtz;
+    L   = topo->L;      Le  = topo->Le;
+    N1  = topo->N1;     N2  = topo->N2;
+    nR  = topo->nR;     sumR = topo->sumR;
 
+                /* allocate memory for frame elements ... */
     Ax  =  vector(1,nE);    /* cross section area of each element   */
     Asy =  vector(1,nE);    /* shear area in local y direction  */
     Asz =  vector(1,nE);    /* shear area in local z direction  */
@@ -203,43 +413,20 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
     p   =  vector(1,nE);    /* member rotation angle about local x axis */
     d   =  vector(1,nE);    /* member rotation angle about local x axis */
 
-    read_frame_element_data( elements, nN, nE, xyz, rj, L, Le, N1, N2,
-                    Ax, Asy, Asz, Jx, Iy, Iz, E, G, p, d );
-
-    if ( verbose)   fprintf(stdout," ... complete\n");
-
-
-
-    if ( verbose ) {    /* display nL */
-        fprintf(stdout," number of load cases ");
-        dots(stdout,31);    fprintf(stdout," nL = %3d \n",nL);
-    }
-
-    if ( nL < 1 ) { /* not enough load cases */
-        errorMsg("\n ERROR: the number of load cases must be at least 1\n");
-        exit(101);
-    }
-    if ( nL >= _NL_ ) { /* too many load cases */
-        sprintf(errMsg,"\n ERROR: maximum of %d load cases allowed\n", _NL_-1);
-        errorMsg(errMsg);
-        exit(102);
-    }
-                    /* allocate memory for loads ... */
-    U   =  D3matrix(1,nL,1,nE,1,4);    /* uniform load on each member */
-    W   =  D3matrix(1,nL,1,10*nE,1,13);/* trapezoidal load on each member */
-    P   =  D3matrix(1,nL,1,10*nE,1,5); /* internal point load each member */
-    T   =  D3matrix(1,nL,1,nE,1,8);    /* internal temp change each member*/
-    Dp  =  matrix(1,nL,1,DoF); /* prescribed displacement of each node */
-
-    F_mech  = dmatrix(1,nL,1,DoF);  /* mechanical load vector   */
-    F_temp  = dmatrix(1,nL,1,DoF);  /* temperature load vector  */
-    F       = dmatrix(1,nL,1,DoF);  /* external load vectors    */
+    if ( nL > 0 ) {     /* allocate memory for the load counts ... */
+        gX  =  vector(1,nL);    /* gravitational acceleration */
+        gY  =  vector(1,nL);
+        gZ  =  vector(1,nL);
+        nF  = ivector(1,nL);    /* number of loads of each type */
+        nU  = ivector(1,nL);
+        nW  = ivector(1,nL);
+        nP  = ivector(1,nL);
+        nT  = ivector(1,nL);
+        nD  = ivector(1,nL);
+        nFE = ivector(1,nL);
+    }   /* ... the load data are allocated for each block of load cases */
     dF  = dvector(1,DoF);   /* equilibrium error {F} - [K]{D} */
 
-    feF_mech =  D3dmatrix(1,nL,1,nE,1,12); /* feF due to mech loads */
-    feF_temp =  D3dmatrix(1,nL,1,nE,1,12); /* feF due to temp loads */
-
-    K   = dmatrix(1,DoF,1,DoF); /* global stiffness matrix  */
     Q   = dmatrix(1,nE,1,12);   /* end forces for each member   */
 
     D   = dvector(1,DoF);   /* displacments of each node        */
@@ -261,26 +448,73 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
     m = ivector(1,DoF);     /* vector of condensed mode numbers */
 
 
-    read_and_assemble_loads( loadcases, nN, nE, nL, DoF, xyz, L, Le, N1, N2,
-            Ax, Asy, Asz, Iy, Iz, E, G, p,
-            d, gX, gY, gZ, r, shear,
-            nF, nU, nW, nP, nT, nD,
-            Q, F_temp, F_mech, F, U, W, P, T,
-            Dp, feF_mech, feF_temp, verbose );
+    status = read_run_data ( other, &shear, &geom, &exagg_static, &dx);
+    if ( status )   goto cleanup;
 
-    if ( verbose ) {    /* display load data complete */
-        fprintf(stdout,"                                                     ");
-        fprintf(stdout," load data ... complete\n");
+    status = read_frame_element_properties( elements, nE,
+                    Ax, Asy, Asz, Jx, Iy, Iz, E, G, p, d );
+    if ( status )   goto cleanup;
+
+    if ( verbose)   fprintf(stdout," ... complete\n");
+
+
+
+    if ( verbose ) {    /* display nL */
+        fprintf(stdout," number of load cases ");
+        dots(stdout,31);    fprintf(stdout," nL = %3d \n",nL);
     }
 
+    status = read_solver_data( solver, &storage, &reorder, &block, &backend,
+            &nlmethod, &nltol, &nlmaxit, &nlrefactor, &blockbytes );
+    if ( status )   goto cleanup;
+
+    if ( storage ) {    /* global stiffness matrix in profile storage */
+        sky = ivector(0,DoF);
+        dof = ivector(1,DoF);
+        if ( solver->symbolic && solver->symbolic[0] ) { /* same topology */
+            for (i=0; i<=DoF; i++)  sky[i] = solver->symbolic[1+i];
+            for (i=1; i<=DoF; i++)  dof[i] = solver->symbolic[1+DoF+i];
+        } else {
+            for (i=1; i<=DoF; i++)  dof[i] = i;
+            skyline_profile( sky, dof, DoF, nE, N1, N2 );
+            solver->profile[0] = sky[DoF];
+
+            if ( reorder ) {    /* renumber the nodes to reduce the profile */
+                nmap = ivector(1,nN);
+                reorder_nodes_rcm( nN, nE, N1, N2, nmap );
+                for (i=1; i<=DoF; i++)  dof[i] = 6*nmap[(i-1)/6+1] - 5 + (i-1)%6;
+                skyline_profile( sky, dof, DoF, nE, N1, N2 );
+                if ( sky[DoF] > solver->profile[0] ) {  /* keep user order */
+                    for (i=1; i<=DoF; i++)  dof[i] = i;
+                    skyline_profile( sky, dof, DoF, nE, N1, N2 );
+                }
+                free_ivector(nmap,1,nN);
+            }
+            if ( solver->symbolic ) {   /* keep the profile for later runs */
+                for (i=0; i<=DoF; i++)  solver->symbolic[1+i] = sky[i];
+                for (i=1; i<=DoF; i++)  solver->symbolic[1+DoF+i] = dof[i];
+                solver->symbolic[0] = 1;
+            }
+        }
+        solver->profile[1] = sky[DoF];
+
+        Ks  = dvector(1,sky[DoF]);
+        Kf  = dvector(1,sky[DoF]);
+        if ( verbose ) {
+            fprintf(stdout," stiffness matrix profile ");
+            dots(stdout,27);    fprintf(stdout," %d terms\n", sky[DoF]);
+        }
+    } else
+        K   = dmatrix(1,DoF,1,DoF); /* global stiffness matrix  */
 
-    read_mass_data( dynamic, extraInertia, extraMass, nN, nE, &nI, &nX,
+    status = read_mass_data( dynamic, extraInertia, extraMass, nN, nE, &nI, &nX,
             d, EMs, NMs, NMx, NMy, NMz,
             NMxy, NMxz, NMyz, rhox, rhoy, rhoz,
             L, Ax, &total_mass, &struct_mass, &nM,
             &Mmethod, &lump, &tol, &shift,
             &exagg_modal, anim, &pan,
             verbose, debug );
+    if ( status )   goto cleanup;
 
     if ( verbose ) {    /* display mass data complete */
         fprintf(stdout,"                                                     ");
@@ -288,8 +522,9 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
     }
 
 
-    read_condensation_data( condensation, nN, nM, &nC, &Cdof,
+    status = read_condensation_data( condensation, nN, nM, &nC, &Cdof,
             &Cmethod, c, m, verbose );
+    if ( status )   goto cleanup;
 
     if( nC>0 && verbose ) { /*  display condensation data complete */
         fprintf(stdout,"                                      ");
@@ -297,10 +532,176 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
     }
 
 
-    // if ( anlyz ) {          /* solve the problem    */
-    srand(time(NULL));
+
+
+    if ( !geom && nL > 0 ) {  /* linear analysis: factor [K] once for all load cases */
+
+        diag = dvector(1,DoF);
+
+        for (i=1; i<=nE; i++)   for (j=1;j<=12;j++) Q[i][j] = 0.0;
+
+        if ( storage ) {
+            assemble_K_sky ( Ks, sky, dof, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
+                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p,
+                    shear, geom, Q, debug,
+                    EKx, EKy, EKz, EKtx, EKty, EKtz );
+        } else {
+            assemble_K ( K, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
+                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p,
+                    shear, geom, Q, debug,
+                    EKx, EKy, EKz, EKtx, EKty, EKtz );
+#ifdef MATRIX_DEBUG
+            save_dmatrix ( "Ku", K, 1,DoF, 1,DoF, 0, "w" ); // unloaded stiffness matrix
+#endif
+        }
+
+        if ( backend ) {    /* banded Cholesky factor of K_qq */
+            eqn = ivector(1,DoF);
+            neq = band_system ( K, sky, dof, DoF, q, eqn, &kd );
+            AB  = dvector(0,(kd+1)*neq-1);
+            factor_system_band ( K, Ks, sky, dof, AB, kd, eqn, neq, DoF, &pd );
+        } else if ( storage )
+            factor_system_sky ( Ks, Kf, sky, dof, diag, DoF, q, r, &pd );
+        else
+            factor_system ( K, diag, DoF, q, r, &pd );
+    }
+
+    if ( geom && nL > 0 ) { /* assemble the elastic [K] once for all iterations */
+
+        for (i=1; i<=nE; i++)   for (j=1;j<=12;j++) Q[i][j] = 0.0;
+
+        if ( storage ) {
+            Kse = dvector(1,sky[DoF]);
+            assemble_K_sky ( Kse, sky, dof, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
+                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p,
+                    shear, 0, Q, debug,
+                    EKx, EKy, EKz, EKtx, EKty, EKtz );
+        } else {
+            Ke  = dmatrix(1,DoF,1,DoF);
+            assemble_K ( Ke, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
+                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p,
+                    shear, 0, Q, debug,
+                    EKx, EKy, EKz, EKtx, EKty, EKtz );
+        }
+    }
+
+    if ( geom && nlmethod > 0 ) { /* keep a factored [K] between iterations */
+        diag = dvector(1,DoF);
+        if ( storage )  Ksn = dvector(1,sky[DoF]);
+        else            Kn  = dmatrix(1,DoF,1,DoF);
+        if ( backend )  eqn = ivector(1,DoF);
+        if ( nlmethod == 2 ) {
+            Ds   = dmatrix(1,nlrefactor,1,DoF);
+            DsDs = dvector(1,nlrefactor);
+        }
+    }
+
     for (lc=1; lc<=nL; lc++) { /* begin load case analysis loop */
 
+        if ( lc > lc2 ) {   /* read the loads of the next block of load cases */
+
+            if ( F != NULL ) {
+                free_load_block ( lc1, lc2, DoF, U, W, P, T, Dp,
+                        F_mech, F_temp, F, feF, Dt, Dm, rms_t, rms_m );
+                U = W = P = T = NULL;   Dp = NULL;
+                F_mech = F_temp = F = Dt = Dm = NULL;
+                feF = NULL;
+                rms_t = rms_m = NULL;
+            }
+
+            lc1 = lc;       /* the load cases whose load data fit in the block */
+            for (bytes=0, lc2=lc1; lc2<=nL; lc2++) {
+                count_loads ( &loadcases[lc2-1], nE,
+                        &nU[lc2], &nW[lc2], &nP[lc2], &nT[lc2], &nFE[lc2] );
+                bytes += sizeof(float)*(DoF + 4*nU[lc2] + 13*nW[lc2] +
+                            5*nP[lc2] + 8*nT[lc2]) +
+                        sizeof(float*)*(nU[lc2] + nW[lc2] + nP[lc2] + nT[lc2]) +
+                        sizeof(double)*((block ? 5 : 3)*DoF + 13*nFE[lc2]) +
+                        sizeof(double*)*nFE[lc2];
+                if ( bytes > blockbytes && lc2 > lc1 )  break;
+            }
+            --lc2;
+            nLb = lc2 - lc1 + 1;
+
+            U   = R3matrix(lc1,lc2,nU,1,4);   /* uniform loads        */
+            W   = R3matrix(lc1,lc2,nW,1,13);  /* trapezoidal loads    */
+            P   = R3matrix(lc1,lc2,nP,1,5);   /* internal point loads */
+            T   = R3matrix(lc1,lc2,nT,1,8);   /* temperature changes  */
+            Dp  =  matrix(lc1,lc2,1,DoF); /* prescribed displacement of each node */
+
+            F_mech  = dmatrix(lc1,lc2,1,DoF);  /* mechanical load vector   */
+            F_temp  = dmatrix(lc1,lc2,1,DoF);  /* temperature load vector  */
+            F       = dmatrix(lc1,lc2,1,DoF);  /* external load vectors    */
+
+            feF = R3dmatrix(lc1,lc2,nFE,0,12); /* element and feF of each load */
+
+            status = read_and_assemble_loads( loadcases, nN, nE, nL, lc1, lc2, DoF,
+                xyz, L, Le, N1, N2,
+                Ax, Asy, Asz, Iy, Iz, E, G, p,
+                d, gX, gY, gZ, r, shear,
+                nF, nU, nW, nP, nT, nD,
+                Q, F_temp, F_mech, F, U, W, P, T,
+                Dp, feF, verbose );
+            if ( status )   goto cleanup;
+
+            if ( verbose ) {    /* display load data complete */
+                fprintf(stdout,"                                                     ");
+                fprintf(stdout," load data ... complete\n");
+            }
+
+            if ( !geom && block && pd >= 0 ) { /* solve the block together */
+                Dt  = dmatrix(lc1,lc2,1,DoF);
+                Dm  = dmatrix(lc1,lc2,1,DoF);
+                rms_t = dvector(lc1,lc2);
+                rms_m = dvector(lc1,lc2);
+                rms_b = dvector(1,nLb);
+                Db  = (double **)malloc(sizeof(double*)*(1+nLb));
+                Fb  = (double **)malloc(sizeof(double*)*(1+nLb));
+
+                /* temperature loads of the block ... */
+                for (nb=0, i=lc1; i<=lc2; i++) {
+                    for (j=1; j<=DoF; j++)  Dt[i][j] = 0.0;
+                    if ( nT[i] > 0 ) {
+                        ++nb;
+                        Db[nb] = Dt[i];
+                        Fb[nb] = F_temp[i];
+                    }
+                }
+                if ( backend )
+                    back_solve_system_band_mrhs(K,Ks,sky,dof,AB,kd,eqn,neq,Db,Fb,nb,DoF,q,r,rms_b);
+                else if ( storage )
+                    back_solve_system_sky_mrhs(Ks,Kf,sky,dof,diag,Db,Fb,nb,DoF,q,r,rms_b);
+                else
+                    back_solve_system_mrhs(K,diag,Db,Fb,nb,DoF,q,r,rms_b);
+                for (nb=0, i=lc1; i<=lc2; i++)  if ( nT[i] > 0 ) rms_t[i] = rms_b[++nb];
+
+                /* ... and mechanical loads of the block */
+                for (nb=0, i=lc1; i<=lc2; i++) {
+                    for (j=1; j<=DoF; j++)  Dm[i][j] = r[j] ? Dp[i][j] : 0.0;
+                    if ( nF[i]>0 || nU[i]>0 || nW[i]>0 || nP[i]>0 || nD[i]>0 ||
+                         gX[i] != 0 || gY[i] != 0 || gZ[i] != 0 ) {
+                        ++nb;
+                        Db[nb] = Dm[i];
+                        Fb[nb] = F_mech[i];
+                    }
+                }
+                if ( backend )
+                    back_solve_system_band_mrhs(K,Ks,sky,dof,AB,kd,eqn,neq,Db,Fb,nb,DoF,q,r,rms_b);
+                else if ( storage )
+                    back_solve_system_sky_mrhs(Ks,Kf,sky,dof,diag,Db,Fb,nb,DoF,q,r,rms_b);
+                else
+                    back_solve_system_mrhs(K,diag,Db,Fb,nb,DoF,q,r,rms_b);
+                for (nb=0, i=lc1; i<=lc2; i++)
+                    if ( nF[i]>0 || nU[i]>0 || nW[i]>0 || nP[i]>0 || nD[i]>0 ||
+                         gX[i] != 0 || gY[i] != 0 || gZ[i] != 0 )
+                        rms_m[i] = rms_b[++nb];
+
+                free(Db);
+                free(Fb);
+                free_dvector(rms_b,1,nLb);
+            }
+        }
+
         if ( verbose ) {    /* display the load case number  */
             fprintf(stdout,"\n");
             textColor('y','g','b','x');
@@ -319,13 +720,16 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
         for (i=1; i<=nE; i++)   for (j=1;j<=12;j++) Q[i][j] = 0.0;
 
         /*  assemble stiffness matrix [K({D}^(i))], {D}^(0)={0} (i=0) */
-        assemble_K ( K, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
-                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p,
-                    shear, geom, Q, debug,
-                    EKx, EKy, EKz, EKtx, EKty, EKtz );
+        if ( geom && storage )
+            assemble_Kg_sky ( Ks, Kse, sky, dof, DoF, nE, xyz, rj, L, Le, N1, N2,
+                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p, shear, Q );
+        if ( geom && !storage )
+            assemble_Kg ( K, Ke, DoF, nE, xyz, rj, L, Le, N1, N2,
+                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p, shear, Q );
 
 #ifdef MATRIX_DEBUG
-        save_dmatrix ( "Ku", K, 1,DoF, 1,DoF, 0, "w" ); // unloaded stiffness matrix
+        if ( geom && !storage )
+            save_dmatrix ( "Ku", K, 1,DoF, 1,DoF, 0, "w" ); // unloaded stiffness matrix
 #endif
 
         /* first apply temperature loads only, if there are any ... */
@@ -334,7 +738,24 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
                 fprintf(stdout," Linear Elastic Analysis ... Temperature Loads\n");
 
             /*  solve {F_t} = [K({D=0})] * {D_t} */
-            solve_system(K,dD,F_temp[lc],DoF,q,r,&ok,verbose,&rms_resid);
+            if ( !geom ) {  /* back-substitute with the factored [K] */
+                ok = pd;
+                if ( ok >= 0 && block ) {   /* solved with all load cases */
+                    for (i=1; i<=DoF; i++)  dD[i] = Dt[lc][i];
+                    rms_resid = rms_t[lc];
+                }
+                if ( ok >= 0 && !block && backend )
+                    back_solve_system_band(K,Ks,sky,dof,AB,kd,eqn,neq,dD,F_temp[lc],DoF,q,r,&ok,verbose,&rms_resid);
+                if ( ok >= 0 && !block && !backend && storage )
+                    back_solve_system_sky(Ks,Kf,sky,dof,diag,dD,F_temp[lc],DoF,q,r,&ok,verbose,&rms_resid);
+                if ( ok >= 0 && !block && !backend && !storage )
+                    back_solve_system(K,diag,dD,F_temp[lc],DoF,q,r,&ok,verbose,&rms_resid);
+            } else if ( backend )
+                solve_system_band(K,Ks,sky,dof,dD,F_temp[lc],DoF,q,r,&ok,verbose,&rms_resid);
+            else if ( storage )
+                solve_system_sky(Ks,Kf,sky,dof,dD,F_temp[lc],DoF,q,r,&ok,verbose,&rms_resid);
+            else
+                solve_system(K,dD,F_temp[lc],DoF,q,r,&ok,verbose,&rms_resid);
 
             /* increment {D_t} = {0} + {D_t} temp.-induced displ */
             for (i=1; i<=DoF; i++)  if (q[i]) D[i] += dD[i];
@@ -345,10 +766,12 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
                 Ax, Asy,Asz, Jx,Iy,Iz, E,G, p, D, shear, geom );
 
              /* assemble temp.-stressed stiffness [K({D_t})]     */
-             assemble_K ( K, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
-                        Ax,Asy,Asz, Jx,Iy,Iz, E, G, p,
-                        shear,geom, Q, debug,
-                        EKx, EKy, EKz, EKtx, EKty, EKtz );
+             if ( storage )
+                assemble_Kg_sky ( Ks, Kse, sky, dof, DoF, nE, xyz, rj, L, Le, N1, N2,
+                        Ax,Asy,Asz, Jx,Iy,Iz, E, G, p, shear, Q );
+             else
+                assemble_Kg ( K, Ke, DoF, nE, xyz, rj, L, Le, N1, N2,
+                        Ax,Asy,Asz, Jx,Iy,Iz, E, G, p, shear, Q );
             }
         }
 
@@ -360,7 +783,24 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
             for (i=1; i<=DoF; i++)  if (r[i]) dD[i] = Dp[lc][i];
 
             /*  solve {F_m} = [K({D_t})] * {D_m}    */
-            solve_system(K,dD,F_mech[lc],DoF,q,r,&ok,verbose,&rms_resid);
+            if ( !geom ) {  /* back-substitute with the factored [K] */
+                ok = pd;
+                if ( ok >= 0 && block ) {   /* solved with all load cases */
+                    for (i=1; i<=DoF; i++)  dD[i] = Dm[lc][i];
+                    rms_resid = rms_m[lc];
+                }
+                if ( ok >= 0 && !block && backend )
+                    back_solve_system_band(K,Ks,sky,dof,AB,kd,eqn,neq,dD,F_mech[lc],DoF,q,r,&ok,verbose,&rms_resid);
+                if ( ok >= 0 && !block && !backend && storage )
+                    back_solve_system_sky(Ks,Kf,sky,dof,diag,dD,F_mech[lc],DoF,q,r,&ok,verbose,&rms_resid);
+                if ( ok >= 0 && !block && !backend && !storage )
+                    back_solve_system(K,diag,dD,F_mech[lc],DoF,q,r,&ok,verbose,&rms_resid);
+            } else if ( backend )
+                solve_system_band(K,Ks,sky,dof,dD,F_mech[lc],DoF,q,r,&ok,verbose,&rms_resid);
+            else if ( storage )
+                solve_system_sky(Ks,Kf,sky,dof,dD,F_mech[lc],DoF,q,r,&ok,verbose,&rms_resid);
+            else
+                solve_system(K,dD,F_mech[lc],DoF,q,r,&ok,verbose,&rms_resid);
 
             /* combine {D} = {D_t} + {D_m}  */
             for (i=1; i<=DoF; i++) {
@@ -372,8 +812,9 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
         /*  combine {F} = {F_t} + {F_m} */
         for (i=1; i<=DoF; i++)  F[lc][i] = F_temp[lc][i] + F_mech[lc][i];
 
-        /*  element forces {Q} for displacements {D}    */
-        element_end_forces ( Q, nE, xyz, L, Le, N1,N2,
+        /*  element forces {Q} for displacements {D}, if they are needed */
+        if ( geom || needQ )
+            element_end_forces ( Q, nE, xyz, L, Le, N1,N2,
                 Ax, Asy,Asz, Jx,Iy,Iz, E,G, p, D, shear, geom );
 
         if ( geom && verbose )
@@ -393,26 +834,66 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
 
         /* quasi Newton-Raphson iteration for geometric nonlinearity */
         ok = 0; iter = 0; error = 1.0;  /* re-initialize */
-        while ( geom && error > tol && iter < 500 && ok >= 0) {
+        while ( geom && error > nltol && iter < nlmaxit && ok >= 0) {
 
             ++iter;
 
-            /*  assemble stiffness matrix [K({D}^(i))]  */
-            assemble_K ( K, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
-                Ax,Asy,Asz, Jx,Iy,Iz, E, G, p,
-                shear,geom, Q, debug,
-                EKx, EKy, EKz, EKtx, EKty, EKtz );
+            /*  assemble stiffness matrix [K({D}^(i))] = [Ke] + [Kg({D}^(i))] */
+            if ( storage )
+                assemble_Kg_sky ( Ks, Kse, sky, dof, DoF, nE, xyz, rj, L, Le, N1, N2,
+                    Ax,Asy,Asz, Jx,Iy,Iz, E, G, p, shear, Q );
+            else
+                assemble_Kg ( K, Ke, DoF, nE, xyz, rj, L, Le, N1, N2,
+                    Ax,Asy,Asz, Jx,Iy,Iz, E, G, p, shear, Q );
 
             /*  compute equilibrium error, {dF}, at iteration i */
             /*  {dF}^(i) = {F} - [K({D}^(i))]*{D}^(i) */
             /*  convergence criteria = || {dF}^(i) ||  /  || F || */
-            error = equilibrium_error ( dF, F[lc], K, D, DoF, q );
+            if ( storage )
+                error = equilibrium_error_sky ( dF, F[lc], Ks, sky, dof, D, DoF, q );
+            else
+                error = equilibrium_error ( dF, F[lc], K, D, DoF, q );
 
             // Powell-Symmetric-Broyden secant stiffness update
             // PSB_update ( Ks, dF, dD, DoF );  /* not helpful? */
 
             /*  solve {dF}^(i) = [K({D}^(i))] * {dD}^(i) */
-            solve_system(K,dD,dF,DoF,q,r,&ok,verbose,&rms_resid);
+            if ( nlmethod == 0 ) {  /* Newton: factor [K] every iteration */
+                if ( backend )
+                    solve_system_band(K,Ks,sky,dof,dD,dF,DoF,q,r,&ok,verbose,&rms_resid);
+                else if ( storage )
+                    solve_system_sky(Ks,Kf,sky,dof,dD,dF,DoF,q,r,&ok,verbose,&rms_resid);
+                else
+                    solve_system(K,dD,dF,DoF,q,r,&ok,verbose,&rms_resid);
+            } else {    /* modified Newton or Broyden: re-use the factored [K] */
+                if ( iter == 1 || ns >= nlrefactor || error > 0.5*error_old ) {
+                    if ( storage )
+                        for (i=1; i<=sky[DoF]; i++)  Ksn[i] = Ks[i];
+                    else
+                        for (i=1; i<=DoF; i++)
+                            for (j=1; j<=DoF; j++)  Kn[i][j] = K[i][j];
+                    if ( backend ) {
+                        if ( AB != NULL )   free_dvector(AB,0,(kd+1)*neq-1);
+                        neq = band_system ( Kn, sky, dof, DoF, q, eqn, &kd );
+                        AB  = dvector(0,(kd+1)*neq-1);
+                        factor_system_band ( Kn, Ksn, sky, dof, AB, kd, eqn, neq, DoF, &ok );
+                    } else if ( storage )
+                        factor_system_sky ( Ksn, Kf, sky, dof, diag, DoF, q, r, &ok );
+                    else
+                        factor_system ( Kn, diag, DoF, q, r, &ok );
+                    ns = 0;
+                }
+                if ( ok >= 0 && backend )
+                    back_solve_system_band(Kn,Ksn,sky,dof,AB,kd,eqn,neq,dD,dF,DoF,q,r,&ok,verbose,&rms_resid);
+                if ( ok >= 0 && !backend && storage )
+                    back_solve_system_sky(Ksn,Kf,sky,dof,diag,dD,dF,DoF,q,r,&ok,verbose,&rms_resid);
+                if ( ok >= 0 && !backend && !storage )
+                    back_solve_system(Kn,diag,dD,dF,DoF,q,r,&ok,verbose,&rms_resid);
+                if ( ok >= 0 && nlmethod == 2 )
+                    broyden_update ( dD, Ds, DsDs, ns, DoF );
+                ++ns;
+            }
+            error_old = error;
 
             if ( ok < 0 ) { /*  K is not pos.def.  */
                 fprintf(stderr,"   The stiffness matrix is not pos-def. \n");
@@ -433,12 +914,15 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
             }
         }           /* end quasi Newton-Raphson iteration */
 
-        compute_reaction_forces( F[lc], K, D, DoF, r );
+        if ( needR && storage )
+            compute_reaction_forces_sky( F[lc], Ks, sky, dof, D, DoF, r );
+        if ( needR && !storage )
+            compute_reaction_forces( F[lc], K, D, DoF, r );
 
-        add_feF ( xyz, L, N1,N2, p, Q, feF_temp[lc], feF_mech[lc],
-                nE, DoF, F[lc], r, verbose );
+        add_feF_rows ( xyz, L, N1,N2, p, Q, feF[lc], nFE[lc],
+                needR ? F[lc] : NULL, r );
 
-        if ( write_matrix ) /* write static stiffness matrix */
+        if ( write_matrix && !storage ) /* write static stiffness matrix */
             save_ut_dmatrix ( "Ks", K, DoF, "w" );
 
         // TODO:
@@ -447,19 +931,39 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
 
 
 
-        write_static_results ( displacements, forces, reactionForces,
+        write_static_results ( displacements, forces, reactionForces, output,
             reactions, nR,
             nN, nE, nL, lc, DoF, N1, N2,
             F[lc], D, r, Q, rms_resid, ok );
 
 
-        write_internal_forces ( internalForces, lc, nL, dx, xyz,
+        if ( internalForces->offset[nE] > 0 && internalForces->extrema )
+            write_internal_force_extrema ( internalForces, lc, nL, xyz,
+                    Q, nN, nE, L, N1, N2,
+                    Ax, Asy, Asz, Jx, Iy, Iz, E, G, p,
+                    d, gX[lc], gY[lc], gZ[lc],
+                    nU[lc], U[lc], nW[lc], W[lc], nP[lc], P[lc],
+                    D, shear );
+        else if ( internalForces->offset[nE] > 0 )
+            write_internal_forces ( internalForces, lc, nL, dx, xyz,
                     Q, nN, nE, L, N1, N2,
                     Ax, Asy, Asz, Jx, Iy, Iz, E, G, p,
                     d, gX[lc], gY[lc], gZ[lc],
                     nU[lc], U[lc], nW[lc], W[lc], nP[lc], P[lc],
                     D, shear, error );
 
+        if ( sensitivity->method > 0 && !geom && ok >= 0 )
+            static_sensitivity ( nN, nE, DoF, xyz, rj, N1, N2,
+                    Ax, Asy, Asz, Jx, Iy, Iz, E, G, p, d, shear,
+                    gX[lc], gY[lc], gZ[lc],
+                    nU[lc], U[lc], nW[lc], W[lc], nP[lc], P[lc], nT[lc], T[lc],
+                    D, q, r, nR, reactions->N,
+                    K, Ks, Kf, sky, dof, diag, AB, kd, eqn, neq, storage, backend,
+                    sensitivity->wrt, sensitivity->method,
+                    sensitivity->nrows, sensitivity->rows,
+                    sensitivity->J + (lc-1) * sensitivity->nrows *
+                        sensitivity_columns ( nN, nE, 0, sensitivity->wrt ) );
+
         // TODO?
         // static_mesh ( IN_file, infcpath, meshpath, plotpath, title,
         //             nN, nE, nL, lc, DoF,
@@ -468,6 +972,12 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
 
     } /* end load case loop */
 
+    if ( F != NULL ) {  /* the load data of the last block */
+        free_load_block ( lc1, lc2, DoF, U, W, P, T, Dp,
+                F_mech, F_temp, F, feF, Dt, Dm, rms_t, rms_m );
+        F = NULL;
+    }
+
     // else {
 
         // if ( verbose ) {   /* display data check only */
@@ -482,7 +992,113 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
     // }
 
 
-    if (nM > 0) { /* carry out modal analysis */
+    if ( nL == 0 ) {    /* modal analysis only: no static load cases */
+
+        for (i=1; i<=nE; i++)   for (j=1;j<=12;j++) Q[i][j] = 0.0;
+
+        if ( storage )
+            assemble_K_sky ( Ks, sky, dof, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
+                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p,
+                    shear, geom, Q, debug,
+                    EKx, EKy, EKz, EKtx, EKty, EKtz );
+        else
+            assemble_K ( K, DoF, nE, nN, xyz, rj, L, Le, N1, N2,
+                    Ax, Asy, Asz, Jx,Iy,Iz, E, G, p,
+                    shear, geom, Q, debug,
+                    EKx, EKy, EKz, EKtx, EKty, EKtz );
+    }
+
+    if ( nM > 0 && Mmethod == 3 && nC > 0 ) {
+        fprintf(stderr," Lanczos modal analysis is not available with matrix");
+        fprintf(stderr," condensation ... using Subspace-Jacobi iteration\n");
+        Mmethod = 1;
+    }
+
+    if ( storage && ( ( nM > 0 && Mmethod != 3 ) || nC > 0 ) ) {
+        /* modal analysis and condensation work on the dense [K] */
+        K   = dmatrix(1,DoF,1,DoF);
+        expand_K_sky( Ks, sky, dof, DoF, K );
+    }
+
+    if ( nM > 0 && Mmethod == 3 ) { /* modal analysis, profile storage */
+
+        if(verbose & anlyz) fprintf(stdout,"\n\n Modal Analysis ...\n");
+
+        nM_calc = nM;
+
+        if ( !storage ) {   /* copy the dense [K] to profile storage */
+            sky = ivector(0,DoF);
+            dof = ivector(1,DoF);
+            for (i=1; i<=DoF; i++)  dof[i] = i;
+            skyline_profile( sky, dof, DoF, nE, N1, N2 );
+            Ks  = dvector(1,sky[DoF]);
+            for (j=1; j<=DoF; j++)
+                for (i=j-sky[j]+sky[j-1]+1; i<=j; i++)
+                    Ks[sky[j]-j+i] = K[i][j];
+        }
+
+        Ms  = dvector(1,sky[DoF]);
+        f   = dvector(1,nM_calc);
+        V   = dmatrix(1,DoF,1,nM_calc);
+        Ve  = dmatrix(1,DoF,1,nM_calc);
+
+        assemble_M_sky ( Ms, sky, dof, DoF, nN, nE, xyz, rj, L, N1,N2,
+                Ax, Jx,Iy,Iz, p, d, EMs, NMs, NMx, NMy, NMz,
+                NMxy, NMxz, NMyz, rhox, rhoy, rhoz, lump, debug );
+
+        for (j=1; j<=DoF; j++) { /*  compute traceK and traceM */
+            if ( !r[j] ) {
+                traceK += Ks[sky[dof[j]]];
+                traceM += Ms[sky[dof[j]]];
+            }
+        }
+        re  = ivector(1,DoF);
+        for (i=1; i<=DoF; i++)  re[dof[i]] = i;
+        for (j=1; j<=DoF; j++) { /*  modify K and M for reactions */
+            for (i=j-sky[j]+sky[j-1]+1; i<j; i++)   /* as for dense K, M */
+                if ( r[ re[i] < re[j] ? re[i] : re[j] ] )
+                    Ks[sky[j]-j+i] = Ms[sky[j]-j+i] = 0.0;
+            if ( r[re[j]] ) {
+                Ks[sky[j]] = traceK * 1e4;
+                Ms[sky[j]] = traceM;
+            }
+        }
+        free_ivector(re,1,DoF);
+
+        if ( anlyz ) {  /* shift-invert Lanczos method */
+            lanczos ( Ks, Ms, sky, DoF, nM_calc, f, Ve, tol, shift,
+                                &iter, &ok, verbose );
+
+            for (i=1; i<=DoF; i++)
+                for (j=1; j<=nM_calc; j++)  V[i][j] = Ve[dof[i]][j];
+
+            for (j=1; j<=nM_calc; j++) f[j] = sqrt(f[j])/(2.0*PI);
+
+            if ( sensitivity->modal )
+                modal_sensitivity ( nN, nE, nI, DoF, xyz, rj, N1, N2,
+                    Ax, Asy, Asz, Jx, Iy, Iz, E, G, p, d, EMs,
+                    shear, geom, Q, lump, extraInertia->N,
+                    NMs, NMx, NMy, NMz, NMxy, NMxz, NMyz, rhox, rhoy, rhoz,
+                    Ks, Ms, sky, dof, r, nM, f, V,
+                    sensitivity->mwrt, sensitivity->shapes,
+                    sensitivity->dfreq, sensitivity->dV );
+
+            write_modal_results_sky ( massResults, modalResults,
+                nN, nE, nI, DoF, Ms, sky, dof, f, V,
+                total_mass, struct_mass,
+                iter, sumR, nM, shift, lump, tol, ok );
+        }
+
+        free_dmatrix(Ve,1,DoF,1,nM_calc);
+        free_dvector(Ms,1,sky[DoF]);
+        if ( !storage ) {
+            free_dvector(Ks,1,sky[DoF]);
+            free_ivector(sky,0,DoF);
+            free_ivector(dof,1,DoF);
+            Ks = NULL;  sky = NULL;  dof = NULL;
+        }
+
+    } else if (nM > 0) { /* carry out modal analysis */
 
         if(verbose & anlyz) fprintf(stdout,"\n\n Modal Analysis ...\n");
 
@@ -521,13 +1137,46 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
         }
 
         if ( anlyz ) {  /* subspace or stodola methods */
-            if( Mmethod == 1 )
-                subspace( K, M, DoF, nM_calc, f, V, tol,shift,&iter,&ok, verbose );
-            if( Mmethod == 2 )
-                stodola ( K, M, DoF, nM_calc, f, V, tol,shift,&iter,&ok, verbose );
+            ok = -1;
+            if ( backend ) {    /* LAPACK dsygvx */
+                iter = 0;
+                lapack_eig ( K, M, DoF, nM_calc, f, V, shift, &ok, verbose );
+            }
+            if( ok < 0 && Mmethod == 1 )
+                status = subspace( K, M, DoF, nM_calc, f, V, tol,shift,&iter,&ok, verbose );
+            if( ok < 0 && Mmethod == 2 )
+                status = stodola ( K, M, DoF, nM_calc, f, V, tol,shift,&iter,&ok, verbose );
+            if ( status )   goto cleanup;
 
             for (j=1; j<=nM_calc; j++) f[j] = sqrt(f[j])/(2.0*PI);
 
+            if ( sensitivity->modal ) { /* [K] and [M] in profile storage */
+                skyM = ivector(0,DoF);
+                dofM = ivector(1,DoF);
+                for (i=1; i<=DoF; i++)  dofM[i] = i;
+                skyline_profile( skyM, dofM, DoF, nE, N1, N2 );
+                Kp = dvector(1,skyM[DoF]);
+                Mp = dvector(1,skyM[DoF]);
+                for (j=1; j<=DoF; j++)
+                    for (i=j-skyM[j]+skyM[j-1]+1; i<=j; i++) {
+                        Kp[skyM[j]-j+i] = K[i][j];
+                        Mp[skyM[j]-j+i] = M[i][j];
+                    }
+
+                modal_sensitivity ( nN, nE, nI, DoF, xyz, rj, N1, N2,
+                    Ax, Asy, Asz, Jx, Iy, Iz, E, G, p, d, EMs,
+                    shear, geom, Q, lump, extraInertia->N,
+                    NMs, NMx, NMy, NMz, NMxy, NMxz, NMyz, rhox, rhoy, rhoz,
+                    Kp, Mp, skyM, dofM, r, nM, f, V,
+                    sensitivity->mwrt, sensitivity->shapes,
+                    sensitivity->dfreq, sensitivity->dV );
+
+                free_dvector(Kp,1,skyM[DoF]);
+                free_dvector(Mp,1,skyM[DoF]);
+                free_ivector(skyM,0,DoF);
+                free_ivector(dofM,1,DoF);
+            }
+
             write_modal_results ( massResults, modalResults,
                 nN, nE, nI, DoF, M, f, V,
                 total_mass, struct_mass,
@@ -562,11 +1211,13 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
             fprintf(stderr,"  The number of condensed degrees of freedom");
             fprintf(stderr," may not exceed the number of computed modes");
             fprintf(stderr," when using dynamic condensation.\n");
-            exit(94);
+            status = 94;
+            goto cleanup;
         }
 
         Kc = dmatrix(1,Cdof,1,Cdof);
         Mc = dmatrix(1,Cdof,1,Cdof);
+        for (i=1; i<=Cdof; i++) for (j=1; j<=Cdof; j++) Kc[i][j] = Mc[i][j] = 0.0;
 
         if ( m[1] > 0 && nM > 0 )   Cfreq = f[m[1]];
 
@@ -587,26 +1238,96 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
             if ( verbose )
                 fprintf(stdout,"   dynamic condensation of K and M complete\n");
         }
-        save_dmatrix("Kc", Kc, 1,Cdof, 1,Cdof, 0, "w" );
-        save_dmatrix("Mc", Mc, 1,Cdof, 1,Cdof, 0, "w" );
+        /* return the condensed matrices, row by row */
+        if ( condensation->Kc )
+            for (i=1; i<=Cdof; i++) for (j=1; j<=Cdof; j++)
+                condensation->Kc[(i-1)*Cdof+j-1] = Kc[i][j];
+        if ( condensation->Mc )
+            for (i=1; i<=Cdof; i++) for (j=1; j<=Cdof; j++)
+                condensation->Mc[(i-1)*Cdof+j-1] = Mc[i][j];
 
         free_dmatrix(Kc, 1,Cdof,1,Cdof );
         free_dmatrix(Mc, 1,Cdof,1,Cdof );
     }
 
 
-    /* deallocate memory used for each frame analysis variable */
-    deallocate ( nN, nE, nL, nF, nU, nW, nP, nT, DoF, nM,
-            xyz, rj, L, Le, N1, N2, q,r,
-            Ax, Asy, Asz, Jx, Iy, Iz, E, G, p,
-            U,W,P,T, Dp, F_mech, F_temp,
-            feF_mech, feF_temp, F, dF,
-            K, Q, D, dD,
-            d,EMs,NMs,NMx,NMy,NMz,
-            NMxy, NMxz, NMyz, rhox, rhoy, rhoz,
-            M,f,V, c, m,
-            EKx, EKy, EKz, EKtx, EKty, EKtz
-    );
+cleanup:    /* free the workspace, also after an error */
+
+    if ( diag != NULL )     free_dvector(diag,1,DoF);
+
+    if ( AB != NULL )   free_dvector(AB,0,(kd+1)*neq-1);
+    if ( eqn != NULL )  free_ivector(eqn,1,DoF);
+
+    if ( Ke != NULL )   free_dmatrix(Ke,1,DoF,1,DoF);
+    if ( Kse != NULL )  free_dvector(Kse,1,sky[DoF]);
+    if ( Kn != NULL )   free_dmatrix(Kn,1,DoF,1,DoF);
+    if ( Ksn != NULL )  free_dvector(Ksn,1,sky[DoF]);
+    if ( Ds != NULL ) {
+        free_dmatrix(Ds,1,nlrefactor,1,DoF);
+        free_dvector(DsDs,1,nlrefactor);
+    }
+
+    if ( F != NULL )    /* the load data of a block, after an error */
+        free_load_block ( lc1, lc2, DoF, U, W, P, T, Dp,
+                F_mech, F_temp, F, feF, Dt, Dm, rms_t, rms_m );
+    if ( nL > 0 ) {
+        free_vector(gX,1,nL);
+        free_vector(gY,1,nL);
+        free_vector(gZ,1,nL);
+        free_ivector(nF,1,nL);
+        free_ivector(nU,1,nL);
+        free_ivector(nW,1,nL);
+        free_ivector(nP,1,nL);
+        free_ivector(nT,1,nL);
+        free_ivector(nD,1,nL);
+        free_ivector(nFE,1,nL);
+    }
+
+    if ( Ks != NULL )   free_dvector(Ks,1,sky[DoF]);
+    if ( Kf != NULL )   free_dvector(Kf,1,sky[DoF]);
+    if ( sky != NULL )  free_ivector(sky,0,DoF);
+    if ( dof != NULL )  free_ivector(dof,1,DoF);
+
+    /* deallocate memory used for each frame analysis variable, except
+       the topology, which is freed by the caller, and the load data,
+       which are freed with each block */
+    free_vector(Ax,1,nE);
+    free_vector(Asy,1,nE);
+    free_vector(Asz,1,nE);
+    free_vector(Jx,1,nE);
+    free_vector(Iy,1,nE);
+    free_vector(Iz,1,nE);
+    free_vector(E,1,nE);
+    free_vector(G,1,nE);
+    free_vector(p,1,nE);
+    free_vector(d,1,nE);
+
+    free_dvector(dF,1,DoF);
+    if ( K != NULL )    free_dmatrix(K,1,DoF,1,DoF);
+    free_dmatrix(Q,1,nE,1,12);
+    free_dvector(D,1,DoF);
+    free_dvector(dD,1,DoF);
+
+    free_vector(EMs,1,nE);
+    free_vector(NMs,1,nN);
+    free_vector(NMx,1,nN);
+    free_vector(NMy,1,nN);
+    free_vector(NMz,1,nN);
+    free_vector(NMxy,1,nN);
+    free_vector(NMxz,1,nN);
+    free_vector(NMyz,1,nN);
+    free_vector(rhox,1,nN);
+    free_vector(rhoy,1,nN);
+    free_vector(rhoz,1,nN);
+
+    free_ivector(c,1,DoF);
+    free_ivector(m,1,DoF);
+
+    if ( nM > 0 ) {
+        if ( M != NULL )    free_dmatrix(M,1,DoF,1,DoF);
+        if ( f != NULL )    free_dvector(f,1,nM);
+        if ( V != NULL )    free_dmatrix(V,1,DoF,1,DoF);
+    }
 
     if ( verbose ) {
         fprintf(stdout,"\n");
@@ -614,6 +1335,453 @@ ALLOW_DLL_CALL int run(Nodes* nodes, Reactions* reactions, Elements* elements,
     }
 
 
+    return(status);
+}
+
+
+
+/*
+ * RUN_BATCH - analyze nB designs of the same topology in one call.
+ * The designs share the nodes, reactions, connectivity and options, and
+ * differ in the element properties (and optionally the load cases) given in
+ * batch.  The results of each design are written into the stacked output
+ * arrays of batch.  The nodes, reactions and element connectivity are read,
+ * and the profile of [K] and its node reordering are found, once for all
+ * designs; each design reads and checks its element properties and runs the
+ * analysis.  Sensitivities are not computed.
+ */
+ALLOW_DLL_CALL int run_batch(Nodes* nodes, Reactions* reactions, Elements* elements,
+    OtherElementData* other, int nL, LoadCase* loadcases,
+    DynamicData *dynamic, ExtraInertia *extraInertia, ExtraMass *extraMass,
+    Condensation *condensation, SolverData *solver, BatchData *batch){
+
+    int nN = nodes->nN, nE = elements->nE, nR = reactions->nK, nM = dynamic->nM,
+        nIF = batch->ifoff[nE], // internal force points of all elements
+        DoF = 6*nN, b, lc, j, k, status = 0;
+
+    Elements design = *elements;    // element data of one design
+    SolverData batchSolver = *solver;
+    Topology topo;
+    SensitivityData noSensitivity;
+
+    Displacements *displacements;
+    Forces *forces;
+    ReactionForces *reactionForces;
+    InternalForces internalForces;
+    MassResults massResults;
+    ModalResults *modalResults;
+    double *o;
+
+    memset(&noSensitivity, 0, sizeof(SensitivityData));
+    batchSolver.symbolic = (int *)calloc(2*DoF+2, sizeof(int));
+
+    displacements = (Displacements *)malloc(sizeof(Displacements)*(nL+1));
+    forces = (Forces *)malloc(sizeof(Forces)*(nL+1));
+    reactionForces = (ReactionForces *)malloc(sizeof(ReactionForces)*(nL+1));
+    modalResults = (ModalResults *)malloc(sizeof(ModalResults)*(nM+1));
+
+    status = read_topology ( nodes, reactions, elements, other, &topo );
+
+    for (b=0; b < batch->nB && status == 0; b++) {
+
+        if ( batch->Ax )    design.Ax  = batch->Ax  + b*nE;
+        if ( batch->Asy )   design.Asy = batch->Asy + b*nE;
+        if ( batch->Asz )   design.Asz = batch->Asz + b*nE;
+        if ( batch->Jx )    design.Jx  = batch->Jx  + b*nE;
+        if ( batch->Iy )    design.Iy  = batch->Iy  + b*nE;
+        if ( batch->Iz )    design.Iz  = batch->Iz  + b*nE;
+        if ( batch->E )     design.E   = batch->E   + b*nE;
+        if ( batch->G )     design.G   = batch->G   + b*nE;
+        if ( batch->roll )  design.roll = batch->roll + b*nE;
+        if ( batch->density )   design.density = batch->density + b*nE;
+
+        for (lc=0; lc < nL; lc++) { /* point the outputs at design b */
+            k = b*nL + lc;
+
+            o = batch->disp + 6*k*nN;
+            displacements[lc].node = batch->dnode + k*nN;
+            displacements[lc].x = o;        displacements[lc].y = o + nN;
+            displacements[lc].z = o + 2*nN;     displacements[lc].xrot = o + 3*nN;
+            displacements[lc].yrot = o + 4*nN;  displacements[lc].zrot = o + 5*nN;
+
+            o = batch->forces + 12*k*nE;
+            forces[lc].element = batch->felement + 2*k*nE;
+            forces[lc].node = batch->fnode + 2*k*nE;
+            forces[lc].Nx = o;          forces[lc].Vy = o + 2*nE;
+            forces[lc].Vz = o + 4*nE;   forces[lc].Txx = o + 6*nE;
+            forces[lc].Myy = o + 8*nE;  forces[lc].Mzz = o + 10*nE;
+
+            o = batch->reactions + 6*k*nR;
+            reactionForces[lc].node = batch->rnode + k*nR;
+            reactionForces[lc].Fx = o;          reactionForces[lc].Fy = o + nR;
+            reactionForces[lc].Fz = o + 2*nR;   reactionForces[lc].Mxx = o + 3*nR;
+            reactionForces[lc].Myy = o + 4*nR;  reactionForces[lc].Mzz = o + 5*nR;
+        }
+
+        internalForces.offset = batch->ifoff;
+        internalForces.values = batch->iforces + 11*b*nL*nIF;
+        internalForces.extrema = NULL;
+
+        o = batch->nmass + 6*b*nN;
+        massResults.total_mass = batch->mass + 2*b;
+        massResults.struct_mass = batch->mass + 2*b + 1;
+        massResults.N = batch->mnode + b*nN;
+        massResults.xmass = o;          massResults.ymass = o + nN;
+        massResults.zmass = o + 2*nN;   massResults.xinrta = o + 3*nN;
+        massResults.yinrta = o + 4*nN;  massResults.zinrta = o + 5*nN;
+
+        for (j=0; j < nM; j++) {
+            k = b*nM + j;
+            o = batch->freq + 4*b*nM + j;
+            modalResults[j].freq = o;       modalResults[j].xmpf = o + nM;
+            modalResults[j].ympf = o + 2*nM;    modalResults[j].zmpf = o + 3*nM;
+            o = batch->modes + 6*k*nN;
+            modalResults[j].N = batch->modenode + k*nN;
+            modalResults[j].xdsp = o;       modalResults[j].ydsp = o + nN;
+            modalResults[j].zdsp = o + 2*nN;    modalResults[j].xrot = o + 3*nN;
+            modalResults[j].yrot = o + 4*nN;    modalResults[j].zrot = o + 5*nN;
+        }
+
+        status = analyze ( &topo, nodes, reactions, &design, other,
+                nL, loadcases + (batch->varyLoads ? b*nL : 0),
+                dynamic, extraInertia, extraMass, condensation,
+                &batchSolver, &noSensitivity, NULL,
+                displacements, forces, reactionForces, &internalForces,
+                &massResults, modalResults );
+    }
+
+    free_topology ( &topo, nN, nE );
+    free(batchSolver.symbolic);
+    free(displacements);
+    free(forces);
+    free(reactionForces);
+    free(modalResults);
+
+    return(status);
+}
+
+
+
+
+/* the position of id in the ascending list ids of n numbers, counting from 1,
+   or 0 if it is not in the list */
+static int list_position ( int *ids, int n, int id )
+{
+    int lo = 0, hi = n-1, mid;
+
+    while ( lo <= hi ) {
+        mid = (lo + hi)/2;
+        if ( ids[mid] == id )   return mid+1;
+        if ( ids[mid] < id )    lo = mid+1;
+        else            hi = mid-1;
+    }
+
+    return 0;
+}
+
+
+/* the uniformly distributed, trapezoidal and interior point loads of load
+   case lcase in tables U, W and P of at least one row each:  with nEl > 0
+   the loads of the elements in the ascending list el only, as loads of
+   element 1 ... nEl in the order of the list, or else all the loads */
+static void read_element_loads ( LoadCase *lcase, int nEl, int *el,
+        int *nU, int *nW, int *nP, float ***U, float ***W, float ***P )
+{
+    UniformLoads *uL = &lcase->uniformLoads;
+    TrapezoidalLoads *tL = &lcase->trapezoidalLoads;
+    ElementLoads *eL = &lcase->elementLoads;
+    int i, k, m;
+
+#define ELEMENT(N) ( nEl ? list_position ( el, nEl, (N) ) : (N) )
+    *nU = *nW = *nP = 0;
+    for (k=0; k < uL->nU; k++)  if ( ELEMENT(uL->EL[k]) ) (*nU)++;
+    for (k=0; k < tL->nW; k++)  if ( ELEMENT(tL->EL[k]) ) (*nW)++;
+    for (k=0; k < eL->nP; k++)  if ( ELEMENT(eL->EL[k]) ) (*nP)++;
+    *U = matrix(1,*nU > 0 ? *nU : 1,1,4);
+    *W = matrix(1,*nW > 0 ? *nW : 1,1,13);
+    *P = matrix(1,*nP > 0 ? *nP : 1,1,5);
+
+    for (i=0, k=0; k < uL->nU; k++) {
+        if ( !(m = ELEMENT(uL->EL[k])) )    continue;
+        ++i;
+        (*U)[i][1] = m;
+        (*U)[i][2] = uL->Ux[k];
+        (*U)[i][3] = uL->Uy[k];
+        (*U)[i][4] = uL->Uz[k];
+    }
+    for (i=0, k=0; k < tL->nW; k++) {
+        if ( !(m = ELEMENT(tL->EL[k])) )    continue;
+        ++i;
+        (*W)[i][1] = m;
+        (*W)[i][2] = tL->xx1[k];    (*W)[i][3] = tL->xx2[k];
+        (*W)[i][4] = tL->wx1[k];    (*W)[i][5] = tL->wx2[k];
+        (*W)[i][6] = tL->xy1[k];    (*W)[i][7] = tL->xy2[k];
+        (*W)[i][8] = tL->wy1[k];    (*W)[i][9] = tL->wy2[k];
+        (*W)[i][10] = tL->xz1[k];   (*W)[i][11] = tL->xz2[k];
+        (*W)[i][12] = tL->wz1[k];   (*W)[i][13] = tL->wz2[k];
+    }
+    for (i=0, k=0; k < eL->nP; k++) {
+        if ( !(m = ELEMENT(eL->EL[k])) )    continue;
+        ++i;
+        (*P)[i][1] = m;
+        (*P)[i][2] = eL->Px[k];
+        (*P)[i][3] = eL->Py[k];
+        (*P)[i][4] = eL->Pz[k];
+        (*P)[i][5] = eL->x[k];
+    }
+#undef ELEMENT
+}
+
+
+/* free the load tables of read_element_loads */
+static void free_element_loads ( int nU, int nW, int nP,
+        float **U, float **W, float **P )
+{
+    free_matrix(U,1,nU > 0 ? nU : 1,1,4);
+    free_matrix(W,1,nW > 0 ? nW : 1,1,13);
+    free_matrix(P,1,nP > 0 ? nP : 1,1,5);
+}
+
+
+/* the row of the input data with number id: row id-1 when the rows are in
+   order, or else found by search; -1 if there is none */
+static int input_row ( int *ids, int n, int id )
+{
+    int i;
+
+    if ( id >= 1 && id <= n && ids[id-1] == id )    return id-1;
+    for (i=0; i<n; i++) if ( ids[i] == id ) return i;
+
+    return -1;
+}
+
+
+/*
+ * ELEMENT_INTERNAL_FORCES - the internal forces of one frame element in one
+ * load case, from the node displacements D (6 for each node) and element end
+ * forces Q (12 for each element, as in Forces) of a solution of the load
+ * case, in the order of the rows of nodes and elements, without assembling or solving the equilibrium equations.  The
+ * element is copied, with its two nodes and its loads, into a frame of one
+ * element, so the cost does not depend on the size of the frame.  The
+ * internal forces are written into the rows of internalForces, with offset
+ * {0, number of points}:  at the points at spacing dx, as in run(), or with
+ * stations, exactly at the points x given in the rows on input.
+ */
+ALLOW_DLL_CALL int element_internal_forces(Nodes* nodes, Elements* elements,
+    OtherElementData* other, LoadCase* lcase, int element,
+    double *Dall, double *Qall, int stations, InternalForces* internalForces){
+
+    vec3    xyz[3];     // the coordinates of the two nodes
+
+    float   Ax[2], Asy[2], Asz[2], Jx[2], Iy[2], Iz[2], E[2], G[2], p[2], d[2],
+        **U, **W, **P,  // the loads of the element
+        dx=1.0;     // x-increment for internal force data
+
+    double  L[2], D[13], Qrow[13], *Q[2], // length, displacements, end forces
+        exagg_static=10;
+
+    int N1[2] = {0, 1}, N2[2] = {0, 2}, // the element connects nodes 1 and 2
+        nU, nW, nP, i, j, k, n1, n2, e,
+        shear=0, geom=0;
+
+    e = input_row ( elements->EL, elements->nE, element );
+    if ( e < 0 ) {
+        errorMsg("\n ERROR: the frame element is out of range\n");
+        return(51);
+    }
+    n1 = elements->N1[e];
+    n2 = elements->N2[e];
+    i = input_row ( nodes->N, nodes->nN, n1 );
+    j = input_row ( nodes->N, nodes->nN, n2 );
+    if ( i < 0 || j < 0 ) {
+        errorMsg("\n ERROR: a node of the frame element is out of range\n");
+        return(52);
+    }
+
+    read_run_data ( other, &shear, &geom, &exagg_static, &dx );
+
+    xyz[1].x = nodes->x[i]; xyz[1].y = nodes->y[i]; xyz[1].z = nodes->z[i];
+    xyz[2].x = nodes->x[j]; xyz[2].y = nodes->y[j]; xyz[2].z = nodes->z[j];
+
+#define SQ(X) ((X)*(X))
+    L[1] = sqrt( SQ( xyz[2].x - xyz[1].x ) +
+             SQ( xyz[2].y - xyz[1].y ) +
+             SQ( xyz[2].z - xyz[1].z ) );
+#undef SQ
+
+    Ax[1] = elements->Ax[e];    Asy[1] = elements->Asy[e];
+    Asz[1] = elements->Asz[e];  Jx[1] = elements->Jx[e];
+    Iy[1] = elements->Iy[e];    Iz[1] = elements->Iz[e];
+    E[1] = elements->E[e];      G[1] = elements->G[e];
+    p[1] = elements->roll[e];   d[1] = elements->density[e];
+    p[1] = p[1]*PI/180.0;   /* convert from degrees to radians */
+
+    for (k=1; k<=6; k++) {  /* the displacements of the two nodes */
+        D[k]   = Dall[6*i+k-1];
+        D[6+k] = Dall[6*j+k-1];
+    }
+    for (k=1; k<=12; k++)   Qrow[k] = Qall[12*e+k-1];
+    Q[1] = Qrow;
+
+    /* the loads of the element, as element 1 */
+    read_element_loads ( lcase, 1, &element, &nU, &nW, &nP, &U, &W, &P );
+
+    if ( stations )
+        write_internal_force_stations ( internalForces, 1, 1, xyz,
+                Q, 2, 1, L, N1, N2,
+                Ax, Asy, Asz, Jx, Iy, Iz, E, G, p,
+                d, lcase->gx, lcase->gy, lcase->gz,
+                nU, U, nW, W, nP, P, D, shear );
+    else
+        write_internal_forces ( internalForces, 1, 1, dx, xyz,
+                Q, 2, 1, L, N1, N2,
+                Ax, Asy, Asz, Jx, Iy, Iz, E, G, p,
+                d, lcase->gx, lcase->gy, lcase->gz,
+                nU, U, nW, W, nP, P, D, shear, 0.0 );
+
+    free_element_loads ( nU, nW, nP, U, W, P );
+
     return(0);
 }
 
+
+/*
+ * ELEMENT_DISPLACEMENTS - the displacements and rotations at the points
+ * x[i] along the frame elements element[i], i = 0 ... nX-1, in the nL load
+ * cases lcase, from the node displacements D (6 for each node) and element
+ * end forces Q (12 for each element, as in Forces) of a solution of each
+ * load case, in the order of the rows of nodes and elements.  The points are
+ * sorted by element and 0 <= x[i] <= L.  Only the elements of the points,
+ * with their nodes and loads, are copied, into a frame of two nodes for each
+ * element, so the cost does not depend on the size of the frame.  The
+ * results are written into displ[(j*nL+lc)*nX+i], j = 0 ... 5, in the local
+ * coordinates of each element or, with local == 0, in global coordinates.
+ */
+ALLOW_DLL_CALL int element_displacements(Nodes* nodes, Elements* elements,
+    OtherElementData* other, int nL, LoadCase* lcase, double *Dall, double *Qall,
+    int nX, int *element, double *x, int local, double *displ){
+
+    vec3    *xyz;       // X,Y,Z coordinates of the nodes of each element
+
+    float   *Ax, *Asy, *Asz, *Jx, *Iy, *Iz, *E, *G, *p, *d,
+        **U, **W, **P,  // the loads of a load case
+        dx=1.0;     // x-increment for internal force data
+
+    double  *L,     // node-to-node length of each element
+        *D,     // the displacements of the nodes of each element
+        **Q,        // the rows of Qall, as end forces of each element
+        exagg_static=10;
+
+    int nN = nodes->nN, nE = elements->nE,
+        nEs,        // number of elements of the points
+        *el,        // the element numbers of the points, ascending
+        *row,       // the row of each element of the points
+        *ix,        // the element of each point, 1 ... nEs
+        *r1, *r2,   // the rows of the two nodes of each element
+        *N1, *N2, nU, nW, nP, i, j, k, m, lc, status=0,
+        shear=0, geom=0;
+
+    for (i=0; i<nX; i++) {
+        if ( element[i] < 1 || element[i] > nE ) {
+            errorMsg("\n ERROR: the frame element is out of range\n");
+            return(51);
+        }
+        if ( i > 0 && element[i] < element[i-1] ) {
+            errorMsg("\n ERROR: the points are not sorted by frame element\n");
+            return(53);
+        }
+    }
+
+    /* the elements of the points, in order */
+    el  = ivector(0,nX);    row = ivector(0,nX);    ix  = ivector(0,nX);
+    for (i=0, nEs=0; i<nX; i++) {
+        if ( nEs == 0 || element[i] != el[nEs-1] ) {
+            el[nEs] = element[i];
+            row[nEs] = input_row ( elements->EL, nE, element[i] );
+            if ( row[nEs] < 0 ) status = 51;
+            nEs++;
+        }
+        ix[i] = nEs;
+    }
+    if ( status ) {
+        errorMsg("\n ERROR: the frame element is out of range\n");
+        free_ivector(ix,0,nX);  free_ivector(row,0,nX); free_ivector(el,0,nX);
+        return(status);
+    }
+
+    xyz = (vec3 *)malloc(sizeof(vec3)*(1+2*nEs));
+    D   = dvector(1,12*nEs);
+    L   = dvector(1,nEs);
+    N1  = ivector(1,nEs);   N2  = ivector(1,nEs);
+    r1  = ivector(1,nEs);   r2  = ivector(1,nEs);
+    Ax  =  vector(1,nEs);   Asy =  vector(1,nEs);   Asz =  vector(1,nEs);
+    Jx  =  vector(1,nEs);   Iy  =  vector(1,nEs);   Iz  =  vector(1,nEs);
+    E   =  vector(1,nEs);   G   =  vector(1,nEs);
+    p   =  vector(1,nEs);   d   =  vector(1,nEs);
+    Q   = (double **)malloc(sizeof(double *)*(1+nEs));
+
+    /* element m connects nodes 2m-1 and 2m */
+    for (m=1; m<=nEs && !status; m++) {
+        k = row[m-1];
+        i = input_row ( nodes->N, nN, elements->N1[k] );
+        j = input_row ( nodes->N, nN, elements->N2[k] );
+        if ( i < 0 || j < 0 ) {
+            errorMsg("\n ERROR: a node of the frame element is out of range\n");
+            status = 52;
+            break;
+        }
+        N1[m] = 2*m-1;  N2[m] = 2*m;
+        r1[m] = i;  r2[m] = j;
+        xyz[2*m-1].x = nodes->x[i]; xyz[2*m-1].y = nodes->y[i]; xyz[2*m-1].z = nodes->z[i];
+        xyz[2*m].x = nodes->x[j];   xyz[2*m].y = nodes->y[j];   xyz[2*m].z = nodes->z[j];
+#define SQ(X) ((X)*(X))
+        L[m] = sqrt( SQ( xyz[2*m].x - xyz[2*m-1].x ) +
+                 SQ( xyz[2*m].y - xyz[2*m-1].y ) +
+                 SQ( xyz[2*m].z - xyz[2*m-1].z ) );
+#undef SQ
+        Ax[m] = elements->Ax[k];    Asy[m] = elements->Asy[k];
+        Asz[m] = elements->Asz[k];  Jx[m] = elements->Jx[k];
+        Iy[m] = elements->Iy[k];    Iz[m] = elements->Iz[k];
+        E[m] = elements->E[k];      G[m] = elements->G[k];
+        p[m] = elements->roll[k]*PI/180.0;  /* from degrees to radians */
+        d[m] = elements->density[k];
+    }
+
+    if ( !status ) {
+        read_run_data ( other, &shear, &geom, &exagg_static, &dx );
+
+        for (lc=0; lc<nL; lc++) {
+            for (m=1; m<=nEs; m++) {
+                for (k=1; k<=6; k++) {
+                    D[12*(m-1)+k]   = Dall[6*(lc*nN+r1[m])+k-1];
+                    D[12*(m-1)+6+k] = Dall[6*(lc*nN+r2[m])+k-1];
+                }
+                Q[m] = Qall + 12*(lc*nE+row[m-1]) - 1;
+            }
+
+            read_element_loads ( lcase+lc, nEs, el, &nU, &nW, &nP, &U, &W, &P );
+
+            write_element_displacements ( nX, ix, x, local, displ + lc*nX, nL*nX,
+                    xyz, Q, 2*nEs, nEs, L, N1, N2,
+                    Ax, Asy, Asz, Jx, Iy, Iz, E, G, p,
+                    d, lcase[lc].gx, lcase[lc].gy, lcase[lc].gz,
+                    nU, U, nW, W, nP, P, D, shear );
+
+            free_element_loads ( nU, nW, nP, U, W, P );
+        }
+    }
+
+    free(Q);
+    free_vector(d,1,nEs);   free_vector(p,1,nEs);
+    free_vector(G,1,nEs);   free_vector(E,1,nEs);
+    free_vector(Iz,1,nEs);  free_vector(Iy,1,nEs);  free_vector(Jx,1,nEs);
+    free_vector(Asz,1,nEs); free_vector(Asy,1,nEs); free_vector(Ax,1,nEs);
+    free_ivector(r2,1,nEs); free_ivector(r1,1,nEs);
+    free_ivector(N2,1,nEs); free_ivector(N1,1,nEs);
+    free_dvector(L,1,nEs);
+    free_dvector(D,1,12*nEs);
+    free(xyz);
+    free_ivector(ix,0,nX);  free_ivector(row,0,nX); free_ivector(el,0,nX);
+
+    return(status);
+}
@@ -0,0 +1,999 @@
+/*
+Semi-analytic sensitivities of the static response of a linear frame, and of
+its natural frequencies and mode shapes.
+
+The derivatives of the element end forces and of the fixed end forces of the
+element loads with respect to the 15 variables of each element (section
+properties, density and the coordinates of its two nodes) are found by central
+differences of the element equations, evaluated in double precision.  With the
+stiffness matrix already factored for the linear analysis, the derivatives of
+the node displacements then follow from one back-substitution for each design
+variable (direct method) or for each response (adjoint method).
+*/
+
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+#include "common.h"
+#include "frame3dd.h"
+#include "coordtrans.h"
+#include "HPGmatrix.h"
+#include "NRutil.h"
+#include "py_io.h"
+#include "py_sensitivity.h"
+
+
+#define NSV 15  /* element variables: Ax Asy Asz Jx Iy Iz E G d x1 y1 z1 x2 y2 z2 */
+#define NB  32  /* right hand sides solved together                     */
+#define CBRT_EPS 6.0554544523933395e-06 /* cube root of DBL_EPSILON, the relative step */
+
+
+/* element loads of one load case, indexed by element */
+typedef struct {
+
+    float gX, gY, gZ;           /* gravitational acceleration           */
+    float **U, **W, **P, **T;   /* load data, U[i][1] is the element of load i */
+    int *sU, *sW, *sP, *sT;     /* loads of element n are iX[sX[n] .. sX[n+1]-1] */
+    int *iU, *iW, *iP, *iT;
+
+} ElementLoadData;
+
+
+/* the variable type of each element variable */
+static int sens_type ( int k ){
+
+    return k <= 12 ? k-1 : k-4;
+}
+
+
+/* the coordinate of the l-th end force of element n */
+static int element_dof ( int *N1, int *N2, int n, int l ){
+
+    return l <= 6 ? 6*(N1[n]-1) + l : 6*(N2[n]-1) + l-6;
+}
+
+
+int sensitivity_columns ( int nN, int nE, int nI, int *wrt ){
+
+    int i, nV = 0;
+
+    for (i=0; i<SENS_TYPES; i++)
+        if ( wrt[i] )   nV += i < SENS_X ? nE : ( i < SENS_MASS ? nN : nI );
+
+    return nV;
+}
+
+
+/*------------------------------------------------------------------------------
+ELEMENT_FRAME - direction cosines of an element with end nodes v[10..12] and
+v[13..15].  The frame of coord_trans() is not differentiable for an element
+along the vertical axis, so a vertical element keeps the frame t0 and turns it
+by the smallest rotation that takes its x axis onto the element.
+------------------------------------------------------------------------------*/
+static void element_frame ( double *t, double *v, float p, int vert, double *t0 ){
+
+    vec3 xyz[3];
+    double L, a[3], b[3], w[3], ww, c, R[3][3];
+    int i, j, k;
+
+    xyz[1].x = v[10];   xyz[1].y = v[11];   xyz[1].z = v[12];
+    xyz[2].x = v[13];   xyz[2].y = v[14];   xyz[2].z = v[15];
+
+    L = sqrt( (v[13]-v[10])*(v[13]-v[10]) + (v[14]-v[11])*(v[14]-v[11]) +
+              (v[15]-v[12])*(v[15]-v[12]) );
+
+    if ( !vert ) {
+        coord_trans ( xyz, L, 1, 2,
+            &t[1], &t[2], &t[3], &t[4], &t[5], &t[6], &t[7], &t[8], &t[9], p );
+        return;
+    }
+
+    for (i=0; i<3; i++) {
+        a[i] = t0[i+1];
+        b[i] = (v[13+i] - v[10+i]) / L;
+    }
+    w[0] = a[1]*b[2] - a[2]*b[1];
+    w[1] = a[2]*b[0] - a[0]*b[2];
+    w[2] = a[0]*b[1] - a[1]*b[0];
+    ww = w[0]*w[0] + w[1]*w[1] + w[2]*w[2];
+    c  = a[0]*b[0] + a[1]*b[1] + a[2]*b[2];
+
+    /* R = I + [w]x + [w]x^2 / (1+c) */
+    for (i=0; i<3; i++)
+        for (j=0; j<3; j++)
+            R[i][j] = ( w[i]*w[j] - (i==j ? ww : 0.0) ) / (1.0 + c)
+                    + (i==j ? 1.0 : 0.0);
+    R[0][1] -= w[2];    R[1][0] += w[2];
+    R[0][2] += w[1];    R[2][0] -= w[1];
+    R[1][2] -= w[0];    R[2][1] += w[0];
+
+    for (i=0; i<3; i++)         /* each local axis */
+        for (j=0; j<3; j++)
+            for (t[3*i+j+1] = 0.0, k=0; k<3; k++)
+                t[3*i+j+1] += R[j][k] * t0[3*i+k+1];
+}
+
+
+/* add the local end forces f of an element to fe in global coordinates, {fe} += [T]'{f} */
+static void add_local ( double *fe, double *t, double *f ){
+
+    int b, i, j;
+
+    for (b=0; b<4; b++)
+        for (j=1; j<=3; j++)
+            for (i=1; i<=3; i++)
+                fe[3*b+j] += f[3*b+i] * t[3*(i-1)+j];
+}
+
+
+/*------------------------------------------------------------------------------
+ELEMENT_FIXED_END_FORCES - the fixed end forces of all loads of element n in
+global coordinates, as in read_and_assemble_loads(), mechanical and thermal
+------------------------------------------------------------------------------*/
+static void element_fixed_end_forces (
+        double *fe, double *t, double L, double Le, double *v,
+        int shear, ElementLoadData *ld, int n ){
+
+    double Ax=v[1], Asy=v[2], Asz=v[3], Iy=v[5], Iz=v[6], E=v[7], G=v[8], d=v[9],
+        f[13], Ksy, Ksz, x1, x2, w1, w2, R1o, R2o, f01, f02, a, b, h, Ta,
+        t4=t[4], t5=t[5], t6=t[6],
+        t7=t[7], t8=t[8], t9=t[9];
+    float gX=ld->gX, gY=ld->gY, gZ=ld->gZ, *X;
+    int i, j;
+
+    if ( shear ) {
+        Ksy = (12.0*E*Iz) / (G*Asy*Le*Le);
+        Ksz = (12.0*E*Iy) / (G*Asz*Le*Le);
+    } else  Ksy = Ksz = 0.0;
+
+    /* gravity loads */
+    fe[1]  = fe[7] = d*Ax*L*gX / 2.0;
+    fe[2]  = fe[8] = d*Ax*L*gY / 2.0;
+    fe[3]  = fe[9] = d*Ax*L*gZ / 2.0;
+
+    fe[4]  = d*Ax*L*L / 12.0 * ( (-t4*t8+t5*t7)*gY + (-t4*t9+t6*t7)*gZ );
+    fe[5]  = d*Ax*L*L / 12.0 * ( (-t5*t7+t4*t8)*gX + (-t5*t9+t6*t8)*gZ );
+    fe[6]  = d*Ax*L*L / 12.0 * ( (-t6*t7+t4*t9)*gX + (-t6*t8+t5*t9)*gY );
+    fe[10] = d*Ax*L*L / 12.0 * ( ( t4*t8-t5*t7)*gY + ( t4*t9-t6*t7)*gZ );
+    fe[11] = d*Ax*L*L / 12.0 * ( ( t5*t7-t4*t8)*gX + ( t5*t9-t6*t8)*gZ );
+    fe[12] = d*Ax*L*L / 12.0 * ( ( t6*t7-t4*t9)*gX + ( t6*t8-t5*t9)*gY );
+
+    for (j=ld->sU[n]; j<ld->sU[n+1]; j++) {     /* uniformly distributed loads */
+        X = ld->U[ld->iU[j]];
+        f[1] = f[7] = X[2]*Le / 2.0;
+        f[2] = f[8] = X[3]*Le / 2.0;
+        f[3] = f[9] = X[4]*Le / 2.0;
+        f[4] = f[10] = 0.0;
+        f[5] = -X[4]*Le*Le / 12.0;  f[11] = -f[5];
+        f[6] =  X[3]*Le*Le / 12.0;  f[12] = -f[6];
+        add_local ( fe, t, f );
+    }
+
+    for (j=ld->sW[n]; j<ld->sW[n+1]; j++) {     /* trapezoidally distributed loads */
+        X = ld->W[ld->iW[j]];
+        for (i=1; i<=12; i++)   f[i] = 0.0;
+
+        x1 = X[2];  x2 = X[3];  w1 = X[4];  w2 = X[5];
+        f[1] = ( 3.0*(w1+w2)*L*(x2-x1) - (2.0*w2+w1)*x2*x2 + (w2-w1)*x2*x1 + (2.0*w1+w2)*x1*x1 ) / (6.0*L);
+        f[7] = ( -(2.0*w1+w2)*x1*x1 + (2.0*w2+w1)*x2*x2  - (w2-w1)*x1*x2 ) / ( 6.0*L );
+
+        x1 = X[6];  x2 = X[7];  w1 = X[8];  w2 = X[9];
+        R1o = ( (2.0*w1+w2)*x1*x1 - (w1+2.0*w2)*x2*x2 +
+             3.0*(w1+w2)*L*(x2-x1) - (w1-w2)*x1*x2 ) / (6.0*L);
+        R2o = ( (w1+2.0*w2)*x2*x2 + (w1-w2)*x1*x2 -
+            (2.0*w1+w2)*x1*x1 ) / (6.0*L);
+        f01 = (  3.0*(w2+4.0*w1)*x1*x1*x1*x1 -  3.0*(w1+4.0*w2)*x2*x2*x2*x2
+              - 15.0*(w2+3.0*w1)*L*x1*x1*x1 + 15.0*(w1+3.0*w2)*L*x2*x2*x2
+              -  3.0*(w1-w2)*x1*x2*(x1*x1 + x2*x2)
+              + 20.0*(w2+2.0*w1)*L*L*x1*x1 - 20.0*(w1+2.0*w2)*L*L*x2*x2
+              + 15.0*(w1-w2)*L*x1*x2*(x1+x2)
+              -  3.0*(w1-w2)*x1*x1*x2*x2 - 20.0*(w1-w2)*L*L*x1*x2 ) / 360.0;
+        f02 = (  3.0*(w2+4.0*w1)*x1*x1*x1*x1 - 3.0*(w1+4.0*w2)*x2*x2*x2*x2
+              -  3.0*(w1-w2)*x1*x2*(x1*x1+x2*x2)
+              - 10.0*(w2+2.0*w1)*L*L*x1*x1 + 10.0*(w1+2.0*w2)*L*L*x2*x2
+              -  3.0*(w1-w2)*x1*x1*x2*x2 + 10.0*(w1-w2)*L*L*x1*x2 ) / 360.0;
+        f[6]  = -( 4.0*f01 + 2.0*f02 + Ksy*(f01 - f02) ) / ( L*L*(1.0+Ksy) );
+        f[12] = -( 2.0*f01 + 4.0*f02 - Ksy*(f01 - f02) ) / ( L*L*(1.0+Ksy) );
+        f[2]  =  R1o + f[6]/L + f[12]/L;
+        f[8]  =  R2o - f[6]/L - f[12]/L;
+
+        x1 = X[10]; x2 = X[11]; w1 = X[12]; w2 = X[13];
+        R1o = ( (2.0*w1+w2)*x1*x1 - (w1+2.0*w2)*x2*x2 +
+             3.0*(w1+w2)*L*(x2-x1) - (w1-w2)*x1*x2 ) / (6.0*L);
+        R2o = ( (w1+2.0*w2)*x2*x2 + (w1-w2)*x1*x2 -
+            (2.0*w1+w2)*x1*x1 ) / (6.0*L);
+        f01 = (  3.0*(w2+4.0*w1)*x1*x1*x1*x1 -  3.0*(w1+4.0*w2)*x2*x2*x2*x2
+              - 15.0*(w2+3.0*w1)*L*x1*x1*x1 + 15.0*(w1+3.0*w2)*L*x2*x2*x2
+              -  3.0*(w1-w2)*x1*x2*(x1*x1 + x2*x2)
+              + 20.0*(w2+2.0*w1)*L*L*x1*x1 - 20.0*(w1+2.0*w2)*L*L*x2*x2
+              + 15.0*(w1-w2)*L*x1*x2*(x1+x2)
+              -  3.0*(w1-w2)*x1*x1*x2*x2 - 20.0*(w1-w2)*L*L*x1*x2 ) / 360.0;
+        f02 = (  3.0*(w2+4.0*w1)*x1*x1*x1*x1 - 3.0*(w1+4.0*w2)*x2*x2*x2*x2
+              -  3.0*(w1-w2)*x1*x2*(x1*x1+x2*x2)
+              - 10.0*(w2+2.0*w1)*L*L*x1*x1 + 10.0*(w1+2.0*w2)*L*L*x2*x2
+              -  3.0*(w1-w2)*x1*x1*x2*x2 + 10.0*(w1-w2)*L*L*x1*x2 ) / 360.0;
+        f[5]  = ( 4.0*f01 + 2.0*f02 + Ksz*(f01 - f02) ) / ( L*L*(1.0+Ksz) );
+        f[11] = ( 2.0*f01 + 4.0*f02 - Ksz*(f01 - f02) ) / ( L*L*(1.0+Ksz) );
+        f[3]  =  R1o - f[5]/L - f[11]/L;
+        f[9]  =  R2o + f[5]/L + f[11]/L;
+
+        add_local ( fe, t, f );
+    }
+
+    for (j=ld->sP[n]; j<ld->sP[n+1]; j++) {     /* concentrated point loads */
+        X = ld->P[ld->iP[j]];
+        a = X[5];   b = L - a;
+        f[1] = X[2]*a/L;
+        f[7] = X[2]*b/L;
+        f[2] = (1./(1.+Ksz)) * X[3]*b*b*(3.*a + b) / ( L*L*L ) +
+            (Ksz/(1.+Ksz)) * X[3]*b/L;
+        f[8] = (1./(1.+Ksz)) * X[3]*a*a*(3.*b + a) / ( L*L*L ) +
+            (Ksz/(1.+Ksz)) * X[3]*a/L;
+        f[3] = (1./(1.+Ksy)) * X[4]*b*b*(3.*a + b) / ( L*L*L ) +
+            (Ksy/(1.+Ksy)) * X[4]*b/L;
+        f[9] = (1./(1.+Ksy)) * X[4]*a*a*(3.*b + a) / ( L*L*L ) +
+            (Ksy/(1.+Ksy)) * X[4]*a/L;
+        f[4] = f[10] = 0.0;
+        f[5]  = -(1./(1.+Ksy)) * X[4]*a*b*b / ( L*L ) -
+            (Ksy/(1.+Ksy)) * X[4]*a*b / (2.*L);
+        f[11] =  (1./(1.+Ksy)) * X[4]*a*a*b / ( L*L ) +
+            (Ksy/(1.+Ksy)) * X[4]*a*b / (2.*L);
+        f[6]  =  (1./(1.+Ksz)) * X[3]*a*b*b / ( L*L ) +
+            (Ksz/(1.+Ksz)) * X[3]*a*b / (2.*L);
+        f[12] = -(1./(1.+Ksz)) * X[3]*a*a*b / ( L*L ) -
+            (Ksz/(1.+Ksz)) * X[3]*a*b / (2.*L);
+        add_local ( fe, t, f );
+    }
+
+    for (j=ld->sT[n]; j<ld->sT[n+1]; j++) {     /* temperature loads */
+        X = ld->T[ld->iT[j]];
+        Ta = X[2];
+        for (i=1; i<=12; i++)   f[i] = 0.0;
+        f[7]  = (Ta/4.0)*( X[5]+X[6]+X[7]+X[8] )*E*Ax;
+        f[1]  = -f[7];
+        h = X[4];
+        f[5]  =  (Ta/h)*(X[8]-X[7])*E*Iy;
+        f[11] = -f[5];
+        h = X[3];
+        f[6]  =  (Ta/h)*(X[5]-X[6])*E*Iz;
+        f[12] = -f[6];
+        add_local ( fe, t, f );
+    }
+}
+
+
+/* the elastic stiffness matrix [k] of an element, local coordinates, as in elastic_K() */
+static void element_stiffness ( double *v, double Le, int shear, double k[13][13] ){
+
+    double Ksy, Ksz,
+        Ax=v[1], Asy=v[2], Asz=v[3], J=v[4], Iy=v[5], Iz=v[6], E=v[7], G=v[8];
+    int i, j;
+
+    for (i=1; i<=12; i++)   for (j=1; j<=12; j++)   k[i][j] = 0.0;
+
+    if ( shear ) {
+        Ksy = 12.*E*Iz / (G*Asy*Le*Le);
+        Ksz = 12.*E*Iy / (G*Asz*Le*Le);
+    } else  Ksy = Ksz = 0.0;
+
+    k[1][1]  = k[7][7]   = E*Ax / Le;
+    k[2][2]  = k[8][8]   = 12.*E*Iz / ( Le*Le*Le*(1.+Ksy) );
+    k[3][3]  = k[9][9]   = 12.*E*Iy / ( Le*Le*Le*(1.+Ksz) );
+    k[4][4]  = k[10][10] = G*J / Le;
+    k[5][5]  = k[11][11] = (4.+Ksz)*E*Iy / ( Le*(1.+Ksz) );
+    k[6][6]  = k[12][12] = (4.+Ksy)*E*Iz / ( Le*(1.+Ksy) );
+
+    k[5][3]  = k[3][5]   = -6.*E*Iy / ( Le*Le*(1.+Ksz) );
+    k[6][2]  = k[2][6]   =  6.*E*Iz / ( Le*Le*(1.+Ksy) );
+    k[7][1]  = k[1][7]   = -k[1][1];
+
+    k[12][8] = k[8][12]  =  k[8][6] = k[6][8] = -k[6][2];
+    k[11][9] = k[9][11]  =  k[9][5] = k[5][9] = -k[5][3];
+    k[10][4] = k[4][10]  = -k[4][4];
+    k[11][3] = k[3][11]  =  k[5][3];
+    k[12][2] = k[2][12]  =  k[6][2];
+
+    k[8][2]  = k[2][8]   = -k[2][2];
+    k[9][3]  = k[3][9]   = -k[3][3];
+    k[11][5] = k[5][11]  = (2.-Ksz)*E*Iy / ( Le*(1.+Ksz) );
+    k[12][6] = k[6][12]  = (2.-Ksy)*E*Iz / ( Le*(1.+Ksy) );
+}
+
+
+/*------------------------------------------------------------------------------
+ELEMENT_RESIDUAL - for the element variables v[1..15], the element's part of the
+equilibrium residual {R} = {fe} - [T]'[k][T]{d}, in global coordinates, and
+its end forces {Q} = [k][T]{d} - [T]{fe}, in local coordinates, as in
+elastic_K(), member_force() and add_feF().  With kT != NULL, [k][T] is saved.
+------------------------------------------------------------------------------*/
+static void element_residual (
+        double *v, double r1, double r2, float p, int shear, int vert,
+        double *t0, ElementLoadData *ld, int n, double *de,
+        double *t, double **kT, double *R, double *Q ){
+
+    double k[13][13], u[13], s[13], fe[13], L, Le;
+    int i, j, m, b;
+
+    L = sqrt( (v[13]-v[10])*(v[13]-v[10]) + (v[14]-v[11])*(v[14]-v[11]) +
+              (v[15]-v[12])*(v[15]-v[12]) );
+    Le = L - r1 - r2;
+
+    element_frame ( t, v, p, vert, t0 );
+
+    element_stiffness ( v, Le, shear, k );
+
+    for (b=0; b<4; b++)         /* {u} = [T]{d} */
+        for (i=1; i<=3; i++)
+            for (u[3*b+i] = 0.0, j=1; j<=3; j++)
+                u[3*b+i] += t[3*(i-1)+j] * de[3*b+j];
+
+    for (i=1; i<=12; i++)       /* {s} = [k]{u} */
+        for (s[i] = 0.0, j=1; j<=12; j++)   s[i] += k[i][j] * u[j];
+
+    if ( kT != NULL )
+        for (i=1; i<=12; i++)
+            for (b=0; b<4; b++)
+                for (j=1; j<=3; j++)
+                    for (kT[i][3*b+j] = 0.0, m=1; m<=3; m++)
+                        kT[i][3*b+j] += k[i][3*b+m] * t[3*(m-1)+j];
+
+    element_fixed_end_forces ( fe, t, L, Le, v, shear, ld, n );
+
+    for (i=1; i<=12; i++)   R[i] = fe[i];
+    for (b=0; b<4; b++)
+        for (j=1; j<=3; j++)
+            for (i=1; i<=3; i++)
+                R[3*b+j] -= t[3*(i-1)+j] * s[3*b+i];
+
+    for (b=0; b<4; b++)
+        for (i=1; i<=3; i++)
+            for (Q[3*b+i] = s[3*b+i], j=1; j<=3; j++)
+                Q[3*b+i] -= t[3*(i-1)+j] * fe[3*b+j];
+}
+
+
+/* solve [K]{X} = {B} for nb right hand sides with the factored [K] */
+static void solve_mrhs (
+        double **K, double *Ks, double *Kf, int *sky, int *dof, double *diag,
+        double *AB, int kd, int *eqn, int neq, int storage, int backend,
+        double **X, double **B, int nb, int DoF, int *q, int *r ){
+
+    double *rms = dvector(1,nb);
+
+    if ( backend )
+        back_solve_system_band_mrhs(K,Ks,sky,dof,AB,kd,eqn,neq,X,B,nb,DoF,q,r,rms);
+    else if ( storage )
+        back_solve_system_sky_mrhs(Ks,Kf,sky,dof,diag,X,B,nb,DoF,q,r,rms);
+    else
+        back_solve_system_mrhs(K,diag,X,B,nb,DoF,q,r,rms);
+
+    free_dvector(rms,1,nb);
+}
+
+
+/*------------------------------------------------------------------------------
+STATIC_SENSITIVITY - Jacobian of the static response of one load case
+------------------------------------------------------------------------------*/
+void static_sensitivity (
+        int nN, int nE, int DoF, vec3 *xyz, float *rj, int *N1, int *N2,
+        float *Ax, float *Asy, float *Asz, float *Jx, float *Iy, float *Iz,
+        float *E, float *G, float *p, float *d, int shear,
+        float gX, float gY, float gZ,
+        int nU, float **U, int nW, float **W, int nP, float **P, int nT, float **T,
+        double *D, int *q, int *r, int nR, int *RN,
+        double **K, double *Ks, double *Kf, int *sky, int *dof, double *diag,
+        double *AB, int kd, int *eqn, int neq, int storage, int backend,
+        int *wrt, int method, int nrows, int *rows, double *J ){
+
+    ElementLoadData ld;
+    double ***dR, ***dQ,    /* derivatives of the element residuals and end forces */
+        ***kT,          /* [k][T] of each element               */
+        **te,           /* direction cosines of each element    */
+        **X, **B,       /* solutions and right hand sides       */
+        v0[NSV+1], v[NSV+1], de[13], t[13], s[13], f[13],
+        Rp[13], Rm[13], Qp[13], Qm[13], h, L, sum;
+    int *active, *colbase, *pos, *rk, *need, *sol,
+        vert, nOut, nV, nS, nb, c0, col, row, g, n, e, k, l, m, i, b, kk;
+
+    nV   = sensitivity_columns ( nN, nE, 0, wrt );
+    nOut = 6*nN + 6*nR + 12*nE;
+    for (i=0; i<nrows*nV; i++)  J[i] = 0.0;
+    if ( nV == 0 || nrows == 0 )    return;
+
+    ld.gX = gX; ld.gY = gY; ld.gZ = gZ;
+    ld.U = U;   ld.W = W;   ld.P = P;   ld.T = T;
+    ld.sU = ivector(1,nE+1);    ld.iU = ivector(1,nU+1);
+    ld.sW = ivector(1,nE+1);    ld.iW = ivector(1,nW+1);
+    ld.sP = ivector(1,nE+1);    ld.iP = ivector(1,nP+1);
+    ld.sT = ivector(1,nE+1);    ld.iT = ivector(1,nT+1);
+    load_index ( nE, nU, U, ld.sU, ld.iU );
+    load_index ( nE, nW, W, ld.sW, ld.iW );
+    load_index ( nE, nP, P, ld.sP, ld.iP );
+    load_index ( nE, nT, T, ld.sT, ld.iT );
+
+    colbase = ivector(0,SENS_TYPES-1);
+    for (col=0, i=0; i<SENS_TYPES; i++) {
+        colbase[i] = wrt[i] ? col : -1;
+        if ( wrt[i] )   col += i < SENS_X ? nE : ( i < SENS_MASS ? nN : 0 );
+    }
+    active = ivector(1,NSV);
+    for (k=1; k<=NSV; k++)  active[k] = wrt[sens_type(k)];
+
+    pos = ivector(0,nOut-1);        /* position of each response in rows[] */
+    for (i=0; i<nOut; i++)  pos[i] = -1;
+    for (i=0; i<nrows; i++) pos[rows[i]] = i;
+
+    rk = ivector(1,DoF);            /* reaction row of each coordinate */
+    for (g=1; g<=DoF; g++)  rk[g] = -1;
+    for (i=0; i<nR; i++)
+        for (l=1; l<=6; l++)
+            if ( r[6*RN[i]-6+l] )   rk[6*RN[i]-6+l] = 6*nN + 6*i + l-1;
+
+    need = ivector(1,nE);           /* element end forces are needed */
+    for (e=1; e<=nE; e++) {
+        need[e] = 0;
+        for (l=1; l<=12; l++) {
+            g = element_dof ( N1, N2, e, l );
+            if ( pos[6*nN + 6*nR + 12*(e-1) + l-1] >= 0 )   need[e] = 1;
+            if ( rk[g] >= 0 && pos[rk[g]] >= 0 )    need[e] = 1;
+        }
+    }
+
+    dR = D3dmatrix(1,nE,1,NSV,1,12);
+    dQ = D3dmatrix(1,nE,1,NSV,1,12);
+    kT = D3dmatrix(1,nE,1,12,1,12);
+    te = dmatrix(1,nE,1,9);
+
+    /* derivatives of each element by central differences */
+    for (e=1; e<=nE; e++) {
+
+        v0[1] = Ax[e];  v0[2] = Asy[e]; v0[3] = Asz[e];
+        v0[4] = Jx[e];  v0[5] = Iy[e];  v0[6] = Iz[e];
+        v0[7] = E[e];   v0[8] = G[e];   v0[9] = d[e];
+        v0[10] = xyz[N1[e]].x;  v0[11] = xyz[N1[e]].y;  v0[12] = xyz[N1[e]].z;
+        v0[13] = xyz[N2[e]].x;  v0[14] = xyz[N2[e]].y;  v0[15] = xyz[N2[e]].z;
+
+        for (l=1; l<=12; l++)   de[l] = D[element_dof(N1,N2,e,l)];
+
+        L = sqrt( (v0[13]-v0[10])*(v0[13]-v0[10]) + (v0[14]-v0[11])*(v0[14]-v0[11]) +
+                  (v0[15]-v0[12])*(v0[15]-v0[12]) );
+        vert = fabs( ( Zvert ? v0[15]-v0[12] : v0[14]-v0[11] ) / L ) == 1.0;
+
+        element_residual ( v0, rj[N1[e]], rj[N2[e]], p[e], shear, 0, NULL,
+                &ld, e, de, te[e], kT[e], Rp, Qp );
+
+        for (k=1; k<=NSV; k++) {
+            if ( !active[k] )   continue;
+            for (i=1; i<=NSV; i++)  v[i] = v0[i];
+            if ( k <= 9 )   h = CBRT_EPS * ( v0[k] != 0.0 ? fabs(v0[k]) : 1.0 );
+            else            h = CBRT_EPS * L;
+            v[k] = v0[k] + h;
+            element_residual ( v, rj[N1[e]], rj[N2[e]], p[e], shear, vert, te[e],
+                    &ld, e, de, t, NULL, Rp, Qp );
+            v[k] = v0[k] - h;
+            element_residual ( v, rj[N1[e]], rj[N2[e]], p[e], shear, vert, te[e],
+                    &ld, e, de, t, NULL, Rm, Qm );
+            for (l=1; l<=12; l++) {
+                dR[e][k][l] = ( Rp[l] - Rm[l] ) / (2.0*h);
+                dQ[e][k][l] = ( Qp[l] - Qm[l] ) / (2.0*h);
+            }
+        }
+    }
+
+    /* explicit terms: end forces and reactions at fixed displacements */
+    for (e=1; e<=nE; e++) {
+        for (k=1; k<=NSV; k++) {
+            if ( !active[k] )   continue;
+            col = colbase[sens_type(k)] +
+                ( k <= 9 ? e : ( k <= 12 ? N1[e] : N2[e] ) ) - 1;
+            for (l=1; l<=12; l++) {
+                row = pos[6*nN + 6*nR + 12*(e-1) + l-1];
+                if ( row >= 0 ) J[row*nV+col] += dQ[e][k][l];
+                g = element_dof ( N1, N2, e, l );
+                if ( rk[g] >= 0 && (row = pos[rk[g]]) >= 0 )
+                    J[row*nV+col] -= dR[e][k][l];
+            }
+        }
+    }
+
+    X = dmatrix(1,NB,1,DoF);
+    B = dmatrix(1,NB,1,DoF);
+
+    if ( method == 1 ) {    /* direct method: one solution per variable */
+
+        for (c0=0; c0<nV; c0+=NB) {
+            nb = nV-c0 < NB ? nV-c0 : NB;
+            for (kk=1; kk<=nb; kk++)
+                for (g=1; g<=DoF; g++)  X[kk][g] = B[kk][g] = 0.0;
+
+            /* {B} = d{R}/dv */
+            for (e=1; e<=nE; e++) {
+                for (k=1; k<=NSV; k++) {
+                    if ( !active[k] )   continue;
+                    col = colbase[sens_type(k)] +
+                        ( k <= 9 ? e : ( k <= 12 ? N1[e] : N2[e] ) ) - 1;
+                    if ( col < c0 || col >= c0+nb ) continue;
+                    for (l=1; l<=12; l++)
+                        B[col-c0+1][element_dof(N1,N2,e,l)] += dR[e][k][l];
+                }
+            }
+
+            solve_mrhs ( K, Ks, Kf, sky, dof, diag, AB, kd, eqn, neq,
+                    storage, backend, X, B, nb, DoF, q, r );
+
+            for (kk=1; kk<=nb; kk++) {
+                col = c0+kk-1;
+                for (g=1; g<=DoF; g++)
+                    if ( q[g] && (row = pos[g-1]) >= 0 )
+                        J[row*nV+col] += X[kk][g];
+                for (e=1; e<=nE; e++) {
+                    if ( !need[e] ) continue;
+                    for (l=1; l<=12; l++)   de[l] = X[kk][element_dof(N1,N2,e,l)];
+                    for (i=1; i<=12; i++)
+                        for (s[i] = 0.0, l=1; l<=12; l++) s[i] += kT[e][i][l] * de[l];
+                    for (b=0; b<4; b++)     /* {f} = [T]'{s} */
+                        for (l=1; l<=3; l++)
+                            for (f[3*b+l] = 0.0, i=1; i<=3; i++)
+                                f[3*b+l] += te[e][3*(i-1)+l] * s[3*b+i];
+                    for (l=1; l<=12; l++) {
+                        row = pos[6*nN + 6*nR + 12*(e-1) + l-1];
+                        if ( row >= 0 ) J[row*nV+col] += s[l];
+                        g = element_dof ( N1, N2, e, l );
+                        if ( rk[g] >= 0 && (row = pos[rk[g]]) >= 0 )
+                            J[row*nV+col] += f[l];
+                    }
+                }
+            }
+        }
+
+    } else {                /* adjoint method: one solution per response */
+
+        sol = ivector(1,nrows);     /* responses that depend on {D} */
+        for (nS=0, i=0; i<nrows; i++) {
+            if ( rows[i] < 6*nN && !q[rows[i]+1] )  continue;
+            if ( rows[i] >= 6*nN && rows[i] < 6*nN + 6*nR &&
+                 !r[6*RN[(rows[i]-6*nN)/6] - 6 + (rows[i]-6*nN)%6 + 1] )   continue;
+            sol[++nS] = i;
+        }
+
+        for (c0=0; c0<nS; c0+=NB) {
+            nb = nS-c0 < NB ? nS-c0 : NB;
+            for (kk=1; kk<=nb; kk++)
+                for (g=1; g<=DoF; g++)  X[kk][g] = B[kk][g] = 0.0;
+
+            /* {B} = d(response)/d{D} */
+            for (kk=1; kk<=nb; kk++) {
+                row = rows[sol[c0+kk]];
+                if ( row < 6*nN ) {         /* displacement */
+                    B[kk][row+1] = 1.0;
+                } else if ( row < 6*nN + 6*nR ) {   /* reaction */
+                    n = RN[(row - 6*nN)/6];
+                    g = 6*(n-1) + (row - 6*nN)%6 + 1;
+                    for (e=1; e<=nE; e++) {
+                        if ( N1[e] == n )       l = g - 6*(n-1);
+                        else if ( N2[e] == n )  l = g - 6*(n-1) + 6;
+                        else    continue;
+                        b = (l-1)/3;
+                        for (m=1; m<=12; m++) {
+                            for (sum=0.0, i=1; i<=3; i++)
+                                sum += te[e][3*(i-1)+l-3*b] * kT[e][3*b+i][m];
+                            B[kk][element_dof(N1,N2,e,m)] += sum;
+                        }
+                    }
+                } else {                    /* element end force */
+                    e = (row - 6*nN - 6*nR)/12 + 1;
+                    l = (row - 6*nN - 6*nR)%12 + 1;
+                    for (m=1; m<=12; m++)
+                        B[kk][element_dof(N1,N2,e,m)] += kT[e][l][m];
+                }
+            }
+
+            solve_mrhs ( K, Ks, Kf, sky, dof, diag, AB, kd, eqn, neq,
+                    storage, backend, X, B, nb, DoF, q, r );
+
+            /* d(response)/dv = {X}' d{R}/dv */
+            for (kk=1; kk<=nb; kk++) {
+                row = sol[c0+kk];
+                for (e=1; e<=nE; e++) {
+                    for (l=1; l<=12; l++)   de[l] = X[kk][element_dof(N1,N2,e,l)];
+                    for (k=1; k<=NSV; k++) {
+                        if ( !active[k] )   continue;
+                        col = colbase[sens_type(k)] +
+                            ( k <= 9 ? e : ( k <= 12 ? N1[e] : N2[e] ) ) - 1;
+                        for (sum=0.0, l=1; l<=12; l++)  sum += de[l] * dR[e][k][l];
+                        J[row*nV+col] += sum;
+                    }
+                }
+            }
+        }
+
+        free_ivector(sol,1,nrows);
+    }
+
+    free_dmatrix(X,1,NB,1,DoF);
+    free_dmatrix(B,1,NB,1,DoF);
+    free_D3dmatrix(dR,1,nE,1,NSV,1,12);
+    free_D3dmatrix(dQ,1,nE,1,NSV,1,12);
+    free_D3dmatrix(kT,1,nE,1,12,1,12);
+    free_dmatrix(te,1,nE,1,9);
+    free_ivector(need,1,nE);
+    free_ivector(rk,1,DoF);
+    free_ivector(pos,0,nOut-1);
+    free_ivector(active,1,NSV);
+    free_ivector(colbase,0,SENS_TYPES-1);
+    free_ivector(ld.sU,1,nE+1);     free_ivector(ld.iU,1,nU+1);
+    free_ivector(ld.sW,1,nE+1);     free_ivector(ld.iW,1,nW+1);
+    free_ivector(ld.sP,1,nE+1);     free_ivector(ld.iP,1,nP+1);
+    free_ivector(ld.sT,1,nE+1);     free_ivector(ld.iT,1,nT+1);
+}
+
+
+/*------------------------------------------------------------------------------
+ELEMENT_MATRICES - the stiffness and mass matrices of an element in global
+coordinates, for the element variables v[1..15], as in elastic_K(),
+geometric_K() with the axial force T, and consistent_M() or lumped_M()
+------------------------------------------------------------------------------*/
+static void element_matrices (
+        double *v, double r1, double r2, float p, int shear, double T,
+        int lump, double EMs, int vert, double *t0,
+        double *t, double km[13][13], double mm[13][13] ){
+
+    double k[13][13], m[13][13], L, Le, Ksy, Ksz, Dsy, Dsz, tm, ry, rz, po, sum,
+        Ax=v[1], Asy=v[2], Asz=v[3], J=v[4], Iy=v[5], Iz=v[6], E=v[7], G=v[8], d=v[9];
+    int i, j, a, b, ii, jj;
+
+    L = sqrt( (v[13]-v[10])*(v[13]-v[10]) + (v[14]-v[11])*(v[14]-v[11]) +
+              (v[15]-v[12])*(v[15]-v[12]) );
+    Le = L - r1 - r2;
+
+    element_frame ( t, v, p, vert, t0 );
+
+    element_stiffness ( v, Le, shear, k );
+
+    if ( T != 0.0 ) {       /* geometric stiffness */
+        if ( shear ) {
+            Ksy = 12.*E*Iz / (G*Asy*Le*Le);
+            Ksz = 12.*E*Iy / (G*Asz*Le*Le);
+        } else  Ksy = Ksz = 0.0;
+        Dsy = (1+Ksy)*(1+Ksy);
+        Dsz = (1+Ksz)*(1+Ksz);
+
+        k[2][2] += T/L*(1.2+2.0*Ksy+Ksy*Ksy)/Dsy;  k[8][8] += T/L*(1.2+2.0*Ksy+Ksy*Ksy)/Dsy;
+        k[3][3] += T/L*(1.2+2.0*Ksz+Ksz*Ksz)/Dsz;  k[9][9] += T/L*(1.2+2.0*Ksz+Ksz*Ksz)/Dsz;
+        k[4][4] += T/L*J/Ax;                        k[10][10] += T/L*J/Ax;
+        k[5][5] += T*L*(2.0/15.0+Ksz/6.0+Ksz*Ksz/12.0)/Dsz;
+        k[11][11] += T*L*(2.0/15.0+Ksz/6.0+Ksz*Ksz/12.0)/Dsz;
+        k[6][6] += T*L*(2.0/15.0+Ksy/6.0+Ksy*Ksy/12.0)/Dsy;
+        k[12][12] += T*L*(2.0/15.0+Ksy/6.0+Ksy*Ksy/12.0)/Dsy;
+
+        k[5][3]  -= T/10.0/Dsz;     k[3][5]  -= T/10.0/Dsz;
+        k[11][3] -= T/10.0/Dsz;     k[3][11] -= T/10.0/Dsz;
+        k[9][5]  += T/10.0/Dsz;     k[5][9]  += T/10.0/Dsz;
+        k[11][9] += T/10.0/Dsz;     k[9][11] += T/10.0/Dsz;
+        k[6][2]  += T/10.0/Dsy;     k[2][6]  += T/10.0/Dsy;
+        k[12][2] += T/10.0/Dsy;     k[2][12] += T/10.0/Dsy;
+        k[8][6]  -= T/10.0/Dsy;     k[6][8]  -= T/10.0/Dsy;
+        k[12][8] -= T/10.0/Dsy;     k[8][12] -= T/10.0/Dsy;
+
+        k[4][10] -= T/L*J/Ax;       k[10][4] -= T/L*J/Ax;
+        k[8][2]  -= T/L*(1.2+2.0*Ksy+Ksy*Ksy)/Dsy;
+        k[2][8]  -= T/L*(1.2+2.0*Ksy+Ksy*Ksy)/Dsy;
+        k[9][3]  -= T/L*(1.2+2.0*Ksz+Ksz*Ksz)/Dsz;
+        k[3][9]  -= T/L*(1.2+2.0*Ksz+Ksz*Ksz)/Dsz;
+        k[11][5] -= T*L*(1.0/30.0+Ksz/6.0+Ksz*Ksz/12.0)/Dsz;
+        k[5][11] -= T*L*(1.0/30.0+Ksz/6.0+Ksz*Ksz/12.0)/Dsz;
+        k[12][6] -= T*L*(1.0/30.0+Ksy/6.0+Ksy*Ksy/12.0)/Dsy;
+        k[6][12] -= T*L*(1.0/30.0+Ksy/6.0+Ksy*Ksy/12.0)/Dsy;
+    }
+
+    for (i=1; i<=12; i++)   for (j=1; j<=12; j++)   m[i][j] = 0.0;
+
+    if ( lump ) {
+        tm = ( d*Ax*L + EMs ) / 2.0;
+        ry = d*Iy*L / 2.0;
+        rz = d*Iz*L / 2.0;
+        po = d*L*J / 2.0;
+        m[1][1] = m[2][2] = m[3][3] = m[7][7] = m[8][8] = m[9][9] = tm;
+        m[4][4] = m[10][10] = po;
+        m[5][5] = m[11][11] = ry;
+        m[6][6] = m[12][12] = rz;
+    } else {
+        tm =  d*Ax*L;
+        ry =  d*Iy;
+        rz =  d*Iz;
+        po =  d*J*L;
+
+        m[1][1]  = m[7][7]   = tm/3.;
+        m[2][2]  = m[8][8]   = 13.*tm/35. + 6.*rz/(5.*L);
+        m[3][3]  = m[9][9]   = 13.*tm/35. + 6.*ry/(5.*L);
+        m[4][4]  = m[10][10] = po/3.;
+        m[5][5]  = m[11][11] = tm*L*L/105. + 2.*L*ry/15.;
+        m[6][6]  = m[12][12] = tm*L*L/105. + 2.*L*rz/15.;
+
+        m[5][3]  = m[3][5]   = -11.*tm*L/210. - ry/10.;
+        m[6][2]  = m[2][6]   =  11.*tm*L/210. + rz/10.;
+        m[7][1]  = m[1][7]   =  tm/6.;
+
+        m[8][6]  = m[6][8]   =  13.*tm*L/420. - rz/10.;
+        m[9][5]  = m[5][9]   = -13.*tm*L/420. + ry/10.;
+        m[10][4] = m[4][10]  =  po/6.;
+        m[11][3] = m[3][11]  =  13.*tm*L/420. - ry/10.;
+        m[12][2] = m[2][12]  = -13.*tm*L/420. + rz/10.;
+
+        m[11][9] = m[9][11]  =  11.*tm*L/210. + ry/10.;
+        m[12][8] = m[8][12]  = -11.*tm*L/210. - rz/10.;
+
+        m[8][2]  = m[2][8]   =  9.*tm/70. - 6.*rz/(5.*L);
+        m[9][3]  = m[3][9]   =  9.*tm/70. - 6.*ry/(5.*L);
+        m[11][5] = m[5][11]  = -L*L*tm/140. - ry*L/30.;
+        m[12][6] = m[6][12]  = -L*L*tm/140. - rz*L/30.;
+
+        for (i=1; i<=3; i++)    m[i][i] += 0.5*EMs;
+        for (i=7; i<=9; i++)    m[i][i] += 0.5*EMs;
+    }
+
+    /* [T]'[k][T] and [T]'[m][T], block by block */
+    for (a=0; a<4; a++)
+        for (b=0; b<4; b++)
+            for (i=1; i<=3; i++)
+                for (j=1; j<=3; j++) {
+                    km[3*a+i][3*b+j] = mm[3*a+i][3*b+j] = 0.0;
+                    for (ii=1; ii<=3; ii++)
+                        for (jj=1; jj<=3; jj++) {
+                            sum = t[3*(ii-1)+i] * t[3*(jj-1)+j];
+                            km[3*a+i][3*b+j] += sum * k[3*a+ii][3*b+jj];
+                            mm[3*a+i][3*b+j] += sum * m[3*a+ii][3*b+jj];
+                        }
+                }
+}
+
+
+/* the extra inertia of a node, as in assemble_M(), for
+   v[0..9] = mass, Ixx, Iyy, Izz, Ixy, Ixz, Iyz, rhox, rhoy, rhoz */
+static void node_mass ( double *v, double mb[7][7] ){
+
+    double m=v[0], rx=v[7], ry=v[8], rz=v[9];
+    int i, j;
+
+    for (i=1; i<=6; i++)    for (j=1; j<=6; j++)    mb[i][j] = 0.0;
+
+    mb[1][1] = mb[2][2] = mb[3][3] = m;
+    mb[1][5] = mb[5][1] =  m*rz;
+    mb[1][6] = mb[6][1] = -m*ry;
+    mb[2][4] = mb[4][2] = -m*rz;
+    mb[2][6] = mb[6][2] =  m*rx;
+    mb[3][4] = mb[4][3] =  m*ry;
+    mb[3][5] = mb[5][3] = -m*rx;
+    mb[4][4] = v[1] + m*(ry*ry + rz*rz);
+    mb[5][5] = v[2] + m*(rx*rx + rz*rz);
+    mb[6][6] = v[3] + m*(rx*rx + ry*ry);
+    mb[4][5] = mb[5][4] = v[4] - m*rx*ry;
+    mb[4][6] = mb[6][4] = v[5] - m*rx*rz;
+    mb[5][6] = mb[6][5] = v[6] - m*ry*rz;
+}
+
+
+/*------------------------------------------------------------------------------
+MODAL_SENSITIVITY - derivatives of the natural frequencies and mode shapes
+
+For a mode {v} with eigenvalue w = (2 pi f)^2 and {v}'[M]{v} = 1,
+    dw/dx = {v}' ( d[K]/dx - w d[M]/dx ) {v} ,
+and, by Nelson's method, d{v}/dx = {y} + c {v}, where {y} solves
+    ( [K] - w [M] ) {y} = - ( d[K]/dx - w d[M]/dx ) {v} + dw/dx [M] {v}
+with its largest coordinate held at zero, and c = -{v}'[M]{y} - {v}'d[M]/dx{v}/2.
+The derivatives of the element matrices are central differences, those of
+the extra node inertias are exact.  Restrained coordinates do not move.
+------------------------------------------------------------------------------*/
+void modal_sensitivity (
+        int nN, int nE, int nI, int DoF, vec3 *xyz, float *rj, int *N1, int *N2,
+        float *Ax, float *Asy, float *Asz, float *Jx, float *Iy, float *Iz,
+        float *E, float *G, float *p, float *d, float *EMs,
+        int shear, int geom, double **Q, int lump, int *IN,
+        float *NMs, float *NMx, float *NMy, float *NMz,
+        float *NMxy, float *NMxz, float *NMyz,
+        float *rhox, float *rhoy, float *rhoz,
+        double *K, double *M, int *sky, int *dof, int *r,
+        int nM, double *f, double **V,
+        int *wrt, int shapes, double *dfreq, double *dV ){
+
+    double **U,         /* mode shapes with [M] norm 1, coordinate order */
+        **MU,           /* [M]{U}, coordinate order     */
+        *w,             /* eigenvalues                  */
+        *nrm,           /* {V} = nrm {U}                */
+        **B=NULL, **X=NULL, /* Nelson right hand sides and solutions, equation order */
+        *gW=NULL, *gM=NULL, /* dw/dx and {v}' d[M]/dx {v}   */
+        *A=NULL, *Af=NULL, *dd=NULL, /* [K] - w [M] and its L D L' decomp. */
+        *x, *y,
+        v0[NSV+1], v[NSV+1], t0[10], t[10], ue[13], h, L, T, dw, sum,
+        kp[13][13], km[13][13], mp[13][13], mm[13][13], dk[13][13], dm[13][13],
+        n0[10], nv[10], np[7][7], nm[7][7];
+    int *colbase, *active, *qq=NULL, *rr=NULL,
+        nV, col, e, k, l, ll, i, j, n, g, gg, mode, vert, pd;
+
+    nV = sensitivity_columns ( nN, nE, nI, wrt );
+    for (i=0; i<nM*nV; i++) dfreq[i] = 0.0;
+    if ( shapes )   for (i=0; i<nM*DoF*nV; i++) dV[i] = 0.0;
+    if ( nV == 0 || nM == 0 )   return;
+
+    colbase = ivector(0,SENS_TYPES-1);
+    for (col=0, i=0; i<SENS_TYPES; i++) {
+        colbase[i] = wrt[i] ? col : -1;
+        if ( wrt[i] )   col += i < SENS_X ? nE : ( i < SENS_MASS ? nN : nI );
+    }
+    active = ivector(1,NSV);
+    for (k=1; k<=NSV; k++)  active[k] = wrt[sens_type(k)];
+
+    /* eigenvalues and mass-normalized mode shapes */
+    U  = dmatrix(1,nM,1,DoF);
+    MU = dmatrix(1,nM,1,DoF);
+    w  = dvector(1,nM);
+    nrm = dvector(1,nM);
+    x  = dvector(1,DoF);
+    y  = dvector(1,DoF);
+    for (mode=1; mode<=nM; mode++) {
+        for (i=1; i<=DoF; i++)  x[dof[i]] = r[i] ? 0.0 : V[i][mode];
+        prodAx_sky ( M, sky, DoF, x, y );
+        for (sum=0.0, i=1; i<=DoF; i++) sum += x[i]*y[i];
+        nrm[mode] = sqrt(sum);
+        for (i=1; i<=DoF; i++) {
+            U[mode][i]  = x[dof[i]] / nrm[mode];
+            MU[mode][i] = y[dof[i]] / nrm[mode];
+        }
+        w[mode] = 4.0*PI*PI*f[mode]*f[mode];
+    }
+
+    if ( shapes ) {
+        B  = dmatrix(1,DoF,1,nV);
+        X  = dmatrix(1,DoF,1,nV);
+        gW = dvector(0,nV-1);
+        gM = dvector(0,nV-1);
+        A  = dvector(1,sky[DoF]);
+        Af = dvector(1,sky[DoF]);
+        dd = dvector(1,DoF);
+        qq = ivector(1,DoF);
+        rr = ivector(1,DoF);
+    }
+
+    /* with mode shapes, one pass over the elements for each mode */
+    for (mode = shapes ? 1 : 0; mode <= (shapes ? nM : 0); mode++) {
+
+        if ( shapes ) {
+            for (i=1; i<=DoF; i++)
+                for (col=0; col<nV; col++)  B[i][col+1] = X[i][col+1] = 0.0;
+            for (col=0; col<nV; col++)  gW[col] = gM[col] = 0.0;
+        }
+
+        for (e=1; e<=nE; e++) {
+
+            v0[1] = Ax[e];  v0[2] = Asy[e]; v0[3] = Asz[e];
+            v0[4] = Jx[e];  v0[5] = Iy[e];  v0[6] = Iz[e];
+            v0[7] = E[e];   v0[8] = G[e];   v0[9] = d[e];
+            v0[10] = xyz[N1[e]].x;  v0[11] = xyz[N1[e]].y;  v0[12] = xyz[N1[e]].z;
+            v0[13] = xyz[N2[e]].x;  v0[14] = xyz[N2[e]].y;  v0[15] = xyz[N2[e]].z;
+
+            L = sqrt( (v0[13]-v0[10])*(v0[13]-v0[10]) + (v0[14]-v0[11])*(v0[14]-v0[11]) +
+                      (v0[15]-v0[12])*(v0[15]-v0[12]) );
+            vert = fabs( ( Zvert ? v0[15]-v0[12] : v0[14]-v0[11] ) / L ) == 1.0;
+            T = geom ? -Q[e][1] : 0.0;
+
+            element_frame ( t0, v0, p[e], 0, NULL );
+
+            for (k=1; k<=NSV; k++) {
+                if ( !active[k] )   continue;
+                col = colbase[sens_type(k)] +
+                    ( k <= 9 ? e : ( k <= 12 ? N1[e] : N2[e] ) ) - 1;
+                for (i=1; i<=NSV; i++)  v[i] = v0[i];
+                if ( k <= 9 )   h = CBRT_EPS * ( v0[k] != 0.0 ? fabs(v0[k]) : 1.0 );
+                else            h = CBRT_EPS * L;
+                v[k] = v0[k] + h;
+                element_matrices ( v, rj[N1[e]], rj[N2[e]], p[e], shear, T,
+                        lump, EMs[e], vert, t0, t, kp, mp );
+                v[k] = v0[k] - h;
+                element_matrices ( v, rj[N1[e]], rj[N2[e]], p[e], shear, T,
+                        lump, EMs[e], vert, t0, t, km, mm );
+                for (l=1; l<=12; l++)
+                    for (ll=1; ll<=12; ll++) {
+                        dk[l][ll] = ( kp[l][ll] - km[l][ll] ) / (2.0*h);
+                        dm[l][ll] = ( mp[l][ll] - mm[l][ll] ) / (2.0*h);
+                    }
+
+                for (j = shapes ? mode : 1; j <= (shapes ? mode : nM); j++) {
+                    for (l=1; l<=12; l++)   ue[l] = U[j][element_dof(N1,N2,e,l)];
+                    for (dw=0.0, sum=0.0, l=1; l<=12; l++)
+                        for (ll=1; ll<=12; ll++) {
+                            dw  += ue[l] * ( dk[l][ll] - w[j]*dm[l][ll] ) * ue[ll];
+                            sum += ue[l] * dm[l][ll] * ue[ll];
+                        }
+                    if ( f[j] > 0.0 )
+                        dfreq[(j-1)*nV+col] += dw / (8.0*PI*PI*f[j]);
+                    if ( !shapes )  continue;
+                    gW[col] += dw;
+                    gM[col] += sum;
+                    for (l=1; l<=12; l++) {
+                        g = element_dof ( N1, N2, e, l );
+                        for (ll=1; ll<=12; ll++)
+                            B[dof[g]][col+1] -= ( dk[l][ll] - w[j]*dm[l][ll] ) * ue[ll];
+                    }
+                }
+            }
+        }
+
+        for (i=0; i<nI; i++) {      /* extra node inertias */
+            n = IN[i];
+            n0[0] = NMs[n];     n0[1] = NMx[n];     n0[2] = NMy[n];
+            n0[3] = NMz[n];     n0[4] = NMxy[n];    n0[5] = NMxz[n];
+            n0[6] = NMyz[n];    n0[7] = rhox[n];    n0[8] = rhoy[n];
+            n0[9] = rhoz[n];
+            for (k=SENS_MASS; k<SENS_TYPES; k++) {
+                if ( !wrt[k] )  continue;
+                col = colbase[k] + i;
+                for (l=0; l<10; l++)    nv[l] = n0[l];
+                h = CBRT_EPS * ( n0[k-SENS_MASS] != 0.0 ? fabs(n0[k-SENS_MASS]) : 1.0 );
+                nv[k-SENS_MASS] = n0[k-SENS_MASS] + h;
+                node_mass ( nv, np );
+                nv[k-SENS_MASS] = n0[k-SENS_MASS] - h;
+                node_mass ( nv, nm );
+                for (j = shapes ? mode : 1; j <= (shapes ? mode : nM); j++) {
+                    for (sum=0.0, l=1; l<=6; l++)
+                        for (ll=1; ll<=6; ll++)
+                            sum += U[j][6*(n-1)+l] * ( np[l][ll] - nm[l][ll] ) / (2.0*h)
+                                 * U[j][6*(n-1)+ll];
+                    if ( f[j] > 0.0 )
+                        dfreq[(j-1)*nV+col] -= w[j]*sum / (8.0*PI*PI*f[j]);
+                    if ( !shapes )  continue;
+                    gW[col] -= w[j]*sum;
+                    gM[col] += sum;
+                    for (l=1; l<=6; l++)
+                        for (ll=1; ll<=6; ll++)
+                            B[dof[6*(n-1)+l]][col+1] += w[j] *
+                                ( np[l][ll] - nm[l][ll] ) / (2.0*h) * U[j][6*(n-1)+ll];
+                }
+            }
+        }
+
+        if ( !shapes )  break;
+
+        /* Nelson's method:  {B} += dw/dx [M]{v}, then solve with ( [K] - w [M] ) */
+        for (col=0; col<nV; col++)
+            for (i=1; i<=DoF; i++)  B[dof[i]][col+1] += gW[col] * MU[mode][i];
+
+        for (i=1; i<=sky[DoF]; i++) A[i] = K[i] - w[mode]*M[i];
+        for (gg=1, g=1; g<=DoF; g++)
+            if ( fabs(U[mode][g]) > fabs(U[mode][gg]) ) gg = g;
+        for (g=1; g<=DoF; g++) {
+            rr[dof[g]] = r[g] || g == gg;
+            qq[dof[g]] = !rr[dof[g]];
+        }
+        ldl_dcmp_sky ( A, Af, sky, DoF, dd, NULL, NULL, qq, rr, 1, 0, &pd );
+        ldl_solve_sky_mrhs ( A, Af, sky, DoF, dd, B, X, nV, qq, rr );
+
+        for (col=0; col<nV; col++) {
+            for (sum=0.0, i=1; i<=DoF; i++) sum += MU[mode][i] * X[dof[i]][col+1];
+            sum = -sum - 0.5*gM[col];
+            for (i=1; i<=DoF; i++)
+                dV[((mode-1)*DoF + i-1)*nV + col] =
+                    nrm[mode] * ( X[dof[i]][col+1] + sum*U[mode][i] );
+        }
+    }
+
+    if ( shapes ) {
+        free_dmatrix(B,1,DoF,1,nV);
+        free_dmatrix(X,1,DoF,1,nV);
+        free_dvector(gW,0,nV-1);
+        free_dvector(gM,0,nV-1);
+        free_dvector(A,1,sky[DoF]);
+        free_dvector(Af,1,sky[DoF]);
+        free_dvector(dd,1,DoF);
+        free_ivector(qq,1,DoF);
+        free_ivector(rr,1,DoF);
+    }
+    free_dmatrix(U,1,nM,1,DoF);
+    free_dmatrix(MU,1,nM,1,DoF);
+    free_dvector(w,1,nM);
+    free_dvector(nrm,1,nM);
+    free_dvector(x,1,DoF);
+    free_dvector(y,1,DoF);
+    free_ivector(active,1,NSV);
+    free_ivector(colbase,0,SENS_TYPES-1);
+}
@@ -0,0 +1,147 @@
+/*
+Semi-analytic sensitivities of the static response of a linear frame and of
+its natural frequencies and mode shapes.
+Derivatives of the node displacements, reactions and element end forces with
+respect to the section properties, densities and node coordinates, found with
+the factored stiffness matrix of the linear analysis, and derivatives of the
+modes with respect to the same variables and the extra node inertias.
+*/
+
+#ifndef PY_SENSITIVITY_H
+#define PY_SENSITIVITY_H
+
+#include "microstran/vec3.h"
+
+
+/* design variable types, the order of the wrt flags */
+#define SENS_AX      0
+#define SENS_ASY     1
+#define SENS_ASZ     2
+#define SENS_JX      3
+#define SENS_IY      4
+#define SENS_IZ      5
+#define SENS_E       6
+#define SENS_G       7
+#define SENS_DENSITY 8
+#define SENS_X       9
+#define SENS_Y      10
+#define SENS_Z      11
+#define SENS_MASS   12  /* extra node inertia, modal sensitivities only */
+#define SENS_IXX    13
+#define SENS_IYY    14
+#define SENS_IZZ    15
+#define SENS_IXY    16
+#define SENS_IXZ    17
+#define SENS_IYZ    18
+#define SENS_RHOX   19
+#define SENS_RHOY   20
+#define SENS_RHOZ   21
+#define SENS_TYPES  22
+
+
+/**
+    number of columns of the Jacobian:  nE for each selected element
+    property, nN for each selected node coordinate and nI for each
+    selected extra node inertia
+*/
+int sensitivity_columns (
+    int nN,     /**< number of nodes                */
+    int nE,     /**< number of frame elements       */
+    int nI,     /**< number of extra node inertias  */
+    int *wrt    /**< wrt[0..SENS_TYPES-1]: 1 to differentiate with respect to it */
+);
+
+
+/**
+    Jacobian of the static response of one load case.
+    The rows of the full response are the node displacements (6*nN, node by
+    node: dx dy dz dxrot dyrot dzrot), the reactions (6*nR, in the order of
+    the reaction nodes: Fx Fy Fz Mxx Myy Mzz) and the element end forces
+    (12*nE, element by element: Nx Vy Vz Txx Myy Mzz at N1 and then at N2).
+    Only the nrows rows listed in rows[] (0-based) are returned, in J[nrows][ncols].
+    The columns are the selected variable types, in the order of the wrt flags,
+    nE columns for an element property and nN for a node coordinate.
+    The extra node inertias do not enter the static response and are skipped.
+*/
+void static_sensitivity (
+    int nN, int nE, int DoF,    /**< number of nodes, elements and DoF's */
+    vec3 *xyz,      /**< XYZ locations of every node        */
+    float *rj,      /**< rigid radius of every node         */
+    int *N1, int *N2,   /**< node connectivity              */
+    float *Ax, float *Asy, float *Asz,  /**< section areas  */
+    float *Jx, float *Iy, float *Iz,    /**< section inertias   */
+    float *E, float *G, /**< elastic and shear moduli       */
+    float *p,       /**< roll angle, radians            */
+    float *d,       /**< mass density                   */
+    int shear,      /**< 1: include shear deformation, 0: don't */
+    float gX, float gY, float gZ,   /**< gravitational acceleration */
+    int nU, float **U,  /**< uniformly distributed loads    */
+    int nW, float **W,  /**< trapezoidally distributed loads */
+    int nP, float **P,  /**< concentrated point loads       */
+    int nT, float **T,  /**< temperature loads              */
+    double *D,      /**< node displacements                 */
+    int *q, int *r, /**< free and restrained coordinates    */
+    int nR,         /**< number of reaction nodes           */
+    int *RN,        /**< reaction nodes, RN[0..nR-1]        */
+    double **K,     /**< stiffness matrix, dense, or NULL   */
+    double *Ks,     /**< stiffness matrix, profile storage, or NULL */
+    double *Kf,     /**< L of the L D L' decomp., profile storage */
+    int *sky,       /**< location of the diagonal of each column */
+    int *dof,       /**< equation number of each coordinate */
+    double *diag,   /**< diagonal of D in the L D L' decomposition */
+    double *AB,     /**< banded Cholesky factor of [K_qq], LAPACK backend */
+    int kd, int *eqn, int neq,  /**< band data of [K_qq]    */
+    int storage,    /**< 0: dense [K], 1: profile [K]       */
+    int backend,    /**< 0: native solvers, 1: LAPACK solvers */
+    int *wrt,       /**< variable types, see sensitivity_columns() */
+    int method,     /**< 1: direct method, 2: adjoint method */
+    int nrows,      /**< number of rows of the response     */
+    int *rows,      /**< rows of the response               */
+    double *J       /**< the Jacobian, J[nrows][ncols], row-major */
+);
+
+
+/**
+    derivatives of the natural frequencies, and optionally of the mode
+    shapes by Nelson's method, with respect to the section properties,
+    densities, node coordinates and extra node inertias.
+    [K] and [M] are in profile storage, with the reactions applied as for the
+    modal analysis.  The frequency derivatives are returned in
+    dfreq[nM][ncols] and the mode shape derivatives in dV[nM][DoF][ncols]
+    (row-major), with the columns of sensitivity_columns().
+*/
+void modal_sensitivity (
+    int nN, int nE, int nI, int DoF, /**< number of nodes, elements, extra inertias and DoF's */
+    vec3 *xyz,      /**< XYZ locations of every node        */
+    float *rj,      /**< rigid radius of every node         */
+    int *N1, int *N2,   /**< node connectivity              */
+    float *Ax, float *Asy, float *Asz,  /**< section areas  */
+    float *Jx, float *Iy, float *Iz,    /**< section inertias   */
+    float *E, float *G, /**< elastic and shear moduli       */
+    float *p,       /**< roll angle, radians            */
+    float *d,       /**< mass density                   */
+    float *EMs,     /**< extra element mass             */
+    int shear,      /**< 1: include shear deformation, 0: don't */
+    int geom,       /**< 1: [K] includes the geometric stiffness */
+    double **Q,     /**< element end forces, for the geometric stiffness */
+    int lump,       /**< 1: lumped mass matrix, 0: consistent mass */
+    int *IN,        /**< node of each extra inertia, IN[0..nI-1] */
+    float *NMs, float *NMx, float *NMy, float *NMz, /**< extra node inertia */
+    float *NMxy, float *NMxz, float *NMyz,
+    float *rhox, float *rhoy, float *rhoz,  /**< location of the extra node mass */
+    double *K,      /**< stiffness matrix, profile storage  */
+    double *M,      /**< mass matrix, profile storage       */
+    int *sky,       /**< location of the diagonal of each column */
+    int *dof,       /**< equation number of each coordinate */
+    int *r,         /**< restrained coordinates             */
+    int nM,         /**< number of modes                    */
+    double *f,      /**< natural frequencies, Hz            */
+    double **V,     /**< mode shapes, V[1..DoF][1..nM]      */
+    int *wrt,       /**< variable types, see sensitivity_columns() */
+    int shapes,     /**< 1: mode shape derivatives too      */
+    double *dfreq,  /**< derivatives of the frequencies     */
+    double *dV      /**< derivatives of the mode shapes, or NULL */
+);
+
+
+#endif /* PY_SENSITIVITY_H */
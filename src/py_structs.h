@@ -148,11 +148,94 @@ typedef struct {
     int *N;
     double *cx, *cy, *cz, *cxx, *cyy, *czz;
     int *m;
+    double *Kc, *Mc;    // output: condensed stiffness and mass [Cdof][Cdof], or NULL
 
 } Condensation;
 
 
 
+// --------------
+// Solver Inputs
+// --------------
+
+
+typedef struct {
+    int storage, reorder;
+    int block;      // 1: solve all load cases as one block of load vectors
+    int backend;    // 0: native solvers, 1: LAPACK (banded Cholesky, dsygvx)
+    int nlmethod;   // geometric nonlinearity 0: Newton, 1: modified Newton, 2: Broyden
+    double nltol;   // convergence tolerance of the equilibrium error
+    int nlmaxit;    // maximum number of nonlinear iterations
+    int nlrefactor; // iterations (or Broyden updates) between factorizations of K
+    int *profile;   // output: terms in the profile of K before and after reordering
+    int *symbolic;  // profile of K shared by runs of the same topology, or NULL:
+                    // symbolic[0] = 1 once set, then sky[0..DoF], dof[1..DoF]
+    double blockbytes; // memory for the load data of a block of load cases,
+                    // or 0 for LOAD_BLOCK_BYTES
+
+} SolverData;
+
+
+typedef struct {
+    int method;     // 0: none, 1: direct method, 2: adjoint method
+    int *wrt;       // 1 for each variable type to differentiate with respect to
+    int nrows;      // number of responses
+    int *rows;      // responses: displacements, reactions, end forces
+    double *J;      // output: Jacobian of each load case [nL][nrows][ncols]
+    int modal;      // 1: derivatives of the natural frequencies
+    int shapes;     // 1: derivatives of the mode shapes too (Nelson's method)
+    int *mwrt;      // variable types of the modal derivatives
+    double *dfreq;  // output: derivatives of the frequencies [nM][ncols]
+    double *dV;     // output: derivatives of the mode shapes [nM][DoF][ncols]
+
+} SensitivityData;
+
+
+typedef struct {
+    int nD;         // number of nodes of the displacements
+    int *Dnode;     // the nodes of the displacements [nD]
+    int nQ;         // number of elements of the end forces
+    int *Qelement;  // the elements of the end forces [nQ]
+    int nR;         // number of nodes of the reactions
+    int *Rnode;     // the nodes of the reactions [nR]
+                    // (internal forces: elements with no points are skipped)
+
+} OutputData;
+
+
+
+// --------------
+// Batch Inputs and Outputs
+// --------------
+
+
+typedef struct {
+    int nB;         // number of designs
+    double *Ax, *Asy, *Asz, *Jx, *Iy, *Iz, *E, *G, *roll, *density;
+                    // element properties of each design [nB][nE], or NULL
+                    // for the properties of Elements
+    int varyLoads;  // 1: nL load cases for each design, 0: the same for all
+    int *ifoff;     // first internal force point of each element [nE+1]
+
+    // outputs, design by design
+    int *dnode;     // [nB][nL][nN]
+    double *disp;   // [nB][nL][6][nN]
+    int *felement, *fnode; // [nB][nL][2*nE]
+    double *forces; // [nB][nL][6][2*nE]
+    int *rnode;     // [nB][nL][nR]
+    double *reactions;  // [nB][nL][6][nR]
+    double *iforces;    // [nB][11][nL][ifoff[nE]]
+    double *mass;   // total and structural mass [nB][2]
+    int *mnode;     // [nB][nN]
+    double *nmass;  // [nB][6][nN]
+    double *freq;   // frequency and participation factors [nB][4][nM]
+    int *modenode;  // [nB][nM][nN]
+    double *modes;  // [nB][nM][6][nN]
+
+} BatchData;
+
+
+
 // --------------
 // Static Data Outputs
 // --------------
@@ -190,7 +273,12 @@ typedef struct{
 
 typedef struct {
 
-    double *x, *Nx, *Vy, *Vz, *Tx, *My, *Mz, *Dx, *Dy, *Dz, *Rx;
+    int *offset;    // first point of each element [nE+1]
+    double *values; // x, Nx, Vy, Vz, Tx, My, Mz, Dx, Dy, Dz, Rx at the points
+                    // of all elements, one quantity after the other
+                    // [11][nL][offset[nE]]
+    double *extrema;    // max, x of max, min, x of min of Nx ... Rx along
+                    // each element [10][4][nL][nE], NULL: the points only
 
 } InternalForces;
 
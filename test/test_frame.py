@@ -9,6 +9,9 @@ Copyright (c) NREL. All rights reserved.
 
 import unittest
 import numpy as np
+import pickle
+import gc
+import weakref
 from StringIO import StringIO
 
 from frame3dd import Frame, NodeData, ReactionData, ElementData, Options, \
@@ -138,6 +141,7 @@ class FrameTestEXA(unittest.TestCase):
 
         frame.addLoadCase(load)
 
+        self.frame = frame
         self.displacements, self.forces, self.reactions, self.internalForces, self.mass, self.modal = frame.run()
 
 
@@ -459,6 +463,612 @@ class FrameTestEXA(unittest.TestCase):
 
 
 
+    def test_reorder(self):
+
+        self.frame.setStorage('skyline', reorder=True)
+        disp, forces, reactions, internalForces, mass, modal = self.frame.run()
+
+        profile = self.frame.profile
+        self.assertEqual(profile.original, 1656)
+        self.assertTrue(profile.reordered < profile.original)
+
+        np.testing.assert_array_equal(disp.node, self.displacements.node)
+        np.testing.assert_array_almost_equal(disp.dx, self.displacements.dx, decimal=10)
+        np.testing.assert_array_almost_equal(disp.dy, self.displacements.dy, decimal=10)
+        np.testing.assert_array_almost_equal(disp.dzrot, self.displacements.dzrot, decimal=10)
+        np.testing.assert_array_almost_equal(forces.Nx, self.forces.Nx, decimal=6)
+        np.testing.assert_array_almost_equal(reactions.Fx, self.reactions.Fx, decimal=6)
+        np.testing.assert_array_almost_equal(reactions.Fy, self.reactions.Fy, decimal=6)
+
+
+    def test_factor_once(self):
+
+        # the load cases of one factorization, as each load case alone
+        f = self.frame
+        for storage in ['dense', 'skyline']:
+            f.setStorage(storage)
+            results = f.run()[:3]
+            for i, load in enumerate(f.loadCases):
+                one = Frame(f.nodes, f.reactions, f.elements, f.options)
+                one.setStorage(storage)
+                one.addLoadCase(load)
+                for a, b in zip(results, one.run()[:3]):
+                    for name in a._fields:
+                        np.testing.assert_allclose(getattr(a, name)[i], getattr(b, name)[0],
+                            rtol=1e-10, atol=1e-10)
+
+
+    def test_ragged_loads(self):
+
+        # load cases with unequal numbers of each kind of load
+        f = self.frame
+        frame = Frame(f.nodes, f.reactions, f.elements, f.options)
+        frame.addLoadCase(StaticLoadCase(0.0, -386.4, 0.0))  # gravity only
+
+        load = StaticLoadCase(0.0, 0.0, 0.0)
+        z3 = np.zeros(3)
+        load.changeUniformLoads(np.array([1, 5, 18]), z3, np.array([-1.0, -2.0, -0.5]), z3)
+        load.changeTrapezoidalLoads(np.array([2, 2]), np.zeros(2), np.zeros(2), np.zeros(2), np.zeros(2),
+            np.array([10.0, 60.0]), np.array([50.0, 110.0]), np.array([-1.0, -2.0]), np.array([-3.0, 0.0]),
+            np.zeros(2), np.zeros(2), np.zeros(2), np.zeros(2))
+        load.changeElementLoads(np.array([3, 3, 3, 21]), np.zeros(4), np.array([-5.0, -5.0, 2.0, -1.0]),
+            np.zeros(4), np.array([20.0, 60.0, 90.0, 30.0]))
+        load.changeTemperatureLoads(np.array([10]), 6e-12*np.ones(1), 5.0*np.ones(1), 5.0*np.ones(1),
+            10.0*np.ones(1), 10.0*np.ones(1), 10.0*np.ones(1), 10.0*np.ones(1))
+        frame.addLoadCase(load)
+
+        frame.addLoadCase(StaticLoadCase(0.0, 0.0, 0.0))  # no loads of any kind
+
+        load = StaticLoadCase(0.0, 0.0, 0.0)
+        load.changeUniformLoads(np.array([7]), np.zeros(1), -np.ones(1), np.zeros(1))
+        frame.addLoadCase(load)
+
+        results = frame.run(contiguous=True)[:4]
+        for i, load in enumerate(frame.loadCases):
+            one = Frame(f.nodes, f.reactions, f.elements, f.options)
+            one.addLoadCase(load)
+            for a, b in zip(results, one.run(contiguous=True)[:4]):
+                for name in a._fields:
+                    if name != 'offset':  # the first point of each element, for all cases
+                        np.testing.assert_allclose(getattr(a, name)[i], getattr(b, name)[0],
+                            rtol=1e-10, atol=1e-10)
+        np.testing.assert_array_equal(results[0].dy[2], 0.0)
+        np.testing.assert_array_equal(results[3].Mz[2], 0.0)
+
+
+    def test_element_load_index(self):
+
+        # several loads on one element and none on most: the internal forces
+        # of all the loads together are the sum of those of each load alone
+        f = self.frame
+        frame = Frame(f.nodes, f.reactions, f.elements, f.options)
+        z, o = np.zeros(1), np.ones(1)
+        loads = []
+        for EL, P, x in [(3, -5.0, 20.0), (3, 2.0, 90.0), (5, -3.0, 60.0), (3, -1.0, 60.0)]:
+            loads.append(('changeElementLoads', (np.array([EL]), z, P*o, z, x*o)))
+        loads.append(('changeUniformLoads', (np.array([3]), z, -o, z)))
+        loads.append(('changeUniformLoads', (np.array([12]), z, 0.5*o, z)))
+        loads.append(('changeTrapezoidalLoads', (np.array([3]), z, z, z, z, 10*o, 50*o, -o, -3*o, z, z, z, z)))
+
+        together = StaticLoadCase(0.0, 0.0, 0.0)
+        for kind in ['changeElementLoads', 'changeUniformLoads', 'changeTrapezoidalLoads']:
+            args = [np.concatenate(a) for a in zip(*[args for k, args in loads if k == kind])]
+            getattr(together, kind)(*args)
+        frame.addLoadCase(together)
+        for kind, args in loads:
+            load = StaticLoadCase(0.0, 0.0, 0.0)
+            getattr(load, kind)(*args)
+            frame.addLoadCase(load)
+
+        intF = frame.run(contiguous=True)[3]
+        for name in ['Nx', 'Vy', 'Mz', 'Dy']:
+            values = getattr(intF, name)
+            np.testing.assert_allclose(values[0], values[1:].sum(axis=0), rtol=1e-9,
+                atol=1e-9*np.abs(values).max())
+
+        # an unloaded element without gravity has a constant shear
+        for i in [0, 9, 20]:
+            Vy = intF.element(i).Vy[0]
+            np.testing.assert_allclose(Vy, Vy[0], rtol=1e-10, atol=1e-10)
+
+
+    def test_block(self):
+
+        for storage in ['dense', 'skyline']:
+            self.frame.setStorage(storage)
+            disp, forces, reactions, internalForces, mass, modal = self.frame.run(block=True)
+
+            np.testing.assert_array_almost_equal(disp.dx, self.displacements.dx, decimal=10)
+            np.testing.assert_array_almost_equal(disp.dy, self.displacements.dy, decimal=10)
+            np.testing.assert_array_almost_equal(disp.dzrot, self.displacements.dzrot, decimal=10)
+            np.testing.assert_array_almost_equal(forces.Nx, self.forces.Nx, decimal=6)
+            np.testing.assert_array_almost_equal(forces.Mzz, self.forces.Mzz, decimal=6)
+            np.testing.assert_array_almost_equal(reactions.Fx, self.reactions.Fx, decimal=6)
+            np.testing.assert_array_almost_equal(reactions.Fy, self.reactions.Fy, decimal=6)
+
+
+    def manyLoadCases(self, nCases):
+        """a frame with nCases load cases of unequal loads"""
+
+        f = self.frame
+        frame = Frame(f.nodes, f.reactions, f.elements, f.options)
+        for i in range(nCases):
+            load = StaticLoadCase(0.0, -386.4*(i % 3), 0.0)
+            load.changePointLoads(np.array([2 + i % 5, 9]), np.array([float(i), 0.0]),
+                np.array([-10.0, -0.5*i]), np.zeros(2), np.zeros(2), np.zeros(2), np.zeros(2))
+            if i % 4 == 0:
+                load.changeUniformLoads(np.array([1 + i % 21]), np.zeros(1), -np.ones(1), np.zeros(1))
+            frame.addLoadCase(load)
+
+        return frame
+
+
+    def test_many_load_cases(self):
+
+        # more load cases than Frame3DD allows, as the same load cases one by one
+        frame = self.manyLoadCases(40)
+        for block in [False, True]:
+            disp, forces, reactions, internalForces = frame.run(block)[:4]
+            for i, load in enumerate(frame.loadCases):
+                one = Frame(frame.nodes, frame.reactions, frame.elements, frame.options)
+                one.addLoadCase(load)
+                d, f, r, intF = one.run()[:4]
+                np.testing.assert_allclose(disp.dy[i], d.dy[0], rtol=1e-9, atol=1e-12)
+                np.testing.assert_allclose(forces.Mzz[i], f.Mzz[0], rtol=1e-9, atol=1e-6)
+                np.testing.assert_allclose(reactions.Fy[i], r.Fy[0], rtol=1e-9, atol=1e-6)
+                np.testing.assert_allclose(internalForces[i % 21].Mz[i], intF[i % 21].Mz[0], rtol=1e-9, atol=1e-6)
+
+
+    def test_load_blocks(self):
+
+        # a block of one load case at a time, as one block of all
+        frame = self.manyLoadCases(10)
+        for block in [False, True]:
+            expected = frame.run(block, contiguous=True)[:4]
+            frame.setLoadBlock(1)
+            results = frame.run(block, contiguous=True)[:4]
+            frame.setLoadBlock()
+            for a, b in zip(results, expected):
+                for name in a._fields:
+                    np.testing.assert_allclose(getattr(a, name), getattr(b, name), rtol=1e-12, atol=1e-12)
+        self.assertRaises(ValueError, frame.setLoadBlock, -1)
+
+
+    def test_contiguous(self):
+
+        intF = self.frame.run(contiguous=True)[3]
+        nIF = [len(f.x[0]) for f in self.internalForces]
+        np.testing.assert_array_equal(intF.offset, np.cumsum([0] + nIF))
+        self.assertEqual(intF.Mz.shape, (2, sum(nIF)))
+        self.assertTrue(intF.Mz.flags.c_contiguous)
+
+        for iE in range(len(nIF)):
+            for name in intF.element(iE)._fields:
+                np.testing.assert_array_equal(getattr(intF.element(iE), name), getattr(self.internalForces[iE], name))
+
+        intF = self.frame.runBatch({'Iz': self.frame.eIz*np.ones((2, 1))}, contiguous=True)[3]
+        np.testing.assert_array_equal(intF.element(3).Mz[1], self.internalForces[3].Mz)
+
+
+    def test_extrema(self):
+
+        ext = self.frame.run(extrema=True)[3]
+        self.assertEqual(ext._fields, self.internalForces[0]._fields[1:])
+
+        # uniform loads: the forces at the points are exact, and the extrema
+        # bound them (the interior extremum of Mz is between the points)
+        for iE, f in enumerate(self.internalForces):
+            for name in ['Nx', 'Vy', 'Vz', 'Tx', 'My', 'Mz']:
+                values, e = getattr(f, name), getattr(ext, name)
+                tol = 1e-8*max(np.abs(values).max(), 1.0)
+                self.assertTrue(np.all(e.max[:, iE] >= values.max(axis=1) - tol))
+                self.assertTrue(np.all(e.min[:, iE] <= values.min(axis=1) + tol))
+                self.assertTrue(np.all((e.xmax[:, iE] >= 0) & (e.xmax[:, iE] <= f.x[:, -1] + 1e-8)))
+        np.testing.assert_allclose(ext.Vy.max[:, 0], self.internalForces[0].Vy.max(axis=1))
+        self.assertTrue(np.all(ext.Mz.max[:, 3] > self.internalForces[3].Mz.max(axis=1)))
+
+        ext = self.frame.run(outputs={'internalForces': [2]}, extrema=True)[3]
+        self.assertTrue(np.all(np.isnan(ext.Mz.max[:, [0, 2]])))
+        np.testing.assert_array_equal(ext.Mz.max[:, 1], self.frame.run(extrema=True)[3].Mz.max[:, 1])
+
+
+    def test_lazy(self):
+
+        disp, forces, reactions, solution = self.frame.run(lazy=True)[:4]
+        np.testing.assert_array_equal(disp.dx, self.displacements.dx)
+        np.testing.assert_array_equal(forces.Mzz, self.forces.Mzz)
+
+        for iE in [0, 3, 20]:
+            for iCase in range(2):
+                intF = solution.internalForces(iE+1, iCase)
+                for name in intF._fields:
+                    np.testing.assert_array_equal(getattr(intF, name), getattr(self.internalForces[iE], name)[iCase])
+        intF = solution.internalForces(4, 1)
+        self.assertTrue(solution.internalForces(4, 1) is intF)  # cached
+
+        x = self.internalForces[3].x[0]
+        intF = solution.internalForces(4, 0, stations=x[::2])
+        np.testing.assert_array_equal(intF.x, x[::2])
+        np.testing.assert_allclose(intF.Mz, self.internalForces[3].Mz[0, ::2], rtol=1e-10)
+
+        disp, forces = self.frame.run(outputs={'displacements': [3], 'forces': [4], 'internalForces': None},
+            lazy=True)[:2]
+        np.testing.assert_array_equal(disp.dy, self.displacements.dy[:, [2]])
+        np.testing.assert_array_equal(forces.Mzz, self.forces.Mzz[:, 6:8])
+        self.assertRaises(ValueError, solution.internalForces, 22, 0)
+        self.assertRaises(ValueError, solution.internalForces, 4, -1)
+        self.assertRaises(ValueError, solution.internalForces, 4, 2)
+        self.assertRaises(ValueError, solution.internalForces, 4, 0, stations=[-5.0, 10.0])
+        self.assertRaises(ValueError, solution.internalForces, 4, 0, stations=[x[-1] + 1.0])
+
+
+    def test_lazy_loads(self):
+
+        # the solution keeps the loads it was run with
+        EL = np.array([4, 5])
+        load = self.frame.loadCases[0]
+        load.changeUniformLoads(EL, np.zeros(2), -np.ones(2), np.zeros(2))
+        solution = self.frame.run(lazy=True)[3]
+        x = self.internalForces[3].x[0]
+        expected = solution.internalForces(4, 0, stations=x)
+        Uy = weakref.ref(load.Uy)
+
+        load.changeUniformLoads(EL, np.zeros(2), np.ones(2), np.zeros(2))
+        self.frame.run()
+        gc.collect()
+        self.assertTrue(Uy() is not None)
+        intF = solution.internalForces(4, 0, stations=x)
+        for name in intF._fields:
+            np.testing.assert_array_equal(getattr(intF, name), getattr(expected, name))
+
+
+    def test_lazy_permuted(self):
+
+        # element and node data in any order of their numbers
+        perm = np.array([20, 3, 0, 7, 12, 1, 19, 4, 15, 2, 9, 11, 5, 18, 6, 10, 17, 8, 14, 16, 13])
+        elements = ElementData(*[np.asarray(a)[perm] for a in self.frame.elements])
+        nperm = np.array([7, 2, 11, 0, 5, 9, 1, 3, 10, 4, 8, 6])
+        nodes = NodeData(*[np.asarray(a)[nperm] for a in self.frame.nodes])
+        frame = Frame(nodes, self.frame.reactions, elements, self.frame.options)
+        for load in self.frame.loadCases:
+            frame.addLoadCase(load)
+
+        disp, forces, reactions, solution = frame.run(lazy=True)[:4]
+        np.testing.assert_allclose(disp.dy, self.displacements.dy[:, nperm], rtol=1e-10, atol=1e-14)
+        for iE in [0, 3, 20]:
+            for iCase in range(2):
+                intF = solution.internalForces(iE+1, iCase)
+                np.testing.assert_allclose(intF.Mz, self.internalForces[iE].Mz[iCase], rtol=1e-10, atol=1e-10)
+        n1 = self.frame.elements.N1[3]
+        displ = solution.elementDisplacements([4], [0.0])
+        np.testing.assert_allclose(displ.dy[:, 0], self.displacements.dy[:, n1-1], rtol=1e-10)
+
+
+    def test_elementDisplacements(self):
+
+        solution = self.frame.run(lazy=True)[3]
+        x = self.internalForces[3].x[0]
+        n1, n2 = self.frame.elements.N1[3], self.frame.elements.N2[3]
+
+        # global displacements at the ends of element 4 are those of its nodes
+        displ = solution.elementDisplacements([4, 2, 4], [x[-1], 0.0, 0.0])
+        np.testing.assert_array_equal(displ.element, [4, 2, 4])
+        for name in displ._fields[2:]:
+            values = getattr(self.displacements, name)
+            np.testing.assert_allclose(getattr(displ, name)[:, [0, 2]],
+                values[:, [n2-1, n1-1]], rtol=1e-8, atol=1e-12)
+
+        # local displacements as the exact internal forces at the same points
+        displ = solution.elementDisplacements(4, x[::3], local=True)
+        for iCase in range(2):
+            intF = solution.internalForces(4, iCase, stations=x[::3])
+            for a, b in [('dx', 'Dx'), ('dy', 'Dy'), ('dz', 'Dz'), ('dxrot', 'Rx')]:
+                np.testing.assert_array_equal(getattr(displ, a)[iCase], getattr(intF, b))
+        np.testing.assert_allclose(displ.dy, self.internalForces[3].Dy[:, ::3], rtol=0.05, atol=0.01)
+
+        self.assertRaises(ValueError, solution.elementDisplacements, 22, 0.0)
+        self.assertRaises(ValueError, solution.elementDisplacements, 4, x[-1] + 1.0)
+
+
+    def test_elementDisplacements_loads(self):
+
+        # the loads of several elements in one call, as of each element alone
+        self.frame.loadCases[0].changeUniformLoads(np.array([15, 4, 10]), np.zeros(3),
+            np.array([-1.0, -2.0, -3.0]), np.zeros(3))
+        solution = self.frame.run(lazy=True)[3]
+        element = np.array([15, 10, 4, 10, 20, 15])
+        x = np.array([50.0, 30.0, 60.0, 100.0, 20.0, 120.0])
+        displ = solution.elementDisplacements(element, x, local=True)
+        for i in range(len(x)):
+            for iCase in range(2):
+                intF = solution.internalForces(element[i], iCase, stations=[x[i]])
+                self.assertAlmostEqual(displ.dy[iCase, i], intF.Dy[0], places=10)
+                self.assertAlmostEqual(displ.dxrot[iCase, i], intF.Rx[0], places=10)
+
+
+    def test_combinations(self):
+
+        # the sum of the two load cases, as one load case
+        load = StaticLoadCase(0.0, -2*386.4, 0.0)
+        load.changePointLoads(np.array([2, 3, 4, 5, 6]), np.array([0.0, 20.0, 10.0, 20.0, 0.0]),
+            np.array([-10.0, -20.0, -20.0, -10.0, -20.0]), np.zeros(5), np.zeros(5), np.zeros(5), np.zeros(5))
+        load.changeTemperatureLoads(np.array([10, 13, 15]), 6e-12*np.ones(3), 5.0*np.ones(3),
+            5.0*np.ones(3), np.array([10.0, 15.0, 17.0]), np.array([10.0, 15.0, 17.0]),
+            np.array([10.0, 15.0, 17.0]), np.array([10.0, 15.0, 17.0]))
+        load.changePrescribedDisplacements(np.array([1, 8]), np.array([0.0, 0.2]), np.array([-1.0, 0.0]),
+            np.zeros(2), np.zeros(2), np.zeros(2), np.zeros(2))
+        self.frame.addLoadCase(load)
+        disp, forces, reactions, intF = self.frame.run(contiguous=True)[:4]
+
+        C = np.array([[1.0, 1.0, 0.0], [1.35, 0.0, 0.0], [0.0, -1.5, 0.0]])
+        cdisp, cforces, creactions, cintF = self.frame.runCombinations(C, contiguous=True)[:4]
+        np.testing.assert_allclose(cdisp.dy[0], disp.dy[2], rtol=1e-8, atol=1e-10)
+        np.testing.assert_allclose(cforces.Mzz[0], forces.Mzz[2], rtol=1e-8, atol=1e-6)
+        np.testing.assert_allclose(creactions.Fy[0], reactions.Fy[2], rtol=1e-8, atol=1e-6)
+        np.testing.assert_allclose(cintF.Mz[0], intF.Mz[2], rtol=1e-8, atol=1e-6)
+        np.testing.assert_allclose(cdisp.dx[1:], [1.35*disp.dx[0], -1.5*disp.dx[1]], rtol=1e-12)
+        np.testing.assert_array_equal(cdisp.node, disp.node)
+        np.testing.assert_array_equal(cintF.x, intF.x)
+
+        # combinations of stored results, as the list of InternalForces
+        cintF = Frame.combine(C[:, :2], (self.displacements, self.forces, None, self.internalForces))[3]
+        np.testing.assert_allclose(cintF[3].Vy[2], -1.5*self.internalForces[3].Vy[1], rtol=1e-12)
+        self.assertRaises(ValueError, Frame.combine, C, (self.displacements, None, None, None))
+
+        # not for the geometric stiffness the C module is run with
+        frame = Frame(self.frame.nodes, self.frame.reactions, self.frame.elements, Options(0, 1, 10.0))
+        frame.addLoadCase(load)
+        self.assertRaises(ValueError, frame.runCombinations, C[:, :1])
+
+
+    def test_envelope(self):
+
+        C = np.random.RandomState(0).uniform(-1.5, 1.5, (50, 2))
+        results = (self.displacements, self.forces, self.reactions, self.internalForces)
+        disp, forces, reactions, intF = Frame.combine(C, results)
+        edisp, eforces, ereactions, eintF = Frame.envelope(C, results, chunkSize=7)
+
+        for env, combos in [(edisp.dy, disp.dy), (eforces.Mzz, forces.Mzz),
+                (ereactions.Fx, reactions.Fx), (eintF[3].Mz, intF[3].Mz)]:
+            np.testing.assert_allclose(env.max, combos.max(axis=0), rtol=1e-12)
+            np.testing.assert_allclose(env.min, combos.min(axis=0), rtol=1e-12)
+            np.testing.assert_array_equal(env.imax, combos.argmax(axis=0))
+            np.testing.assert_array_equal(env.imin, combos.argmin(axis=0))
+        np.testing.assert_array_equal(edisp.node, self.displacements.node[0])
+        np.testing.assert_array_equal(eintF[3].x, self.internalForces[3].x[0])
+
+        intF = Frame.combine(C, self.frame.run(contiguous=True))[3]
+        eintF = Frame.envelope(C, self.frame.run(contiguous=True), chunkSize=64)[3]
+        np.testing.assert_allclose(eintF.Vy.max, intF.Vy.max(axis=0), rtol=1e-12)
+
+
+    def test_influenceLines(self):
+
+        elements = np.array([1, 1, 2, 2])
+        x = np.array([0.0, 60.0, 0.0, 120.0])
+        lines = self.frame.influenceLines((0.0, -1.0, 0.0), elements=elements, x=x)
+        np.testing.assert_allclose(lines.s, [0.0, 60.0, 120.0, 240.0])
+        self.assertEqual(len(self.frame.loadCases), 2)
+
+        # the unit load at a position, as a load case
+        load = StaticLoadCase(0.0, 0.0, 0.0)
+        load.changeElementLoads(np.array([2]), np.zeros(1), -np.ones(1), np.zeros(1), np.array([120.0]))
+        self.frame.loadCases = [load]
+        disp, forces, reactions = self.frame.run()[:3]
+        np.testing.assert_allclose(lines.displacements.dy[3], disp.dy[0], rtol=1e-10, atol=1e-14)
+        np.testing.assert_allclose(lines.forces.Mzz[3], forces.Mzz[0], rtol=1e-10, atol=1e-10)
+        np.testing.assert_allclose(lines.reactions.Fy[3], reactions.Fy[0], rtol=1e-10, atol=1e-10)
+
+        # two axles 60 apart: at the front positions 120 and 90
+        disp = lines.movingLoad([10.0, 5.0], [0.0, 60.0], [120.0, 90.0])[0]
+        dy = lines.displacements.dy
+        np.testing.assert_allclose(disp.dy[0], 10*dy[2] + 5*dy[1], rtol=1e-12)
+        np.testing.assert_allclose(disp.dy[1], 10*(0.5*dy[1] + 0.5*dy[2]) + 5*(0.5*dy[0] + 0.5*dy[1]), rtol=1e-12)
+        env = lines.movingLoad([10.0, 5.0], [0.0, 60.0], np.linspace(0.0, 300.0, 301), envelope=True)[0]
+        self.assertTrue(np.all(env.dy.min <= disp.dy.min(axis=0)))
+
+        nodeLines = self.frame.influenceLines((0.0, -1.0, 0.0), nodes=[2, 3], outputs=['reactions'])
+        self.assertTrue(nodeLines.displacements is None)
+        self.assertRaises(ValueError, self.frame.influenceLines, (0.0, -1.0, 0.0))
+
+        # positions by node number, whatever the order of the node rows
+        nperm = np.array([7, 2, 11, 0, 5, 9, 1, 3, 10, 4, 8, 6])
+        nodes = NodeData(*[np.asarray(a)[nperm] for a in self.frame.nodes])
+        frame = Frame(nodes, self.frame.reactions, self.frame.elements, self.frame.options)
+        nodeLines = frame.influenceLines((0.0, -1.0, 0.0), nodes=[2, 3, 9], outputs=['reactions'])
+        np.testing.assert_allclose(nodeLines.s, [0.0, 120.0, 240.0])
+        lines = frame.influenceLines((0.0, -1.0, 0.0), elements=elements, x=x)
+        np.testing.assert_allclose(lines.s, [0.0, 60.0, 120.0, 240.0])
+
+        frame = Frame(self.frame.nodes, self.frame.reactions, self.frame.elements, Options(0, 1, 10.0))
+        self.assertRaises(ValueError, frame.influenceLines, (0.0, -1.0, 0.0), nodes=[2, 3])
+
+
+    def test_internal_force_points(self):
+
+        # dx = 0.1 is not a float: the points are those the C module writes
+        frame = Frame(self.frame.nodes, self.frame.reactions, self.frame.elements, Options(1, 0, 0.1))
+        for load in self.frame.loadCases:
+            frame.addLoadCase(load)
+        internalForces = frame.run(contiguous=True)[3]
+        x, y = frame.nodes.x, frame.nodes.y
+        for i, (n1, n2) in enumerate(zip(frame.elements.N1, frame.elements.N2)):
+            intF = internalForces.element(i)
+            self.assertAlmostEqual(intF.x[0, -1], np.hypot(x[n2-1] - x[n1-1], y[n2-1] - y[n1-1]))
+            self.assertAlmostEqual(intF.x[0, 1], 0.1, places=6)
+        self.assertEqual(internalForces.offset[-1], internalForces.x.shape[1])
+
+
+    def test_outputs(self):
+
+        outputs = {'displacements': [3, 1], 'reactions': None, 'internalForces': [2]}
+        disp, forces, reactions, intF, mass, modal = self.frame.run(outputs=outputs)
+        self.assertTrue(forces is None and mass is None)
+        np.testing.assert_array_equal(disp.node[0], [3, 1])
+        np.testing.assert_array_equal(disp.dy, self.displacements.dy[:, [2, 0]])
+        np.testing.assert_array_equal(reactions.Fx, self.reactions.Fx)
+        self.assertTrue(intF[0] is None)
+        np.testing.assert_array_equal(intF[1].Mz, self.internalForces[1].Mz)
+
+        disp, forces, reactions = self.frame.run(outputs={'forces': [4]})[:3]
+        self.assertTrue(disp is None and reactions is None)
+        np.testing.assert_array_equal(forces.Mzz, self.forces.Mzz[:, 6:8])
+
+        self.assertRaises(ValueError, self.frame.run, outputs=['stresses'])
+        self.assertRaises(ValueError, self.frame.run, outputs={'reactions': [13]})
+
+
+    def test_sensitivity(self):
+
+        of = {'displacements': None, 'reactions': [1, 8], 'forces': [4, 10]}
+        self.frame.setSensitivity(['Iz', 'y'], of=of, method='direct')
+        self.frame.run()
+        direct = self.frame.sensitivity
+        self.frame.setSensitivity(['Iz', 'y'], of=of, method='adjoint')
+        self.frame.run()
+        adjoint = self.frame.sensitivity
+
+        np.testing.assert_array_almost_equal(adjoint.displacements['Iz'].dy, direct.displacements['Iz'].dy, decimal=8)
+        np.testing.assert_array_almost_equal(adjoint.reactions['y'].Fx, direct.reactions['y'].Fx, decimal=8)
+        np.testing.assert_array_almost_equal(adjoint.forces['Iz'].Mzz, direct.forces['Iz'].Mzz, decimal=8)
+        np.testing.assert_array_equal(direct.forces['y'].node, [4, 5, 3, 9])
+
+        # central differences of the element 4 Iz and the node 10 y coordinate
+        for var, values, i in [('Iz', self.frame.eIz, 3), ('y', self.frame.ny, 9)]:
+            h = 1e-3*values[i]
+            values[i] += h
+            disp1, forces1, reactions1 = self.frame.run()[:3]
+            values[i] -= 2*h
+            disp2, forces2, reactions2 = self.frame.run()[:3]
+            values[i] += h
+
+            fd = (disp1.dy - disp2.dy)/(2*h)
+            np.testing.assert_allclose(direct.displacements[var].dy[:, :, i], fd, rtol=1e-3, atol=1e-3*np.abs(fd).max())
+            fd = (reactions1.Fx - reactions2.Fx)[:, [0, 7]]/(2*h)
+            np.testing.assert_allclose(direct.reactions[var].Fx[:, :, i], fd, rtol=1e-3, atol=1e-3*np.abs(fd).max())
+            fd = (forces1.Mzz - forces2.Mzz)[:, [6, 7, 18, 19]]/(2*h)
+            np.testing.assert_allclose(direct.forces[var].Mzz[:, :, i], fd, rtol=1e-3, atol=1e-3*np.abs(fd).max())
+
+        self.assertRaises(ValueError, self.frame.setSensitivity, ['Ix'])
+
+        # not for the geometric stiffness the C module is run with
+        frame = Frame(self.frame.nodes, self.frame.reactions, self.frame.elements, Options(0, 1, 10.0))
+        frame.addLoadCase(self.frame.loadCases[0])
+        frame.setSensitivity(['Iz'])
+        self.assertRaises(ValueError, frame.run)
+
+
+    def test_batch(self):
+
+        f = self.frame
+        Iz = f.eIz*np.array([[0.5], [1.0], [2.0]])
+        disp, forces, reactions, internalForces, mass, modal = f.runBatch({'Iz': Iz})
+        self.assertEqual(disp.dy.shape, (3, 2, len(f.nx)))
+
+        np.testing.assert_array_equal(disp.dy[1], self.displacements.dy)
+        np.testing.assert_array_equal(forces.Mzz[1], self.forces.Mzz)
+        np.testing.assert_array_equal(reactions.Fx[1], self.reactions.Fx)
+        np.testing.assert_array_equal(internalForces[3].Mz[1], self.internalForces[3].Mz)
+
+        Iz0 = np.copy(f.eIz)
+        f.eIz[:] = Iz[2]
+        disp2, forces2 = f.run()[:2]
+        f.eIz[:] = Iz0
+        np.testing.assert_array_equal(disp.dy[2], disp2.dy)
+        np.testing.assert_array_equal(forces.Mzz[2], forces2.Mzz)
+
+        # load cases of each design
+        disp = f.runBatch(loadCases=[f.loadCases, f.loadCases[::-1]])[0]
+        np.testing.assert_array_equal(disp.dx[1], self.displacements.dx[::-1])
+
+        self.assertRaises(ValueError, f.runBatch, {'Iz': Iz[:, :3]})
+        self.assertRaises(ValueError, f.runBatch, {'Ix': Iz})
+
+        # the element properties of each design are checked
+        Iz[2, 4] = 0.0
+        self.assertRaises(RuntimeError, f.runBatch, {'Iz': Iz})
+
+
+    def test_sweep(self):
+
+        f = self.frame
+        Iz = f.eIz*np.linspace(0.5, 2.0, 7)[:, np.newaxis]
+        cases = [f.loadCases if i % 2 else f.loadCases[::-1] for i in range(7)]
+        batch = f.runBatch({'Iz': Iz}, cases)
+        sweep = f.runSweep({'Iz': Iz}, cases, processes=2, chunksize=2)
+
+        np.testing.assert_array_equal(sweep[0].dy, batch[0].dy)
+        np.testing.assert_array_equal(sweep[1].Mzz, batch[1].Mzz)
+        np.testing.assert_array_equal(sweep[2].Fx, batch[2].Fx)
+        np.testing.assert_array_equal(sweep[3][3].Mz, batch[3][3].Mz)
+        np.testing.assert_array_equal(sweep[4].total_mass, batch[4].total_mass)
+
+        sweep = f.runSweep({'Iz': Iz[:0]}, processes=2)
+        self.assertEqual(sweep[0].dy.shape, (0, 2, 12))
+
+        # a frame is rebuilt from its pickle
+        frame = pickle.loads(pickle.dumps(f))
+        np.testing.assert_array_equal(frame.run()[0].dy, self.displacements.dy)
+
+
+    def test_run_many(self):
+
+        frames = []
+        for scale in [0.5, 1.0, 2.0, 4.0]:
+            self.setUp()
+            self.frame.eIz *= scale
+            frames.append(self.frame)
+
+        results = Frame.runMany(frames, maxWorkers=2)
+        for frame, result in zip(frames, results):
+            disp, forces = frame.run()[:2]
+            np.testing.assert_array_equal(result[0].dy, disp.dy)
+            np.testing.assert_array_equal(result[1].Mzz, forces.Mzz)
+
+        self.assertRaises(ValueError, Frame.runMany, [frames[0], frames[0]])
+
+        # frames that share a load case, each with the weight of its own extra mass
+        load = self.frame.loadCases[0]
+        frames = []
+        for i in range(40):
+            frame = Frame(self.frame.nodes, self.frame.reactions, self.frame.elements, self.frame.options)
+            frame.addLoadCase(load)
+            frame.changeExtraNodeMass(np.array([3 + i % 4]), np.array([0.01*(i + 1)]), np.zeros(1), np.zeros(1),
+                np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), True)
+            if i % 2:
+                frame.changeExtraElementMass(np.array([1 + i % 21]), np.array([0.02*i]), True)
+            frames.append(frame)
+        pL, eL = load.pL, load.eL
+        results = Frame.runMany(frames, maxWorkers=8)
+        for frame, result in zip(frames, results):
+            np.testing.assert_array_equal(result[0].dy, frame.run()[0].dy)
+        self.assertTrue(load.pL is pL and load.eL is eL)  # the load case is not changed
+
+        # the weight of an extra element mass, as a point load at its middle
+        frame = frames[9]
+        L = 120.0  # element 10, from node 3 to node 9
+        expected = StaticLoadCase(load.gx, load.gy, load.gz)
+        expected.changePointLoads(load.NF, load.Fx, load.Fy, load.Fz, load.Mxx, load.Myy, load.Mzz)
+        expected.changePrescribedDisplacements(load.ND, load.Dx, load.Dy, load.Dz, load.Dxx, load.Dyy, load.Dzz)
+        expected.changeElementLoads(np.array([10]), np.zeros(1), 0.02*9*load.gy*np.ones(1), np.zeros(1), 0.5*L*np.ones(1))
+        one = Frame(frame.nodes, frame.reactions, frame.elements, frame.options)
+        one.addLoadCase(expected)
+        one.changeExtraNodeMass(frame.ENMnode, frame.ENMmass, np.zeros(1), np.zeros(1),
+            np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), True)
+        np.testing.assert_allclose(frame.run()[0].dy, one.run()[0].dy, rtol=1e-12)
+
+
+    def test_input_error(self):
+
+        # an input error is reported, and the frame can be run again
+        Ax0 = self.frame.eAx[0]
+        self.frame.eAx[0] = 0.0
+        self.assertRaises(RuntimeError, self.frame.run)
+        self.frame.eAx[0] = Ax0
+        disp = self.frame.run()[0]
+        np.testing.assert_array_equal(disp.dy, self.displacements.dy)
+
+
 
 class FrameTestEXB(unittest.TestCase):
 
@@ -577,6 +1187,7 @@ class FrameTestEXB(unittest.TestCase):
 
 
 
+        self.frame = frame
         self.displacements, self.forces, self.reactions, self.internalForces, self.mass, self.modal = frame.run()
 
 
@@ -919,6 +1530,155 @@ class FrameTestEXB(unittest.TestCase):
 
 
 
+    def test_dense_storage(self):
+
+        self.frame.setStorage('dense')
+        disp, forces, reactions, internalForces, mass, modal = self.frame.run()
+
+        np.testing.assert_array_almost_equal(disp.dx, self.displacements.dx, decimal=10)
+        np.testing.assert_array_almost_equal(disp.dy, self.displacements.dy, decimal=10)
+        np.testing.assert_array_almost_equal(disp.dz, self.displacements.dz, decimal=10)
+        np.testing.assert_array_almost_equal(forces.Myy, self.forces.Myy, decimal=6)
+        np.testing.assert_array_almost_equal(reactions.Fz, self.reactions.Fz, decimal=6)
+        np.testing.assert_array_almost_equal(modal.freq, self.modal.freq, decimal=6)
+
+
+    def test_condensation(self):
+
+        one = np.ones(2)
+        zero = np.zeros(2)
+        Kc = []
+        for storage in ['dense', 'skyline']:
+            self.frame.setStorage(storage)
+            self.frame.changeCondensationData(1, np.array([1, 2]), one, one, one, zero, zero, zero, np.arange(1, 7))
+            self.frame.run()
+            Kc.append(np.copy(self.frame.Kc))
+
+        self.assertEqual(Kc[0].shape, (6, 6))
+        np.testing.assert_allclose(Kc[0], Kc[0].T, atol=1e-8*np.abs(Kc[0]).max())
+        self.assertTrue(np.all(np.diag(Kc[0]) > 0))
+        np.testing.assert_allclose(Kc[1], Kc[0], atol=1e-8*np.abs(Kc[0]).max())
+
+
+    def test_lapack(self):
+
+        try:
+            import scipy.linalg.cython_lapack
+        except ImportError:
+            self.skipTest('LAPACK backend requires scipy')
+
+        for storage in ['dense', 'skyline']:
+            self.frame.setStorage(storage)
+            self.frame.setSolver('lapack')
+            disp, forces, reactions, internalForces, mass, modal = self.frame.run()
+
+            np.testing.assert_array_almost_equal(disp.dx, self.displacements.dx, decimal=10)
+            np.testing.assert_array_almost_equal(disp.dz, self.displacements.dz, decimal=10)
+            np.testing.assert_array_almost_equal(forces.Myy, self.forces.Myy, decimal=6)
+            np.testing.assert_array_almost_equal(reactions.Fz, self.reactions.Fz, decimal=6)
+            np.testing.assert_array_almost_equal(modal.freq, self.modal.freq, decimal=6)
+            # mode shapes are unique up to sign
+            np.testing.assert_array_almost_equal(np.abs(modal.xdsp), np.abs(self.modal.xdsp), decimal=6)
+            np.testing.assert_array_almost_equal(np.abs(modal.xmpf), np.abs(self.modal.xmpf), decimal=6)
+
+
+    def test_lanczos(self):
+
+        f = self.frame
+        for storage in ['dense', 'skyline']:
+            f.setStorage(storage)
+            f.enableDynamics(f.nM, 3, f.lump, f.tol, f.shift)
+            disp, forces, reactions, internalForces, mass, modal = f.run()
+
+            np.testing.assert_array_almost_equal(mass.xmass, self.mass.xmass, decimal=10)
+            np.testing.assert_array_almost_equal(modal.freq, self.modal.freq, decimal=6)
+            # mode shapes are unique up to sign
+            np.testing.assert_array_almost_equal(np.abs(modal.xdsp), np.abs(self.modal.xdsp), decimal=6)
+            np.testing.assert_array_almost_equal(np.abs(modal.xmpf), np.abs(self.modal.xmpf), decimal=6)
+            np.testing.assert_array_almost_equal(np.abs(modal.zmpf), np.abs(self.modal.zmpf), decimal=6)
+
+
+    def test_modal_only(self):
+
+        # without geometric stiffness the modes do not depend on the loads
+        self.frame.c_other.geom = 0
+        disp, forces, reactions, internalForces, mass, modal = self.frame.run()
+
+        for storage in ['dense', 'skyline']:
+            self.frame.setStorage(storage)
+            mass2, modal2 = self.frame.runModal()
+
+            self.assertAlmostEqual(mass2.total_mass, mass.total_mass, places=10)
+            np.testing.assert_array_almost_equal(mass2.xmass, mass.xmass, decimal=10)
+            np.testing.assert_array_almost_equal(modal2.freq, modal.freq, decimal=10)
+            np.testing.assert_array_almost_equal(modal2.xmpf, modal.xmpf, decimal=8)
+            np.testing.assert_array_almost_equal(modal2.zdsp, modal.zdsp, decimal=8)
+
+
+    def test_modal_sensitivity(self):
+
+        f = self.frame
+        f.c_other.geom = 0
+        f.setModalSensitivity(['Iy', 'mass'], shapes=True)
+        mass, modal = f.runModal()
+        S = f.modalSensitivity
+        self.assertEqual(S.freq['Iy'].shape, (6, 4))
+        self.assertEqual(S.freq['mass'].shape, (6, 1))
+
+        # central differences of the element 1 Iy and the extra node mass
+        for var, values in [('Iy', f.eIy), ('mass', f.ENMmass)]:
+            h = 1e-3*values[0]
+            values[0] += h
+            modal1 = f.runModal()[1]
+            values[0] -= 2*h
+            modal2 = f.runModal()[1]
+            values[0] += h
+
+            fd = (modal1.freq - modal2.freq)/(2*h)
+            np.testing.assert_allclose(S.freq[var][:, 0], fd, rtol=1e-4, atol=1e-4*np.abs(fd).max())
+            # mode shapes are unique up to sign
+            s1 = np.sign(np.sum(modal1.xdsp*modal.xdsp, axis=1))
+            s2 = np.sign(np.sum(modal2.xdsp*modal.xdsp, axis=1))
+            fd = (s1[:, np.newaxis]*modal1.xdsp - s2[:, np.newaxis]*modal2.xdsp)/(2*h)
+            np.testing.assert_allclose(S.modes[var].dx[0, :, 0], fd[0], rtol=1e-3, atol=1e-3*np.abs(fd[0]).max())
+
+        f.setModalSensitivity(None)
+        f.runModal()
+        self.assertIsNone(f.modalSensitivity)
+        self.assertRaises(ValueError, f.setModalSensitivity, ['Ix'])
+
+
+    def test_nonlinear(self):
+
+        for method in ['modified', 'broyden']:
+            for storage in ['dense', 'skyline']:
+                self.frame.setStorage(storage)
+                self.frame.setNonlinear(method, tol=1e-12, maxit=100, refactor=5)
+                disp, forces, reactions, internalForces, mass, modal = self.frame.run()
+
+                np.testing.assert_array_almost_equal(disp.dx, self.displacements.dx, decimal=8)
+                np.testing.assert_array_almost_equal(disp.dz, self.displacements.dz, decimal=8)
+                np.testing.assert_array_almost_equal(forces.Nx, self.forces.Nx, decimal=4)
+                np.testing.assert_array_almost_equal(reactions.Fz, self.reactions.Fz, decimal=4)
+                np.testing.assert_array_almost_equal(modal.freq, self.modal.freq, decimal=6)
+
+        self.assertRaises(ValueError, self.frame.setNonlinear, 'secant')
+
+
+    def test_nonlinear_cases(self):
+
+        # the geometric stiffness of each load case, as each load case alone
+        f = self.frame
+        results = (self.displacements, self.forces, self.reactions)
+        for i, load in enumerate(f.loadCases):
+            one = Frame(f.nodes, f.reactions, f.elements, f.options)
+            one.addLoadCase(load)
+            for a, b in zip(results, one.run()[:3]):
+                for name in a._fields:
+                    np.testing.assert_allclose(getattr(a, name)[i], getattr(b, name)[0],
+                        rtol=1e-10, atol=1e-10)
+
+
 
 if __name__ == "__main__":
     unittest.main()